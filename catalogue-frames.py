@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Cataloguing Frames
+
+ See the README.md file for more information.
+
+"""
+
+# Import the code needed to manage files.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+#...for the time.
+import time
+
+#...for the frame catalogue.
+from cernatschool.catalogue import FrameCatalogue
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*==================================*")
+    print("* CERN@school - frame cataloguing  *")
+    print("*==================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",         help="Path to the input datasets.")
+    parser.add_argument("-c", "--catalogue", help="Path to the catalogue file (default: <inputPath>/catalogue.sqlite)")
+    parser.add_argument("-r", "--rebuild",   help="Rebuild the catalogue even if it exists", action="store_true")
+    parser.add_argument("--datapoint",       help="Select frames from this data point")
+    parser.add_argument("--chipid",          help="Select frames from this chip ID")
+    parser.add_argument("--start",           help="Select frames starting at or after this time [s]", type=float)
+    parser.add_argument("--end",             help="Select frames starting before this time [s]", type=float)
+    parser.add_argument("--hv",              help="Select frames with this bias voltage [V]", type=float)
+    parser.add_argument("--ikrum",           help="Select frames with this I_Krum value", type=int)
+    parser.add_argument("-l", "--list",      help="List the selected frames", action="store_true")
+    parser.add_argument("-v", "--verbose",   help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the data.
+    datapath = args.inputPath
+    #
+    if not os.path.isdir(datapath):
+        raise IOError("* ERROR: '%s' input directory does not exist!" % (datapath))
+
+    ## The path to the catalogue.
+    catpath = args.catalogue
+    #
+    if catpath is None:
+        catpath = (datapath + "/catalogue.sqlite").replace("//", "/")
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename='log_catalogue-frames.log', filemode='w', level=level)
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Catalogue           : '%s'" % (catpath))
+    print("*")
+
+    ## Does the catalogue need building?
+    needs_building = args.rebuild or not os.path.exists(catpath)
+
+    ## The frame catalogue.
+    cat = FrameCatalogue(catpath)
+
+    if needs_building or cat.getNumberOfFrames() == 0:
+        t_0 = time.time()
+        n = cat.build(datapath)
+        print("* Catalogued %d frames in %.2f [s]." % (n, time.time() - t_0))
+        print("*")
+
+    print("* The catalogue contains %d frames from %d data points." % \
+        (cat.getNumberOfFrames(), len(cat.getDataPoints())))
+    print("*")
+
+    # Perform the query.
+    t_0 = time.time()
+    #
+    ## The selected frames.
+    records = cat.getFrameRecords(\
+        datapoint = args.datapoint, \
+        chipid    = args.chipid,    \
+        start     = args.start,     \
+        end       = args.end,       \
+        hv        = args.hv,        \
+        ikrum     = args.ikrum)
+    #
+    t_q = time.time() - t_0
+
+    print("* Selected %d frames in %.2f [ms]." % (len(records), 1000.0 * t_q))
+
+    if args.list:
+        print("*")
+        for r in records:
+            print("* %-10s %-24s %17.6f %s" % \
+                (r["datapoint"], r["datafile"], r["start_time"], r["chipid"]))
+
+    cat.close()
+
+    print("*")
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Reading the datasets straight from zip and tar archives.
+
+The datasets are distributed (and archived) as zip files and tarballs
+of thousands of small data and DSC files, which take far longer to
+extract than to read. The archive members are read instead: the data
+and DSC members of a folder in the archive are paired by name, as the
+Dataset does for the files in a folder, and read in the order they are
+stored, so that a compressed tarball is only read through once.
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the archives.
+import zipfile, tarfile
+
+#...for closing the tar files.
+from contextlib import closing
+
+#...for the members read recently.
+from collections import OrderedDict
+
+#...for processing the file format.
+from helpers import getFormatFromLine, getPixelArraysFromString
+
+#...for the DSC file wrapper class.
+from dsc import DscFile
+
+#...for the dataset wrapper class.
+from dataset import Dataset, DEFAULT_FORMAT_SAMPLE
+
+#...for the read-ahead defaults.
+from prefetch import DEFAULT_PREFETCH_MB
+
+## The archive file extensions.
+ARCHIVE_EXTENSIONS = [".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2"]
+
+## The default memory ceiling for the tar archive members kept once read [MB].
+DEFAULT_ARCHIVE_CACHE_MB = 64
+
+def isArchive(path):
+    """ Is the path a (zip or tar) archive file? """
+    return os.path.isfile(path) and any([path.lower().endswith(ext) for ext in ARCHIVE_EXTENSIONS])
+
+class DataArchive:
+    """ Wrapper class for the zip and tar archives of datasets. """
+
+    def __init__(self, path, cachemb=DEFAULT_ARCHIVE_CACHE_MB):
+        """
+        Constructor.
+
+        Only the list of members is read here.
+
+        @param [in] path The path to the archive file.
+        @param [in] cachemb The memory ceiling for the tar archive members kept once read [MB].
+        """
+
+        # Check if the archive exists. If it doesn't, throw an exception.
+        if not os.path.isfile(path):
+            raise IOError("NOT_EXIST")
+
+        ## The path to the archive.
+        self.__path = path
+
+        ## The zip file (if it's a zip archive).
+        self.__zip = None
+
+        ## The tar file being read through (if it's a tar archive).
+        self.__tar = None
+
+        ## Is it a tar archive?
+        self.__istar = False
+
+        ## The position of the next member in the tar file being read through.
+        self.__position = 0
+
+        ## The tar archive members read most recently {name:contents}.
+        self.__cache = OrderedDict()
+
+        ## The size of the members kept [bytes].
+        self.__cachesize = 0
+
+        ## The memory ceiling for the members kept [bytes].
+        self.__cachemax = cachemb * 1024 * 1024
+
+        ## The names of the members (files), in the order they're stored.
+        self.__names = []
+
+        try:
+            if zipfile.is_zipfile(path):
+                self.__zip = zipfile.ZipFile(path, "r")
+                self.__names = [zi.filename for zi in \
+                    sorted(self.__zip.infolist(), key=lambda zi: zi.header_offset) if not zi.filename.endswith("/")]
+            elif tarfile.is_tarfile(path):
+                # Compressed tarballs are slow to seek in, so they're
+                # only ever read through from the start.
+                self.__istar = True
+                with closing(tarfile.open(path, "r|*")) as tf:
+                    self.__names = [ti.name for ti in tf if ti.isfile()]
+            else:
+                raise IOError("BAD_ARCHIVE")
+        except (zipfile.BadZipfile, tarfile.TarError, EOFError):
+            raise IOError("BAD_ARCHIVE")
+
+        ## The position of each member in the archive {name:index}.
+        self.__order = dict([(name, i) for i, name in enumerate(self.__names)])
+
+        ## The contents of each folder {folder:set of names}.
+        self.__folders = {}
+        #
+        for name in self.__names:
+            parts = name.split("/")
+            for j in range(1, len(parts)):
+                self.__folders.setdefault("/".join(parts[:j]), set()).add(parts[j])
+
+        lg.debug(" * '%s' has %d members in %d folders." % (path, len(self.__names), len(self.__folders)))
+
+    def getPath(self):
+        return self.__path
+
+    def getNames(self):
+        """ The names of the members, in the order they're stored. """
+        return list(self.__names)
+
+    def isFolder(self, name):
+        """ Is the name a folder in the archive? """
+        return name in self.__folders
+
+    def listFolder(self, folder):
+        """ The names of the members (and folders) in a folder of the archive. """
+        return sorted(self.__folders.get(folder, []))
+
+    def read(self, name):
+        """
+        Read a member of the archive.
+
+        The members of a tar archive are found by reading on through the
+        archive, which is only started again if the member has already
+        been passed and is no longer kept - so the members should be read
+        in the order they're stored (see sortByPosition).
+        """
+
+        if name not in self.__order:
+            raise IOError("NOT_EXIST")
+
+        if not self.__istar:
+            return self.__zip.read(name)
+
+        if name in self.__cache:
+            return self.__cache[name]
+
+        if self.__tar is None or self.__order[name] < self.__position:
+            lg.debug(" * Reading '%s' from the start for '%s'." % (self.__path, name))
+            self.close()
+            self.__tar = tarfile.open(self.__path, "r|*")
+            self.__position = 0
+
+        while True:
+
+            ti = self.__tar.next()
+
+            if ti is None:
+                raise IOError("NOT_EXIST")
+
+            if not ti.isfile():
+                continue
+
+            self.__position += 1
+
+            ## The member's contents.
+            text = self.__tar.extractfile(ti).read()
+
+            self.keep(ti.name, text)
+
+            if ti.name == name:
+                return text
+
+    def keep(self, name, text):
+        """ Keep a tar archive member's contents (dropping the oldest beyond the memory ceiling). """
+
+        if name in self.__cache:
+            return
+
+        self.__cache[name] = text; self.__cachesize += len(text)
+
+        while self.__cachesize > self.__cachemax and len(self.__cache) > 0:
+            self.__cachesize -= len(self.__cache.popitem(last=False)[1])
+
+    def sortByPosition(self, names):
+        """ Sort member names into the order they're stored in (so a compressed tarball isn't rewound). """
+        for name in names:
+            if name not in self.__order:
+                raise IOError("NOT_EXIST")
+        return sorted(names, key=lambda name: self.__order[name])
+
+    def iterMembers(self, names):
+        """
+        Iterate over some of the members of the archive, in the order they're stored.
+
+        @param [in] names The names of the members to read.
+        @returns An iterator over the (name, contents) of the members.
+        """
+
+        for name in self.sortByPosition(names):
+            yield name, self.read(name)
+
+    def findDataPoints(self):
+        """ The (sorted) folders in the archive holding a data point (a metadata.json and an ASCIIxyC folder). """
+        return sorted([folder for folder, names in self.__folders.iteritems() \
+            if "metadata.json" in names and self.isFolder(folder + "/ASCIIxyC")])
+
+    def close(self):
+        if self.__zip is not None:
+            self.__zip.close()
+        if self.__tar is not None:
+            self.__tar.close()
+            self.__tar = None
+
+class ArchiveDataset(Dataset):
+    """
+    Wrapper class for the datasets in a zip or tar archive.
+
+    The data and DSC files are checked and paired as they would be in a
+    folder (see Dataset). The file paths are the names of the archive
+    members.
+    """
+
+    def __init__(self, archive, foldername, selection=None, formatsample=DEFAULT_FORMAT_SAMPLE):
+        """
+        Constructor.
+
+        @param [in] archive The archive (DataArchive).
+        @param [in] foldername The folder in the archive containing the data and DSC files.
+        @param [in] selection A list of the data file names to use (optional).
+        @param [in] formatsample The number of data files to check the format of (None for all).
+        """
+
+        ## The archive.
+        self.archive = archive
+
+        Dataset.__init__(self, foldername.rstrip("/"), selection, formatsample)
+
+    def folderExists(self):
+        return self.archive.isFolder(self.foldername)
+
+    def listFileNames(self):
+        return self.archive.listFolder(self.foldername)
+
+    def isFolder(self, bn):
+        return self.archive.isFolder(self.foldername + "/" + bn)
+
+    def getFileFormats(self, names):
+        """ Get the formats of the named members of the folder (from their first lines) {name:format}. """
+
+        ## The formats {name:format}.
+        formats = {}
+
+        for name, text in self.archive.iterMembers([self.foldername + "/" + bn for bn in names]):
+            formats[name[len(self.foldername) + 1:]] = getFormatFromLine(text.split("\n", 1)[0])
+
+        return formats
+
+    def readDscFile(self, dscpath, readpixels=True):
+        """ Read a DSC member and (optionally) its data member. """
+
+        ## The data member's contents (if needed).
+        datatext = None
+        #
+        if readpixels:
+            datatext = self.archive.read(dscpath[:-4])
+
+        return DscFile(dscpath, readpixels=readpixels, dataformat=self.dataformat, \
+            contents=(self.archive.read(dscpath), datatext))
+
+    def readPixelArrays(self, path, dataformat, width=256, height=256):
+        """ Read the pixel arrays of a data member (see countKlusterTypes). """
+        return getPixelArraysFromString(self.archive.read(path), dataformat, width, height)
+
+    def getDscFiles(self):
+        """ Get the DSC file wrappers (sorted by start time), reading them if needed. """
+        if self.dscfiles is None:
+            self.dscfiles = sorted(self.iterDscFiles())
+        return self.dscfiles
+
+    def iterDscFiles(self, prefetch=0, prefetchmb=DEFAULT_PREFETCH_MB):
+        """
+        Iterate over the DSC file wrappers in the order the members are stored.
+
+        The archive is read through once, so the members aren't read
+        ahead (prefetch and prefetchmb are ignored). The data and DSC
+        members are usually stored next to each other, so only a few
+        are held until their partners are read.
+        """
+
+        ## The DSC member names.
+        dscpaths = set(self.getDscFilePaths())
+
+        ## The members read but not yet paired {DSC path:{name:contents}}.
+        held = {}
+
+        for name, text in self.archive.iterMembers(dscpaths | set([fn[:-4] for fn in dscpaths])):
+
+            dscpath = name if name in dscpaths else name + ".dsc"
+
+            held.setdefault(dscpath, {})[name] = text
+
+            if len(held[dscpath]) < 2:
+                continue
+
+            contents = held.pop(dscpath)
+
+            yield DscFile(dscpath, dataformat=self.dataformat, contents=(contents[dscpath], contents[dscpath[:-4]]))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Per-pixel energy calibration of Timepix (ToT mode) frames.
+
+Each pixel's time-over-threshold (ToT) response to a deposited energy E
+is modelled with the surrogate function
+
+    ToT(E) = a E + b - c / (E - t),
+
+with the parameters a, b, c and t supplied as one 256 x 256 matrix each.
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+## The names of the calibration parameters (and their files).
+CALIBRATION_PARAMETERS = ["a", "b", "c", "t"]
+
+def loadCalibrationMatrix(calibpath, name, width, height):
+    """
+    Load a calibration matrix as a (memory-mapped) array.
+
+    The matrix is read from '<name>.npy' if it exists. Otherwise it is read
+    from the '<name>.txt' text file (one row of the matrix per line) and
+    cached as '<name>.npy' alongside it, if possible, so that subsequent
+    loads are memory-mapped.
+
+    @param [in] calibpath The path to the calibration files.
+    @param [in] name The name of the parameter (a, b, c or t).
+    @param [in] width The width of the matrix [pixels].
+    @param [in] height The height of the matrix [pixels].
+    @returns The flattened (width x height) array, indexed by X = (width * y) + x.
+    """
+
+    ## The path to the cached (binary) matrix.
+    npypath = os.path.join(calibpath, name + ".npy")
+
+    ## The path to the text matrix.
+    txtpath = os.path.join(calibpath, name + ".txt")
+
+    if not os.path.exists(npypath):
+
+        if not os.path.exists(txtpath):
+            raise IOError("CALIBRATION_MISSING_%s" % (name.upper()))
+
+        m = np.loadtxt(txtpath, dtype=np.float64)
+
+        if m.shape != (height, width):
+            raise IOError("CALIBRATION_BAD_SHAPE")
+
+        try:
+            np.save(npypath, m)
+            lg.info(" * Cached the '%s' calibration matrix to '%s'." % (name, npypath))
+        except (IOError, OSError):
+            # We can't write the cache, so just use what we've read.
+            return m.reshape(-1)
+
+    m = np.load(npypath, mmap_mode="r")
+
+    if m.shape != (height, width):
+        raise IOError("CALIBRATION_BAD_SHAPE")
+
+    return m.reshape(-1)
+
+class PixelCalibration:
+    """ Wrapper class for the per-pixel energy calibration matrices. """
+
+    def __init__(self, calibpath, width=256, height=256):
+        """
+        Constructor.
+
+        @param [in] calibpath The path to the a, b, c and t matrices.
+        @param [in] width The frame width [pixels].
+        @param [in] height The frame height [pixels].
+        """
+
+        if not os.path.isdir(calibpath):
+            raise IOError("NOT_EXIST")
+
+        ## The path to the calibration files.
+        self.__path = calibpath
+
+        ## The frame width [pixels].
+        self.__width = width
+
+        ## The frame height [pixels].
+        self.__height = height
+
+        ## The calibration matrices (flattened) {name:array}.
+        self.__m = {}
+
+        for name in CALIBRATION_PARAMETERS:
+            self.__m[name] = loadCalibrationMatrix(calibpath, name, width, height)
+
+    def getPath(self):
+        return self.__path
+
+    def getWidth(self):
+        return self.__width
+
+    def getHeight(self):
+        return self.__height
+
+    def getParameters(self, X):
+        """ Get the a, b, c and t values for an array of pixel X values. """
+        X = np.asarray(X, dtype=np.int64)
+        return [self.__m[name][X] for name in CALIBRATION_PARAMETERS]
+
+    def getEnergies(self, X, C):
+        """
+        Convert an array of pixel counts (ToT) to energies [keV].
+
+        This inverts the surrogate function for every pixel at once:
+
+        E = (a t + ToT - b + sqrt((b + a t - ToT)^2 + 4 a c)) / (2 a).
+
+        Pixels without a calibration (a = 0) or without any counts are
+        given zero energy.
+
+        @param [in] X An array of the pixel X values, (width * y) + x.
+        @param [in] C An array of the pixel count (ToT) values.
+        @returns An array of the energies [keV].
+        """
+
+        a, b, c, t = self.getParameters(X)
+
+        ## The ToT values.
+        tot = np.asarray(C, dtype=np.float64)
+
+        ## Which pixels can be calibrated?
+        ok = (a != 0.0) & (tot > 0.0)
+
+        ## The safe a values (to avoid dividing by zero).
+        a_s = np.where(ok, a, 1.0)
+
+        ## The discriminant.
+        disc = np.maximum((b + (a_s * t) - tot)**2 + (4.0 * a_s * c), 0.0)
+
+        E = ((a_s * t) + tot - b + np.sqrt(disc)) / (2.0 * a_s)
+
+        return np.where(ok, E, 0.0)
+
+    def getKlusterEnergies(self, X, C, labels, n_klusters):
+        """
+        Get the total and maximum energies of each cluster in a frame.
+
+        @param [in] X An array of the pixel X values.
+        @param [in] C An array of the pixel count (ToT) values.
+        @param [in] labels An array of the cluster index (0 to n_klusters - 1) of each pixel.
+        @param [in] n_klusters The number of clusters.
+        @returns Arrays of the total and maximum energy of each cluster [keV].
+        """
+
+        ## The energy of each pixel [keV].
+        E = self.getEnergies(X, C)
+
+        labels = np.asarray(labels, dtype=np.int64)
+
+        ## The total energy of each cluster [keV].
+        E_total = np.bincount(labels, weights=E, minlength=n_klusters)
+
+        ## The maximum (pixel) energy of each cluster [keV].
+        E_max = np.zeros(n_klusters)
+        #
+        np.maximum.at(E_max, labels, E)
+
+        return E_total, E_max
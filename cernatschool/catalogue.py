@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A persistent (SQLite) catalogue of the frames in a tree of CERN@school datasets.
+
+The catalogue stores the DSC metadata and location of every frame found
+under an input path, indexed by start time, chip ID and data point, so that
+frames can be selected without parsing every DSC and data file again.
+"""
+
+# The usual suspects.
+import os, time
+
+#...for the logging.
+import logging as lg
+
+#...for the database.
+import sqlite3
+
+#...for the DSC file wrapper class.
+from dsc import DscFile
+
+#...for the dataset wrapper class.
+from dataset import Dataset
+
+#...for the Pixelman time handling.
+from handlers import getPixelmanTimeArrays
+
+## The columns of the frame table (in order).
+CATALOGUE_COLUMNS = [
+    "datapoint",
+    "folder",
+    "datafile",
+    "start_time",
+    "start_sec",
+    "start_subsec",
+    "acq_time",
+    "chipid",
+    "hv",
+    "ikrum",
+    "width",
+    "height"
+    ]
+
+## The SQL for creating the catalogue tables and indices.
+CATALOGUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id           INTEGER PRIMARY KEY,
+    datapoint    TEXT    NOT NULL,
+    folder       TEXT    NOT NULL,
+    datafile     TEXT    NOT NULL,
+    start_time   REAL    NOT NULL,
+    start_sec    INTEGER NOT NULL,
+    start_subsec INTEGER NOT NULL,
+    acq_time     REAL,
+    chipid       TEXT,
+    hv           REAL,
+    ikrum        INTEGER,
+    width        INTEGER,
+    height       INTEGER
+);
+CREATE TABLE IF NOT EXISTS info (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS frames_start_time ON frames (start_time);
+CREATE INDEX IF NOT EXISTS frames_chipid     ON frames (chipid, start_time);
+CREATE INDEX IF NOT EXISTS frames_datapoint  ON frames (datapoint, start_time);
+"""
+
+class FrameCatalogue:
+    """ Wrapper class for the SQLite frame catalogue. """
+
+    def __init__(self, dbpath):
+        """
+        Constructor.
+
+        @param [in] dbpath The path to the catalogue (SQLite) file.
+        """
+
+        ## The path to the catalogue file.
+        self.__dbpath = dbpath
+
+        ## The database connection.
+        self.__db = sqlite3.connect(dbpath)
+
+        self.__db.executescript(CATALOGUE_SCHEMA)
+
+    def close(self):
+        self.__db.close()
+
+    def getPath(self):
+        return self.__dbpath
+
+    def getInputPath(self):
+        """ The input path the catalogue was built from (or None). """
+        row = self.__db.execute("SELECT value FROM info WHERE key = 'inputpath'").fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def getNumberOfFrames(self):
+        return self.__db.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def getDataPoints(self):
+        """ The names of the data points in the catalogue (sorted). """
+        return [row[0] for row in \
+            self.__db.execute("SELECT DISTINCT datapoint FROM frames ORDER BY datapoint")]
+
+    def build(self, inputpath):
+        """
+        (Re)build the catalogue from a tree of data points.
+
+        Each sub-directory of the input path is a data point; every folder
+        below it that contains DSC files is catalogued. Only the DSC files
+        are read - the data files themselves are not opened.
+
+        @param [in] inputpath The path to the data points (e.g. data/sr).
+        @returns The number of frames catalogued.
+        """
+
+        if not os.path.isdir(inputpath):
+            raise IOError("NOT_EXIST")
+
+        lg.info(" * Building the frame catalogue '%s' from '%s'." % (self.__dbpath, inputpath))
+
+        ## The rows to insert.
+        rows = []
+
+        for dpname in sorted(os.listdir(inputpath)):
+
+            ## The path to the data point.
+            dppath = os.path.join(inputpath, dpname)
+
+            if not os.path.isdir(dppath):
+                continue
+
+            for folder, dirnames, filenames in os.walk(dppath):
+
+                dirnames.sort()
+
+                for fn in sorted(filenames):
+
+                    if not fn.endswith(".dsc"):
+                        continue
+
+                    ## The DSC file wrapper (metadata only).
+                    df = DscFile(os.path.join(folder, fn), readpixels=False)
+
+                    # The seconds and sub-second values are added below.
+                    rows.append((\
+                        dpname, \
+                        os.path.abspath(folder), \
+                        fn[:-4], \
+                        df.getStartTime(), \
+                        df.getAcqTime(), \
+                        df.getChipId(), \
+                        df.getBiasVoltage(), \
+                        df.getIKrum(), \
+                        df.getFrameWidth(), \
+                        df.getFrameHeight()))
+
+            lg.info(" *--> '%s': %d frames catalogued so far." % (dpname, len(rows)))
+
+        # Convert all of the start times at once.
+        secs, subs = getPixelmanTimeArrays([row[3] for row in rows])
+        #
+        rows = [row[:4] + (int(sec), int(sub)) + row[4:] for row, sec, sub in zip(rows, secs, subs)]
+
+        with self.__db:
+            self.__db.execute("DELETE FROM frames")
+            self.__db.executemany(\
+                "INSERT INTO frames (%s) VALUES (%s)" % \
+                (", ".join(CATALOGUE_COLUMNS), ", ".join(["?"] * len(CATALOGUE_COLUMNS))), \
+                rows)
+            self.__db.execute("INSERT OR REPLACE INTO info VALUES ('inputpath', ?)", \
+                (os.path.abspath(inputpath),))
+            self.__db.execute("INSERT OR REPLACE INTO info VALUES ('built', ?)", \
+                (time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),))
+
+        return len(rows)
+
+    def getFrameRecords(self, **kwargs):
+        """
+        Get the catalogue entries matching the selection, sorted by start time.
+
+        Selection keywords (all optional):
+        * datapoint - the data point name;
+        * chipid - the chip ID;
+        * start, end - the start time range [s] (start <= t < end);
+        * hv - the bias voltage [V];
+        * ikrum - the I_Krum DAC value.
+
+        @returns A list of dictionaries, one per frame.
+        """
+
+        ## The WHERE clauses.
+        clauses = []
+
+        ## The values for the clauses.
+        vals = []
+
+        for key, column in [("datapoint", "datapoint"), ("chipid", "chipid"), ("hv", "hv"), ("ikrum", "ikrum")]:
+            if kwargs.get(key) is not None:
+                clauses.append("%s = ?" % (column))
+                vals.append(kwargs[key])
+
+        if kwargs.get("start") is not None:
+            clauses.append("start_time >= ?")
+            vals.append(kwargs["start"])
+
+        if kwargs.get("end") is not None:
+            clauses.append("start_time < ?")
+            vals.append(kwargs["end"])
+
+        ## The query.
+        q = "SELECT %s FROM frames" % (", ".join(CATALOGUE_COLUMNS))
+        #
+        if len(clauses) > 0:
+            q += " WHERE " + " AND ".join(clauses)
+        #
+        q += " ORDER BY start_time, datapoint, datafile"
+
+        return [dict(zip(CATALOGUE_COLUMNS, row)) for row in self.__db.execute(q, vals)]
+
+    def getDatasets(self, **kwargs):
+        """
+        Get Dataset objects containing only the frames matching the selection.
+
+        The selection keywords are those of getFrameRecords.
+
+        @returns A list of (data point name, Dataset) tuples, one per folder.
+        """
+
+        ## The selected data file names for each (data point, folder).
+        selections = {}
+
+        for r in self.getFrameRecords(**kwargs):
+            selections.setdefault((r["datapoint"], r["folder"]), []).append(r["datafile"])
+
+        return [(dpname, Dataset(folder, selection=selections[(dpname, folder)])) \
+            for dpname, folder in sorted(selections.keys())]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Counting the cluster types straight from the Timepix data files.
+
+For when only the number of clusters of each type is needed (e.g. the
+number of beta candidates for each data point). The pixels of a batch
+of frames are labelled in one go and only the cluster properties used
+by the sorting rules (size, radius and bounding box) are calculated -
+no Kluster objects, images or JSON files are made.
+
+The clusters and their properties are the same as those found by the
+KlusterFinder (eight-way connected pixels, unweighted radius).
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the labelling.
+from scipy import ndimage
+
+#...for reading the data files.
+from helpers import getPixelArrays
+
+#...for the cluster types.
+from sorting import KLUSTER_TYPES, getKlusterTypeIndices
+
+## The default number of frames labelled at once.
+DEFAULT_COUNTING_BATCH = 64
+
+## The labelling structure - eight-way connectivity within (but not between) frames.
+FRAME_STRUCTURE = np.zeros((3, 3, 3), dtype=np.bool_)
+#
+FRAME_STRUCTURE[1] = True
+
+def getKlusterLabels(X, frames, nframes, width=256, height=256):
+    """
+    Label the clusters in a batch of frames.
+
+    @param [in] X The array of pixel X values (for all of the frames).
+    @param [in] frames The array of the frame index of each pixel.
+    @param [in] nframes The number of frames in the batch.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns The array of the (0-based) cluster label of each pixel and the number of clusters.
+    """
+
+    ## The pixel positions in the batch.
+    G = frames * (width * height) + X
+
+    ## The hit pixels of each frame.
+    grid = np.zeros(nframes * width * height, dtype=np.bool_)
+    #
+    grid[G] = True
+
+    labels, n = ndimage.label(grid.reshape(nframes, height, width), structure=FRAME_STRUCTURE)
+
+    return labels.ravel()[G] - 1, n
+
+def getKlusterFeatures(X, labels, n, width=256):
+    """
+    Calculate the cluster properties needed to sort the clusters.
+
+    @param [in] X The array of pixel X values.
+    @param [in] labels The array of the cluster label of each pixel.
+    @param [in] n The number of clusters.
+    @param [in] width The frame width [pixels].
+    @returns The cluster property arrays {name:array} (see klusterhelpers).
+    """
+
+    x = (X % width).astype(np.float64); y = (X // width).astype(np.float64)
+
+    ## The cluster sizes.
+    size = np.bincount(labels, minlength=n)
+
+    ## The unweighted cluster positions.
+    x_uw = np.bincount(labels, weights=x, minlength=n) / size
+    y_uw = np.bincount(labels, weights=y, minlength=n) / size
+
+    ## The distance of each pixel from its cluster's position.
+    r = np.sqrt((x - x_uw[labels])**2 + (y - y_uw[labels])**2)
+
+    columns = {"size" : size}
+
+    # The cluster radius is the distance of the furthest pixel.
+    for name, vals, func, init in [ \
+        ("radius_uw", r, np.maximum, 0.0), \
+        ("xmin",      x, np.minimum, np.inf), \
+        ("xmax",      x, np.maximum, -np.inf), \
+        ("ymin",      y, np.minimum, np.inf), \
+        ("ymax",      y, np.maximum, -np.inf)]:
+        columns[name] = np.full(n, init)
+        func.at(columns[name], labels, vals)
+
+    return columns
+
+def countKlusterTypes(paths, dataformat, pixel_mask={}, width=256, height=256, batchsize=DEFAULT_COUNTING_BATCH, \
+    reader=getPixelArrays):
+    """
+    Count the clusters of each type in Timepix data files.
+
+    @param [in] paths The paths to the data files (one frame per file).
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] pixel_mask The pixel mask {X:1}.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] batchsize The number of frames to label at once.
+    @param [in] reader The function reading the pixel arrays of a data file (e.g. from an archive).
+    @returns A dictionary of the number of clusters of each type {type:n}.
+    """
+
+    ## The masked pixel X values.
+    masked = np.array(sorted(pixel_mask.keys()), dtype=np.int64)
+
+    ## The number of clusters of each type (indexed as KLUSTER_TYPES).
+    counts = np.zeros(len(KLUSTER_TYPES), dtype=np.int64)
+
+    for first in range(0, len(paths), batchsize):
+
+        ## The pixel arrays from the data files in the batch.
+        arrays = [reader(fn, dataformat, width, height)[0] \
+            for fn in paths[first:first + batchsize]]
+
+        ## The frame index of each pixel.
+        frames = np.repeat(np.arange(len(arrays)), [len(X) for X in arrays])
+
+        X = np.concatenate(arrays)
+
+        # Remove the masked pixels.
+        if len(masked) > 0:
+            keep = ~np.in1d(X, masked)
+            X = X[keep]; frames = frames[keep]
+
+        if len(X) == 0:
+            continue
+
+        labels, n = getKlusterLabels(X, frames, len(arrays), width, height)
+
+        types = getKlusterTypeIndices(getKlusterFeatures(X, labels, n, width), width, height)
+
+        counts += np.bincount(types.astype(np.intp), minlength=len(KLUSTER_TYPES))
+
+        lg.debug(" * Counted %d clusters in %d frames." % (n, len(arrays)))
+
+    return dict([(typename, int(counts[i])) for i, typename in enumerate(KLUSTER_TYPES)])
@@ -6,7 +6,7 @@ Wrapper class for the CERN@school Timepix datasets.
 """
 
 # The usual suspects.
-import os, glob, inspect
+import os, inspect
 
 #...for the logging.
 import logging as lg
@@ -23,70 +23,164 @@ from dsc import DscFile
 #...for the frames.
 from frame import Frame
 
+#...for reading the files ahead of the clustering.
+from prefetch import Prefetcher, getFileSize, DEFAULT_PREFETCH_THREADS, DEFAULT_PREFETCH_MB
+
+## The default number of data files whose format is checked.
+DEFAULT_FORMAT_SAMPLE = 16
+
+def getFormatSample(n, nsample):
+    """
+    Get the (sorted) indices of the files to check the format of.
+
+    The sample is spread evenly across the files, always including the
+    first and last files.
+
+    @param [in] n The number of files.
+    @param [in] nsample The size of the sample (None to check every file).
+    """
+    if nsample is None or nsample >= n:
+        return range(n)
+    if nsample <= 1:
+        return [0]
+    return sorted(set([int(round(k * (n - 1) / float(nsample - 1))) for k in range(nsample)]))
+
 class Dataset:
     """ Wrapper class for the CERN@school Timepix datasets. """
 
-    def __init__(self, foldername):
+    def __init__(self, foldername, selection=None, formatsample=DEFAULT_FORMAT_SAMPLE):
+        """
+        Constructor.
+
+        The data and DSC files are paired by name. Only a sample of the
+        files is opened to check the format, which is then trusted for
+        the rest of the files in the folder.
+
+        @param [in] foldername The folder containing the data and DSC files.
+        @param [in] selection A list of the data file names to use (optional).
+        @param [in] formatsample The number of data files to check the format of (None for all).
+        """
+
+        ## The folder name.
+        self.foldername = foldername
 
         # Check if the folder exists. If it doesn't, throw an exception.
-        if not os.path.exists(foldername):
+        if not self.folderExists():
             #raise IOError("The folder doesn't exist.")
             raise IOError("NOT_EXIST")
 
-        ## The folder name.
-        self.foldername = foldername
+        ## The names of the files to use.
+        names = []
+        #
+        if selection is None:
+            # Ignore hidden files (as glob would).
+            names = [bn for bn in self.listFileNames() if not bn.startswith(".")]
+        else:
+            # Only use the selected data files and their DSC files.
+            names = list(selection) + [bn + ".dsc" for bn in selection]
 
         ## The list of names of files in the folder (sorted).
-        self.filenames = sorted(glob.glob(foldername + "/*"))
+        self.filenames = sorted([foldername + "/" + bn for bn in names])
 
         # Throw an exception if the supplied folder is empty.
         if len(self.filenames) == 0:
             #raise IOError("The folder is empty.")
             raise IOError("FOLDER_EMPTY")
 
-        ## The datafile names.
+        # Pair the data and DSC files by name.
+
+        ## The set of DSC file names.
+        dscnames = set([bn for bn in names if bn.endswith(".dsc")])
+
+        ## The set of data file names.
+        datnames = set(names) - dscnames
+
+        ## The data files without a DSC file.
+        unpaired_dat = datnames - set([bn[:-4] for bn in dscnames])
+
+        ## The DSC files without a data file.
+        unpaired_dsc = dscnames - set([bn + ".dsc" for bn in datnames])
+
+        # Anything that isn't paired may be a directory or something else.
+        for bn in sorted(unpaired_dat | unpaired_dsc):
+            if self.isFolder(bn):
+                lg.debug(" '%s' is a directory!" % (bn))
+                raise IOError("CONTAINS_DIR")
+        #
+        ## The formats of the unpaired data files {name:format}.
+        unpaired_formats = self.getFileFormats(sorted(unpaired_dat))
+        #
+        for bn in sorted(unpaired_dat):
+            if unpaired_formats[bn] <= 0:
+                lg.debug("'%s' is in an unrecognised format." % (bn))
+                raise IOError("BAD_FORMAT")
+
+        ## The data file names {index:name}.
         self.datfilenames = {}
 
-        ## The DSC file names.
+        ## The DSC file names {index:name}.
         self.dscfilenames = {}
 
-        ## The datafile formats.
-        self.datfileformats = {}
-
-        # Loop over the files found in the folder.
-        lg.debug("")
-        lg.debug(" Files found in '%s':" % (foldername))
-        lg.debug("")
         for i, fn in enumerate(self.filenames):
+            bn = fn[len(foldername) + 1:]
+            if bn in dscnames:
+                self.dscfilenames[i] = bn
+            else:
+                self.datfilenames[i] = bn
 
-            ## The basename of the file.
-            bn = os.path.basename(fn)
+        ## The data files that are missing a DSC file (sorted).
+        self.__missing_dsc = sorted(unpaired_dat)
 
-            lg.debug(" * '%s'" % (bn))
+        # Check the formats of a sample of the files.
 
-            # If the "file" is a directory, raise an exception.
-            if os.path.isdir(fn):
-                raise IOError("CONTAINS_DIR")
+        ## The data file formats found in the sample {index:format}.
+        sampled = {}
 
-            formatval = getFormat(fn)
+        ## The data file indices (sorted).
+        datindices = sorted(self.datfilenames.keys())
+
+        ## The indices of the sampled data files.
+        sample = [datindices[j] for j in getFormatSample(len(datindices), formatsample)]
+
+        ## The formats of the sampled data files and their DSC files {name:format}.
+        formats = self.getFileFormats( \
+            [self.datfilenames[i] for i in sample] + \
+            [self.datfilenames[i] + ".dsc" for i in sample if self.datfilenames[i] not in unpaired_dat])
+
+        for i in sample:
+
+            bn = self.datfilenames[i]
+
+            formatval = formats[bn]
 
             ## If the file isn't recognised, raise an exception.
-            if formatval == 0:
+            if formatval <= 0:
                 lg.debug("'%s' is in an unrecognised format." % (bn))
                 raise IOError("BAD_FORMAT")
-            elif formatval > 0:
-                lg.debug(" *--> Adding '%s' ('%s' format) to the data files." \
-                    % (bn, DATA_FILE_TYPES[formatval]))
 
-                self.datfilenames[i] = bn
+            if bn not in unpaired_dat and formats[bn + ".dsc"] != -1:
+                lg.debug("'%s.dsc' is not a DSC file." % (bn))
+                raise IOError("BAD_FORMAT")
 
-                self.datfileformats[i] = formatval
+            sampled[i] = formatval
 
-            else:
-                lg.debug(" *--> Adding '%s' ('%s' format) to the DSC files." \
-                    % (bn, DATA_FILE_TYPES[formatval]))
+        lg.debug(" Checked the format of %d of the %d data files in '%s'." % \
+            (len(sampled), len(datindices), foldername))
 
-                self.dscfilenames[i] = bn
+        ## Are the (sampled) data file formats consistent?
+        self.__formats_consistent = len(set(sampled.values())) <= 1
+
+        ## The data file format (trusted from the sample).
+        self.dataformat = None
+
+        if len(sampled) > 0:
+            self.dataformat = sampled[min(sampled.keys())]
+
+        ## The datafile formats {index:format}.
+        self.datfileformats = {}
+        #
+        for i in datindices:
+            self.datfileformats[i] = sampled.get(i, self.dataformat)
 
         lg.debug("")
 
@@ -100,49 +194,50 @@ class Dataset:
             lg.debug(" There are DSC files missing!")
             raise IOError("MISSING_DSC")
 
-        lg.debug(" There are %d data files." % (self.getNumberOfDataFiles())); lg.debug("")
-
-        # Now process the DSC files to extract the information we need
-        # to build the data set information.
+        if len(unpaired_dsc) > 0:
+            lg.debug(" There are data files missing!")
+            raise IOError("MISSING_DAT")
 
-        ## The DSC file wrappers.
-        self.dscfiles = sorted([DscFile(foldername + "/" + fn) for fn in self.dscfilenames.values()])
+        lg.debug(" There are %d data files." % (self.getNumberOfDataFiles())); lg.debug("")
 
+        ## The DSC file wrappers (read when first needed - see getDscFiles).
+        self.dscfiles = None
 
-    def areFormatsConsistent(self):
-        """ Check if the data files found are all the same format. """
+    def folderExists(self):
+        """ Does the folder exist? """
+        return os.path.exists(self.foldername)
 
-        try:
+    def listFileNames(self):
+        """ The names of everything in the folder. """
+        return os.listdir(self.foldername)
 
-            ## The list of format values.
-            formats = self.datfileformats.values()
+    def isFolder(self, bn):
+        """ Is the named thing in the folder a folder? """
+        return os.path.isdir(self.foldername + "/" + bn)
 
-            # Check if the formats are all identical.
-            result = formats.count(formats[0]) == len(formats)
+    def getFileFormats(self, names):
+        """ Get the formats of the named files in the folder {name:format}. """
+        return dict([(bn, getFormat(self.foldername + "/" + bn)) for bn in names])
 
-            if result:
-                lg.debug(" The formats are consistent (%s)." % (DATA_FILE_TYPES[formats[0]]))
-                lg.debug("")
-
-            return result
+    def areFormatsConsistent(self):
+        """ Check if the data files found are all the same format. """
 
-        except IndexError:
+        if len(self.datfileformats) == 0:
             print("* ERROR: calling areFormatsConsistent() with no files!")
             return False
 
-    def dscFilesPresent(self):
-        """ Check if the corresponding detector settings files exist. """
+        if self.__formats_consistent:
+            lg.debug(" The formats are consistent (%s)." % (DATA_FILE_TYPES[self.dataformat]))
+            lg.debug("")
 
-        # Loop through the data files and check if a matching
-        # DSC file has been found.
-        for i, bn in self.datfilenames.iteritems():
+        return self.__formats_consistent
 
-            ## The DSC file name for the data file.
-            dscn = bn + ".dsc"
+    def dscFilesPresent(self):
+        """ Check if the corresponding detector settings files exist. """
 
-            if not dscn in self.dscfilenames.values():
-                lg.debug("Data file '%s' is missing a DSC file." % (bn))
-                return False
+        if len(self.__missing_dsc) > 0:
+            lg.debug("Data file '%s' is missing a DSC file." % (self.__missing_dsc[0]))
+            return False
 
         lg.debug(" All files have corresponding DSC files."); lg.debug("")
 
@@ -151,51 +246,128 @@ class Dataset:
     def getNumberOfDataFiles(self):
         return len(self.datfilenames)
 
+    def getDataFilePaths(self):
+        """ The paths to the data files, sorted by name. """
+        return [self.foldername + "/" + self.datfilenames[i] for i in sorted(self.datfilenames.keys())]
+
+    def getDscFilePaths(self):
+        """ The paths to the DSC files, sorted by name. """
+        return [self.foldername + "/" + self.dscfilenames[i] for i in sorted(self.dscfilenames.keys())]
+
+    def getFrameSize(self):
+        """
+        The frame width and height [pixels], from the first DSC file.
+
+        All of the frames in a dataset are assumed to be the same size
+        (256 x 256 if there are no DSC files).
+        """
+
+        ## The DSC file paths.
+        paths = self.getDscFilePaths()
+
+        if len(paths) == 0:
+            return 256, 256
+
+        df = self.readDscFile(paths[0], readpixels=False)
+
+        return df.getFrameWidth(), df.getFrameHeight()
+
+    def readDscFile(self, dscpath, readpixels=True):
+        """ Read a DSC file and (optionally) its data file. """
+        return DscFile(dscpath, readpixels=readpixels, dataformat=self.dataformat)
+
+    def getDscFiles(self):
+        """ Get the DSC file wrappers (sorted by start time), reading them if needed. """
+
+        # Process the DSC files to extract the information we need
+        # to build the data set information.
+        if self.dscfiles is None:
+            self.dscfiles = sorted([self.readDscFile(fn) for fn in self.getDscFilePaths()])
+
+        return self.dscfiles
+
+    def iterDscFiles(self, prefetch=0, prefetchmb=DEFAULT_PREFETCH_MB):
+        """
+        Iterate over the DSC file wrappers in file name order.
+
+        @param [in] prefetch The number of files to read ahead in the background (0 for none).
+        @param [in] prefetchmb The memory ceiling for the files read ahead [MB].
+        """
+
+        ## The paths to the DSC files.
+        paths = self.getDscFilePaths()
+
+        if prefetch <= 0:
+            return (self.readDscFile(fn) for fn in paths)
+
+        return iter(Prefetcher(self.readDscFile, paths, \
+            depth   = prefetch, \
+            threads = DEFAULT_PREFETCH_THREADS, \
+            maxmb   = prefetchmb, \
+            sizer   = lambda fn: getFileSize(fn) + getFileSize(fn[:-4])))
+
     def getFolderFormat(self):
         """ Gets the format of the datafiles in the folder supplied. """
         if self.areFormatsConsistent():
-            return DATA_FILE_TYPES[self.datfileformats[0]]
+            return DATA_FILE_TYPES[self.dataformat]
         else:
             return "various"
 
-    def getFrames(self, geo, **kwargs):
-        """ Extract the frames from the dataset. """
+    def makeFrame(self, df, geo, **kwargs):
+        """ Make a frame from a DSC file wrapper. """
 
         # Get the geospatial information from the tuple provided.
         lat = geo[0]; lon = geo[1]; alt = geo[2]
 
+        frameargs = {\
+            "lat"         : lat, \
+            "lon"         : lon, \
+            "alt"         : alt, \
+            #
+            "chipid"      : df.getChipId(), \
+            "biasvoltage" : df.getBiasVoltage(), \
+            "ikrum"       : df.getIKrum(), \
+            #
+            "starttime"   : df.getStartTime(), \
+            "acqtime"     : df.getAcqTime(), \
+            "width"       : df.getFrameWidth(), \
+            "height"      : df.getFrameHeight(), \
+            "format"      : self.dataformat, \
+            "payload"     : df.getPayload(), \
+            "ismc"        : df.isMC()\
+            }
+
+        # Optional properties.
+        for key, arg in kwargs.iteritems():
+            frameargs[key] = kwargs[key]
+
+        return Frame(**frameargs)
+
+    def iterFrames(self, geo, prefetch=0, prefetchmb=DEFAULT_PREFETCH_MB, **kwargs):
+        """
+        Iterate over the frames in the dataset, in file name order.
+
+        With prefetch > 0 the upcoming files are read by background
+        threads while the current frame is being clustered.
+
+        @param [in] geo The (latitude, longitude, altitude) of the dataset.
+        @param [in] prefetch The number of files to read ahead (0 for none).
+        @param [in] prefetchmb The memory ceiling for the files read ahead [MB].
+        """
+
+        for df in self.iterDscFiles(prefetch, prefetchmb):
+            yield self.makeFrame(df, geo, **kwargs)
+
+    def getFrames(self, geo, prefetch=0, prefetchmb=DEFAULT_PREFETCH_MB, **kwargs):
+        """ Extract the frames from the dataset, sorted by start time. """
+
+        if self.dscfiles is not None or prefetch <= 0:
+            return [self.makeFrame(df, geo, **kwargs) for df in self.getDscFiles()]
+
         ## The list of frames to return.
-        frames = []
-
-        # Loop over the DSC files to get each frame.
-        for i, df in enumerate(self.dscfiles):
-
-            #if i % 50 == 0:
-            #    print("* Processing frame % 10d: '%s' ('%s')." % (i, df.getDscFilename(), df.getDataFilename()))
-
-            frameargs = {\
-                "lat"         : lat, \
-                "lon"         : lon, \
-                "alt"         : alt, \
-                #
-                "chipid"      : df.getChipId(), \
-                "biasvoltage" : df.getBiasVoltage(), \
-                "ikrum"       : df.getIKrum(), \
-                #
-                "starttime"   : df.getStartTime(), \
-                "acqtime"     : df.getAcqTime(), \
-                "width"       : df.getFrameWidth(), \
-                "height"      : df.getFrameHeight(), \
-                "format"      : self.datfileformats[0], \
-                "pixelmap"    : df.getPixelMap(), \
-                "ismc"        : False\
-                }
-
-            # Optional properties.
-            for key, arg in kwargs.iteritems():
-                frameargs[key] = kwargs[key]
-
-            # Add the frame to the list of frames.
-            frames.append(Frame(**frameargs))
+        frames = list(self.iterFrames(geo, prefetch, prefetchmb, **kwargs))
+
+        # Sort the frames as the DSC files would be.
+        frames.sort(key=lambda f: f.getStartTime())
 
         return frames
@@ -17,6 +17,12 @@ DATA_FILE_TYPES = {
     -2   : "Empty"
     }
 
+## The (Timepix3, data-driven) hit stream file types.
+STREAM_FILE_TYPES = {
+    "xytt" : "ASCII [x, y, ToA, ToT]",
+    "t3pa" : "Pixet t3pa [Index, Matrix Index, ToA, ToT, FToA, Overflow]"
+    }
+
 ACQ_MODES = {
     1 : "Started immediately, Stopped by timer",
     2 : "Started immediately, Stopped by SW trigger",
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Differential testing of the cluster finding engines.
+
+A faster way of finding the clusters (or their properties) can only be
+used for production once it reproduces the results of the reference
+code - the KlusterFinder with the reference backend, Kluster.process and
+getLinearity. The comparison runs every engine and the reference over
+the same frames and checks the cluster membership, the cluster order
+and the cluster properties (see getKlusterPropertiesJson), stopping
+at the first divergence found for each engine.
+
+Each engine is a function taking the pixel map {X:C} and the frame
+width and height and returning a list of (pixel set, properties)
+tuples - one for each cluster, in the order the engine gives them.
+An engine need only supply some of the properties; only the properties
+supplied are compared.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the timing.
+import time
+
+#...for the MATH.
+import numpy as np
+
+#...for the cluster finder.
+from kluster import KlusterFinder
+
+#...for the cluster finding backends.
+from klusterbackends import getKlusterBackendNames
+
+#...for the cluster properties.
+from helpers import getKlusterPropertiesJson
+
+#...for the cluster counting features.
+from counting import getKlusterLabels, getKlusterFeatures
+
+## The default relative tolerance for the (floating point) cluster properties.
+DEFAULT_RTOL = 1.0e-6
+
+## The default absolute tolerance for the (floating point) cluster properties.
+DEFAULT_ATOL = 1.0e-9
+
+## The name of the reference engine.
+REFERENCE_ENGINE = "reference"
+
+def getKlusterFinderKlusters(pixelmap, width, height, backend):
+    """
+    Find the clusters and their properties with the KlusterFinder.
+
+    @param [in] pixelmap The pixel map {X:C}.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] backend The cluster finding backend to use.
+    @returns The list of (pixel set, properties) tuples.
+    """
+
+    kf = KlusterFinder(pixelmap, height, width, False, backend=backend)
+
+    return [(frozenset(kl.get_pixel_xy_list()), getKlusterPropertiesJson("k%05d" % (i), kl)) \
+        for i, kl in enumerate(kf.getListOfKlusters())]
+
+def getCountingKlusters(pixelmap, width, height):
+    """
+    Find the clusters and the properties used for counting them (see counting).
+
+    @param [in] pixelmap The pixel map {X:C}.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns The list of (pixel set, properties) tuples, largest cluster first.
+    """
+
+    if len(pixelmap) == 0:
+        return []
+
+    X = np.array(sorted(pixelmap.keys()), dtype=np.int64)
+
+    labels, n = getKlusterLabels(X, np.zeros(len(X), dtype=np.int64), 1, width, height)
+
+    columns = getKlusterFeatures(X, labels, n, width)
+
+    ## The pixels of each cluster.
+    blobs = [[] for i in range(n)]
+    #
+    for x, label in zip(X.tolist(), labels.tolist()):
+        blobs[label].append(x)
+
+    klusters = [(frozenset(blobs[i]), dict([(name, columns[name][i].item()) for name in columns])) \
+        for i in range(n)]
+
+    return sorted(klusters, key=lambda k: len(k[0]), reverse=True)
+
+def makeBackendEngine(backend):
+    """ Make an engine that uses the KlusterFinder with a given backend. """
+    return lambda pixelmap, width, height: getKlusterFinderKlusters(pixelmap, width, height, backend)
+
+## The engines {name:function}.
+ENGINES = dict([(name, makeBackendEngine(name)) for name in getKlusterBackendNames()])
+#
+ENGINES["counting"] = getCountingKlusters
+
+def registerEngine(name, func):
+    """
+    Add (or replace) an engine to compare with the reference.
+
+    @param [in] name The name of the engine.
+    @param [in] func The engine function - func(pixelmap, width, height) -> list of (pixel set, properties).
+    """
+    ENGINES[name] = func
+
+def getEngineNames():
+    """ The names of the engines that can be compared with the reference (sorted). """
+    return sorted([name for name in ENGINES.keys() if name != REFERENCE_ENGINE])
+
+def isClose(a, b, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL):
+    """ Are two property values the same (within the tolerances, for floating point values)? """
+
+    if isinstance(a, float) or isinstance(b, float):
+        if np.isnan(a) and np.isnan(b):
+            return True
+        return abs(a - b) <= atol + rtol * abs(a)
+
+    return a == b
+
+def compareKlusters(ref, test, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL, strictorder=False):
+    """
+    Compare the clusters found by an engine with the reference clusters.
+
+    The clusters must be in the same order, by size. Clusters of the same
+    size may be in any order unless strictorder is set.
+
+    @param [in] ref The reference list of (pixel set, properties) tuples.
+    @param [in] test The engine's list of (pixel set, properties) tuples.
+    @param [in] rtol The relative tolerance for the floating point properties.
+    @param [in] atol The absolute tolerance for the floating point properties.
+    @param [in] strictorder Must clusters of the same size be in the same order?
+    @returns None if the clusters agree, otherwise a dictionary describing the first divergence.
+    """
+
+    if len(ref) != len(test):
+        return {"kind" : "count", "reference" : len(ref), "test" : len(test)}
+
+    ## The reference cluster index for each pixel set.
+    refindex = dict([(pixels, i) for i, (pixels, props) in enumerate(ref)])
+
+    for i, (pixels, props) in enumerate(test):
+
+        if len(pixels) != len(ref[i][0]):
+            return {"kind" : "order", "kluster" : i, "reference" : len(ref[i][0]), "test" : len(pixels)}
+
+        if pixels not in refindex:
+            return {"kind" : "membership", "kluster" : i, "test" : sorted(pixels)}
+
+        j = refindex[pixels]
+
+        if strictorder and j != i:
+            return {"kind" : "order", "kluster" : i, "reference" : j, "test" : i}
+
+        for name in sorted(props.keys()):
+
+            # The IDs depend on the order of clusters of the same size.
+            if name == "id" or name not in ref[j][1]:
+                continue
+
+            if not isClose(ref[j][1][name], props[name], rtol, atol):
+                return {"kind" : "property", "kluster" : i, "field" : name, \
+                    "reference" : ref[j][1][name], "test" : props[name]}
+
+    return None
+
+def getRandomPixelMap(rs, width=256, height=256, nklusters=20, maxlength=30, maxcount=200):
+    """
+    Make a random frame of cluster-like blobs (random walks).
+
+    Blobs may touch (or overlap) each other and the edges of the frame.
+
+    @param [in] rs The numpy RandomState to use.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] nklusters The number of blobs.
+    @param [in] maxlength The maximum number of steps in each blob.
+    @param [in] maxcount The maximum pixel count value.
+    @returns The pixel map {X:C}.
+    """
+
+    pixelmap = {}
+
+    for k in range(nklusters):
+
+        x = rs.randint(width); y = rs.randint(height)
+
+        for step in range(rs.randint(1, maxlength + 1)):
+
+            pixelmap[y * width + x] = int(rs.randint(1, maxcount + 1))
+
+            x = min(max(x + rs.randint(-1, 2), 0), width - 1)
+            y = min(max(y + rs.randint(-1, 2), 0), height - 1)
+
+    return pixelmap
+
+class DifferentialComparison:
+    """
+    Wrapper class for comparing engines with the reference over many frames.
+    """
+
+    def __init__(self, engines, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL, strictorder=False):
+        """
+        Constructor.
+
+        @param [in] engines The names of the engines to compare.
+        @param [in] rtol The relative tolerance for the floating point properties.
+        @param [in] atol The absolute tolerance for the floating point properties.
+        @param [in] strictorder Must clusters of the same size be in the same order?
+        """
+
+        for name in engines:
+            if name not in ENGINES:
+                raise IOError("BAD_ENGINE")
+
+        ## The names of the engines being compared.
+        self.__engines = list(engines)
+
+        ## The relative tolerance.
+        self.__rtol = rtol
+
+        ## The absolute tolerance.
+        self.__atol = atol
+
+        ## Must clusters of the same size be in the same order?
+        self.__strictorder = strictorder
+
+        ## The number of frames compared.
+        self.__n_frames = 0
+
+        ## The number of reference clusters.
+        self.__n_klusters = 0
+
+        ## The total time taken by each engine (and the reference) [s].
+        self.__times = dict([(name, 0.0) for name in self.__engines + [REFERENCE_ENGINE]])
+
+        ## The first divergence found for each engine (None if there isn't one).
+        self.__divergences = dict([(name, None) for name in self.__engines])
+
+    def compareFrame(self, label, pixelmap, width=256, height=256):
+        """
+        Compare the engines with the reference for one frame.
+
+        @param [in] label The frame label (e.g. the data file name).
+        @param [in] pixelmap The pixel map {X:C} (with the masked pixels removed).
+        @param [in] width The frame width [pixels].
+        @param [in] height The frame height [pixels].
+        @returns The number of engines that diverged from the reference in this frame.
+        """
+
+        t = time.time()
+        #
+        ref = ENGINES[REFERENCE_ENGINE](pixelmap, width, height)
+        #
+        self.__times[REFERENCE_ENGINE] += time.time() - t
+
+        self.__n_frames += 1
+
+        self.__n_klusters += len(ref)
+
+        ndiverged = 0
+
+        for name in self.__engines:
+
+            t = time.time()
+            #
+            test = ENGINES[name](pixelmap, width, height)
+            #
+            self.__times[name] += time.time() - t
+
+            divergence = compareKlusters(ref, test, self.__rtol, self.__atol, self.__strictorder)
+
+            if divergence is None:
+                continue
+
+            ndiverged += 1
+
+            # Only the first divergence is kept.
+            if self.__divergences[name] is None:
+                divergence["frame"] = label
+                self.__divergences[name] = divergence
+                lg.info(" * '%s' diverged from the reference: %s" % (name, divergence))
+
+        return ndiverged
+
+    def getNumberOfFrames(self):
+        return self.__n_frames
+
+    def getNumberOfKlusters(self):
+        return self.__n_klusters
+
+    def getTime(self, name):
+        """ The total time taken by an engine (or the reference) [s]. """
+        return self.__times[name]
+
+    def getDivergence(self, name):
+        """ The first divergence found for an engine (None if there isn't one). """
+        return self.__divergences[name]
+
+    def getSummary(self):
+        """ Get the comparison results as a dictionary (e.g. for a JSON file). """
+
+        engines = {}
+
+        for name in self.__engines:
+
+            speedup = 0.0
+            #
+            if self.__times[name] > 0.0:
+                speedup = self.__times[REFERENCE_ENGINE] / self.__times[name]
+
+            engines[name] = {
+                "time"       : self.__times[name],
+                "speedup"    : speedup,
+                "divergence" : self.__divergences[name]
+                }
+
+        return {
+            "n_frames"       : self.__n_frames,
+            "n_klusters"     : self.__n_klusters,
+            "rtol"           : self.__rtol,
+            "atol"           : self.__atol,
+            "strictorder"    : self.__strictorder,
+            "reference_time" : self.__times[REFERENCE_ENGINE],
+            "engines"        : engines
+            }
@@ -20,22 +20,35 @@ from dscvals import *
 from handlers import isChipIdValid, getPixelmanTimeString
 
 #...for the HELPING.
-from helpers import getFormat
+from helpers import getFormat, getFormatFromLine
+
+#...for the frame payloads.
+from payload import getPayloadFromDataFile, getPayloadFromString
 
 class DscFile:
     """
     A wrapper class for the Pixelman DSC files.
     """
 
-    def __init__(self, dscfilename):
-        """ The constructor. """
+    def __init__(self, dscfilename, readpixels=True, dataformat=None, contents=None):
+        """
+        The constructor.
+
+        @param [in] dscfilename The path to the DSC file.
+        @param [in] readpixels Read the pixels from the data file too?
+        @param [in] dataformat The data file format, if already known.
+        @param [in] contents The DSC and data file contents, if already read (e.g. from an archive).
+        """
+
+        ## The DSC and data file contents (None to read the files).
+        self.__contents = contents
 
         # Check if the file exists. If it doesn't, throw an exception.
-        if not os.path.exists(dscfilename):
+        if contents is None and not os.path.exists(dscfilename):
             raise IOError("NOT_EXIST")
 
         # Check that the file is, indeed, a file.
-        if not os.path.isfile(dscfilename):
+        if contents is None and not os.path.isfile(dscfilename):
             raise IOError("NOT_FILE")
 
         ## The frame width.
@@ -92,23 +105,41 @@ class DscFile:
         ## The name and serial number.
         self.__nameAndSN = None
 
+        ## Is the data simulated?
+        self.__isMC = False
+
         ## The DSC file name.
         self.__dscfilename = dscfilename
 
         ## The data file name.
         self.__datafilename = dscfilename[:-4]
 
-        if not os.path.exists(self.__datafilename):
+        if contents is None and not os.path.exists(self.__datafilename):
             raise IOError #("MISSING_DAT")
 
         # Process the DSC file.
         self.processDscFile()
 
-        ## The pixel map.
-        self.__pixelmap = {}
+        ## The pixel map (made from the payload when first needed).
+        self.__pixelmap = None
+
+        ## The frame payload (the hit pixels).
+        self.__payload = None
 
         ## The data file format.
-        self.__format = getFormat(self.__datafilename)
+        self.__format = None
+
+        # If only the metadata is needed, we can stop here.
+        if not readpixels:
+            self.__contents = None
+            return None
+
+        self.__format = dataformat
+        #
+        if self.__format is None and contents is not None:
+            self.__format = getFormatFromLine(contents[1].split("\n", 1)[0])
+        elif self.__format is None:
+            self.__format = getFormat(self.__datafilename)
 
         # Process the data file.
         self.processDataFile()
@@ -210,6 +241,9 @@ class DscFile:
         return self.__startTime
 
     def getStartTimeS(self):
+        """ The start time in the Pixelman format (made when first asked for). """
+        if self.__startTimeS is None and self.__startTime is not None:
+            self.__startTimeS = getPixelmanTimeString(self.__startTime)[2]
         return self.__startTimeS
 
     def getTpxClock(self):
@@ -218,23 +252,39 @@ class DscFile:
     def getNameAndSerialNumber(self):
         return self.__nameAndSN
 
+    def isMC(self):
+        return self.__isMC
+
     def getBSPreampEnabled(self):
         return self.__bspenabled
 
+    def getPayload(self):
+        return self.__payload
+
     def getPixelMap(self):
+        """ The pixel map {X:C} (made from the payload when first asked for). """
+        if self.__pixelmap is None:
+            self.__pixelmap = {}
+            if self.__payload is not None:
+                self.__pixelmap = self.__payload.getPixelMap()
         return self.__pixelmap
 
     def processDscFile(self):
         """ Process the detector settings file (.dsc). """
 
-        # The DSC file.
-        f = open(self.__dscfilename, "r")
-
         ## The lines of the DSC file.
-        ls = f.readlines()
+        ls = []
+        #
+        if self.__contents is not None:
+            ls = self.__contents[0].splitlines(True)
+        else:
+            # The DSC file.
+            f = open(self.__dscfilename, "r")
+
+            ls = f.readlines()
 
-        # Close the DSC file.
-        f.close()
+            # Close the DSC file.
+            f.close()
 
         lg.debug("")
 
@@ -392,12 +442,7 @@ class DscFile:
                 except:
                     raise IOError("BAD_START_TIME")
 
-                sec, sub, sts = getPixelmanTimeString(st)
-
-                self.__startTimeS = sts
-
                 lg.debug(" * Start time is %20.6f [s]." % (self.__startTime))
-                lg.debug(" *--> Converted to string: '%s'." % (sts))
 
                 # Check if the start time matches the supplied string.
                 #if self.__startTimeS is not None and sts != self.__startTimeS:
@@ -437,28 +482,80 @@ class DscFile:
                 self.__nameAndSN = ls[i+2].strip()
                 lg.debug(" * Name and serial no. = '%s'." % (self.__nameAndSN))
 
+            elif DSC_SIMULATED_STRING in l:
+                try:
+                    self.__isMC = int(ls[i+2].strip()) == 1
+                except ValueError:
+                    raise IOError("BAD_SIMULATED")
+                lg.debug(" * Simulated data = %s." % (self.__isMC))
+
         lg.debug("")
 
     def processDataFile(self):
         """ Process the accompanying Timepix datafile. """
 
-        df = open(self.__datafilename, "r")
-        ls = df.readlines()
-        df.close()
-
-        # Loop over the lines in the file.
-        for j, l in enumerate(ls):
-
-            if   self.__format == 4114: # ASCII xyC.
-                vals = l.strip().split("\t")
-                self.__pixelmap[self.__fHeight * int(vals[1]) + int(vals[0])] = int(vals[2])
-            elif self.__format == 18: # ASCII matrix.
-                vals = [int(val) for val in l.strip().split(" ")]
-                for i, C in enumerate(vals):
-                    if C > 0:
-                        self.__pixelmap[(self.__fHeight * j) + i] = C
-            elif self.__format == 8210: # ASCII XC
-                vals = [int(val) for val in l.strip().split("\t")]
-                self.__pixelmap[vals[0]] = vals[1]
-            else:
-                raise IOError("FRAME_BAD_FORMAT")
+        if self.__contents is not None:
+            self.__payload = getPayloadFromString(self.__contents[1], self.__format, self.__fWidth, self.__fHeight)
+        else:
+            self.__payload = getPayloadFromDataFile(self.__datafilename, self.__format, self.__fWidth, self.__fHeight)
+
+        # The contents aren't needed once the pixels have been read.
+        self.__contents = None
+
+## The pixel data type descriptions (for the DSC file "Type" line) of each data file format.
+DSC_TYPE_STRINGS = {
+    4114 : "[X,Y,C]",
+    8210 : "[X,C]",
+    18   : "[C]"
+    }
+
+def writeDscFile(dscfilename, starttime, acqtime=0.5, width=256, height=256, dataformat=4114, \
+    chipid="E09-W0211", hv=94.5, dacs=[1, 100, 255, 127, 127, 0, 363, 7, 130, 128, 80, 63, 128, 128], ismc=False):
+    """
+    Write a Pixelman-style DSC file (e.g. for simulated data).
+
+    @param [in] dscfilename The DSC file name (the data file name plus ".dsc").
+    @param [in] starttime The acquisition start time [s].
+    @param [in] acqtime The acquisition time [s].
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] chipid The chip ID.
+    @param [in] hv The bias voltage [V].
+    @param [in] dacs The DAC values (I_Krum first).
+    @param [in] ismc Is the data simulated?
+    """
+
+    if dataformat not in DSC_TYPE_STRINGS:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    ## The DSC file entries (header, type, value).
+    entries = [ \
+        (DSC_ACQ_MODE_STRING,         "i32[1]",     "1 "), \
+        (DSC_ACQ_TIME_STRING,         "double[1]",  "%f " % (acqtime)), \
+        (DSC_CHIPID_STRING,           "uchar[10]",  chipid), \
+        (DSC_DACS_STRING,             "u16[14]",    " ".join(["%d" % (d) for d in dacs]) + " "), \
+        (DSC_FIRMWARE_STRING,         "char[64]",   "Firmware 3 (date: 28. 11. 2012)"), \
+        (DSC_BIAS_VOLTAGE_STRING,     "double[1]",  "%f " % (hv)), \
+        (DSC_HW_TIMER_STRING,         "i32[1]",     "2 "), \
+        (DSC_INTERFACE_STRING,        "uchar[6]",   "MX-10"), \
+        (DSC_MPX_CLOCK_STRING,        "double[1]",  "10.000000 "), \
+        (DSC_MPX_TYPE_STRING,         "i32[1]",     "3 "), \
+        (DSC_NAME_SN_STRING,          "char[64]",   "MX-10 Particle Detector A"), \
+        (DSC_PIXELMAN_VERSION_STRING, "uchar[6]",   "2.2.2"), \
+        (DSC_POLARITY_STRING,         "i32[1]",     "1 "), \
+        (DSC_START_TIME_STRING,       "double[1]",  "%f " % (starttime)), \
+        (DSC_START_TIME_S_STRING,     "char[64]",   getPixelmanTimeString(starttime)[2]), \
+        ("\"Timepix clock\" (\"Timepix clock (in MHz)\"):", "double[1]", "10.000000 ")]
+    #
+    if ismc:
+        entries.append((DSC_SIMULATED_STRING, "i32[1]", "1 "))
+
+    ## The lines of the DSC file.
+    ls = ["A000000001", "[F0]", "Type=i16 %s width=%d height=%d" % (DSC_TYPE_STRINGS[dataformat], width, height)]
+    #
+    for header, typestring, val in entries:
+        ls += [header, typestring, val, ""]
+
+    with open(dscfilename, "w") as f:
+        f.write("\n".join(ls))
@@ -36,3 +36,6 @@ DSC_START_TIME_S_STRING = "\"Start time (string)\" (\"Acquisition start time (st
 DSC_TPX_CLOCK_STRING = "Timepix clock"
 
 DSC_NAME_SN_STRING = "\"Name+SN\" (\"Name and serial number\"):"
+
+## Not written by Pixelman - marks the frames made by the synthetic frame generator.
+DSC_SIMULATED_STRING = "\"Simulated\" (\"Simulated data (0 no, 1 yes)\"):"
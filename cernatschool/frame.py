@@ -8,16 +8,49 @@ import logging as lg
 #from datavals import *
 
 #...for the HANDLING.
-from handlers import getPixelmanTimeString, getPixelsStringFromPixelMap
+from handlers import getPixelmanTime, getPixelmanTimeS, getPixelsStringFromPixelMap
 
 #...for the Klusters (Clusters).
 from kluster import KlusterFinder
 
-class Frame:
+#...for the frame payloads.
+from payload import getPayloadFromPixelMap
+
+#...for the cluster finding backends.
+from klusterbackends import DEFAULT_KLUSTER_BACKEND
+
+## The optional frame properties and their default values.
+FRAME_OPTIONAL_DEFAULTS = {
+    "roll"      : 0.0, # The roll angle of the lab. frame [deg.].
+    "pitch"     : 0.0, # The pitch angle of the lab. frame [deg.].
+    "yaw"       : 0.0, # The yaw angle of the lab. frame [deg.].
+    "omegax"    : 0.0, # The Omega_x of the lab frame [deg. s^{-1}].
+    "omegay"    : 0.0, # The Omega_y of the lab frame [deg. s^{-1}].
+    "omegaz"    : 0.0, # The Omega_z of the lab frame [deg. s^{-1}].
+    "detx"      : 0.0, # The detector x position [mm].
+    "dety"      : 0.0, # The detector y position [mm].
+    "detz"      : 0.0, # The detector z position [mm].
+    "deteulera" : 0.0, # The detector Euler angle a [deg.].
+    "deteulerb" : 0.0, # The detector Euler angle b [deg.].
+    "deteulerc" : 0.0  # The detector Euler angle c [deg.].
+    }
+
+class Frame(object):
     """
     A wrapper class for Timepix frames.
+
+    Only the frame properties are stored when the frame is made. The
+    clustering and the derived (time) values are worked out when they
+    are first asked for, so that scanning the metadata of many frames
+    is cheap.
     """
 
+    __slots__ = ["__lat", "__lon", "__alt", "__optional", \
+                 "__chipid", "__hv", "__ikrum", \
+                 "__starttime", "__acqtime", "__endtime", "__starttimes", "__endtimes", \
+                 "__width", "__height", "__format", "__pixelmap", "__payload", "__pixel_mask_map", \
+                 "__ismc", "__calibration", "__skipclustering", "__keepgammas", "__backend", "__kf"]
+
     def __init__(self, **kwargs):
         """
         Constructor.
@@ -27,112 +60,59 @@ class Frame:
         # Geospatial information
         #------------------------
 
-        if "lat" not in kwargs.keys():
+        if "lat" not in kwargs:
             raise IOError("FRAME_NO_LAT")
 
         ## The frame latitude [deg.].
         self.__lat = kwargs["lat"]
 
-        if "lon" not in kwargs.keys():
+        if "lon" not in kwargs:
             raise IOError("FRAME_NO_LON")
 
         ## The frame longitude [deg.].
         self.__lon = kwargs["lon"]
 
-        if "alt" not in kwargs.keys():
+        if "alt" not in kwargs:
             raise IOError("FRAME_NO_ALT")
 
         ## The frame altitude [m].
         self.__alt = kwargs["alt"]
 
-        ## The roll angle of the lab. frame [deg.].
-        self.__roll = 0.0
-        if "roll" in kwargs.keys():
-            # TODO: validate the value.
-            self.__roll = kwargs["roll"]
-
-        ## The pitch angle of the lab. frame [deg.].
-        self.__pitch = 0.0
-        if "pitch" in kwargs.keys():
-            # TODO: validate the value.
-            self.__pitch = kwargs["pitch"]
-
-        ## The yaw angle of the lab. frame [deg.].
-        self.__yaw = 0.0
-        if "yaw" in kwargs.keys():
-            # TODO: validate the value.
-            self.__yaw = kwargs["yaw"]
-
-        ## The Omega_x of the lab frame [deg. s^{-1}].
-        self.__omegax = 0.0
-        if "omegax" in kwargs.keys():
-            self.__omegax = kwargs["omegax"]
-
-        ## The Omega_y of the lab frame [deg. s^{-1}].
-        self.__omegay = 0.0
-        if "omegay" in kwargs.keys():
-            self.__omegay = kwargs["omegay"]
-
-        ## The Omega_z of the lab frame [deg. s^{-1}].
-        self.__omegaz = 0.0
-        if "omegaz" in kwargs.keys():
-            self.__omegaz = kwargs["omegaz"]
+        ## The optional properties supplied {name:value} (see FRAME_OPTIONAL_DEFAULTS).
+        self.__optional = {}
+        #
+        for name in FRAME_OPTIONAL_DEFAULTS:
+            if name in kwargs:
+                try:
+                    self.__optional[name] = float(kwargs[name])
+                except (TypeError, ValueError):
+                    raise IOError("FRAME_BAD_ORIENTATION")
 
         # For the detector.
 
-        if "chipid" not in kwargs.keys():
+        if "chipid" not in kwargs:
             raise IOError("FRAME_NO_CHIPID")
 
         ## The chip ID.
         self.__chipid = kwargs["chipid"]
 
-        if "biasvoltage" not in kwargs.keys():
+        if "biasvoltage" not in kwargs:
             raise IOError("FRAME_NO_HV")
 
         ## The bias voltage (HV) [V].
         self.__hv = kwargs["biasvoltage"]
 
-        if "ikrum" not in kwargs.keys():
+        if "ikrum" not in kwargs:
             raise IOError("FRAME_NO IKRUM")
 
         ## The detector I_Krum value.
         self.__ikrum = kwargs["ikrum"]
 
-        ## The detector x position [mm].
-        self.__det_x = 0.0
-        if "detx" in kwargs.keys():
-            self.__det_x = kwargs["detx"]
-
-        ## The detector y position [mm].
-        self.__det_y = 0.0
-        if "dety" in kwargs.keys():
-            self.__det_y = kwargs["dety"]
-
-        ## The detector z position [mm].
-        self.__det_z = 0.0
-        if "detz" in kwargs.keys():
-            self.__det_z = kwargs["detz"]
-
-        ## The detector Euler angle a [deg.].
-        self.__det_euler_a = 0.0
-        if "deteulera" in kwargs.keys():
-            self.__det_euler_a = kwargs["deteulera"]
-
-        ## The detector Euler angle b [deg.].
-        self.__det_euler_b = 0.0
-        if "deteulerb" in kwargs.keys():
-            self.__det_euler_b = kwargs["deteulerb"]
-
-        ## The detector Euler angle c [deg.].
-        self.__det_euler_c = 0.0
-        if "deteulerc" in kwargs.keys():
-            self.__det_euler_c = kwargs["deteulerc"]
-
 
         # Temporal information
         #----------------------
 
-        if "starttime" not in kwargs.keys() or "acqtime" not in kwargs.keys():
+        if "starttime" not in kwargs or "acqtime" not in kwargs:
             raise IOError("BAD_FRAME_TIME_INFO")
 
         ## The start time [s].
@@ -141,67 +121,76 @@ class Frame:
         ## The acquisition time [s].
         self.__acqtime = kwargs["acqtime"]
 
-        self.__starttimesec, self.__starttimesubsec, sts = \
-            getPixelmanTimeString(self.__starttime)
-        lg.debug(" Frame found with start time: '%s'." % (sts))
-
         ## The end time [s].
         self.__endtime = self.__starttime + self.__acqtime
 
-        self.__endtimesec, self.__endtimesubsec, ets = \
-            getPixelmanTimeString(self.__endtime)
+        ## The start time seconds and sub-second values (worked out when first needed).
+        self.__starttimes = None
+
+        ## The end time seconds and sub-second values (worked out when first needed).
+        self.__endtimes = None
 
 
         # Payload information
         #--------------------
 
         ## The frame width.
-        self.__width = 256
-
-        if "width" in kwargs.keys():
-            self.__width = kwargs["width"]
+        self.__width = kwargs.get("width", 256)
 
         ## The frame height.
-        self.__height = 256
+        self.__height = kwargs.get("height", 256)
 
-        if "height" in kwargs.keys():
-            self.__height = kwargs["height"]
-
-        if "format" not in kwargs.keys():
+        if "format" not in kwargs:
             raise IOError("FRAME_NO_FORMAT")
 
         ## The payload format.
         self.__format = kwargs["format"]
 
-        ## The map of the pixels.
-        self.__pixelmap = {}
+        ## The map of the pixels (made from the payload when first needed).
+        self.__pixelmap = kwargs.get("pixelmap", None)
 
-        if "pixelmap" in kwargs.keys():
-            self.__pixelmap = kwargs["pixelmap"]
+        ## The frame payload (made from the pixel map when first needed).
+        self.__payload = kwargs.get("payload", None)
+        #
+        if self.__pixelmap is None and self.__payload is None:
+            self.__pixelmap = {}
 
         ## The pixel mask map.
-        self.__pixel_mask_map = {}
-
-        if "pixelmask" in kwargs.keys():
-            self.__pixel_mask_map = kwargs["pixelmask"]
+        self.__pixel_mask_map = kwargs.get("pixelmask", {})
 
         ## Is the data from a Monte Carlo simulation?
-        self.__isMC = False
-        if "ismc" in kwargs.keys():
-            self.__ismc = kwargs["ismc"]
+        self.__ismc = kwargs.get("ismc", False)
+
+        ## The per-pixel energy calibration (if any).
+        self.__calibration = kwargs.get("calibration", None)
 
-        if "skipclustering" in kwargs.keys():
-            if kwargs["skipclustering"]:
-                #print("SKIPPING THE CLUSTERING!")
-                self.__n_klusters = -1
-                return None
+        ## Skip the clustering?
+        self.__skipclustering = kwargs.get("skipclustering", False)
 
-        # Do the clustering.
+        ## Keep the gamma candidate clusters (or only count them)?
+        self.__keepgammas = kwargs.get("keepgammas", True)
 
-        ## The frame's cluster finder.
-        self.__kf = KlusterFinder(self.getPixelMap(), self.getWidth(), self.getHeight(), self.isMC(), self.__pixel_mask_map)
+        ## The cluster finding backend (see klusterbackends).
+        self.__backend = kwargs.get("backend", DEFAULT_KLUSTER_BACKEND)
 
-        self.__n_klusters = self.__kf.getNumberOfKlusters()
+        ## The frame's cluster finder (made when first needed - see cluster).
+        self.__kf = None
+
+    def cluster(self):
+        """ Do the clustering (if it hasn't been done already). """
+
+        if self.__kf is None and not self.__skipclustering:
+
+            # Use the payload unless the pixel map has been supplied (or made).
+            data = self.__pixelmap
+            #
+            if data is None:
+                data = self.__payload
+
+            self.__kf = KlusterFinder(data, self.__height, self.__width, self.__ismc, \
+                self.__pixel_mask_map, self.__calibration, self.__keepgammas, self.__backend)
+
+        return self.__kf
 
     # Accessor methods
     #==================
@@ -219,40 +208,40 @@ class Frame:
         return self.__alt
 
     def getRoll(self):
-        return self.__roll
+        return self.__optional.get("roll", FRAME_OPTIONAL_DEFAULTS["roll"])
 
     def getPitch(self):
-        return self.__pitch
+        return self.__optional.get("pitch", FRAME_OPTIONAL_DEFAULTS["pitch"])
 
     def getYaw(self):
-        return self.__yaw
+        return self.__optional.get("yaw", FRAME_OPTIONAL_DEFAULTS["yaw"])
 
     def getOmegax(self):
-        return self.__omegax
+        return self.__optional.get("omegax", FRAME_OPTIONAL_DEFAULTS["omegax"])
 
     def getOmegay(self):
-        return self.__omegay
+        return self.__optional.get("omegay", FRAME_OPTIONAL_DEFAULTS["omegay"])
 
     def getOmegaz(self):
-        return self.__omegaz
+        return self.__optional.get("omegaz", FRAME_OPTIONAL_DEFAULTS["omegaz"])
 
     def getDetx(self):
-        return self.__det_x
+        return self.__optional.get("detx", FRAME_OPTIONAL_DEFAULTS["detx"])
 
     def getDety(self):
-        return self.__det_y
+        return self.__optional.get("dety", FRAME_OPTIONAL_DEFAULTS["dety"])
 
     def getDetz(self):
-        return self.__det_z
+        return self.__optional.get("detz", FRAME_OPTIONAL_DEFAULTS["detz"])
 
     def getDetEulera(self):
-        return self.__det_euler_a
+        return self.__optional.get("deteulera", FRAME_OPTIONAL_DEFAULTS["deteulera"])
 
     def getDetEulerb(self):
-        return self.__det_euler_b
+        return self.__optional.get("deteulerb", FRAME_OPTIONAL_DEFAULTS["deteulerb"])
 
     def getDetEulerc(self):
-        return self.__det_euler_c
+        return self.__optional.get("deteulerc", FRAME_OPTIONAL_DEFAULTS["deteulerc"])
 
     def getChipId(self):
         return self.__chipid
@@ -269,20 +258,40 @@ class Frame:
     def getStartTime(self):
         return self.__starttime
 
+    def getStartTimes(self):
+        """ The start time seconds and sub-second [us] values. """
+        if self.__starttimes is None:
+            self.__starttimes = getPixelmanTime(self.__starttime)
+        return self.__starttimes
+
     def getStartTimeSec(self):
-        return self.__starttimesec
+        return self.getStartTimes()[0]
 
     def getStartTimeSubSec(self):
-        return self.__starttimesubsec
+        return self.getStartTimes()[1]
 
     def getEndTime(self):
         return self.__endtime
 
+    def getEndTimes(self):
+        """ The end time seconds and sub-second [us] values. """
+        if self.__endtimes is None:
+            self.__endtimes = getPixelmanTime(self.__endtime)
+        return self.__endtimes
+
     def getEndTimeSec(self):
-        return self.__endtimesec
+        return self.getEndTimes()[0]
 
     def getEndTimeSubSec(self):
-        return self.__endtimesubsec
+        return self.getEndTimes()[1]
+
+    def getStartTimeS(self):
+        """ The start time in the Pixelman format. """
+        return getPixelmanTimeS(*self.getStartTimes())
+
+    def getEndTimeS(self):
+        """ The end time in the Pixelman format. """
+        return getPixelmanTimeS(*self.getEndTimes())
 
     def getAcqTime(self):
         return self.__acqtime
@@ -300,64 +309,72 @@ class Frame:
         return self.__format
 
     def getPixelMap(self):
+        """ The pixel map {X:C} (made from the payload when first asked for). """
+        if self.__pixelmap is None:
+            self.__pixelmap = self.__payload.getPixelMap()
         return self.__pixelmap
 
+    def getPayload(self):
+        """ The frame payload (made from the pixel map when first asked for). """
+        if self.__payload is None:
+            self.__payload = getPayloadFromPixelMap(self.__pixelmap, self.__width, self.__height)
+        return self.__payload
+
     def getPixelMask(self):
         return self.__pixel_mask_map
 
     def getRawNumberOfPixels(self):
+        if self.__pixelmap is None:
+            return self.__payload.getNumberOfPixels()
         return len(self.__pixelmap)
 
     def getNumberOfUnmaskedPixels(self):
-        unmasked = 0
-        #lg.debug(self.__pixelmap)
-        #lg.debug(self.__pixel_mask_map)
-        #for X in self.__pixel_mask_map.keys():
-        #    lg.debug(" * %5d -> (%5d,%5d)." % (X, X%256, X/256))
-        for X in self.__pixelmap.keys():
-            #lg.debug(" * Is %5d -> (%5d,%5d) in the map?" % (X, X%256, X/256))
-            if X not in self.__pixel_mask_map.keys():
-                #lg.debug(" *---> NO!")
-                unmasked += 1
-            #else:
-            #    lg.debug(" *---> YES!")
-        return unmasked
+        """ The number of hit pixels that aren't masked. """
+        if self.__pixelmap is None:
+            return self.__payload.mask(self.__pixel_mask_map).getNumberOfPixels()
+        return len(self.__pixelmap) - len([X for X in self.__pixel_mask_map if X in self.__pixelmap])
 
     def getNumberOfMaskedPixels(self):
         return len(self.__pixel_mask_map)
 
     def getOccupancy(self):
-        return len(self.__pixelmap)
+        return self.getRawNumberOfPixels()
 
     def getOccupancyPc(self):
-        return float(len(self.__pixelmap))/float(self.__width * self.__height)
+        return float(self.getRawNumberOfPixels())/float(self.__width * self.__height)
 
     def isMC(self):
         return self.__ismc
 
+    def getCalibration(self):
+        return self.__calibration
+
     def getPixelsString(self):
         s = ""
 
     def getNumberOfKlusters(self):
-        return self.__n_klusters
+        """ The number of clusters in the frame (-1 if the clustering was skipped). """
+        if self.__skipclustering:
+            return -1
+        return self.cluster().getNumberOfKlusters()
 
     def getNumberOfGammas(self):
-        return self.__kf.getNumberOfGammas()
+        return self.cluster().getNumberOfGammas()
 
     def getNumberOfMonopixels(self):
-        return self.__kf.getNumberOfMonopixels()
+        return self.cluster().getNumberOfMonopixels()
 
     def getNumberOfBipixels(self):
-        return self.__kf.getNumberOfBipixels()
+        return self.cluster().getNumberOfBipixels()
 
     def getNumberOfTripixelGammas(self):
-        return self.__kf.getNumberOfTripixelGammas()
+        return self.cluster().getNumberOfTripixelGammas()
 
     def getNumberOfTetrapixelGammas(self):
-        return self.__kf.getNumberOfTetrapixelGammas()
+        return self.cluster().getNumberOfTetrapixelGammas()
 
     def getNumberOfNonGammas(self):
         return self.getNumberOfKlusters() - self.getNumberOfGammas()
 
     def getKlusterFinder(self):
-        return self.__kf
+        return self.cluster()
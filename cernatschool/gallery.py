@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Paginated HTML galleries of cluster images.
+
+The pages are written to file as the clusters are added, so the memory
+used doesn't depend on the number of clusters.
+"""
+
+# The usual suspects.
+import os
+
+#...for the logging.
+import logging as lg
+
+## The default number of cluster thumbnails per gallery page.
+DEFAULT_GALLERY_PAGE_SIZE = 100
+
+## The width of the cluster thumbnails [pixels].
+GALLERY_THUMBNAIL_WIDTH = 64
+
+def getGalleryPageName(name, page):
+    """
+    The file name of a gallery page.
+
+    The first page is '<name>.html' (so that it can be linked to without
+    knowing how many pages there are), the rest are '<name>_<page>.html'.
+    """
+    if page == 1:
+        return "%s.html" % (name)
+    return "%s_%d.html" % (name, page)
+
+class KlusterGallery:
+    """ Wrapper class for a paginated gallery of cluster images. """
+
+    def __init__(self, outputpath, name, title, imagepath, pagesize=DEFAULT_GALLERY_PAGE_SIZE):
+        """
+        Constructor.
+
+        @param [in] outputpath The directory to write the pages to.
+        @param [in] name The gallery name (used for the page file names).
+        @param [in] title The title of the gallery pages.
+        @param [in] imagepath The path to the cluster images, relative to the pages.
+        @param [in] pagesize The number of clusters per page.
+        """
+
+        if pagesize < 1:
+            raise ValueError("BAD_PAGE_SIZE")
+
+        ## The directory the pages are written to.
+        self.__outputpath = outputpath
+
+        ## The gallery name.
+        self.__name = name
+
+        ## The page title.
+        self.__title = title
+
+        ## The (relative) path to the cluster images.
+        self.__imagepath = imagepath
+
+        ## The number of clusters per page.
+        self.__pagesize = pagesize
+
+        ## The current page file (None if no page is open).
+        self.__f = None
+
+        ## The current page number.
+        self.__page = 0
+
+        ## The number of clusters on the current page.
+        self.__n_on_page = 0
+
+        ## The total number of clusters in the gallery.
+        self.__n = 0
+
+    def getNumberOfKlusters(self):
+        return self.__n
+
+    def getNumberOfPages(self):
+        return self.__page
+
+    def __writeLinks(self, hasnext):
+        """ Write the links to the index and the neighbouring pages. """
+        self.__f.write("    <p>")
+        self.__f.write("<a href=\"index.html\">Back to the summary</a>")
+        if self.__page > 1:
+            self.__f.write(" | <a href=\"%s\">&lt; Previous</a>" % (getGalleryPageName(self.__name, self.__page - 1)))
+        if hasnext:
+            self.__f.write(" | <a href=\"%s\">Next &gt;</a>" % (getGalleryPageName(self.__name, self.__page + 1)))
+        self.__f.write("</p>\n")
+
+    def __openPage(self):
+        """ Start a new page. """
+
+        self.__page += 1
+        self.__n_on_page = 0
+
+        self.__f = open(os.path.join(self.__outputpath, getGalleryPageName(self.__name, self.__page)), "w")
+
+        self.__f.write("<!DOCTYPE html>\n")
+        self.__f.write("<html>\n")
+        self.__f.write("  <head>\n")
+        self.__f.write("    <title>%s (page %d)</title>\n" % (self.__title, self.__page))
+        self.__f.write("  </head>\n")
+        self.__f.write("  <body>\n")
+        self.__f.write("    <h1>%s</h1>\n" % (self.__title))
+        self.__f.write("    <h2>Page %d</h2>\n" % (self.__page))
+        self.__writeLinks(False)
+        self.__f.write("    <div>\n")
+
+    def __closePage(self, hasnext):
+        """ Finish the current page. """
+
+        self.__f.write("    </div>\n")
+        self.__writeLinks(hasnext)
+        self.__f.write("  </body>\n")
+        self.__f.write("</html>")
+        self.__f.close()
+        self.__f = None
+
+    def add(self, klusterid):
+        """ Add a cluster to the gallery. """
+
+        if self.__f is None:
+            self.__openPage()
+        elif self.__n_on_page == self.__pagesize:
+            self.__closePage(True)
+            self.__openPage()
+
+        ## The path to the cluster image.
+        img = "%s/%s.png" % (self.__imagepath, klusterid)
+
+        self.__f.write("      <a href=\"%s\"><img src=\"%s\" width=\"%d\" title=\"%s\" alt=\"%s\"/></a>\n" % \
+            (img, img, GALLERY_THUMBNAIL_WIDTH, klusterid, klusterid))
+
+        self.__n_on_page += 1
+        self.__n += 1
+
+    def close(self):
+        """ Finish the gallery (an empty gallery still gets its first page). """
+
+        if self.__f is None and self.__page == 0:
+            self.__openPage()
+            self.__f.write("      <p>No clusters.</p>\n")
+
+        if self.__f is not None:
+            self.__closePage(False)
+
+        lg.info(" * Written %d clusters to %d '%s' gallery pages." % (self.__n, self.__page, self.__name))
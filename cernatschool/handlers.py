@@ -14,6 +14,12 @@ import re
 #...for the time functionality.
 import time
 
+#...for rounding the times.
+import math
+
+#...for the MATH.
+import numpy as np
+
 def isChipIdValid(chipid):
     """ Does the chip ID conform to the UVV-XYYYY format? """
 
@@ -36,22 +42,68 @@ def isStartTimeStringValid(sts):
     else:
         return False
 
-def getPixelmanTimeString(st):
-    """ Get the timestring in the Pixelman (custom) format. """
+def getPixelmanTime(st):
+    """
+    Split a start time into whole seconds and microseconds.
+
+    The time is rounded to the nearest microsecond first, so that e.g.
+    1375181535.9999997 gives (1375181536, 0) rather than a sub-second
+    value of 1000000.
+
+    @param [in] st The time [s].
+    @returns The seconds and the sub-second value [us].
+    """
+
+    ## The seconds (rounded down).
+    sec = int(math.floor(st))
+
+    ## The sub-second value [us].
+    sub = int(math.floor((st - sec) * 1e6 + 0.5))
+
+    if sub >= 1000000:
+        sec += 1; sub -= 1000000
+
+    return sec, sub
+
+def getPixelmanTimeArrays(st):
+    """
+    Split an array of start times into whole seconds and microseconds.
 
-    ## The seconds from the start time provided.
-    sec = int(str(st).split(".")[0])
+    The same as getPixelmanTime, but for many times at once.
 
-    ## The seb-second value.
-    sub = int(("%.6f" % st).strip().split(".")[1])
+    @param [in] st The array of times [s].
+    @returns The arrays of the seconds and the sub-second values [us].
+    """
+
+    st = np.asarray(st, dtype=np.float64)
+
+    ## The seconds (rounded down).
+    sec = np.floor(st)
+
+    ## The sub-second values [us].
+    sub = np.floor((st - sec) * 1e6 + 0.5)
+
+    ## The times that round up to the next second.
+    carry = sub >= 1000000
+
+    sec[carry] += 1; sub[carry] -= 1000000
+
+    return sec.astype(np.int64), sub.astype(np.int64)
+
+def getPixelmanTimeS(sec, sub):
+    """ Get the time string in the Pixelman (custom) format from the seconds and sub-second values. """
 
     ## The time represented as a Python time object.
     mytime = time.gmtime(sec)
 
-    ## The time in the Pixelman format.
-    sts = time.strftime("%a %b %d %H:%M:%S.", mytime) + ("%06d" % (sub)) + time.strftime(" %Y", mytime)
+    return time.strftime("%a %b %d %H:%M:%S.", mytime) + ("%06d" % (sub)) + time.strftime(" %Y", mytime)
+
+def getPixelmanTimeString(st):
+    """ Get the timestring in the Pixelman (custom) format. """
+
+    sec, sub = getPixelmanTime(st)
 
-    return sec, sub, sts
+    return sec, sub, getPixelmanTimeS(sec, sub)
 
 def getPixelsStringFromPixelMap(pixelmap):
     """ Convert a pixel dictionary to a string in the X, C format. """
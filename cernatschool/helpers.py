@@ -17,6 +17,9 @@ from scipy.optimize import leastsq
 #...for the data values.
 from datavals import *
 
+#...for reading the data file values.
+from payload import getPayloadValues, getPayloadRows
+
 def getConsistentValue(thelist, error, emptyval=None):
     """
     Function for extracting a consistent value from a list,
@@ -42,67 +45,148 @@ def getFormat(fn):
 
     ## Open the file and look at the first line.
     with open(fn, "r") as f:
+        return getFormatFromLine(f.readline())
+
+def getFormatFromLine(l):
+    """
+    Get the file format value from the first line of a data or DSC file.
+
+    @param [in] l The first line of the file.
+    @returns The file format value (see DATA_FILE_TYPES, 0 if unrecognised).
+    """
+
+    l = l.strip()
 
-        l = f.readline().strip()
+    lg.debug("")
+    lg.debug(" *--> First line is:")
+    lg.debug("\n\n%s\n" % (l))
+    lg.debug("")
 
-        lg.debug("")
-        lg.debug(" *--> First line is:")
-        lg.debug("\n\n%s\n" % (l))
-        lg.debug("")
+    ## The file type value.
+    filetypeval = 0
 
-        ## The file type value.
-        filetypeval = 0
+    # Is it a DSC file?
+    # TODO: check all possible DSC file starts...
+    if   l == "A000000001":
+        filetypeval = -1
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
+        return filetypeval
 
-        # Is it a DSC file?
-        # TODO: check all possible DSC file starts...
-        if   l == "A000000001":
-            filetypeval = -1
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
+    # Is the file empty?
+    if l == "":
+        filetypeval = 4114
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
+        return filetypeval
 
-        # Is the file empty?
-        if l == "":
+    # Try to break up the first line into tab-separated integers.
+
+    try:
+        ## Values separated by tab
+        tabvals = [int(x) for x in l.split('\t')]
+
+        lg.debug(" %d tab separated values found in the first line." % (len(tabvals)))
+
+        if len(tabvals) == 2:
+            filetypeval = 8210
+        elif len(tabvals) == 3:
             filetypeval = 4114
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
+        return filetypeval
 
-        # Try to break up the first line into tab-separated integers.
+    except ValueError:
+        lg.debug(" Tab separation into integers failed!")
+        pass
 
-        try:
-            ## Values separated by tab
-            tabvals = [int(x) for x in l.split('\t')]
+    try:
+        ## Values separated by spaces.
+        spcvals = [int(x) for x in l.split(' ')]
 
-            lg.debug(" %d tab separated values found in the first line." % (len(tabvals)))
+        lg.debug(" %d space separated values found in the first line." % (len(spcvals)))
 
-            if len(tabvals) == 2:
-                filetypeval = 8210
-            elif len(tabvals) == 3:
-                filetypeval = 4114
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
+        # (256 to 1024 columns - see DscFile.processDscFile.)
+        if len(spcvals) >= 256 and len(spcvals) <= 1024:
+            filetypeval = 18
+        lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
+        return filetypeval
 
-        except ValueError:
-            lg.debug(" Tab separation into integers failed!")
-            pass
+    except ValueError:
+        lg.debug(" Space separation into integers failed!")
+        pass
 
-        try:
-            ## Values separated by spaces.
-            spcvals = [int(x) for x in l.split(' ')]
+    lg.debug(" This is not a valid data file.")
 
-            lg.debug(" %d space separated values found in the first line." % (len(spcvals)))
+    return filetypeval
 
-            if len(spcvals) == 256:
-                filetypeval = 18
-            lg.debug(" *--> This is a %s file." % (DATA_FILE_TYPES[filetypeval]))
-            return filetypeval
 
-        except ValueError:
-            lg.debug(" Space separation into integers failed!")
-            pass
+def getPixelArrays(fn, dataformat, width=256, height=256):
+    """
+    Read the pixels of a Timepix data file into arrays.
 
-        lg.debug(" This is not a valid data file.")
+    A (much) faster alternative to building the pixel map dictionary
+    when only the pixel positions and counts are needed.
 
-        return filetypeval
+    @param [in] fn The path to the data file.
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns The arrays of pixel X values and counts (C).
+    """
+
+    with open(fn, "r") as f:
+        return getPixelArraysFromString(f.read(), dataformat, width, height)
+
+
+def getPixelArraysFromString(text, dataformat, width=256, height=256):
+    """ Get the arrays of pixel X values and counts (C) from a data file's contents. """
+
+    vals = getPayloadValues(text)
+
+    if   dataformat == 4114: # ASCII xyC.
+        vals = getPayloadRows(vals, 3)
+        return width * vals[:, 1] + vals[:, 0], vals[:, 2]
+    elif dataformat == 18: # ASCII matrix.
+        if len(vals) != width * height:
+            raise IOError("FRAME_BAD_FORMAT")
+        X = np.flatnonzero(vals > 0)
+        return X, vals[X]
+    elif dataformat == 8210: # ASCII XC
+        vals = getPayloadRows(vals, 2)
+        return vals[:, 0], vals[:, 1]
+
+    raise IOError("FRAME_BAD_FORMAT")
+
+
+def writeDataFile(fn, X, C, dataformat, width=256, height=256):
+    """
+    Write pixel arrays to a Timepix data file (the inverse of getPixelArrays).
+
+    @param [in] fn The path to the data file.
+    @param [in] X The array of pixel X values.
+    @param [in] C The array of pixel counts.
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    """
+
+    X = np.asarray(X, dtype=np.int64); C = np.asarray(C, dtype=np.int64)
+
+    if   dataformat == 4114: # ASCII xyC.
+        vals = np.column_stack((X % width, X // width, C))
+        fmt = "%d\t%d\t%d"
+    elif dataformat == 18: # ASCII matrix.
+        vals = np.zeros(width * height, dtype=np.int64)
+        vals[X] = C
+        vals = vals.reshape(height, width)
+        fmt = "%d"
+    elif dataformat == 8210: # ASCII XC
+        vals = np.column_stack((X, C))
+        fmt = "%d\t%d"
+    else:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    with open(fn, "w") as f:
+        if len(vals) > 0:
+            np.savetxt(f, vals, fmt=fmt, delimiter=" ")
 
 
 def residuals(p, y, x):
@@ -123,7 +207,7 @@ def residuals(p, y, x):
     # Return it!
     return res
 
-def getLinearity(pixel_dict):
+def getLinearity(pixel_dict, cols=256):
     """
     A helper function for finding the linearity of a cluster.
 
@@ -131,6 +215,7 @@ def getLinearity(pixel_dict):
     from the line of best fit.
 
     @param [in] pixel_dict A dictionary of pixel {X:C} values.
+    @param [in] cols The number of columns in the frame.
     @returns m The gradient of the line of best fit.
     @returns c The intercept of the line of best fit.
     @returns sumR The sum of the residuals.
@@ -150,9 +235,10 @@ def getLinearity(pixel_dict):
     ys = []
 
     # Loop over the pixels provided to get the x and y values.
-    for X, C in pixel_dict.iteritems():
-        x = float(X % 256)
-        y = float(X / 256)
+    # (In X order, so that the fit doesn't depend on the order of the dictionary.)
+    for X, C in sorted(pixel_dict.iteritems()):
+        x = float(X % cols)
+        y = float(X / cols)
         xs.append(x)
         ys.append(y)
 
@@ -231,8 +317,8 @@ def getLinearity(pixel_dict):
 
         # Loop over the pixels and calculate the distances.
         for X, C in pixel_dict.iteritems():
-            x = X % 256
-            y = X / 256
+            x = X % cols
+            y = X / cols
 
             ## The numerator of |d| (the perpendicular distance).
             numerator = np.fabs(m * x - y + c)
@@ -256,9 +342,9 @@ def countEdgePixels(pixels_dict, rows, cols):
     # Loop over the pixels in the cluster.
     for X in pixels_dict.keys():
 
-        x = X%256
+        x = X%cols
 
-        y = X/256
+        y = X/cols
 
         is_edge_pixel = False
 
@@ -324,9 +410,9 @@ def getKlusterPropertiesJson(klusterid, k):
         "edgefrac"      : k.getOuterPixelFraction(),  \
         "innerfrac"     : k.getInnerPixelFraction(),  \
         "ismc"          : k.isMC(),                   \
-        "isedgekluster" : k.isEdgeCluster()           \
-        #"totalenergy"   :, \
-        #"maxenergy"     :, \
+        "isedgekluster" : k.isEdgeCluster(),          \
+        "totalenergy"   : k.getTotalEnergy(),         \
+        "maxenergy"     : k.getMaxEnergy()            \
         #"frameid"       :\
         }
 
@@ -10,6 +10,12 @@ from copy import deepcopy
 #...for the MATH.
 import numpy as np
 
+#...for timing the cluster properties.
+import time
+
+#...for the CPU times.
+from metrics import getCpuTime
+
 #...for the data values.
 from datavals import *
 
@@ -19,6 +25,39 @@ from pixel import *
 #...for the linearity calculations.
 from helpers import getLinearity, countEdgePixels
 
+#...for the cluster finding backends.
+from klusterbackends import getKlusterBackend, DEFAULT_KLUSTER_BACKEND
+
+#...for the frame payloads.
+from payload import FramePayload
+
+def isGammaCandidate(npix, rad):
+    """
+    Is a cluster a gamma candidate?
+
+    @param [in] npix The number of pixels in the cluster.
+    @param [in] rad The (unweighted) cluster radius [pixels].
+    """
+    return npix == 1 or npix == 2 or (npix==3 and rad<TRIPIXEL_RADIUS) or (npix==4 and rad<TETRAPIXEL_RADIUS)
+
+def getKlusterRadius(xys, cols=256):
+    """
+    Get the unweighted radius of a cluster from its pixel positions.
+
+    The same as the radius found by Kluster.process, for when the full
+    cluster properties aren't needed.
+
+    @param [in] xys The list of the cluster's pixel X values.
+    @param [in] cols The number of columns in the frame.
+    """
+
+    xs = [float(X % cols) for X in xys]; ys = [float(X / cols) for X in xys]
+
+    ## The unweighted cluster position.
+    x_uw = sum(xs) / len(xs); y_uw = sum(ys) / len(ys)
+
+    return max([np.sqrt((x - x_uw)*(x - x_uw) + (y - y_uw)*(y - y_uw)) for x, y in zip(xs, ys)])
+
 class Kluster:
     """
     Wrapper class for klusters.
@@ -132,6 +171,12 @@ class Kluster:
     def get_pixel_xy_list(self):
         return self.pixel_xy_list
 
+    def getFrameRows(self):
+        return self.__frame_rows
+
+    def getFrameCols(self):
+        return self.__frame_cols
+
     def insert(self, pixel_xy, pixel):
         self.pixel_xy_list.append(pixel_xy)
         self.total_counts += pixel.getC()
@@ -196,6 +241,11 @@ class Kluster:
     def getMaxEnergy(self):
         return self.__energy_max
 
+    def setEnergies(self, total, emax):
+        """ Set the total and maximum (pixel) energies of the cluster [keV]. """
+        self.__energy_total = float(total)
+        self.__energy_max = float(emax)
+
     def getNumberOfEdgePixels(self):
         return self.__n_edge
 
@@ -213,9 +263,7 @@ class Kluster:
 
     def isGamma(self):
         """ Is the cluster a gamma candidate? """
-        npix = self.getNumberOfPixels()
-        rad = self.getRadiusUW()
-        return npix == 1 or npix == 2 or (npix==3 and rad<TRIPIXEL_RADIUS) or (npix==4 and rad<TETRAPIXEL_RADIUS)
+        return isGammaCandidate(self.getNumberOfPixels(), self.getRadiusUW())
 
     def process(self, pixels):
         #
@@ -278,8 +326,10 @@ class Kluster:
         # Calculate the cluster radius
         #------------------------------
         # Firstly, we calculate the distance between each pixel and the centre.
-        r_i = [np.sqrt( (float(X%256) - self.__x_uw)*(float(X%256) - self.__x_uw) \
-                     +  (float(X/256) - self.__y_uw)*(float(X/256) - self.__y_uw) ) \
+        cols = self.__frame_cols
+        #
+        r_i = [np.sqrt( (float(X%cols) - self.__x_uw)*(float(X%cols) - self.__x_uw) \
+                     +  (float(X/cols) - self.__y_uw)*(float(X/cols) - self.__y_uw) ) \
             for X in self.__pixel_dict.keys()]
 
         # Then we find the maximum of these distances. This is the cluster radius.
@@ -303,7 +353,7 @@ class Kluster:
 
         # Linearity information
         #-----------------------
-        self.__lin_m, self.__lin_c, self.__lin_sumR, self.__linearity = getLinearity(self.__pixel_dict)
+        self.__lin_m, self.__lin_c, self.__lin_sumR, self.__linearity = getLinearity(self.__pixel_dict, self.__frame_cols)
 
         # Edge pixel information.
         self.__n_edge = countEdgePixels(self.__pixel_dict, self.__frame_rows, self.__frame_cols)
@@ -312,14 +362,17 @@ class Kluster:
 
         self.__inner_pixels_frac = 1.0 - self.__outer_pixels_frac
 
-        if 0 in xs or 0 in ys or 255 in xs or 255 in ys:
+        if 0 in xs or 0 in ys or (self.__frame_cols - 1) in xs or (self.__frame_rows - 1) in ys:
             self.__is_edge_kluster = True
         else:
             self.__is_edge_kluster = False
 
-        # TMP
-        self.__energy_total = 0.0
-        self.__energy_max = 0.0
+        # The energies are only known if the frame is calibrated
+        # (see setEnergies and the KlusterFinder).
+        if self.__energy_total is None:
+            self.__energy_total = 0.0
+        if self.__energy_max is None:
+            self.__energy_max = 0.0
 
         lg.debug("*")
         lg.debug("* NEW CLUSTER:")
@@ -380,8 +433,8 @@ class Kluster:
             #"innerfrac"     :, \
             #"ismc"          : self.isMC()\
             #"isedgekluster" : , \
-            #"totalenergy"   :, \
-            #"maxenergy"     :, \
+            "totalenergy"   : self.getTotalEnergy(),    \
+            "maxenergy"     : self.getMaxEnergy(),      \
             #"frameid"       :\
             }
         return p
@@ -397,19 +450,20 @@ class KlusterFinder:
     @author Son Hoang (principle author).
     @author T. Whyntie (editor).
     """
-    dir_x = [-1, -1,  0,  1,  1,  1,  0, -1]
-    dir_y = [ 0,  1,  1,  1,  0, -1, -1, -1]
 
-    def __init__(self, data, r, c, ismc, maskdict={}):
+    def __init__(self, data, r, c, ismc, maskdict={}, calibration=None, keepgammas=True, backend=DEFAULT_KLUSTER_BACKEND):
 
         """
         Constructor.
 
-        @param [in] data A dictionary of pixel data - {X:C}.
+        @param [in] data A dictionary of pixel data - {X:C} - or a FramePayload.
         @param [in] r The number of rows in the originating frame.
         @param [in] c The number of columns in the originating frame.
         @param [in] ismc Is the cluster from simulated data?
         @param [in] maskdict A dictionary of masked pixels.
+        @param [in] calibration The per-pixel energy calibration (optional).
+        @param [in] keepgammas Keep the gamma candidate clusters (or only count them)?
+        @param [in] backend The cluster finding backend (see klusterbackends).
         """
         lg.debug(""); lg.debug(" Instantiating a cluster finder object."); lg.debug("")
 
@@ -426,99 +480,20 @@ class KlusterFinder:
         ## Are we looking at simulated data?
         self.__is_mc = ismc
 
-        self.__pixel_map = deepcopy(data)
+        if isinstance(data, FramePayload):
 
-        # Remove the masked pixels from the data.
-        if maskdict is not None:
-            for X in maskdict:
-                if X in self.__pixel_map.keys():
-                    del self.__pixel_map[X]
+            # Masking the payload makes a new one, so there's no need to copy it.
+            self.__pixel_map = data.mask(maskdict)
 
-        #print "DEBUG: Data supplied has %6d pixels." % \
-        #  (len(data))
-        #
-        # An arbitrary check on number of pixels in the frame.
-        #  if data.size() >= 10000 then return
-        #
-        # Loop over the data supplied to the KlusterFinder.
-        # * Puts all of the data into the pixel map;
-        # * Assigns neighbouring pixels where it find them.
-        for xy, c in self.__pixel_map.iteritems():
-            x = xy % self.cols; y = xy / self.cols
-            self.pixels[xy] = Pixel(x,y,c,-1, self.rows, self.cols)
-
-            # Loop over the eight possible directions.
-            for direction in range(8):
-                ny = y + self.dir_y[direction]  # Next row.
-                nx = x + self.dir_x[direction]  # Next column.
-                nxy = ny * self.cols + nx # The next xy value.
-
-                # If the next row or column is on an edge, skip it.
-                if ny<0 or ny>=self.rows or nx<0 or nx>=self.cols:
-                    continue
-                if nxy in self.pixels:
-                    #print "DEBUG: *-----* Found neighbour in self.pixels!"
-                    #print "DEBUG: *     \\--* xy = %d" % (nxy)
-                    self.pixels[ xy].set_neighbour( direction,     nxy)
-                    self.pixels[nxy].set_neighbour((direction+4)%8, xy)
-
-        # Print out all pixels and neighbours
-        if self.dbg:
-            ## puts "DEBUG:"
-            print "DEBUG: Looping over pixels in the @pixel_map:"
-            print "DEBUG:---------------------------------------"
-            for xy, p in self.pixels.iteritems():
-                print "DEBUG: * Pixel at (%10d) -> (%3d, %3d) = %3d" % \
-                  (xy, p.get_x(),p.get_y(),p.get_c())
-                for direction, n in p.get_neighbours().iteritems():
-                    print "DEBUG: *---> Neighbour in direction % 1d with ID=%s" % \
-                      (direction, n)
-                print "DEBUG:"
-            print "DEBUG:"
-        # Now loop over the pixels in the KlusterFinder's pixel_map
-        # in order to create the blobs.
-        #print "DEBUG: Creating the Klusters!"
-        #print "DEBUG:"
-        #print "DEBUG: Looping over the pixels in the @pixel_map:"
-        #print "DEBUG:-------------------------------------------"
-        for xy, p in self.pixels.iteritems():
-            #print "DEBUG: * Pixel at (%3d, %3d) = %3d, mask = %3d" % \
-            #  (p.get_x(),p.get_y(),p.get_c(),p.get_mask())
-            # Start a new blob if the pixel hasn't been blobed yet.
-            if p.get_mask() == -1:
-                blob = Kluster(self.rows, self.cols, self.__is_mc)
-                p.set_mask(0)
-                #print "DEBUG: Mask set to %3d" % (p.get_mask())
-                blob.insert(xy, p)
-                # Loop over the list of pixels in the blob.
-                for bxy in blob.get_pixel_xy_list():
-                    #pb = self.pixels[bxy]
-                    for direction in range(8):
-                        if direction in self.pixels[bxy].get_neighbours():
-                            #print "DEBUG: *---> Pixel found in direction %1d" % (direction)
-                            nxy = self.pixels[bxy].get_neighbour(direction)
-                            self.pixels[bxy].set_mask(self.pixels[bxy].get_mask() + pow(2, direction))
-                            #print "DEBUG: *---> Setting mask to %3d" % \
-                            # (self.pixels[bxy].get_mask() + 2.0 ** direction)
-                            # If the Pixel isn't already in the Kluster, add it.
-                            if not blob.contains_pixel(nxy):
-                                blob.insert(nxy, self.pixels[bxy])
-                            # end of Pixel presence check.
-                        # end of Pixel neighbour in direction existence check.
-                # end of loop over the directions.
-
-                self.insert(blob)
-            ## end of check on the Pixel mask (as to whether or not blobed).
-        # end of loop over the Pixels
-        #print "DEBUG:-------------------------------------------"
-        if self.dbg:
-            print "DEBUG:"
-            print "DEBUG: Looping over the found blobs:"
-            print "DEBUG:------------------------------"
-            for b in self.blob_list:
-                print "DEBUG: * %3d pixel(s) found." % (len(b.get_pixel_xy_list()))
-            # end of loop over blobs
-            print "DEBUG:------------------------------"
+        else:
+
+            self.__pixel_map = deepcopy(data)
+
+            # Remove the masked pixels from the data.
+            if maskdict is not None:
+                for X in maskdict:
+                    if X in self.__pixel_map:
+                        del self.__pixel_map[X]
 
         ## The number of gamma candidates.
         self.__n_gammas = 0
@@ -535,42 +510,130 @@ class KlusterFinder:
         ## The number of tetrapixel candidates.
         self.__n_g4 = 0
 
+        ## The size of every blob found, in the order they were found.
+        sizes = []
+
+        ## The index (in the order they were found) of each blob in the blob list.
+        found = []
+
+        # Find the blobs (the lists of each cluster's pixels), ordered
+        # by their lowest X pixel so that clusters of the same size are
+        # in the same order whichever backend (or pixel order) is used.
+        for xys in sorted(getKlusterBackend(backend)(self.__pixel_map, self.rows, self.cols), key=min):
+
+            sizes.append(len(xys))
+
+            # Count the gamma candidates - we may not store these
+            # so we need to know the numbers.
+            if len(xys) <= 4:
+
+                isgamma = isGammaCandidate(len(xys), getKlusterRadius(xys, self.cols))
+
+                if   len(xys) == 1:
+                    self.__n_g1 += 1
+                elif len(xys) == 2:
+                    self.__n_g2 += 1
+                elif len(xys) == 3 and isgamma:
+                    self.__n_g3 += 1
+                elif len(xys) == 4 and isgamma:
+                    self.__n_g4 += 1
+
+                # Only the count is kept for gamma candidates (if asked).
+                if isgamma and not keepgammas:
+                    continue
+
+            ## The pixel counts.
+            if isinstance(self.__pixel_map, FramePayload):
+                Cs = self.__pixel_map.getCounts(xys).tolist()
+            else:
+                Cs = [self.__pixel_map[xy] for xy in xys]
+
+            blob = Kluster(self.rows, self.cols, self.__is_mc)
+            #
+            for xy, C in zip(xys, Cs):
+                self.pixels[xy] = Pixel(xy % self.cols, xy / self.cols, C, -1, self.rows, self.cols)
+                blob.insert(xy, self.pixels[xy])
+
+            self.insert(blob)
+
+            found.append(len(sizes) - 1)
+
+        self.__n_gammas = self.__n_g1 + self.__n_g2 + self.__n_g3 + self.__n_g4
+
+        ## The total number of clusters found (including any that weren't kept).
+        self.__n_klusters = len(sizes)
+
+        wall_0 = time.time(); cpu_0 = getCpuTime()
+
         # Calculate the blob properties
         for b in self.blob_list:
             b.process(self.pixels)
 
-            # Count the gamma candidates - we won't store these so we need to
-            # know the numbers.
-            if   b.getNumberOfPixels() == 1:
-                self.__n_g1 += 1
-            # Bipixel gamma.
-            elif b.getNumberOfPixels() == 2:
-                self.__n_g2 += 1
-            # Tripixel...
-            elif b.getNumberOfPixels() == 3:
-                # Tripixel gamma.
-                if b.getRadiusUW() < TRIPIXEL_RADIUS: #0.75
-                    self.__n_g3 += 1
-            # Tetrapixel...
-            elif b.getNumberOfPixels() == 4:
-                # Tetrapixel gamma.
-                if b.getRadiusUW() < TETRAPIXEL_RADIUS: #0.71
-                    self.__n_g4 += 1
+        # Calculate the cluster energies (all of the pixels at once).
+        if calibration is not None and len(self.blob_list) > 0:
+            self.calibrate(calibration)
 
-            self.__n_gammas = self.__n_g1 + self.__n_g2 + self.__n_g3 + self.__n_g4
+        ## The wall and CPU time spent calculating the cluster properties [s].
+        self.__properties_time = (time.time() - wall_0, getCpuTime() - cpu_0)
 
         # Sort the cluster list by cluster size.
         self.blob_list.sort(reverse=True)
 
+        # The index each kept cluster would have in the sorted list of
+        # all of the clusters (so that the cluster IDs don't depend on
+        # whether the gamma candidates were kept).
+
+        ## The position of each blob (in the order found) in the sorted list of all of the blobs.
+        rank = [0] * len(sizes)
+        #
+        for i, j in enumerate(sorted(range(len(sizes)), key=lambda j: sizes[j], reverse=True)):
+            rank[j] = i
+
+        ## The indices of the kept clusters.
+        self.__kluster_indices = [rank[j] for j in sorted(found, key=lambda j: sizes[j], reverse=True)]
+
     def insert(self, blob):
         self.blob_list.append(blob)
 
+    def getPropertiesTime(self):
+        """ The wall and CPU time spent calculating the cluster properties [s]. """
+        return self.__properties_time
+
+    def calibrate(self, calibration):
+        """
+        Set the cluster energies using a per-pixel energy calibration.
+
+        @param [in] calibration The PixelCalibration to use.
+        """
+
+        ## The pixel X values of every cluster, concatenated.
+        Xs = []
+
+        ## The index of the cluster each pixel belongs to.
+        labels = []
+
+        for i, b in enumerate(self.blob_list):
+            Xs.extend(b.get_pixel_xy_list())
+            labels.extend([i] * b.getNumberOfPixels())
+
+        ## The pixel counts (ToT).
+        Cs = [self.pixels[X].getC() for X in Xs]
+
+        E_total, E_max = calibration.getKlusterEnergies(Xs, Cs, labels, len(self.blob_list))
+
+        for i, b in enumerate(self.blob_list):
+            b.setEnergies(E_total[i], E_max[i])
+
     def getNumberOfKlusters(self):
-        return len(self.blob_list)
+        return self.__n_klusters
 
     def getListOfKlusters(self):
         return self.blob_list
 
+    def getKlusterIndices(self):
+        """ The index of each kept cluster in the (size-sorted) list of all of the clusters. """
+        return self.__kluster_indices
+
     def getNumberOfGammas(self):
         return self.__n_gammas
 
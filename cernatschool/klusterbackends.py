@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The cluster finding backends.
+
+A backend groups the (unmasked) hit pixels of a frame into clusters of
+eight-way connected pixels. The KlusterFinder then makes the Kluster
+objects (and their properties) from the groups, so the clusters found
+are the same whichever backend is used - only the speed differs.
+
+Each backend is a function taking the pixel map {X:C} (or a
+FramePayload) and the number of rows and columns of the frame and
+returning a list of the clusters' pixel X value lists. New backends can
+be added with registerKlusterBackend.
+
+The "tiled" backend (a TiledKlusterBackend) labels large frames tile
+by tile, optionally in parallel, and stitches together the clusters
+that cross the tile boundaries.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the pixels.
+from pixel import Pixel
+
+#...for the frame payloads.
+from payload import FramePayload
+
+#...for labelling the tiles in parallel.
+from multiprocessing import Pool
+
+#...for the labelling (if available).
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+## The default cluster finding backend.
+DEFAULT_KLUSTER_BACKEND = "reference"
+
+## The default tile size for the tiled backend [pixels] - one Timepix chip.
+DEFAULT_TILE_SIZE = 256
+
+## The x and y offsets of the eight neighbouring pixels (see pixel.Pixel).
+dir_x = [-1, -1,  0,  1,  1,  1,  0, -1]
+dir_y = [ 0,  1,  1,  1,  0, -1, -1, -1]
+
+def getPixelXArray(pixelmap):
+    """ The sorted pixel X values of a pixel map {X:C} or FramePayload. """
+    if isinstance(pixelmap, FramePayload):
+        return pixelmap.getArrays()[0].astype(np.int64)
+    return np.array(sorted(pixelmap.keys()), dtype=np.int64)
+
+def findBlobsReference(pixelmap, rows, cols):
+    """
+    Find the clusters by linking each pixel to its neighbours and
+    following the links (the original KlusterFinder algorithm).
+
+    @author Son Hoang (principle author).
+    @author T. Whyntie (editor).
+    """
+
+    if isinstance(pixelmap, FramePayload):
+        pixelmap = pixelmap.getPixelMap()
+
+    ## The pixels {X:Pixel}.
+    pixels = {}
+
+    # Loop over the data supplied to the KlusterFinder.
+    # * Puts all of the data into the pixel map;
+    # * Assigns neighbouring pixels where it find them.
+    for xy, c in pixelmap.iteritems():
+        x = xy % cols; y = xy / cols
+        pixels[xy] = Pixel(x,y,c,-1, rows, cols)
+
+        # Loop over the eight possible directions.
+        for direction in range(8):
+            ny = y + dir_y[direction]  # Next row.
+            nx = x + dir_x[direction]  # Next column.
+            nxy = ny * cols + nx # The next xy value.
+
+            # If the next row or column is on an edge, skip it.
+            if ny<0 or ny>=rows or nx<0 or nx>=cols:
+                continue
+            if nxy in pixels:
+                pixels[ xy].set_neighbour( direction,     nxy)
+                pixels[nxy].set_neighbour((direction+4)%8, xy)
+
+    ## The clusters' pixel lists.
+    blobs = []
+
+    # Now loop over the pixels in order to create the blobs.
+    for xy, p in pixels.iteritems():
+        # Start a new blob if the pixel hasn't been blobed yet.
+        if p.get_mask() == -1:
+            p.set_mask(0)
+
+            ## The blob's pixels, in the order they were found.
+            xys = [xy]
+
+            ## The blob's pixels (for checking quickly).
+            inblob = set(xys)
+
+            # Loop over the list of pixels in the blob.
+            for bxy in xys:
+                for direction in range(8):
+                    if direction in pixels[bxy].get_neighbours():
+                        nxy = pixels[bxy].get_neighbour(direction)
+                        pixels[bxy].set_mask(pixels[bxy].get_mask() + pow(2, direction))
+                        # If the Pixel isn't already in the blob, add it.
+                        if nxy not in inblob:
+                            xys.append(nxy); inblob.add(nxy)
+
+            blobs.append(xys)
+
+    return blobs
+
+def getBlobsFromLabels(X, labels):
+    """
+    Group pixels by their cluster labels.
+
+    @param [in] X The array of pixel X values.
+    @param [in] labels The array of the cluster label of each pixel.
+    @returns The clusters' pixel lists, ordered by the clusters' first (lowest X) pixels.
+    """
+
+    if len(X) == 0:
+        return []
+
+    ## The pixels sorted by cluster, then by X.
+    order = np.lexsort((X, labels))
+
+    X = X[order]; labels = labels[order]
+
+    ## Where each cluster starts in the sorted pixels.
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+
+    ## The clusters, ordered by their first pixels.
+    blobs = np.split(X, starts[1:])
+    #
+    blobs.sort(key=lambda b: b[0])
+
+    return [b.tolist() for b in blobs]
+
+def getNeighbourPairs(X, rows, cols, pixels=None):
+    """
+    Find the pairs of neighbouring pixels.
+
+    @param [in] X The (sorted) array of pixel X values.
+    @param [in] rows The number of rows in the frame.
+    @param [in] cols The number of columns in the frame.
+    @param [in] pixels The indices of the pixels to find the neighbours of (default: all of them).
+    @returns The pairs of neighbouring pixels (a, b), as indices into X.
+    """
+
+    n = len(X)
+
+    if pixels is None:
+        pixels = np.arange(n)
+
+    ## The pixel X values (and positions) to find the neighbours of.
+    Xp = X[pixels]
+    #
+    x = Xp % cols; y = Xp // cols
+
+    a = []; b = []
+
+    # Only the "forward" neighbours are needed to find every pair.
+    for dx, dy in [(1, 0), (-1, 1), (0, 1), (1, 1)]:
+
+        ok = (x + dx >= 0) & (x + dx < cols) & (y + dy < rows)
+
+        ## The X value of each pixel's neighbour.
+        nX = Xp + dy * cols + dx
+
+        j = np.searchsorted(X, nX)
+        #
+        j[j >= n] = 0
+
+        found = ok & (X[j] == nX)
+
+        a.append(pixels[found]); b.append(j[found])
+
+    return np.concatenate(a).astype(np.int64), np.concatenate(b).astype(np.int64)
+
+def getRoots(n, a, b):
+    """
+    Join the pairs (a, b) of n items with a (NumPy) union-find.
+
+    Each item starts as its own set; every pair is joined by pointing
+    both at the lower of their roots, with the paths to the roots
+    halved, until nothing changes.
+
+    @returns The root (lowest item) of each item's set.
+    """
+
+    ## The parent of each item.
+    parent = np.arange(n)
+
+    while len(a) > 0:
+
+        ## The roots of the items in each pair.
+        ra = parent[a]; rb = parent[b]
+
+        if np.array_equal(ra, rb):
+            break
+
+        ## The lower of the roots.
+        r = np.minimum(ra, rb)
+
+        np.minimum.at(parent, ra, r)
+        np.minimum.at(parent, rb, r)
+
+        # Halve the paths to the roots.
+        parent = parent[parent]
+        parent = parent[parent]
+
+    # Point every item at its root.
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            break
+        parent = grandparent
+
+    return parent
+
+def getLabelsUnionFind(X, rows, cols):
+    """ Label the (sorted) pixels X with a union-find over the neighbouring pixel pairs. """
+    a, b = getNeighbourPairs(X, rows, cols)
+    return getRoots(len(X), a, b)
+
+def getLabelsNdimage(X, rows, cols, grid=None):
+    """
+    Label the pixels X with scipy.ndimage.label (eight-way connectivity).
+
+    @param [in] grid The 2-D array of pixel counts, if there is one already.
+    """
+
+    if grid is None:
+
+        ## The hit pixels.
+        grid = np.zeros(rows * cols, dtype=np.bool_)
+        #
+        grid[X] = True
+
+    labels, n = ndimage.label(grid.reshape(rows, cols), structure=np.ones((3, 3), dtype=np.bool_))
+
+    return labels.ravel()[X]
+
+def findBlobsUnionFind(pixelmap, rows, cols):
+    """
+    Find the clusters with a (NumPy) union-find over the neighbouring pixel pairs.
+    """
+
+    ## The (sorted) pixel X values.
+    X = getPixelXArray(pixelmap)
+
+    if len(X) == 0:
+        return []
+
+    return getBlobsFromLabels(X, getLabelsUnionFind(X, rows, cols))
+
+def findBlobsNdimage(pixelmap, rows, cols):
+    """ Find the clusters with scipy.ndimage.label (eight-way connectivity). """
+
+    ## The pixel X values.
+    X = getPixelXArray(pixelmap)
+
+    # Dense payloads can be labelled as they are.
+    if isinstance(pixelmap, FramePayload) and pixelmap.isDense():
+        return getBlobsFromLabels(X, getLabelsNdimage(X, rows, cols, pixelmap.getDense()))
+
+    return getBlobsFromLabels(X, getLabelsNdimage(X, rows, cols))
+
+def labelTile(args):
+    """
+    Label the pixels of one tile (a module level function, so that
+    it can be run by a multiprocessing.Pool).
+
+    @param [in] args The tile's (sorted) pixel X values, rows, columns
+                     and labelling method ("ndimage" or "unionfind").
+    @returns The label of each pixel.
+    """
+
+    X, rows, cols, method = args
+
+    if method == "ndimage":
+        return getLabelsNdimage(X, rows, cols)
+
+    return getLabelsUnionFind(X, rows, cols)
+
+class TiledKlusterBackend:
+    """
+    A backend that finds the clusters in large (e.g. multi-chip) frames
+    tile by tile.
+
+    The frame is cut into tiles (e.g. one per Timepix chip) that are
+    labelled separately - in parallel, if there is more than one job -
+    and the clusters that cross the tile boundaries are then stitched
+    together by joining the labels of the neighbouring pixels either
+    side of each boundary.
+    """
+
+    def __init__(self, tilesize=DEFAULT_TILE_SIZE, jobs=1, method=None):
+        """
+        Constructor.
+
+        @param [in] tilesize The tile width and height [pixels].
+        @param [in] jobs The number of processes to label the tiles with.
+        @param [in] method The labelling method ("ndimage" or "unionfind", default: the fastest available).
+        """
+
+        if tilesize < 1:
+            raise IOError("BAD_TILE_SIZE")
+
+        ## The tile width and height [pixels].
+        self.__tilesize = tilesize
+
+        ## The number of processes to label the tiles with.
+        self.__jobs = jobs
+
+        ## The labelling method.
+        self.__method = method
+        #
+        if self.__method is None:
+            self.__method = "ndimage" if ndimage is not None else "unionfind"
+
+        ## The pool of processes (made when it's first needed).
+        self.__pool = None
+
+    def getTileSize(self):
+        return self.__tilesize
+
+    def getJobs(self):
+        return self.__jobs
+
+    def labelTiles(self, tiles):
+        """ Label the tiles, in parallel if there's more than one job. """
+
+        if self.__jobs > 1 and len(tiles) > 1:
+            if self.__pool is None:
+                self.__pool = Pool(processes=self.__jobs)
+            return self.__pool.map(labelTile, tiles)
+
+        return map(labelTile, tiles)
+
+    def __call__(self, pixelmap, rows, cols):
+
+        ## The (sorted) pixel X values.
+        X = getPixelXArray(pixelmap)
+
+        if len(X) == 0:
+            return []
+
+        ts = self.__tilesize
+
+        x = X % cols; y = X // cols
+
+        ## The number of tiles across the frame.
+        ntx = (cols + ts - 1) // ts
+
+        ## The tile of each pixel.
+        tile = (y // ts) * ntx + (x // ts)
+
+        ## The pixels sorted by tile (then by X).
+        order = np.lexsort((X, tile))
+
+        ## Where each tile starts in the sorted pixels.
+        starts = np.flatnonzero(np.r_[True, tile[order][1:] != tile[order][:-1]])
+        #
+        groups = np.split(order, starts[1:])
+
+        ## The tiles to label - (pixel X values relative to the tile, rows, cols, method).
+        tiles = []
+
+        for g in groups:
+
+            ## The tile's origin and size.
+            x0 = (x[g[0]] // ts) * ts; y0 = (y[g[0]] // ts) * ts
+            #
+            tw = min(ts, cols - x0); th = min(ts, rows - y0)
+
+            tiles.append(((y[g] - y0) * tw + (x[g] - x0), th, tw, self.__method))
+
+        ## The label of each pixel (unique across the tiles).
+        labels = np.zeros(len(X), dtype=np.int64)
+
+        offset = 0
+
+        for g, tl in zip(groups, self.labelTiles(tiles)):
+
+            # Number the labels within the tile from zero.
+            u, tl = np.unique(tl, return_inverse=True)
+
+            labels[g] = tl + offset
+
+            offset += len(u)
+
+        ## The pixels on the edges of their tiles with (forward) neighbours in other tiles.
+        border = np.flatnonzero((x % ts == 0) | (x % ts == ts - 1) | (y % ts == ts - 1))
+
+        # Stitch together the clusters that cross the tile boundaries.
+        a, b = getNeighbourPairs(X, rows, cols, border)
+        #
+        crossing = tile[a] != tile[b]
+        #
+        roots = getRoots(offset, labels[a[crossing]], labels[b[crossing]])
+
+        return getBlobsFromLabels(X, roots[labels])
+
+## The cluster finding backends {name:function}.
+KLUSTER_BACKENDS = {
+    "reference" : findBlobsReference,
+    "unionfind" : findBlobsUnionFind,
+    "tiled"     : TiledKlusterBackend()
+    }
+#
+if ndimage is not None:
+    KLUSTER_BACKENDS["ndimage"] = findBlobsNdimage
+
+## The backends to try for "auto", fastest first.
+AUTO_KLUSTER_BACKENDS = ["ndimage", "unionfind", "reference"]
+
+def registerKlusterBackend(name, func):
+    """
+    Add (or replace) a cluster finding backend.
+
+    @param [in] name The name of the backend.
+    @param [in] func The backend function - func(pixelmap, rows, cols) -> list of pixel X lists.
+    """
+    KLUSTER_BACKENDS[name] = func
+
+def getKlusterBackendNames():
+    """ The names of the available backends (sorted). """
+    return sorted(KLUSTER_BACKENDS.keys())
+
+def getKlusterBackend(name=DEFAULT_KLUSTER_BACKEND):
+    """
+    Get a cluster finding backend.
+
+    @param [in] name The name of the backend ("auto" for the fastest available).
+    @returns The backend function.
+    """
+
+    if name == "auto":
+        name = [b for b in AUTO_KLUSTER_BACKENDS if b in KLUSTER_BACKENDS][0]
+        lg.debug(" * Using the '%s' cluster finding backend." % (name))
+
+    if name not in KLUSTER_BACKENDS:
+        raise IOError("BAD_KLUSTER_BACKEND")
+
+    return KLUSTER_BACKENDS[name]
@@ -10,64 +10,252 @@ import logging as lg
 # Import the JSON library.
 import json
 
+#...for the MATH.
+import numpy as np
+
+## The cluster property columns (JSON key, NumPy type).
+KLUSTER_COLUMNS = [
+    ("size",          np.int32),
+    ("xmin",          np.float64),
+    ("xmax",          np.float64),
+    ("ymin",          np.float64),
+    ("ymax",          np.float64),
+    ("width",         np.float64),
+    ("height",        np.float64),
+    ("x_uw",          np.float64),
+    ("y_uw",          np.float64),
+    ("radius_uw",     np.float64),
+    ("density_uw",    np.float64),
+    ("totalcounts",   np.int64),
+    ("maxcounts",     np.float64),
+    ("lin_m",         np.float64),
+    ("lin_c",         np.float64),
+    ("lin_sumofres",  np.float64),
+    ("lin_linearity", np.float64),
+    ("n_edgepixels",  np.int32),
+    ("edgefrac",      np.float64),
+    ("innerfrac",     np.float64),
+    ("isedgekluster", np.bool_),
+    ("totalenergy",   np.float64),
+    ("maxenergy",     np.float64)
+    ]
+
+## The default values of the columns missing from older files.
+KLUSTER_COLUMN_DEFAULTS = {"totalenergy" : 0.0, "maxenergy" : 0.0}
+
+## The number of clusters converted to columns at a time.
+DEFAULT_KLUSTER_CHUNK_SIZE = 65536
+
+## The number of characters read from the JSON file at a time.
+DEFAULT_JSON_BLOCK_SIZE = 1024 * 1024
+
+def iterKlusterJson(jsonpath, blocksize=DEFAULT_JSON_BLOCK_SIZE):
+    """
+    Iterate over the clusters in a cluster JSON file without loading it all.
+
+    The file must contain a JSON array of objects (as written by
+    process-datasets.py). The objects are decoded one at a time from
+    blocks of the file.
+
+    @param [in] jsonpath The path to the cluster JSON file.
+    @param [in] blocksize The number of characters to read at a time.
+    """
+
+    ## The JSON decoder.
+    decoder = json.JSONDecoder()
+
+    with open(jsonpath, "r") as kf:
+
+        ## The text read but not yet decoded.
+        buf = ""
+
+        ## The position in the buffer.
+        pos = 0
+
+        ## Has the opening bracket of the array been found?
+        started = False
+
+        while True:
+
+            # Skip the whitespace and separators, reading more if needed.
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf):
+                    break
+                block = kf.read(blocksize)
+                if not block:
+                    raise IOError("BAD_KLUSTER_JSON")
+                buf = block; pos = 0
+
+            if not started:
+                if buf[pos] != "[":
+                    raise IOError("BAD_KLUSTER_JSON")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                k, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # The object runs past the end of the buffer.
+                block = kf.read(blocksize)
+                if not block:
+                    raise IOError("BAD_KLUSTER_JSON")
+                buf = buf[pos:] + block; pos = 0
+                continue
+
+            yield k
+
+            pos = end
+
+def getKlusterColumns(klusters, chunksize=DEFAULT_KLUSTER_CHUNK_SIZE):
+    """
+    Convert clusters (property dictionaries) to arrays, one per property.
+
+    @param [in] klusters An iterable of cluster property dictionaries.
+    @param [in] chunksize The number of clusters to convert at a time.
+    @returns A dictionary of the columns {name:array}.
+    """
+
+    ## The converted chunks of each column {name:[array]}.
+    chunks = dict([(name, []) for name, dtype in KLUSTER_COLUMNS])
+
+    ## The clusters waiting to be converted.
+    pending = []
+
+    def convert():
+        for name, dtype in KLUSTER_COLUMNS:
+            default = KLUSTER_COLUMN_DEFAULTS.get(name)
+            chunks[name].append(np.array([k.get(name, default) for k in pending], dtype=dtype))
+        del pending[:]
+
+    for k in klusters:
+        pending.append(k)
+        if len(pending) == chunksize:
+            convert()
+
+    if len(pending) > 0 or len(chunks["size"]) == 0:
+        convert()
+
+    return dict([(name, np.concatenate(chunks[name])) for name, dtype in KLUSTER_COLUMNS])
+
+def getCachePath(jsonpath):
+    """ The path to the (columnar) cache of a cluster JSON file. """
+    return os.path.splitext(jsonpath)[0] + ".npz"
+
+def readKlusterColumns(jsonpath, usecache=False):
+    """
+    Read the cluster property columns from a cluster JSON file.
+
+    @param [in] jsonpath The path to the cluster JSON file.
+    @param [in] usecache Read from (or write) a columnar .npz cache of the JSON.
+    @returns A dictionary of the columns {name:array}.
+    """
+
+    ## The path to the cache.
+    cachepath = getCachePath(jsonpath)
+
+    if usecache and os.path.exists(cachepath) and \
+        os.path.getmtime(cachepath) >= os.path.getmtime(jsonpath):
+        with np.load(cachepath) as npz:
+            if set(npz.files) == set([name for name, dtype in KLUSTER_COLUMNS]):
+                lg.info(" * Reading the cluster properties from the cache '%s'." % (cachepath))
+                return dict([(name, npz[name]) for name in npz.files])
+
+    columns = getKlusterColumns(iterKlusterJson(jsonpath))
+
+    if usecache:
+        try:
+            np.savez(cachepath, **columns)
+            lg.info(" * Cached the cluster properties to '%s'." % (cachepath))
+        except (IOError, OSError):
+            lg.info(" * Couldn't write the cluster property cache '%s'." % (cachepath))
+
+    return columns
+
 class KlusterProperties:
-    """ A wrapper class for cluster properties. """
+    """
+    A wrapper class for cluster properties.
+
+    The properties are held as NumPy arrays (one per property). By
+    default the edge clusters are left out.
+    """
 
-    def __init__(self, jsonpath):
-        """ Constructor. """
+    def __init__(self, jsonpath, includeedges=False, usecache=False, columns=None):
+        """
+        Constructor.
+
+        @param [in] jsonpath Path to the cluster JSON file.
+        @param [in] includeedges Include the clusters on the edge of the frame?
+        @param [in] usecache Read from (or write) a columnar .npz cache of the JSON.
+        @param [in] columns The property arrays to use instead of reading the file (optional).
+        """
 
         ## Path to the cluster JSON file.
         self.__json_path = jsonpath
-        #
-        if not os.path.exists(self.__json_path):
-            raise IOError("* ERROR: '%s' does not exist!" % (self.__json_path))
 
-        kf = open(self.__json_path, "r")
+        if columns is None:
 
-        ## The cluster JSON.
-        self.__json = json.load(kf)
+            if not os.path.exists(self.__json_path):
+                raise IOError("* ERROR: '%s' does not exist!" % (self.__json_path))
 
-        kf.close()
+            lg.info(" *")
+            lg.info(" * Initialising KlusterProperties object from '%s'." % (self.__json_path))
+            lg.info(" *")
 
-        lg.info(" *")
-        lg.info(" * Initialising KlusterProperties object from '%s'." % (self.__json_path))
-        lg.info(" *")
+            columns = readKlusterColumns(self.__json_path, usecache)
 
-        # Get the cluster properties.
+        if not includeedges:
+            ## The clusters to keep.
+            keep = ~columns["isedgekluster"]
+            columns = dict([(name, col[keep]) for name, col in columns.iteritems()])
 
-        ## The list of clusters.
-        self.__klusters = []
+        ## The cluster property arrays {name:array}.
+        self.__columns = columns
 
-        # Create container lists for the cluster properties.
-        self.__cluster_size      = []
-        self.__cluster_counts    = []
-        self.__cluster_maxcounts = []
-        self.__cluster_radius_u  = []
-        self.__cluster_density_u = []
-        self.__cluster_linearity = []
-        self.__cluster_innerfrac = []
+    def get_number_of_klusters(self):
+        return len(self.__columns["size"])
 
-        # Loop over the klusters.
-        for k in self.__json:
+    def get_column_names(self):
+        return [name for name, dtype in KLUSTER_COLUMNS]
 
-            # Add to the cluster property dictionaries.
-            if not k["isedgekluster"]:
-                self.__cluster_size.append(     k["size"])
-                self.__cluster_radius_u.append( k["radius_uw"])
-                self.__cluster_density_u.append(k["density_uw"])
-                self.__cluster_linearity.append(k["lin_linearity"])
-                self.__cluster_innerfrac.append(k["innerfrac"])
-                self.__cluster_counts.append(   k["totalcounts"])
-                self.__cluster_maxcounts.append(k["maxcounts"])
+    def get_column(self, name):
+        """ The array of a cluster property (not a copy). """
+        if name not in self.__columns:
+            raise KeyError("BAD_COLUMN")
+        return self.__columns[name]
 
-    def get_number_of_klusters(self):
-        return len(self.__cluster_size)
+    def get_subset(self, mask):
+        """
+        Get the clusters selected by a boolean mask (or index array).
+
+        @param [in] mask The mask, e.g. kp.get_column("size") > 4.
+        @returns A new KlusterProperties object.
+        """
+        return KlusterProperties(self.__json_path, includeedges=True, \
+            columns=dict([(name, col[mask]) for name, col in self.__columns.iteritems()]))
 
     def get_cluster_size_list(self):
-        return self.__cluster_size
+        return self.__columns["size"]
 
     def get_cluster_radius_u_list(self):
-        return self.__cluster_radius_u
+        return self.__columns["radius_uw"]
+
+    def get_cluster_density_u_list(self):
+        return self.__columns["density_uw"]
 
     def get_cluster_linearity_list(self):
-        return self.__cluster_linearity
+        return self.__columns["lin_linearity"]
+
+    def get_cluster_innerfrac_list(self):
+        return self.__columns["innerfrac"]
+
+    def get_cluster_counts_list(self):
+        return self.__columns["totalcounts"]
+
+    def get_cluster_maxcounts_list(self):
+        return self.__columns["maxcounts"]
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Timing and counting instrumentation for processing CERN@school datasets.
+"""
+
+#...for the operating system commands (and the CPU times).
+import os
+
+#...for the wall clock.
+import time
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for timing the stages with a "with" statement.
+from contextlib import contextmanager
+
+## The processing stages that are timed (in order).
+PROCESSING_STAGES = ["parse", "cluster", "properties", "render", "write"]
+
+## The quantities that are counted.
+PROCESSING_COUNTERS = ["frames", "pixels", "clusters", "gammas"]
+
+def getCpuTime():
+    """ Get the user + system CPU time used by this process [s]. """
+    t = os.times()
+    return t[0] + t[1]
+
+class ProcessingMetrics:
+    """
+    Wrapper class for the timing and counting of a processing run.
+
+    The wall and CPU times are accumulated separately for each stage,
+    so a stage may be entered and left many times (e.g. once per frame).
+    """
+
+    def __init__(self, name):
+        """
+        Constructor.
+
+        @param [in] name The name of the thing being processed (e.g. the data point).
+        """
+
+        ## The name of the run.
+        self.__name = name
+
+        ## The cumulative wall time for each stage [s].
+        self.__wall = {}
+
+        ## The cumulative CPU time for each stage [s].
+        self.__cpu = {}
+
+        for stage in PROCESSING_STAGES:
+            self.__wall[stage] = 0.0
+            self.__cpu[stage]  = 0.0
+
+        ## The counters.
+        self.__counts = {}
+
+        for counter in PROCESSING_COUNTERS:
+            self.__counts[counter] = 0
+
+        ## The wall time at which the metrics were created.
+        self.__wall_start = time.time()
+
+        ## The CPU time at which the metrics were created.
+        self.__cpu_start = getCpuTime()
+
+    @contextmanager
+    def stage(self, stage):
+        """ Time the enclosed block and add it to the stage totals. """
+
+        if stage not in self.__wall:
+            raise KeyError("BAD_STAGE")
+
+        wall_0 = time.time(); cpu_0 = getCpuTime()
+        try:
+            yield
+        finally:
+            self.__wall[stage] += time.time() - wall_0
+            self.__cpu[stage]  += getCpuTime() - cpu_0
+
+    def moveTime(self, fromstage, tostage, wall, cpu):
+        """
+        Move some of the time recorded for one stage to another.
+
+        For when part of a timed block (e.g. the cluster properties
+        worked out while finding the clusters) belongs to another stage.
+
+        @param [in] fromstage The stage the time was recorded for.
+        @param [in] tostage The stage the time belongs to.
+        @param [in] wall The wall time to move [s].
+        @param [in] cpu The CPU time to move [s].
+        """
+
+        if fromstage not in self.__wall or tostage not in self.__wall:
+            raise KeyError("BAD_STAGE")
+
+        self.__wall[fromstage] -= wall; self.__wall[tostage] += wall
+        self.__cpu[fromstage]  -= cpu;  self.__cpu[tostage]  += cpu
+
+    def increment(self, counter, n=1):
+        """ Add n to the named counter. """
+        if counter not in self.__counts:
+            raise KeyError("BAD_COUNTER")
+        self.__counts[counter] += n
+
+    def getName(self):
+        return self.__name
+
+    def getWallTime(self, stage):
+        return self.__wall[stage]
+
+    def getCpuTime(self, stage):
+        return self.__cpu[stage]
+
+    def getCount(self, counter):
+        return self.__counts[counter]
+
+    def getTotalWallTime(self):
+        """ The wall time since the metrics were created [s]. """
+        return time.time() - self.__wall_start
+
+    def getTotalCpuTime(self):
+        """ The CPU time since the metrics were created [s]. """
+        return getCpuTime() - self.__cpu_start
+
+    def getFrameRate(self):
+        """ The number of frames processed per second (wall time). """
+        total = self.getTotalWallTime()
+        if total <= 0.0:
+            return 0.0
+        return float(self.__counts["frames"]) / total
+
+    def getJson(self):
+        """ Get the metrics as a JSON-friendly dictionary. """
+
+        stages = {}
+        for stage in PROCESSING_STAGES:
+            stages[stage] = {"wall" : self.__wall[stage], "cpu" : self.__cpu[stage]}
+
+        return {
+            "name"       : self.__name,
+            "stages"     : stages,
+            "counts"     : dict(self.__counts),
+            "total_wall" : self.getTotalWallTime(),
+            "total_cpu"  : self.getTotalCpuTime(),
+            "frame_rate" : self.getFrameRate()
+            }
+
+    def writeJson(self, path):
+        """ Write the metrics to a JSON file. """
+        with open(path, "w") as mf:
+            json.dump(self.getJson(), mf, indent=2, sort_keys=True)
+
+    def getSummaryLines(self, framerate=True):
+        """
+        Get a human-readable summary of the metrics as a list of lines.
+
+        @param [in] framerate Include the frame rate (not for hit streams, which have no frames)?
+        """
+
+        total_wall = self.getTotalWallTime()
+
+        ls = []
+        ls.append("* Metrics for '%s':" % (self.__name))
+        ls.append("*--> | %-10s | %10s | %10s | %6s |" % ("Stage", "Wall [s]", "CPU [s]", "Wall %"))
+        for stage in PROCESSING_STAGES:
+            pc = 0.0
+            if total_wall > 0.0:
+                pc = 100.0 * self.__wall[stage] / total_wall
+            ls.append("*--> | %-10s | %10.3f | %10.3f | %6.1f |" % \
+                (stage, self.__wall[stage], self.__cpu[stage], pc))
+        ls.append("*--> | %-10s | %10.3f | %10.3f | %6s |" % \
+            ("total", total_wall, self.getTotalCpuTime(), ""))
+        for counter in PROCESSING_COUNTERS:
+            ls.append("*--> Number of %-8s = % 10d" % (counter, self.__counts[counter]))
+        if framerate:
+            ls.append("*--> Throughput         = % 10.2f [frames/s]" % (self.getFrameRate()))
+        return ls
+
+    def logSummary(self, framerate=True):
+        """ Write the summary to the log. """
+        for l in self.getSummaryLines(framerate):
+            lg.info(" %s" % (l))
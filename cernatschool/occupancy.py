@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Pixel occupancy maps for CERN@school Timepix datasets.
+
+The maps count, for each pixel, the number of frames in which the pixel
+was hit and the sum of its count values over all of the frames. Maps
+made from different parts of a dataset (e.g. by different processes)
+can be merged by simply adding them together. Noisy (hot) pixels are
+found from the map and can be written to a pixel mask file.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the HELPING.
+from helpers import getPixelArrays
+
+## The default maximum fraction of frames a (good) pixel is hit in.
+DEFAULT_MAX_HIT_FRACTION = 0.5
+
+## The default maximum number of hits of a (good) pixel, relative to the mean of the hit pixels.
+DEFAULT_MAX_HIT_FACTOR = 20.0
+
+## The default number of data files read before the maps are updated.
+DEFAULT_OCCUPANCY_BATCH = 256
+
+def readMaskFile(maskpath, width=256):
+    """
+    Read a pixel mask file (one tab-separated x and y per line).
+
+    @param [in] maskpath The path to the mask file.
+    @param [in] width The frame width [pixels].
+    @returns The pixel mask {X:1}.
+    """
+
+    with open(maskpath, "r") as mpf:
+        return getMaskFromLines(mpf.readlines(), width)
+
+def getMaskFromLines(rows, width=256):
+    """
+    Get the pixel mask from the lines of a pixel mask file.
+
+    @param [in] rows The lines of the mask file.
+    @param [in] width The frame width [pixels].
+    @returns The pixel mask {X:1}.
+    """
+
+    ## The pixel mask.
+    pixel_mask = {}
+
+    for row in rows:
+        if row.strip() == "":
+            continue
+        vals = [int(val) for val in row.strip().split("\t")]
+        x = vals[0]; y = vals[1]; X = (width*y) + x; C = 1
+        pixel_mask[X] = C
+
+    return pixel_mask
+
+def writeMaskFile(maskpath, pixels, width=256):
+    """
+    Write a pixel mask file (one tab-separated x and y per line).
+
+    @param [in] maskpath The path to the mask file.
+    @param [in] pixels The pixel X values to mask.
+    @param [in] width The frame width [pixels].
+    """
+
+    with open(maskpath, "w") as mpf:
+        for X in sorted(set(pixels)):
+            mpf.write("%d\t%d\n" % (X % width, X / width))
+
+class OccupancyMap:
+    """ Wrapper class for the pixel occupancy maps of a dataset. """
+
+    def __init__(self, width=256, height=256, hits=None, counts=None, nframes=0):
+        """
+        Constructor.
+
+        @param [in] width The frame width [pixels].
+        @param [in] height The frame height [pixels].
+        @param [in] hits The initial hit map (optional).
+        @param [in] counts The initial summed count map (optional).
+        @param [in] nframes The number of frames in the initial maps.
+        """
+
+        ## The frame width [pixels].
+        self.__width = width
+
+        ## The frame height [pixels].
+        self.__height = height
+
+        ## The number of frames each pixel was hit in (indexed by X).
+        self.__hits = np.zeros(width * height, dtype=np.uint32)
+        #
+        if hits is not None:
+            self.__hits[:] = np.ravel(hits)
+
+        ## The summed count values of each pixel (indexed by X).
+        self.__counts = np.zeros(width * height, dtype=np.uint32)
+        #
+        if counts is not None:
+            self.__counts[:] = np.ravel(counts)
+
+        ## The number of frames added to the maps.
+        self.__nframes = nframes
+
+    def getWidth(self):
+        return self.__width
+
+    def getHeight(self):
+        return self.__height
+
+    def getNumberOfFrames(self):
+        return self.__nframes
+
+    def getHits(self):
+        return self.__hits
+
+    def getCounts(self):
+        return self.__counts
+
+    def getHitMap(self):
+        """ The number of hits of each pixel as a (height, width) array. """
+        return self.__hits.reshape(self.__height, self.__width)
+
+    def getCountMap(self):
+        """ The summed count values of each pixel as a (height, width) array. """
+        return self.__counts.reshape(self.__height, self.__width)
+
+    def addPixels(self, X, C, nframes=1):
+        """
+        Add the pixels from one or more frames to the maps.
+
+        @param [in] X The array of pixel X values (each pixel once per frame).
+        @param [in] C The array of pixel count values.
+        @param [in] nframes The number of frames the pixels came from.
+        """
+
+        n = self.__width * self.__height
+
+        X = np.asarray(X, dtype=np.intp)
+
+        if len(X) > 0 and (X.min() < 0 or X.max() >= n):
+            raise IOError("BAD_PIXEL")
+
+        self.__hits += np.bincount(X, minlength=n).astype(np.uint32)
+
+        self.__counts += np.bincount(X, weights=C, minlength=n).astype(np.uint32)
+
+        self.__nframes += nframes
+
+    def addFrame(self, f):
+        """ Add a frame (see frame.Frame) to the maps. """
+
+        ## The frame pixel X values and counts.
+        X, C = f.getPayload().getArrays()
+
+        self.addPixels(X.astype(np.intp), C.astype(np.float64))
+
+    def addDataFiles(self, paths, dataformat, batchsize=DEFAULT_OCCUPANCY_BATCH):
+        """
+        Add the frames from Timepix data files to the maps.
+
+        The files are read in batches, with the maps updated once per batch.
+
+        @param [in] paths The paths to the data files.
+        @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+        @param [in] batchsize The number of data files to read per batch.
+        """
+
+        for first in range(0, len(paths), batchsize):
+
+            ## The pixel arrays from the data files in the batch.
+            arrays = [getPixelArrays(fn, dataformat, self.__width, self.__height) \
+                for fn in paths[first:first + batchsize]]
+
+            if len(arrays) == 0:
+                continue
+
+            self.addPixels(np.concatenate([X for X, C in arrays]), \
+                           np.concatenate([C for X, C in arrays]), nframes=len(arrays))
+
+            lg.debug(" * Added %d data files to the occupancy map." % (len(arrays)))
+
+    def merge(self, other):
+        """ Add the maps of another occupancy map (of the same size) to these. """
+
+        if other.getWidth() != self.__width or other.getHeight() != self.__height:
+            raise IOError("OCCUPANCY_MISMATCH")
+
+        self.__hits += other.getHits()
+
+        self.__counts += other.getCounts()
+
+        self.__nframes += other.getNumberOfFrames()
+
+    def getHitFractions(self):
+        """ The fraction of the frames each pixel was hit in. """
+        if self.__nframes == 0:
+            return np.zeros(len(self.__hits))
+        return self.__hits / float(self.__nframes)
+
+    def getNoisyPixels(self, maxfraction=DEFAULT_MAX_HIT_FRACTION, maxfactor=DEFAULT_MAX_HIT_FACTOR):
+        """
+        Find the noisy (hot) pixels.
+
+        A pixel is noisy if it was hit in more than maxfraction of the
+        frames, or hit more than maxfactor times as often as the mean
+        of all of the pixels that were hit.
+
+        @param [in] maxfraction The maximum fraction of frames a pixel is hit in.
+        @param [in] maxfactor The maximum number of hits relative to the mean.
+        @returns The array of the noisy pixel X values (sorted).
+        """
+
+        ## The pixels that were hit.
+        hit = self.__hits > 0
+
+        if not hit.any():
+            return np.zeros(0, dtype=np.intp)
+
+        ## The mean number of hits of the pixels that were hit.
+        meanhits = self.__hits[hit].mean()
+
+        noisy = (self.getHitFractions() > maxfraction) | (self.__hits > maxfactor * meanhits)
+
+        lg.debug(" * Found %d noisy pixels (mean hits = %f)." % (noisy.sum(), meanhits))
+
+        return np.flatnonzero(noisy)
+
+    def save(self, path):
+        """ Save the maps to a (compressed) .npz file. """
+        np.savez_compressed(path, hits=self.getHitMap(), counts=self.getCountMap(), \
+            nframes=self.__nframes)
+
+def loadOccupancyMap(path):
+    """ Load an occupancy map from a .npz file (see OccupancyMap.save). """
+
+    with np.load(path) as npz:
+
+        height, width = npz["hits"].shape
+
+        return OccupancyMap(width, height, npz["hits"], npz["counts"], int(npz["nframes"]))
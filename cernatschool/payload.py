@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The frame payloads - the hit pixels of a frame.
+
+A pixel map dictionary {X:C} is fine for the sparse frames of the
+supplied datasets, but takes around a hundred bytes per pixel and is
+slow to build for busy frames. A FramePayload stores the pixels either
+as sparse arrays (sorted X values and counts) or as a dense 2-D array
+of counts, whichever takes less memory for the frame's occupancy:
+
+* sparse - 4 (X) + 2 (C) bytes per hit pixel;
+* dense  - 2 bytes per pixel, hit or not.
+
+The pixel map dictionary is only made if something asks for it.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+## The occupancy above which the dense array takes less memory than the sparse arrays.
+DENSE_OCCUPANCY = 1.0 / 3.0
+
+## The data type of the pixel X values.
+X_DTYPE = np.int32
+
+## The data type of the pixel counts (the Timepix counter is 14 bits).
+C_DTYPE = np.uint16
+
+def readPayloadValues(fn):
+    """ Read the (whitespace separated) integer values of a data file. """
+    with open(fn, "r") as f:
+        return getPayloadValues(f.read())
+
+def getPayloadValues(text):
+    """ Get the (whitespace separated) integer values from a data file's contents. """
+
+    vals = np.fromstring(text, dtype=np.int64, sep=" ")
+
+    ## The values as written.
+    tokens = text.split()
+
+    # fromstring stops (quietly) at the first value it can't read -
+    # or, for the last value, part of the way through it.
+    if len(vals) != len(tokens):
+        raise IOError("FRAME_BAD_FORMAT")
+    #
+    try:
+        if len(tokens) > 0 and int(tokens[-1]) != vals[-1]:
+            raise IOError("FRAME_BAD_FORMAT")
+    except ValueError:
+        raise IOError("FRAME_BAD_FORMAT")
+
+    return vals
+
+def getPayloadRows(vals, ncols):
+    """ Split the values of a data file into rows (of x, y and C, say). """
+    if len(vals) % ncols != 0:
+        raise IOError("FRAME_BAD_FORMAT")
+    return vals.reshape(-1, ncols)
+
+class FramePayload:
+    """
+    Wrapper class for the hit pixels of a frame (sparse or dense).
+    """
+
+    def __init__(self, width=256, height=256, X=None, C=None, dense=None, threshold=DENSE_OCCUPANCY):
+        """
+        Constructor.
+
+        Supply either the sparse arrays (X and C) or the dense array.
+        The payload is converted to the other representation if that
+        is cheaper for the frame's occupancy. Arrays that are already of
+        the right type (and sorted, for X) aren't copied.
+
+        @param [in] width The frame width [pixels].
+        @param [in] height The frame height [pixels].
+        @param [in] X The array of pixel X values.
+        @param [in] C The array of pixel counts.
+        @param [in] dense The 2-D array (height x width) of pixel counts.
+        @param [in] threshold The occupancy above which the dense array is used.
+        """
+
+        ## The frame width [pixels].
+        self.__width = width
+
+        ## The frame height [pixels].
+        self.__height = height
+
+        ## The sparse pixel X values (sorted) - None if dense.
+        self.__X = None
+
+        ## The sparse pixel counts - None if dense.
+        self.__C = None
+
+        ## The dense pixel counts (height x width) - None if sparse.
+        self.__dense = None
+
+        ## The number of hit pixels.
+        self.__n = 0
+
+        if dense is not None:
+
+            dense = np.asarray(dense).reshape(height, width).astype(C_DTYPE, copy=False)
+
+            self.__n = np.count_nonzero(dense)
+
+            if self.__n >= threshold * width * height:
+                self.__dense = dense
+            else:
+                self.__X = np.flatnonzero(dense).astype(X_DTYPE)
+                self.__C = dense.ravel()[self.__X]
+
+        else:
+
+            X = np.asarray(X if X is not None else [], dtype=X_DTYPE)
+            C = np.asarray(C if C is not None else [], dtype=C_DTYPE)
+
+            if len(X) != len(C):
+                raise IOError("BAD_PAYLOAD")
+
+            # Keep the pixels in X order (and only the hit ones).
+            if len(X) > 1 and np.any(X[1:] < X[:-1]):
+                order = np.argsort(X, kind="mergesort")
+                X = X[order]; C = C[order]
+            # A pixel that's listed twice keeps its last count (as the pixel map would).
+            if len(X) > 1 and np.any(X[1:] == X[:-1]):
+                last = np.append(X[1:] != X[:-1], True)
+                X = X[last]; C = C[last]
+            if np.any(C == 0):
+                X = X[C > 0]; C = C[C > 0]
+
+            self.__n = len(X)
+
+            if self.__n >= threshold * width * height:
+                self.__dense = np.zeros((height, width), dtype=C_DTYPE)
+                self.__dense.ravel()[X] = C
+            else:
+                self.__X = X; self.__C = C
+
+    def getWidth(self):
+        return self.__width
+
+    def getHeight(self):
+        return self.__height
+
+    def isDense(self):
+        return self.__dense is not None
+
+    def getNumberOfPixels(self):
+        """ The number of hit pixels. """
+        return self.__n
+
+    def getOccupancy(self):
+        """ The fraction of the pixels that are hit. """
+        return float(self.__n) / float(self.__width * self.__height)
+
+    def getArrays(self):
+        """ The (sorted) pixel X values and counts. """
+        if self.__dense is not None:
+            X = np.flatnonzero(self.__dense).astype(X_DTYPE)
+            return X, self.__dense.ravel()[X]
+        return self.__X, self.__C
+
+    def getDense(self):
+        """ The 2-D (height x width) array of pixel counts (not a copy if the payload is dense). """
+        if self.__dense is not None:
+            return self.__dense
+        dense = np.zeros((self.__height, self.__width), dtype=C_DTYPE)
+        dense.ravel()[self.__X] = self.__C
+        return dense
+
+    def getCounts(self, X):
+        """
+        Get the counts of some (hit) pixels.
+
+        @param [in] X The pixel X values.
+        @returns The array of the pixel counts.
+        """
+        if self.__dense is not None:
+            return self.__dense.ravel()[X]
+        return self.__C[np.searchsorted(self.__X, X)]
+
+    def getPixelMap(self):
+        """ The pixel map dictionary {X:C}. """
+        X, C = self.getArrays()
+        return dict(zip(X.tolist(), C.tolist()))
+
+    def mask(self, maskdict):
+        """
+        Remove the masked pixels.
+
+        @param [in] maskdict The pixel mask {X:1} (or any collection of X values).
+        @returns The payload without the masked pixels (the same payload if nothing is masked).
+        """
+
+        if maskdict is None or len(maskdict) == 0:
+            return self
+
+        ## The masked pixel X values.
+        masked = np.fromiter(maskdict, dtype=np.int64, count=len(maskdict))
+        #
+        masked = masked[(masked >= 0) & (masked < self.__width * self.__height)]
+
+        if self.__dense is not None:
+            dense = self.__dense.copy()
+            dense.ravel()[masked] = 0
+            return FramePayload(self.__width, self.__height, dense=dense)
+
+        keep = ~np.in1d(self.__X, masked)
+
+        if np.all(keep):
+            return self
+
+        return FramePayload(self.__width, self.__height, self.__X[keep], self.__C[keep])
+
+def getPayloadFromPixelMap(pixelmap, width=256, height=256, threshold=DENSE_OCCUPANCY):
+    """ Make a payload from a pixel map {X:C}. """
+    X = np.fromiter(pixelmap.iterkeys(), dtype=X_DTYPE, count=len(pixelmap))
+    C = np.fromiter(pixelmap.itervalues(), dtype=C_DTYPE, count=len(pixelmap))
+    return FramePayload(width, height, X, C, threshold=threshold)
+
+def getPayloadFromDataFile(fn, dataformat, width=256, height=256, threshold=DENSE_OCCUPANCY):
+    """
+    Read a payload from a Timepix data file.
+
+    The ASCII matrix files are read straight into the dense array.
+
+    @param [in] fn The path to the data file.
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] threshold The occupancy above which the dense array is used.
+    """
+
+    return getPayloadFromValues(readPayloadValues(fn), dataformat, width, height, threshold)
+
+def getPayloadFromString(text, dataformat, width=256, height=256, threshold=DENSE_OCCUPANCY):
+    """
+    Make a payload from the contents of a Timepix data file (e.g. read from an archive).
+
+    @param [in] text The data file contents.
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] threshold The occupancy above which the dense array is used.
+    """
+    return getPayloadFromValues(getPayloadValues(text), dataformat, width, height, threshold)
+
+def getPayloadFromValues(vals, dataformat, width=256, height=256, threshold=DENSE_OCCUPANCY):
+    """ Make a payload from the integer values of a data file. """
+
+    if   dataformat == 4114: # ASCII xyC.
+        vals = getPayloadRows(vals, 3)
+        return FramePayload(width, height, width * vals[:, 1] + vals[:, 0], vals[:, 2], threshold=threshold)
+    elif dataformat == 18: # ASCII matrix.
+        if len(vals) != width * height:
+            raise IOError("FRAME_BAD_FORMAT")
+        return FramePayload(width, height, dense=vals, threshold=threshold)
+    elif dataformat == 8210: # ASCII XC
+        vals = getPayloadRows(vals, 2)
+        return FramePayload(width, height, vals[:, 0], vals[:, 1], threshold=threshold)
+
+    raise IOError("FRAME_BAD_FORMAT")
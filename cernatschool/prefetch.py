@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Read-ahead (prefetching) of the files in a dataset.
+
+The files are read by a small pool of background threads while the
+caller works on the results already read, so that the (I/O bound) file
+reading overlaps with the (CPU bound) clustering. The number of items
+read ahead is bounded both by a queue depth and by a memory ceiling.
+"""
+
+# The usual suspects.
+import os, sys
+
+#...for the logging.
+import logging as lg
+
+#...for the background threads.
+import threading
+
+#...for the work queue.
+import Queue
+
+## The default number of items to read ahead.
+DEFAULT_PREFETCH_DEPTH = 8
+
+## The default number of reading threads.
+DEFAULT_PREFETCH_THREADS = 4
+
+## The default memory ceiling for the items read ahead [MB].
+DEFAULT_PREFETCH_MB = 64
+
+def getFileSize(path):
+    """ The size of a file [bytes] (zero if it can't be found). """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class Prefetcher:
+    """
+    Wrapper class for reading items ahead of their use.
+
+    Iterating over the prefetcher yields loader(item) for each item,
+    in the order the items were supplied. At most 'depth' items are
+    read (or being read) ahead of the one being used, and no new item is
+    started if the estimated size of the items in hand would exceed the
+    memory ceiling (unless nothing else is in hand).
+    """
+
+    def __init__(self, loader, items, depth=DEFAULT_PREFETCH_DEPTH, \
+                 threads=DEFAULT_PREFETCH_THREADS, maxmb=DEFAULT_PREFETCH_MB, sizer=None):
+        """
+        Constructor.
+
+        @param [in] loader The function that reads an item.
+        @param [in] items The list of items (e.g. file names) to read.
+        @param [in] depth The maximum number of items to read ahead.
+        @param [in] threads The number of reading threads.
+        @param [in] maxmb The memory ceiling for the items read ahead [MB].
+        @param [in] sizer A function estimating the size of an item [bytes] (optional).
+        """
+
+        if depth < 1:
+            raise ValueError("BAD_PREFETCH_DEPTH")
+
+        ## The function that reads an item.
+        self.__loader = loader
+
+        ## The items to read.
+        self.__items = list(items)
+
+        ## The maximum number of items read ahead.
+        self.__depth = depth
+
+        ## The number of reading threads.
+        self.__n_threads = max(1, min(threads, depth, len(self.__items)))
+
+        ## The memory ceiling [bytes].
+        self.__maxbytes = int(maxmb * 1024 * 1024)
+
+        ## The item size estimator.
+        self.__sizer = sizer
+
+        ## The maximum number of items in hand at any one time.
+        self.__max_in_hand = 0
+
+        ## The maximum estimated size of the items in hand [bytes].
+        self.__max_bytes_in_hand = 0
+
+    def getNumberOfItems(self):
+        return len(self.__items)
+
+    def getNumberOfThreads(self):
+        return self.__n_threads
+
+    def getMaxItemsInHand(self):
+        """ The largest number of items read (or being read) ahead at once. """
+        return self.__max_in_hand
+
+    def getMaxBytesInHand(self):
+        """ The largest estimated size of the items in hand at once [bytes]. """
+        return self.__max_bytes_in_hand
+
+    def __iter__(self):
+
+        ## The items waiting to be read (index, item).
+        tasks = Queue.Queue()
+
+        ## The results {index:(ok, result or exception info)}.
+        results = {}
+
+        ## For signalling that a result is ready.
+        ready = threading.Condition()
+
+        def work():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                i, item = task
+                try:
+                    r = (True, self.__loader(item))
+                except Exception:
+                    r = (False, sys.exc_info())
+                with ready:
+                    results[i] = r
+                    ready.notify()
+
+        ## The reading threads.
+        workers = [threading.Thread(target=work) for t in range(self.__n_threads)]
+        #
+        for w in workers:
+            w.daemon = True
+            w.start()
+
+        ## The estimated sizes of the items in hand {index:bytes}.
+        sizes = {}
+
+        ## The index of the next item to start reading.
+        n_started = 0
+
+        try:
+            for i in range(len(self.__items)):
+
+                # Start reading as many items as the limits allow.
+                while n_started < len(self.__items) and len(sizes) < self.__depth:
+
+                    size = 0
+                    if self.__sizer is not None:
+                        size = self.__sizer(self.__items[n_started])
+
+                    if len(sizes) > 0 and sum(sizes.values()) + size > self.__maxbytes:
+                        break
+
+                    sizes[n_started] = size
+                    tasks.put((n_started, self.__items[n_started]))
+                    n_started += 1
+
+                self.__max_in_hand = max(self.__max_in_hand, len(sizes))
+                self.__max_bytes_in_hand = max(self.__max_bytes_in_hand, sum(sizes.values()))
+
+                # Wait for the current item.
+                with ready:
+                    while i not in results:
+                        ready.wait()
+                    ok, r = results.pop(i)
+
+                del sizes[i]
+
+                if not ok:
+                    raise r[0], r[1], r[2]
+
+                yield r
+        finally:
+            # Stop the reading threads (once they've finished what they're doing).
+            for w in workers:
+                tasks.put(None)
+
+        lg.debug(" Prefetched %d items with %d threads (max. %d items, %d bytes in hand)." % \
+            (len(self.__items), self.__n_threads, self.__max_in_hand, self.__max_bytes_in_hand))
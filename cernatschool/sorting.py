@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The cluster sorting algorithm - which type of particle do we think
+might be associated with a given cluster?
+
+The clusters are the property dictionaries written by process-datasets.py
+(see helpers.getKlusterPropertiesJson). Change the algorithm here to
+change how sort-clusters.py sorts the clusters.
+"""
+
+#...for the MATH.
+import numpy as np
+
+#...for the data values.
+from datavals import TRIPIXEL_RADIUS, TETRAPIXEL_RADIUS
+
+## The cluster types.
+KLUSTER_TYPES = ["None", "Edge", "Alpha", "Beta", "Gamma"]
+
+def isEdgeKluster(k, width=256, height=256):
+    """ Is the cluster on the edge of the (width x height) frame? """
+    return k["xmin"] <= 0.1 or k["xmax"] >= width - 1.1 or k["ymin"] <= 0.1 or k["ymax"] >= height - 1.1
+
+def getKlusterType(k, width=256, height=256):
+    """
+    Get the type of a cluster.
+
+    @param [in] k The cluster properties dictionary.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns The cluster type (one of KLUSTER_TYPES).
+    """
+
+    # Check if the cluster is on the edge of the frame.
+    if isEdgeKluster(k, width, height):
+        return "Edge"
+
+    # Everything but gamma (or edge) is a beta (Strontium-90 data only!).
+    if   k['size'] == 1:
+        return "Gamma"
+    elif k['size'] == 2:
+        return "Gamma"
+    elif k['size'] == 3:
+        if k['radius_uw'] <= TRIPIXEL_RADIUS:
+            return "Gamma"
+        return "Beta"
+    elif k['size'] == 4:
+        if k['radius_uw'] <= TETRAPIXEL_RADIUS:
+            return "Gamma"
+        return "Beta"
+    return "Beta"
+
+def sortKlusters(kd, width=256, height=256):
+    """
+    Sort a list of clusters by type.
+
+    @param [in] kd The list of cluster properties dictionaries.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns A dictionary of the cluster types {id:type} and one of the number of each type {type:n}.
+    """
+
+    ## The cluster types {id:type}.
+    ks = {}
+
+    ## The number of clusters of each type {type:n}.
+    counts = dict([(typename, 0) for typename in KLUSTER_TYPES])
+
+    for k in kd:
+        ktype = getKlusterType(k, width, height)
+        ks[k["id"]] = ktype
+        counts[ktype] += 1
+
+    return ks, counts
+
+def getKlusterTypeIndices(columns, width=256, height=256):
+    """
+    Get the types of many clusters at once (the same rules as getKlusterType).
+
+    @param [in] columns The cluster property arrays {name:array} (see klusterhelpers).
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns An array of the indices of the cluster types in KLUSTER_TYPES.
+    """
+
+    size = columns["size"]; r = columns["radius_uw"]
+
+    ## The type indices (everything starts as a beta).
+    types = np.full(len(size), KLUSTER_TYPES.index("Beta"), dtype=np.int8)
+
+    ## Which clusters are gamma candidates?
+    gamma = (size <= 2) | ((size == 3) & (r <= TRIPIXEL_RADIUS)) | ((size == 4) & (r <= TETRAPIXEL_RADIUS))
+    #
+    types[gamma] = KLUSTER_TYPES.index("Gamma")
+
+    ## Which clusters are on the edge of the frame?
+    edge = (columns["xmin"] <= 0.1) | (columns["xmax"] >= width - 1.1) | \
+           (columns["ymin"] <= 0.1) | (columns["ymax"] >= height - 1.1)
+    #
+    types[edge] = KLUSTER_TYPES.index("Edge")
+
+    return types
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Timepix3 (data-driven) hit streams.
+
+Timepix3 detectors don't take frames - each hit pixel is read out
+straight away with its position, time of arrival (ToA) and time over
+threshold (ToT). The hits are read from the stream files in chunks
+and grouped into clusters of neighbouring (eight-way connected) hits
+that arrived within a time window of each other.
+
+The hits only need to be roughly in time order: a cluster is finished
+once the latest hit read is more than the window plus the allowed
+disorder later than the cluster's last hit. Only the hits of the
+unfinished clusters are kept between chunks, so the memory used
+depends on the hit rate and the window, not on the length of the run.
+
+The ToA values are in nanoseconds.
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for reading the files in chunks.
+from itertools import islice
+
+#...for the MATH.
+import numpy as np
+
+#...for the data values.
+from datavals import STREAM_FILE_TYPES
+
+#...for the union-find.
+from klusterbackends import getRoots
+
+#...for the pixels.
+from pixel import Pixel
+
+#...for the clusters.
+from kluster import Kluster
+
+#...for the cluster properties.
+from helpers import getKlusterPropertiesJson
+
+## The default number of hits read from a stream file at a time.
+DEFAULT_HIT_CHUNK = 100000
+
+## The default time window for joining neighbouring hits [ns].
+DEFAULT_TOA_WINDOW = 200.0
+
+## The default allowed disorder of the hit ToA values in the stream [ns].
+DEFAULT_TOA_DISORDER = 1000.0
+
+## The length of a t3pa ToA clock tick [ns] (40 MHz).
+T3PA_TOA_TICK = 25.0
+
+## The length of a t3pa fine ToA (FToA) clock tick [ns] (640 MHz).
+T3PA_FTOA_TICK = 1.5625
+
+def isStreamHeader(l):
+    """ Is the line a comment or column header (rather than a hit)? """
+    return l.startswith("#") or l.startswith("Index")
+
+def getStreamFormat(fn):
+    """
+    Get the format of a hit stream file (see STREAM_FILE_TYPES).
+
+    @param [in] fn The path to the stream file.
+    @returns The stream format ("xytt" or "t3pa").
+    """
+
+    with open(fn, "r") as f:
+        for l in f:
+
+            l = l.strip()
+
+            if l.startswith("Index"):
+                lg.debug(" *--> This is a %s file." % (STREAM_FILE_TYPES["t3pa"]))
+                return "t3pa"
+
+            if l == "" or l.startswith("#"):
+                continue
+
+            ## The number of values on the first hit line.
+            nvals = len(l.split())
+
+            if nvals == 4:
+                lg.debug(" *--> This is a %s file." % (STREAM_FILE_TYPES["xytt"]))
+                return "xytt"
+            elif nvals == 6:
+                lg.debug(" *--> This is a %s file." % (STREAM_FILE_TYPES["t3pa"]))
+                return "t3pa"
+
+            break
+
+    raise IOError("STREAM_BAD_FORMAT")
+
+def getHitValues(text):
+    """ Get the (whitespace separated) values from some of a stream file's hit lines. """
+
+    vals = np.fromstring(text, dtype=np.float64, sep=" ")
+
+    ## The values as written.
+    tokens = text.split()
+
+    # fromstring stops (quietly) at the first value it can't read -
+    # or, for the last value, part of the way through it.
+    if len(vals) != len(tokens):
+        raise IOError("STREAM_BAD_FORMAT")
+    #
+    try:
+        if len(tokens) > 0 and float(tokens[-1]) != vals[-1]:
+            raise IOError("STREAM_BAD_FORMAT")
+    except ValueError:
+        raise IOError("STREAM_BAD_FORMAT")
+
+    return vals
+
+def iterHitChunks(fn, streamformat=None, chunksize=DEFAULT_HIT_CHUNK, width=256):
+    """
+    Read the hits of a stream file a chunk at a time.
+
+    @param [in] fn The path to the stream file.
+    @param [in] streamformat The stream format (found from the file if not given).
+    @param [in] chunksize The number of hits (lines) to read at a time.
+    @param [in] width The frame width [pixels].
+    @returns A generator of the chunks' hit pixel X, ToA [ns] and ToT arrays.
+    """
+
+    if streamformat is None:
+        streamformat = getStreamFormat(fn)
+
+    if streamformat not in STREAM_FILE_TYPES:
+        raise IOError("STREAM_BAD_FORMAT")
+
+    ## The number of values per hit.
+    ncols = 4 if streamformat == "xytt" else 6
+
+    with open(fn, "r") as f:
+
+        ## Is this the first chunk (which may start with the headers)?
+        first = True
+
+        while True:
+
+            lines = list(islice(f, chunksize))
+
+            if len(lines) == 0:
+                break
+
+            if first:
+                lines = [l for l in lines if not isStreamHeader(l.strip())]
+                first = False
+
+            vals = getHitValues("".join(lines))
+
+            if len(vals) % ncols != 0:
+                raise IOError("STREAM_BAD_FORMAT")
+
+            vals = vals.reshape(-1, ncols)
+
+            if streamformat == "xytt":
+                X   = (width * vals[:, 1] + vals[:, 0]).astype(np.int64)
+                toa = vals[:, 2]
+                tot = vals[:, 3].astype(np.int64)
+            else:
+                X   = vals[:, 1].astype(np.int64)
+                toa = T3PA_TOA_TICK * vals[:, 2] - T3PA_FTOA_TICK * vals[:, 4]
+                tot = vals[:, 3].astype(np.int64)
+
+            yield X, toa, tot
+
+def writeHitFile(fn, X, toa, tot, streamformat="xytt", width=256):
+    """
+    Write hits to a stream file (the inverse of iterHitChunks).
+
+    @param [in] fn The path to the stream file.
+    @param [in] X The array of hit pixel X values.
+    @param [in] toa The array of hit ToA values [ns].
+    @param [in] tot The array of hit ToT values.
+    @param [in] streamformat The stream format (see STREAM_FILE_TYPES).
+    @param [in] width The frame width [pixels].
+    """
+
+    X = np.asarray(X, dtype=np.int64); toa = np.asarray(toa, dtype=np.float64); tot = np.asarray(tot, dtype=np.int64)
+
+    with open(fn, "w") as f:
+
+        if streamformat == "xytt":
+            f.write("# x\ty\tToA [ns]\tToT\n")
+            for x, y, t, c in zip((X % width).tolist(), (X // width).tolist(), toa.tolist(), tot.tolist()):
+                f.write("%d\t%d\t%.4f\t%d\n" % (x, y, t, c))
+
+        elif streamformat == "t3pa":
+
+            ## The ToA clock ticks (and the fine ToA ticks to take off).
+            ticks = np.ceil(toa / T3PA_TOA_TICK)
+            #
+            fticks = np.round((ticks * T3PA_TOA_TICK - toa) / T3PA_FTOA_TICK)
+
+            f.write("Index\tMatrix Index\tToA\tToT\tFToA\tOverflow\n")
+            for i, (x, t, c, ft) in enumerate(zip(X.tolist(), ticks.tolist(), tot.tolist(), fticks.tolist())):
+                f.write("%d\t%d\t%d\t%d\t%d\t0\n" % (i, x, t, c, ft))
+
+        else:
+            raise IOError("STREAM_BAD_FORMAT")
+
+def getHitLabels(X, toa, rows, cols, window):
+    """
+    Label the hits, joining neighbouring hits (or hits in the same
+    pixel) whose ToA values are within the window of each other.
+
+    The hits are found with a sorted key of the pixel X value and the
+    rank of the ToA, so that each hit's neighbours in the window can
+    be looked up with one search per direction.
+
+    @param [in] X The array of hit pixel X values.
+    @param [in] toa The array of hit ToA values [ns].
+    @param [in] rows The number of rows in the frame.
+    @param [in] cols The number of columns in the frame.
+    @param [in] window The time window [ns].
+    @returns The label (root hit index) of each hit.
+    """
+
+    n = len(X)
+
+    ## The hits in ToA order.
+    torder = np.argsort(toa, kind="mergesort")
+    #
+    tsorted = toa[torder]
+
+    ## The rank of each hit's ToA.
+    rank = np.empty(n, dtype=np.int64)
+    #
+    rank[torder] = np.arange(n)
+
+    ## The range of ToA ranks within the window of each hit.
+    lo = np.searchsorted(tsorted, toa - window, "left")
+    hi = np.searchsorted(tsorted, toa + window, "right")
+
+    ## The sorted (pixel, ToA rank) keys.
+    key = X * n + rank
+    #
+    korder = np.argsort(key)
+    #
+    keys = key[korder]
+
+    x = X % cols; y = X // cols
+
+    a = []; b = []
+
+    # The same pixel and the "forward" neighbours are enough to find every pair.
+    for dx, dy in [(0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]:
+
+        ok = (x + dx >= 0) & (x + dx < cols) & (y + dy < rows)
+
+        ## The neighbouring pixel's X value.
+        nX = X + dy * cols + dx
+
+        ## The neighbouring pixel's hits within the window.
+        first = np.searchsorted(keys, nX * n + lo, "left")
+        last  = np.searchsorted(keys, nX * n + hi, "left")
+
+        found = np.where(ok, last - first, 0)
+
+        if found.sum() == 0:
+            continue
+
+        ## Where each hit's pairs start.
+        starts = np.cumsum(found) - found
+
+        a.append(np.repeat(np.arange(n), found))
+        b.append(korder[np.repeat(first, found) + np.arange(found.sum()) - np.repeat(starts, found)])
+
+    if len(a) == 0:
+        return np.arange(n)
+
+    return getRoots(n, np.concatenate(a), np.concatenate(b))
+
+class StreamKlusterer:
+    """
+    Groups a stream of hits into clusters within a sliding ToA window.
+    """
+
+    def __init__(self, width=256, height=256, window=DEFAULT_TOA_WINDOW, disorder=DEFAULT_TOA_DISORDER, maskdict={}):
+        """
+        Constructor.
+
+        @param [in] width The frame width [pixels].
+        @param [in] height The frame height [pixels].
+        @param [in] window The time window for joining neighbouring hits [ns].
+        @param [in] disorder How much earlier than the latest hit read a hit may arrive [ns].
+        @param [in] maskdict The pixel mask {X:1}.
+        """
+
+        if window < 0.0 or disorder < 0.0:
+            raise IOError("BAD_TOA_WINDOW")
+
+        ## The frame width [pixels].
+        self.__width = width
+
+        ## The frame height [pixels].
+        self.__height = height
+
+        ## The time window [ns].
+        self.__window = window
+
+        ## The allowed disorder of the ToA values [ns].
+        self.__disorder = disorder
+
+        ## The masked pixel X values.
+        self.__masked = np.array(sorted(maskdict.keys()), dtype=np.int64)
+
+        ## The hits of the unfinished clusters (X, ToA, ToT).
+        self.__X   = np.zeros(0, dtype=np.int64)
+        self.__toa = np.zeros(0, dtype=np.float64)
+        self.__tot = np.zeros(0, dtype=np.int64)
+
+        ## The latest ToA read [ns].
+        self.__t_max = None
+
+        ## The number of hits read.
+        self.__n_hits = 0
+
+        ## The number of hits that arrived too late to join a finished cluster.
+        self.__n_late = 0
+
+        ## The largest number of hits kept between chunks.
+        self.__max_buffered = 0
+
+    def getNumberOfHits(self):
+        return self.__n_hits
+
+    def getNumberOfLateHits(self):
+        return self.__n_late
+
+    def getNumberOfBufferedHits(self):
+        return len(self.__X)
+
+    def getMaxBufferedHits(self):
+        return self.__max_buffered
+
+    def addHits(self, X, toa, tot):
+        """
+        Add a chunk of hits.
+
+        @param [in] X The array of hit pixel X values.
+        @param [in] toa The array of hit ToA values [ns].
+        @param [in] tot The array of hit ToT values.
+        @returns The clusters finished by the new hits (see getKlusters).
+        """
+
+        X = np.asarray(X, dtype=np.int64); toa = np.asarray(toa, dtype=np.float64); tot = np.asarray(tot, dtype=np.int64)
+
+        # Remove the masked pixels.
+        if len(self.__masked) > 0 and len(X) > 0:
+            keep = ~np.in1d(X, self.__masked)
+            X = X[keep]; toa = toa[keep]; tot = tot[keep]
+
+        if len(X) == 0:
+            return []
+
+        self.__n_hits += len(X)
+
+        if self.__t_max is not None:
+            self.__n_late += int(np.count_nonzero(toa < self.__t_max - self.__disorder))
+            self.__t_max = max(self.__t_max, toa.max())
+        else:
+            self.__t_max = toa.max()
+
+        self.__X   = np.concatenate((self.__X, X))
+        self.__toa = np.concatenate((self.__toa, toa))
+        self.__tot = np.concatenate((self.__tot, tot))
+
+        # The clusters whose last hits are too early to be joined by
+        # any hits still to come are finished.
+        return self.getKlusters(self.__t_max - self.__disorder - self.__window)
+
+    def flush(self):
+        """ Finish all of the remaining clusters (at the end of the stream). """
+        return self.getKlusters(np.inf)
+
+    def getKlusters(self, t_end):
+        """
+        Take the finished clusters out of the buffer.
+
+        @param [in] t_end The ToA before which a cluster's last hit must be for it to be finished [ns].
+        @returns The list of the finished clusters' (X, ToA, ToT) arrays, in order of their first hits.
+        """
+
+        if len(self.__X) == 0:
+            return []
+
+        labels = getHitLabels(self.__X, self.__toa, self.__height, self.__width, self.__window)
+
+        ## The last ToA of each cluster (indexed by the label).
+        t_last = np.full(len(self.__X), -np.inf)
+        #
+        np.maximum.at(t_last, labels, self.__toa)
+
+        done = t_last[labels] < t_end
+
+        ## The hits of the finished clusters, by cluster then ToA.
+        order = np.flatnonzero(done)
+        order = order[np.lexsort((self.__toa[order], labels[order]))]
+
+        klusters = []
+
+        if len(order) > 0:
+
+            ## Where each cluster starts.
+            starts = np.flatnonzero(np.r_[True, labels[order][1:] != labels[order][:-1]])
+
+            for hits in np.split(order, starts[1:]):
+                klusters.append((self.__X[hits], self.__toa[hits], self.__tot[hits]))
+
+            klusters.sort(key=lambda k: k[1][0])
+
+        # Keep the unfinished clusters' hits.
+        keep = ~done
+        #
+        self.__X = self.__X[keep]; self.__toa = self.__toa[keep]; self.__tot = self.__tot[keep]
+
+        self.__max_buffered = max(self.__max_buffered, len(self.__X))
+
+        return klusters
+
+def getStreamKlusterPropertiesJson(klusterid, X, toa, tot, width=256, height=256, ismc=False):
+    """
+    Get the properties of a stream cluster (in the getKlusterPropertiesJson schema).
+
+    The ToT values of hits in the same pixel are added together. The
+    time of the first hit ("toa") and the time between the first and
+    last hits ("duration") are added to the properties.
+
+    @param [in] klusterid The cluster ID.
+    @param [in] X The array of the cluster's hit pixel X values.
+    @param [in] toa The array of the hit ToA values [ns].
+    @param [in] tot The array of the hit ToT values.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @param [in] ismc Is the cluster from simulated data?
+    @returns The cluster properties dictionary.
+    """
+
+    ## The pixels and their summed ToT values.
+    Xs, inverse = np.unique(X, return_inverse=True)
+    #
+    Cs = np.bincount(inverse, weights=tot)
+
+    ## The pixels {X:Pixel}.
+    pixels = {}
+
+    k = Kluster(height, width, ismc)
+
+    for xy, C in zip(Xs.tolist(), Cs.tolist()):
+        pixels[xy] = Pixel(xy % width, xy / width, int(C), -1, height, width)
+        k.insert(xy, pixels[xy])
+
+    k.process(pixels)
+
+    p = getKlusterPropertiesJson(klusterid, k)
+
+    p["toa"] = float(toa.min())
+
+    p["duration"] = float(toa.max() - toa.min())
+
+    return p
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic Timepix frames (for load testing and benchmarking).
+
+The frames are made of:
+
+* gamma candidates - compact clusters of one to four pixels;
+* beta candidates - tracks made by random walks with a small change
+  of direction at each (one pixel) step;
+* noisy pixels - a fixed set of pixels that fire in a fraction of the
+  frames.
+
+Clusters are added until the requested occupancy (the fraction of the
+pixels that are hit) is reached, so clusters can touch and overlap at
+high occupancies. The pixels of every cluster in a frame are made at
+once with NumPy.
+
+The frames are written in the ASCII formats read by the Dataset (with
+DSC files marking the data as simulated), so they can be used as input
+to any of the scripts.
+"""
+
+#...for the operating system commands.
+import os
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for the MATH.
+import numpy as np
+
+#...for writing the data files.
+from helpers import writeDataFile
+
+#...for writing the DSC files.
+from dsc import writeDscFile
+
+#...for writing the pixel mask.
+from occupancy import writeMaskFile
+
+## The default fraction of the pixels hit in each frame.
+DEFAULT_SYNTHETIC_OCCUPANCY = 0.005
+
+## The default fraction of the clusters that are gamma candidates.
+DEFAULT_GAMMA_FRACTION = 0.5
+
+## The default probabilities of gamma candidates of one, two, three and four pixels.
+DEFAULT_GAMMA_SIZES = [0.55, 0.25, 0.12, 0.08]
+
+## The default mean beta track length [pixels].
+DEFAULT_TRACK_LENGTH = 15.0
+
+## The minimum beta track length [pixels].
+MIN_TRACK_LENGTH = 5
+
+## The default r.m.s. change of the track direction at each step [rad.].
+DEFAULT_TRACK_SCATTER = 0.15
+
+## The default mean pixel count (ToT) value.
+DEFAULT_MEAN_COUNTS = 40.0
+
+## The maximum pixel count value.
+MAX_COUNTS = 11810
+
+## The pixel offsets (dx, dy) of the gamma candidates of each size (all below the sorting radius cuts).
+GAMMA_SHAPES = [
+    [(0, 0)],
+    [(0, 0), (1, 0)],
+    [(0, 0), (1, 0), (0, 1)],
+    [(0, 0), (1, 0), (0, 1), (1, 1)]
+    ]
+
+class SyntheticFrameGenerator:
+    """
+    Wrapper class for making synthetic Timepix frames.
+    """
+
+    def __init__(self, width=256, height=256, occupancy=DEFAULT_SYNTHETIC_OCCUPANCY, \
+        gammafraction=DEFAULT_GAMMA_FRACTION, gammasizes=DEFAULT_GAMMA_SIZES, \
+        tracklength=DEFAULT_TRACK_LENGTH, scatter=DEFAULT_TRACK_SCATTER, \
+        meancounts=DEFAULT_MEAN_COUNTS, nnoisy=0, noiseprob=0.5, seed=None):
+        """
+        Constructor.
+
+        @param [in] width The frame width [pixels].
+        @param [in] height The frame height [pixels].
+        @param [in] occupancy The (mean) fraction of the pixels hit in each frame.
+        @param [in] gammafraction The fraction of the clusters that are gamma candidates.
+        @param [in] gammasizes The probabilities of one, two, three and four pixel gamma candidates.
+        @param [in] tracklength The mean beta track length [pixels].
+        @param [in] scatter The r.m.s. change of the track direction at each step [rad.].
+        @param [in] meancounts The mean pixel count (ToT) value.
+        @param [in] nnoisy The number of noisy pixels.
+        @param [in] noiseprob The probability of a noisy pixel firing in a frame.
+        @param [in] seed The random number seed.
+        """
+
+        if occupancy <= 0.0 or occupancy >= 1.0:
+            raise IOError("BAD_OCCUPANCY")
+
+        if gammafraction < 0.0 or gammafraction > 1.0:
+            raise IOError("BAD_GAMMA_FRACTION")
+
+        if len(gammasizes) != len(GAMMA_SHAPES) or abs(sum(gammasizes) - 1.0) > 1.0e-6:
+            raise IOError("BAD_GAMMA_SIZES")
+
+        if tracklength < MIN_TRACK_LENGTH:
+            raise IOError("BAD_TRACK_LENGTH")
+
+        if nnoisy < 0 or nnoisy > width * height:
+            raise IOError("BAD_NOISY_PIXELS")
+
+        ## The frame width [pixels].
+        self.__width = width
+
+        ## The frame height [pixels].
+        self.__height = height
+
+        ## The fraction of the pixels hit.
+        self.__occupancy = occupancy
+
+        ## The fraction of gamma candidates.
+        self.__gammafraction = gammafraction
+
+        ## The gamma candidate size probabilities.
+        self.__gammasizes = np.array(gammasizes, dtype=np.float64)
+
+        ## The mean track length [pixels].
+        self.__tracklength = tracklength
+
+        ## The r.m.s. change of direction at each step [rad.].
+        self.__scatter = scatter
+
+        ## The mean pixel count value.
+        self.__meancounts = meancounts
+
+        ## The noisy pixel firing probability.
+        self.__noiseprob = noiseprob
+
+        ## The random numbers.
+        self.__rs = np.random.RandomState(seed)
+
+        ## The noisy pixels' X values.
+        self.__noisy = np.sort(self.__rs.choice(width * height, nnoisy, replace=False))
+
+        ## The mean number of pixels in each cluster (ignoring overlaps and the edges).
+        self.__meansize = gammafraction * np.dot(self.__gammasizes, np.arange(1, len(GAMMA_SHAPES) + 1)) + \
+            (1.0 - gammafraction) * tracklength
+
+    def getNoisyPixels(self):
+        """ The noisy pixels' X values. """
+        return self.__noisy
+
+    def makeGammas(self, n):
+        """
+        Make some gamma candidates.
+
+        @param [in] n The number of gamma candidates.
+        @returns The arrays of the pixels' x and y values.
+        """
+
+        rs = self.__rs
+
+        ## The number of pixels in each gamma candidate.
+        sizes = rs.choice(len(GAMMA_SHAPES), n, p=self.__gammasizes) + 1
+
+        ## The index of the gamma candidate each pixel belongs to.
+        owner = np.repeat(np.arange(n), sizes)
+
+        ## The index of each pixel within its gamma candidate.
+        within = np.arange(len(owner)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+        dx = np.array([dxy[0] for dxy in GAMMA_SHAPES[-1]])[within]
+        dy = np.array([dxy[1] for dxy in GAMMA_SHAPES[-1]])[within]
+
+        # Flip the shapes at random.
+        flipx = rs.randint(2, size=n) * 2 - 1
+        flipy = rs.randint(2, size=n) * 2 - 1
+
+        x = rs.randint(self.__width, size=n)[owner] + dx * flipx[owner]
+        y = rs.randint(self.__height, size=n)[owner] + dy * flipy[owner]
+
+        return x, y
+
+    def makeTracks(self, n):
+        """
+        Make some beta candidate tracks.
+
+        @param [in] n The number of tracks.
+        @returns The arrays of the pixels' x and y values.
+        """
+
+        rs = self.__rs
+
+        ## The number of steps in each track.
+        lengths = MIN_TRACK_LENGTH + rs.exponential(self.__tracklength - MIN_TRACK_LENGTH, size=n).astype(np.int64)
+
+        ## The index of the track each step belongs to.
+        owner = np.repeat(np.arange(n), lengths)
+
+        ## The index of the first step of each track.
+        starts = np.cumsum(lengths) - lengths
+
+        ## The change of direction at each step (none at the start of each track).
+        dtheta = rs.normal(0.0, self.__scatter, size=len(owner))
+        dtheta[starts] = rs.uniform(0.0, 2.0 * np.pi, size=n)
+
+        ## The direction of each step - the running sum within each track.
+        theta = np.cumsum(dtheta)
+        theta -= np.repeat(theta[starts] - dtheta[starts], lengths)
+
+        ## The step positions (one pixel steps from the start of each track).
+        px = np.cos(theta); py = np.sin(theta)
+        px[starts] = 0.0; py[starts] = 0.0
+        #
+        px = np.cumsum(px); py = np.cumsum(py)
+        px -= np.repeat(px[starts], lengths); py -= np.repeat(py[starts], lengths)
+
+        x = np.rint(rs.uniform(0.0, self.__width,  size=n)[owner] + px).astype(np.int64)
+        y = np.rint(rs.uniform(0.0, self.__height, size=n)[owner] + py).astype(np.int64)
+
+        return x, y
+
+    def makeFrame(self):
+        """
+        Make a frame.
+
+        @returns The arrays of the pixel X values (sorted) and counts.
+        """
+
+        rs = self.__rs
+
+        w = self.__width; h = self.__height
+
+        ## The pixel counts.
+        grid = np.zeros(w * h, dtype=np.int64)
+
+        ## The number of pixels to hit.
+        target = min(rs.poisson(self.__occupancy * w * h), w * h)
+
+        nhit = 0
+
+        # Add clusters until enough pixels have been hit.
+        while nhit < target:
+
+            ## The number of clusters to add.
+            n = int(np.ceil((target - nhit) / self.__meansize))
+
+            ngammas = rs.binomial(n, self.__gammafraction)
+
+            gx, gy = self.makeGammas(ngammas)
+            tx, ty = self.makeTracks(n - ngammas)
+
+            x = np.concatenate((gx, tx)); y = np.concatenate((gy, ty))
+
+            # Anything outside the frame is lost.
+            inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+
+            X = y[inside] * w + x[inside]
+
+            # Pixels hit more than once add their counts together.
+            np.add.at(grid, X, 1 + rs.exponential(self.__meancounts, size=len(X)).astype(np.int64))
+
+            nhit = np.count_nonzero(grid)
+
+        # The noisy pixels.
+        if len(self.__noisy) > 0:
+            fired = self.__noisy[rs.uniform(size=len(self.__noisy)) < self.__noiseprob]
+            grid[fired] += 1 + rs.exponential(10.0 * self.__meancounts, size=len(fired)).astype(np.int64)
+
+        np.minimum(grid, MAX_COUNTS, out=grid)
+
+        X = np.flatnonzero(grid)
+
+        return X, grid[X]
+
+    def writeDataset(self, foldername, nframes, dataformat=4114, starttime=1375178115.0, acqtime=0.5):
+        """
+        Write synthetic frames as a Pixelman dataset (data and DSC files).
+
+        @param [in] foldername The folder to write the files to (which must exist).
+        @param [in] nframes The number of frames.
+        @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+        @param [in] starttime The start time of the first frame [s].
+        @param [in] acqtime The acquisition time of each frame [s].
+        @returns The total number of pixels written.
+        """
+
+        ## The number of digits in the file names (so they sort in order).
+        ndigits = max(3, len(str(nframes - 1)))
+
+        npixels = 0
+
+        for i in range(nframes):
+
+            fn = os.path.join(foldername, "data%0*d.txt" % (ndigits, i))
+
+            X, C = self.makeFrame()
+
+            writeDataFile(fn, X, C, dataformat, self.__width, self.__height)
+
+            writeDscFile(fn + ".dsc", starttime + i * acqtime, acqtime, self.__width, self.__height, \
+                dataformat, ismc=True)
+
+            npixels += len(X)
+
+        lg.info(" * Wrote %d synthetic frames (%d pixels) to '%s'." % (nframes, npixels, foldername))
+
+        return npixels
+
+def writeSyntheticDataPoint(path, generator, nframes, dataformat=4114, geo=(51.261015, -1.084127, 48.0)):
+    """
+    Write a data point (as in data/sr) of synthetic frames.
+
+    The frames are written to the data point's ASCIIxyC folder, with an
+    empty pixel mask and the geospatial metadata.
+
+    @param [in] path The data point path (e.g. "../synthetic/0-00_mm").
+    @param [in] generator The SyntheticFrameGenerator to use.
+    @param [in] nframes The number of frames.
+    @param [in] dataformat The data file format (see DATA_FILE_TYPES).
+    @param [in] geo The (latitude, longitude, altitude) of the data point.
+    @returns The total number of pixels written.
+    """
+
+    if not os.path.isdir(path + "/ASCIIxyC"):
+        os.makedirs(path + "/ASCIIxyC")
+
+    writeMaskFile(path + "/masked_pixels.txt", [])
+
+    with open(path + "/metadata.json", "w") as mf:
+        json.dump([{"lat" : geo[0], "lon" : geo[1], "alt" : geo[2]}], mf, indent=2)
+
+    return generator.writeDataset(path + "/ASCIIxyC", nframes, dataformat)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary folders.
+import tempfile, shutil
+
+#...for making the test archives.
+import zipfile, tarfile
+
+#...for the archives.
+from archive import DataArchive, ArchiveDataset, isArchive
+
+#...for the dataset wrapper.
+from dataset import Dataset
+
+#...for counting the cluster types.
+from counting import countKlusterTypes
+
+## The data files put in the test archives.
+DATA_FILES = ["data%03d.txt" % (i) for i in range(10)]
+
+## The data point folder.
+DATA_POINT = "data/sr/0-00_mm"
+
+def writeArchive(path, names, dp="sr/0-00_mm"):
+    """ Write an archive of some of the data point's files (stored in reverse order). """
+
+    ## The members [(name in the archive, path)].
+    members = [(dp + "/" + bn, DATA_POINT + "/" + bn) for bn in ["metadata.json", "masked_pixels.txt"]]
+    #
+    for bn in reversed(names):
+        members += [(dp + "/ASCIIxyC/" + bn + ".dsc", DATA_POINT + "/ASCIIxyC/" + bn + ".dsc")]
+        members += [(dp + "/ASCIIxyC/" + bn, DATA_POINT + "/ASCIIxyC/" + bn)]
+
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, fn in members:
+                zf.write(fn, name)
+    else:
+        tf = tarfile.open(path, "w:gz")
+        for name, fn in members:
+            tf.add(fn, name)
+        tf.close()
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_frames(self):
+
+        ## The frames read from the folder.
+        ref = Dataset(DATA_POINT + "/ASCIIxyC/", selection=DATA_FILES).getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+        for bn in ["sr.zip", "sr.tar.gz"]:
+
+            path = os.path.join(self.tmpdir, bn)
+
+            writeArchive(path, DATA_FILES)
+
+            archive = DataArchive(path)
+
+            ds = ArchiveDataset(archive, "sr/0-00_mm/ASCIIxyC/")
+
+            frames = ds.getFrames((0.0, 0.0, 0.0), skipclustering=True)
+
+            # The tests
+            #-----------
+            self.assertTrue(isArchive(path))
+            self.assertEqual(archive.findDataPoints(), ["sr/0-00_mm"])
+            self.assertEqual(ds.getNumberOfDataFiles(), len(DATA_FILES))
+            self.assertEqual(ds.getFolderFormat(), "ASCII [x, y, C]")
+            self.assertEqual(ds.getFrameSize(), (256, 256))
+            self.assertEqual(ds.getDataFilePaths()[0], "sr/0-00_mm/ASCIIxyC/data000.txt")
+            #
+            self.assertEqual([f.getStartTime() for f in frames], [f.getStartTime() for f in ref])
+            for f, g in zip(frames, ref):
+                self.assertEqual(f.getPixelMap(), g.getPixelMap())
+
+            # The members are read in the order they're stored.
+            self.assertEqual(len(list(ds.iterDscFiles())), len(DATA_FILES))
+            self.assertEqual([name for name, text in archive.iterMembers(ds.getDataFilePaths())], \
+                list(reversed(ds.getDataFilePaths())))
+
+            # Counting the clusters from the archive.
+            self.assertEqual(countKlusterTypes(ds.getDataFilePaths(), ds.dataformat, reader=ds.readPixelArrays), \
+                countKlusterTypes([DATA_POINT + "/ASCIIxyC/" + bn for bn in DATA_FILES], ds.dataformat))
+
+            # Only some of the frames.
+            self.assertEqual(ArchiveDataset(archive, "sr/0-00_mm/ASCIIxyC", selection=DATA_FILES[:3]).getNumberOfDataFiles(), 3)
+
+            archive.close()
+
+        self.assertFalse(isArchive(DATA_POINT))
+
+    def test_tar_reading(self):
+
+        path = os.path.join(self.tmpdir, "sr.tar.gz")
+
+        writeArchive(path, DATA_FILES)
+
+        ## An archive that keeps nothing, so it's read from the start when needed.
+        archive = DataArchive(path, cachemb=0)
+
+        # The tests
+        #-----------
+        for bn in ["data005.txt", "data000.txt", "data009.txt", "data005.txt"]:
+            with open(DATA_POINT + "/ASCIIxyC/" + bn, "r") as f:
+                self.assertEqual(archive.read("sr/0-00_mm/ASCIIxyC/" + bn), f.read())
+
+        with self.assertRaises(IOError) as cm:
+            archive.read("sr/0-00_mm/ASCIIxyC/data999.txt")
+        self.assertEqual(str(cm.exception), "NOT_EXIST")
+
+    def test_bad_archives(self):
+
+        path = os.path.join(self.tmpdir, "bad.zip")
+        #
+        with zipfile.ZipFile(path, "w") as zf:
+            # A data file without a DSC file.
+            zf.write(DATA_POINT + "/ASCIIxyC/data000.txt", "dp/ASCIIxyC/data000.txt")
+            zf.write(DATA_POINT + "/ASCIIxyC/data001.txt", "dp/ASCIIxyC/data001.txt")
+            zf.write(DATA_POINT + "/ASCIIxyC/data001.txt.dsc", "dp/ASCIIxyC/data001.txt.dsc")
+            # A folder within the folder.
+            zf.write(DATA_POINT + "/ASCIIxyC/data001.txt", "dp2/ASCIIxyC/data001.txt")
+            zf.write(DATA_POINT + "/ASCIIxyC/data001.txt.dsc", "dp2/ASCIIxyC/data001.txt.dsc")
+            zf.write(DATA_POINT + "/ASCIIxyC/data002.txt", "dp2/ASCIIxyC/sub/data002.txt")
+
+        archive = DataArchive(path)
+
+        # The tests
+        #-----------
+        with self.assertRaises(IOError) as cm:
+            ArchiveDataset(archive, "dp/ASCIIxyC")
+        self.assertEqual(str(cm.exception), "MISSING_DSC")
+
+        with self.assertRaises(IOError) as cm:
+            ArchiveDataset(archive, "dp2/ASCIIxyC")
+        self.assertEqual(str(cm.exception), "CONTAINS_DIR")
+
+        # A selected data file that isn't there.
+        with self.assertRaises(IOError) as cm:
+            ArchiveDataset(archive, "dp/ASCIIxyC", selection=["data009.txt"])
+        self.assertEqual(str(cm.exception), "NOT_EXIST")
+
+        with self.assertRaises(IOError) as cm:
+            ArchiveDataset(archive, "dp/nothere")
+        self.assertEqual(str(cm.exception), "NOT_EXIST")
+
+        # No data points (no metadata.json).
+        self.assertEqual(archive.findDataPoints(), [])
+
+        # Not an archive.
+        path = os.path.join(self.tmpdir, "notanarchive.zip")
+        #
+        with open(path, "w") as f:
+            f.write("Not an archive.\n")
+        #
+        with self.assertRaises(IOError) as cm:
+            DataArchive(path)
+        self.assertEqual(str(cm.exception), "BAD_ARCHIVE")
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_archive.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_archive.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary calibration files.
+import tempfile, shutil
+
+#...for the MATH.
+import numpy as np
+
+#...for the energy calibration.
+from calibration import PixelCalibration
+
+#...for the cluster finding.
+from kluster import KlusterFinder
+
+## Typical calibration parameter values.
+CALIBRATION_VALUES = {"a" : 2.0, "b" : 60.0, "c" : 300.0, "t" : 2.5}
+
+class CalibrationTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The temporary calibration directory.
+        self.tmpdir = tempfile.mkdtemp()
+
+        for name, val in CALIBRATION_VALUES.iteritems():
+            m = np.full((256, 256), val)
+            if name == "a":
+                # An uncalibrated pixel at (10, 10).
+                m[10, 10] = 0.0
+            np.savetxt(os.path.join(self.tmpdir, name + ".txt"), m, fmt="%.6f")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_energies(self):
+
+        cal = PixelCalibration(self.tmpdir)
+
+        # The binary matrices should have been cached.
+        for name in CALIBRATION_VALUES.keys():
+            self.assertTrue(os.path.exists(os.path.join(self.tmpdir, name + ".npy")))
+
+        a = CALIBRATION_VALUES["a"]; b = CALIBRATION_VALUES["b"]
+        c = CALIBRATION_VALUES["c"]; t = CALIBRATION_VALUES["t"]
+
+        # The true energies [keV] and the corresponding ToT values.
+        E_true = np.array([10.0, 20.0, 60.0, 250.0])
+        tot = (a * E_true) + b - (c / (E_true - t))
+
+        E = cal.getEnergies([0, 1, 256, 65535], tot)
+
+        # The tests
+        #-----------
+        self.assertTrue(np.allclose(E, E_true))
+
+        # The uncalibrated pixel (and zero counts) give zero energy.
+        E = cal.getEnergies([(256 * 10) + 10, 2], [100.0, 0.0])
+        self.assertEqual(list(E), [0.0, 0.0])
+
+        # Loading again uses the (memory-mapped) cache.
+        cal = PixelCalibration(self.tmpdir)
+        self.assertTrue(np.allclose(cal.getEnergies([0, 1, 256, 65535], tot), E_true))
+
+    def test_kluster_energies(self):
+
+        cal = PixelCalibration(self.tmpdir)
+
+        # A three pixel cluster and a single pixel cluster.
+        pixels = {(256 * 100) + 100 : 80, (256 * 100) + 101 : 120, (256 * 101) + 101 : 95, \
+                  (256 * 200) + 50 : 150}
+
+        kf = KlusterFinder(pixels, 256, 256, False, {}, cal)
+
+        ## The energies of the individual pixels.
+        E = dict(zip(pixels.keys(), cal.getEnergies(pixels.keys(), pixels.values())))
+
+        ks = kf.getListOfKlusters()
+
+        # The tests
+        #-----------
+        self.assertEqual(len(ks), 2)
+        #
+        for k in ks:
+            E_k = [E[X] for X in k.getPixelMap().keys()]
+            self.assertAlmostEqual(k.getTotalEnergy(), sum(E_k))
+            self.assertAlmostEqual(k.getMaxEnergy(), max(E_k))
+
+        # Without a calibration the energies are zero.
+        kf = KlusterFinder(pixels, 256, 256, False, {})
+        for k in kf.getListOfKlusters():
+            self.assertEqual(k.getTotalEnergy(), 0.0)
+            self.assertEqual(k.getMaxEnergy(), 0.0)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_calibration.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=====================================================")
+    lg.info(" Logger output from cernatschool/test_calibration.py ")
+    lg.info("=====================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary test files.
+import tempfile, shutil
+
+#...for the frame catalogue.
+from catalogue import FrameCatalogue
+
+class CatalogueTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## A temporary directory for the test input tree and catalogue.
+        self.tmpdir = tempfile.mkdtemp()
+
+        # Copy the first five frames of two data points.
+        for dpname in ["0-00_mm", "3-20_mm"]:
+            folder = os.path.join(self.tmpdir, "sr", dpname, "ASCIIxyC")
+            os.makedirs(folder)
+            for i in range(5):
+                for ext in ["", ".dsc"]:
+                    fn = "data%03d.txt%s" % (i, ext)
+                    shutil.copy(os.path.join("data/sr", dpname, "ASCIIxyC", fn), folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_build_and_query(self):
+
+        cat = FrameCatalogue(os.path.join(self.tmpdir, "catalogue.sqlite"))
+
+        # The tests
+        #-----------
+        self.assertEqual(cat.build(os.path.join(self.tmpdir, "sr")), 10)
+        self.assertEqual(cat.getNumberOfFrames(), 10)
+        self.assertEqual(cat.getDataPoints(), ["0-00_mm", "3-20_mm"])
+
+        # Select by data point.
+        rs = cat.getFrameRecords(datapoint="3-20_mm")
+        self.assertEqual(len(rs), 5)
+        self.assertEqual(rs[0]["datafile"], "data000.txt")
+        self.assertEqual(rs[0]["start_time"], 1375181535.850145)
+        self.assertEqual(rs[0]["start_sec"], 1375181535)
+        self.assertEqual(rs[0]["start_subsec"], 850145)
+        self.assertEqual(rs[0]["chipid"], "E09-W0211")
+
+        # Select by time window (sorted by start time).
+        rs = cat.getFrameRecords(start=1375181536.0, end=1375181538.0)
+        self.assertEqual([r["datafile"] for r in rs], ["data001.txt", "data002.txt", "data003.txt"])
+
+        # Select by chip ID.
+        self.assertEqual(len(cat.getFrameRecords(chipid="E09-W0211")), 10)
+        self.assertEqual(len(cat.getFrameRecords(chipid="A00-W0000")), 0)
+
+        # Open only the selected frames.
+        dss = cat.getDatasets(start=1375181536.0, end=1375181538.0)
+        self.assertEqual(len(dss), 1)
+        self.assertEqual(dss[0][0], "3-20_mm")
+        self.assertEqual(dss[0][1].getNumberOfDataFiles(), 3)
+
+        cat.close()
+
+        # Re-opening the catalogue doesn't need a rebuild.
+        cat = FrameCatalogue(os.path.join(self.tmpdir, "catalogue.sqlite"))
+        self.assertEqual(cat.getNumberOfFrames(), 10)
+        cat.close()
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_catalogue.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===================================================")
+    lg.info(" Logger output from cernatschool/test_catalogue.py ")
+    lg.info("===================================================")
+    lg.info("")
+
+    unittest.main()
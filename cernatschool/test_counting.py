@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for the cluster type counting.
+from counting import countKlusterTypes, getKlusterLabels, getKlusterFeatures
+
+#...for the cluster sorting (the reference).
+from sorting import getKlusterType, KLUSTER_TYPES
+
+#...for the cluster properties (the reference).
+from helpers import getKlusterPropertiesJson
+
+class CountingTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_features(self):
+
+        # Two frames: an L-shaped tripixel, a diagonal pair and a corner
+        # pixel in the first, and the same tripixel position in the second.
+        X      = np.array([256 * 10 + 10, 256 * 10 + 11, 256 * 11 + 10, 256 * 20 + 20, 256 * 21 + 21, 0, 256 * 10 + 10])
+        frames = np.array([0, 0, 0, 0, 0, 0, 1])
+
+        labels, n = getKlusterLabels(X, frames, 2)
+
+        columns = getKlusterFeatures(X, labels, n)
+
+        # The tests
+        #-----------
+        self.assertEqual(n, 4)
+        self.assertEqual(sorted(columns["size"]), [1, 1, 2, 3])
+        #
+        ## The tripixel cluster.
+        k = labels[0]
+        #
+        self.assertAlmostEqual(columns["radius_uw"][k], np.sqrt(5.0) / 3.0)
+        self.assertEqual((columns["xmin"][k], columns["xmax"][k], columns["ymin"][k], columns["ymax"][k]), \
+            (10.0, 11.0, 10.0, 11.0))
+        #
+        # Clusters in different frames aren't joined.
+        self.assertNotEqual(labels[6], labels[0])
+
+    def test_count_kluster_types(self):
+
+        ## The dataset wrapper.
+        ds = Dataset("data/sr/0-00_mm/ASCIIxyC/")
+
+        ## The pixel mask.
+        pixel_mask = {256 * 100 + 100 : 1, 256 * 5 : 1}
+
+        counts = countKlusterTypes(ds.getDataFilePaths()[:20], ds.dataformat, pixel_mask, batchsize=7)
+
+        # The reference - the full cluster finding and sorting.
+        ref = dict([(typename, 0) for typename in KLUSTER_TYPES])
+        #
+        for f in ds.getFrames((0.0, 0.0, 0.0), pixelmask=pixel_mask)[:20]:
+            for k in f.getKlusterFinder().getListOfKlusters():
+                ref[getKlusterType(getKlusterPropertiesJson("k", k))] += 1
+
+        # The tests
+        #-----------
+        self.assertEqual(counts, ref)
+        self.assertTrue(counts["Beta"] > 0)
+        self.assertTrue(counts["Edge"] > 0)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_counting.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("==================================================")
+    lg.info(" Logger output from cernatschool/test_counting.py ")
+    lg.info("==================================================")
+    lg.info("")
+
+    unittest.main()
@@ -10,8 +10,11 @@ import unittest
 #...for the logging.
 import logging as lg
 
+#...for the temporary test files.
+import tempfile, shutil
+
 #...for the dataset wrapper.
-from dataset import Dataset
+from dataset import Dataset, getFormatSample
 
 class DatasetTest(unittest.TestCase):
 
@@ -34,6 +37,75 @@ class DatasetTest(unittest.TestCase):
         # The data format of the folder.
         self.assertEqual(pds.getFolderFormat(), "ASCII [x, y, C]")
 
+    def test_import_dataset_selection(self):
+
+        ## The Pixelman dataset object (only some of the frames).
+        pds = Dataset("data/sr/0-00_mm/ASCIIxyC/", selection=["data002.txt", "data010.txt"])
+
+        # The tests.
+
+        # The number of datafiles.
+        self.assertEqual(pds.getNumberOfDataFiles(), 2)
+
+        # The data format of the folder.
+        self.assertEqual(pds.getFolderFormat(), "ASCII [x, y, C]")
+
+    def test_prefetched_frames(self):
+
+        ## The Pixelman dataset object (only some of the frames).
+        pds = Dataset("data/sr/0-00_mm/ASCIIxyC/", \
+            selection=["data%03d.txt" % (i) for i in range(20)])
+
+        ## The frames, read one at a time.
+        frames = pds.getFrames((51.509915, -0.142965, 34.5), skipclustering=True)
+
+        ## The frames, read ahead in the background.
+        prefetched = list(pds.iterFrames((51.509915, -0.142965, 34.5), prefetch=4, skipclustering=True))
+
+        # The tests.
+        self.assertEqual(len(prefetched), 20)
+        #
+        for f, g in zip(frames, prefetched):
+            self.assertEqual(f.getStartTime(), g.getStartTime())
+            self.assertEqual(f.getPixelMap(), g.getPixelMap())
+
+    def test_format_sample(self):
+
+        # The tests.
+        self.assertEqual(getFormatSample(5, None), [0, 1, 2, 3, 4])
+        self.assertEqual(getFormatSample(5, 16), [0, 1, 2, 3, 4])
+        self.assertEqual(getFormatSample(600, 1), [0])
+        self.assertEqual(getFormatSample(600, 3), [0, 300, 599])
+
+    def test_bad_datasets(self):
+
+        ## A temporary folder for the bad dataset.
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            # A data file without a DSC file.
+            shutil.copy("data/sr/0-00_mm/ASCIIxyC/data000.txt", tmpdir)
+            with self.assertRaises(IOError) as cm:
+                Dataset(tmpdir)
+            self.assertEqual(str(cm.exception), "MISSING_DSC")
+
+            # A DSC file without a data file.
+            shutil.copy("data/sr/0-00_mm/ASCIIxyC/data000.txt.dsc", tmpdir)
+            shutil.copy("data/sr/0-00_mm/ASCIIxyC/data001.txt.dsc", tmpdir)
+            with self.assertRaises(IOError) as cm:
+                Dataset(tmpdir)
+            self.assertEqual(str(cm.exception), "MISSING_DAT")
+
+            # A folder within the folder.
+            os.remove(os.path.join(tmpdir, "data001.txt.dsc"))
+            os.mkdir(os.path.join(tmpdir, "subfolder"))
+            with self.assertRaises(IOError) as cm:
+                Dataset(tmpdir)
+            self.assertEqual(str(cm.exception), "CONTAINS_DIR")
+
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for the engine comparison.
+from differential import DifferentialComparison, compareKlusters, getRandomPixelMap, getEngineNames, \
+    registerEngine, ENGINES, REFERENCE_ENGINE
+
+class DifferentialTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_engines_agree(self):
+
+        dc = DifferentialComparison(getEngineNames())
+
+        # Some real frames...
+        for i, f in enumerate(Dataset("data/sr/0-00_mm/ASCIIxyC/").getFrames((0.0, 0.0, 0.0), skipclustering=True)[:5]):
+            dc.compareFrame("frame_%d" % (i), f.getPixelMap())
+
+        # ...and some random ones.
+        rs = np.random.RandomState(42)
+        #
+        for i in range(20):
+            dc.compareFrame("random_%d" % (i), getRandomPixelMap(rs))
+
+        summary = dc.getSummary()
+
+        # The tests
+        #-----------
+        self.assertEqual(summary["n_frames"], 25)
+        self.assertTrue(summary["n_klusters"] > 0)
+        for name in getEngineNames():
+            self.assertEqual(dc.getDivergence(name), None)
+
+    def test_divergences(self):
+
+        ## The pixel map - a tripixel and two monopixels.
+        pixelmap = {256 * 10 + 10 : 20, 256 * 10 + 11 : 30, 256 * 11 + 10 : 40, 256 * 50 + 50 : 5, 256 * 100 + 100 : 6}
+
+        ref = ENGINES[REFERENCE_ENGINE](pixelmap, 256, 256)
+
+        # A cluster that is missing...
+        self.assertEqual(compareKlusters(ref, ref[:2])["kind"], "count")
+
+        # ...clusters out of order...
+        self.assertEqual(compareKlusters(ref, [ref[1], ref[0], ref[2]])["kind"], "order")
+
+        # ...clusters of the same size in a different order (only when strict)...
+        self.assertEqual(compareKlusters(ref, [ref[0], ref[2], ref[1]]), None)
+        self.assertEqual(compareKlusters(ref, [ref[0], ref[2], ref[1]], strictorder=True)["kind"], "order")
+
+        # ...a cluster with different pixels...
+        self.assertEqual(compareKlusters(ref, [ref[0], ref[1], (frozenset([7]), {})])["kind"], "membership")
+
+        # ...and a property outside the tolerances.
+        props = dict(ref[0][1])
+        props["radius_uw"] += 1.0e-3
+        #
+        divergence = compareKlusters(ref, [(ref[0][0], props), ref[1], ref[2]])
+        #
+        self.assertEqual((divergence["kind"], divergence["field"], divergence["kluster"]), ("property", "radius_uw", 0))
+
+        # Engines that diverge are reported once, with the first frame they diverged in.
+        registerEngine("broken", lambda pixelmap, width, height: ENGINES[REFERENCE_ENGINE](pixelmap, width, height)[:1])
+        #
+        try:
+            dc = DifferentialComparison(["broken"])
+            self.assertEqual(dc.compareFrame("first", pixelmap), 1)
+            self.assertEqual(dc.compareFrame("second", pixelmap), 1)
+            self.assertEqual(dc.getDivergence("broken")["frame"], "first")
+        finally:
+            del ENGINES["broken"]
+
+        self.assertRaises(IOError, DifferentialComparison, ["nonsense"])
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_differential.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("======================================================")
+    lg.info(" Logger output from cernatschool/test_differential.py ")
+    lg.info("======================================================")
+    lg.info("")
+
+    unittest.main()
@@ -16,6 +16,9 @@ import json
 #...for the Pixelman dataset wrapper.
 from dataset import Dataset
 
+#...for the frames.
+from frame import Frame
+
 class FrameTest(unittest.TestCase):
 
     def setUp(self):
@@ -115,6 +118,50 @@ class FrameTest(unittest.TestCase):
         self.assertEqual(frames[0].getNumberOfTetrapixelGammas(), 0)
         self.assertEqual(frames[0].getNumberOfNonGammas(), 0)
 
+    def test_lazy_frame(self):
+
+        ## The pixels (one masked) - a three-pixel cluster and a single pixel.
+        pixelmap = {256 * 10 + 10 : 5, 256 * 10 + 11 : 6, 256 * 11 + 10 : 7, 256 * 50 + 50 : 8}
+
+        kwargs = {"lat" : 51.5, "lon" : -0.1, "alt" : 34.5, \
+                  "chipid" : "E09-W0211", "biasvoltage" : 94.5, "ikrum" : 1, \
+                  "starttime" : 1375181535.9999997, "acqtime" : 0.5, "format" : 4114, \
+                  "pixelmap" : pixelmap, "pixelmask" : {256 * 50 + 50 : 1}, "roll" : 12.0}
+
+        ## A frame that hasn't been clustered yet (and without "ismc").
+        f = Frame(**kwargs)
+
+        # The tests
+        #-----------
+        self.assertEqual(f.isMC(), False)
+        self.assertEqual(f.getRoll(), 12.0)
+        self.assertEqual(f.getPitch(), 0.0)
+        self.assertEqual(f.getStartTimeSec(), 1375181536)
+        self.assertEqual(f.getStartTimeSubSec(), 0)
+        self.assertEqual(f.getStartTimeS(), "Tue Jul 30 10:52:16.000000 2013")
+        self.assertEqual(f.getNumberOfUnmaskedPixels(), 3)
+        #
+        # The clustering is done (once) when first needed.
+        self.assertTrue(f.getKlusterFinder() is f.cluster())
+        self.assertEqual(f.getNumberOfKlusters(), 1)
+        self.assertEqual(f.getNumberOfNonGammas(), 0)
+
+        # Metadata only.
+        kwargs["skipclustering"] = True
+        #
+        self.assertEqual(Frame(**kwargs).getNumberOfKlusters(), -1)
+        self.assertEqual(Frame(**kwargs).cluster(), None)
+
+        # Only the optional properties are kept (not the pixels etc.).
+        self.assertEqual(f._Frame__optional, {"roll" : 12.0})
+
+        # The optional properties must be numbers.
+        kwargs["pitch"] = "up a bit"
+        #
+        with self.assertRaises(IOError) as cm:
+            Frame(**kwargs)
+        self.assertEqual(str(cm.exception), "FRAME_BAD_ORIENTATION")
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary output directory.
+import tempfile, shutil
+
+#...for the cluster galleries.
+from gallery import KlusterGallery, getGalleryPageName
+
+class GalleryTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The temporary output directory.
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pages(self):
+
+        g = KlusterGallery(self.tmpdir, "Beta", "Beta clusters", "../clusters", pagesize=10)
+
+        for i in range(25):
+            g.add("k%05d" % (i))
+
+        g.close()
+
+        # The tests
+        #-----------
+        self.assertEqual(g.getNumberOfKlusters(), 25)
+        self.assertEqual(g.getNumberOfPages(), 3)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["Beta.html", "Beta_2.html", "Beta_3.html"])
+
+        with open(os.path.join(self.tmpdir, "Beta_2.html"), "r") as f:
+            pg = f.read()
+
+        self.assertEqual(pg.count("<img "), 10)
+        self.assertTrue("../clusters/k00010.png" in pg)
+        self.assertTrue("href=\"Beta.html\"" in pg)
+        self.assertTrue("href=\"Beta_3.html\"" in pg)
+
+        # The last page has no next page.
+        with open(os.path.join(self.tmpdir, "Beta_3.html"), "r") as f:
+            pg = f.read()
+        self.assertEqual(pg.count("<img "), 5)
+        self.assertFalse("Next" in pg)
+
+    def test_empty_gallery(self):
+
+        g = KlusterGallery(self.tmpdir, "Alpha", "Alpha clusters", "../clusters")
+        g.close()
+
+        # The tests
+        #-----------
+        self.assertEqual(getGalleryPageName("Alpha", 1), "Alpha.html")
+        self.assertEqual(os.listdir(self.tmpdir), ["Alpha.html"])
+        self.assertEqual(g.getNumberOfPages(), 1)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_gallery.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_gallery.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the handlers.
+from handlers import getPixelmanTime, getPixelmanTimeArrays, getPixelmanTimeString, \
+    isStartTimeStringValid
+
+class HandlersTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_pixelman_time(self):
+
+        sec, sub, sts = getPixelmanTimeString(1375181535.850145)
+
+        # The tests
+        #-----------
+        self.assertEqual(sec, 1375181535)
+        self.assertEqual(sub, 850145)
+        self.assertEqual(sts, "Tue Jul 30 10:52:15.850145 2013")
+        self.assertTrue(isStartTimeStringValid(sts))
+
+        # Times that round up to the next second.
+        self.assertEqual(getPixelmanTime(1375181535.9999997), (1375181536, 0))
+        self.assertEqual(getPixelmanTime(1375181535.996), (1375181535, 996000))
+
+    def test_pixelman_time_arrays(self):
+
+        st = np.concatenate([1375181535.0 + np.random.RandomState(42).uniform(0.0, 1.0e5, 1000), \
+            [1375181535.9999997, 1375181535.996, 1375181535.0]])
+
+        secs, subs = getPixelmanTimeArrays(st)
+
+        # The tests
+        #-----------
+        self.assertEqual(zip(secs, subs), [getPixelmanTime(t) for t in st])
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_handlers.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("==================================================")
+    lg.info(" Logger output from cernatschool/test_handlers.py ")
+    lg.info("==================================================")
+    lg.info("")
+
+    unittest.main()
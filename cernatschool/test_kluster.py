@@ -124,6 +124,51 @@ class KlusterTest(unittest.TestCase):
         # Is it an edge cluster?
         self.assertEqual(ks[0].isEdgeCluster(), False)
 
+    def test_gamma_fast_path(self):
+
+        ## The dataset wrapper.
+        ds = Dataset("data/sr/0-00_mm/ASCIIxyC/")
+
+        for f in ds.getFrames((0.0, 0.0, 0.0), skipclustering=True)[:10]:
+
+            ## The cluster finder keeping all of the clusters.
+            kf_all = KlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False)
+
+            ## The cluster finder that only counts the gamma candidates.
+            kf = KlusterFinder(f.getPixelMap(), f.getWidth(), f.getHeight(), False, keepgammas=False)
+
+            ## The clusters that aren't gamma candidates (and their indices).
+            kept = [(i, k) for i, k in enumerate(kf_all.getListOfKlusters()) if not k.isGamma()]
+
+            # The tests
+            #-----------
+            self.assertEqual(kf.getNumberOfKlusters(), kf_all.getNumberOfKlusters())
+            self.assertEqual(kf.getNumberOfGammas(), kf_all.getNumberOfGammas())
+            self.assertEqual(kf.getNumberOfMonopixels(), kf_all.getNumberOfMonopixels())
+            self.assertEqual(kf.getNumberOfBipixels(), kf_all.getNumberOfBipixels())
+            self.assertEqual(kf.getNumberOfTripixelGammas(), kf_all.getNumberOfTripixelGammas())
+            self.assertEqual(kf.getNumberOfTetrapixelGammas(), kf_all.getNumberOfTetrapixelGammas())
+            #
+            # Only the clusters that aren't gamma candidates are kept,
+            # with the same indices as when all of the clusters are kept.
+            self.assertEqual(kf.getKlusterIndices(), [i for i, k in kept])
+            self.assertEqual([k.getKlusterPropertiesJson() for k in kf.getListOfKlusters()], \
+                             [k.getKlusterPropertiesJson() for i, k in kept])
+            self.assertEqual(kf_all.getKlusterIndices(), range(kf_all.getNumberOfKlusters()))
+
+    def test_total_counts(self):
+
+        ## A three pixel track and a single pixel {X:C}.
+        pixels = {(256 * 10) + 10 : 10, (256 * 10) + 11 : 20, (256 * 10) + 12 : 40, (256 * 100) + 100 : 5}
+
+        kf = KlusterFinder(pixels, 256, 256, False)
+
+        # The tests
+        #-----------
+        # The total counts are the sums of each cluster's own pixel counts.
+        self.assertEqual(sorted([k.getTotalCounts() for k in kf.getListOfKlusters()]), [5, 70])
+        self.assertEqual(sorted([k.getMaxCountValue() for k in kf.getListOfKlusters()]), [5, 40])
+
 
 if __name__ == "__main__":
 
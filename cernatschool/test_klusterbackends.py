@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for the cluster finding backends.
+from klusterbackends import getKlusterBackend, getKlusterBackendNames, registerKlusterBackend, \
+    findBlobsReference, findBlobsUnionFind, TiledKlusterBackend, KLUSTER_BACKENDS
+
+#...for the synthetic (multi-chip) frames.
+from synthetic import SyntheticFrameGenerator
+
+#...for the cluster finder.
+from kluster import KlusterFinder
+
+def getBlobSet(blobs):
+    """ The clusters as a set of (frozen) sets of pixels. """
+    return set([frozenset(xys) for xys in blobs])
+
+class KlusterBackendsTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_backends_agree(self):
+
+        ## The pixel maps to test - the first frames of a dataset...
+        pixelmaps = [f.getPixelMap() for f in \
+            Dataset("data/sr/0-00_mm/ASCIIxyC/").getFrames((0.0, 0.0, 0.0), skipclustering=True)[:10]]
+
+        # ...an empty frame, the corners and edges and a diagonal line.
+        pixelmaps.append({})
+        pixelmaps.append({0:1, 255:1, 256*255:1, 256*256-1:1, 256*255-1:1, 256:1, 257:1})
+        pixelmaps.append(dict([(256 * i + i, 5) for i in range(256)]))
+
+        for name in getKlusterBackendNames():
+            for pixelmap in pixelmaps:
+
+                ref = findBlobsReference(pixelmap, 256, 256)
+
+                blobs = getKlusterBackend(name)(pixelmap, 256, 256)
+
+                # The tests
+                #-----------
+                self.assertEqual(getBlobSet(blobs), getBlobSet(ref))
+                self.assertEqual(sum([len(xys) for xys in blobs]), len(pixelmap))
+
+    def test_kluster_finder(self):
+
+        ## The pixel map - an L-shaped tripixel and a pair on the edge.
+        pixelmap = {256 * 10 + 10 : 20, 256 * 10 + 11 : 30, 256 * 11 + 10 : 40, 0 : 5, 1 : 6}
+
+        for name in getKlusterBackendNames() + ["auto"]:
+
+            kf = KlusterFinder(pixelmap, 256, 256, False, backend=name)
+
+            ## The clusters found.
+            kls = kf.getListOfKlusters()
+
+            # The tests
+            #-----------
+            self.assertEqual(kf.getNumberOfKlusters(), 2)
+            self.assertEqual([kl.getNumberOfPixels() for kl in kls], [3, 2])
+            self.assertEqual([kl.getTotalCounts() for kl in kls], [90, 11])
+
+    def test_tiled(self):
+
+        # Quad and hexa chip sized frames (and one that isn't a whole number of tiles).
+        for width, height in [(512, 512), (1024, 1024), (700, 300)]:
+
+            X, C = SyntheticFrameGenerator(width, height, occupancy=0.05, seed=width + height).makeFrame()
+
+            ## The pixel map.
+            pixelmap = dict(zip(X.tolist(), C.tolist()))
+
+            ## The clusters found without tiles.
+            ref = findBlobsUnionFind(pixelmap, height, width)
+
+            # Small tiles mean many clusters cross the tile boundaries.
+            for tilesize, jobs in [(256, 1), (100, 2), (7, 1)]:
+
+                blobs = TiledKlusterBackend(tilesize, jobs)(pixelmap, height, width)
+
+                # The tests
+                #-----------
+                self.assertEqual(blobs, ref)
+
+        # A line crossing the corners of four tiles.
+        pixelmap = dict([(512 * i + i, 5) for i in range(250, 262)])
+        #
+        self.assertEqual(TiledKlusterBackend(256, 1)(pixelmap, 512, 512), [sorted(pixelmap.keys())])
+
+        self.assertRaises(IOError, TiledKlusterBackend, 0)
+
+    def test_large_frames(self):
+
+        ## A 512 x 512 frame - a tripixel on the (old) 256 x 256 edge
+        #  and a pair on the frame's own edge.
+        pixelmap = {512 * 100 + 255 : 20, 512 * 100 + 256 : 30, 512 * 101 + 255 : 40, 512 * 511 + 3 : 5, 512 * 511 + 4 : 6}
+
+        kf = KlusterFinder(pixelmap, 512, 512, False, backend="tiled")
+
+        ## The clusters found.
+        kls = kf.getListOfKlusters()
+
+        # The tests
+        #-----------
+        self.assertEqual([kl.getNumberOfPixels() for kl in kls], [3, 2])
+        self.assertEqual([kl.isEdgeCluster() for kl in kls], [False, True])
+        self.assertEqual([(kl.getXMin(), kl.getYMin()) for kl in kls], [(255.0, 100.0), (3.0, 511.0)])
+        self.assertAlmostEqual(kls[0].getXUW(), 255.0 + 1.0 / 3.0)
+
+    def test_registry(self):
+
+        # Unknown backends are rejected.
+        self.assertRaises(IOError, getKlusterBackend, "nonsense")
+
+        # "auto" picks one of the available backends.
+        self.assertTrue(getKlusterBackend("auto") in KLUSTER_BACKENDS.values())
+
+        # New backends can be added.
+        registerKlusterBackend("test", findBlobsReference)
+        #
+        try:
+            self.assertTrue("test" in getKlusterBackendNames())
+            self.assertEqual(getKlusterBackend("test"), findBlobsReference)
+        finally:
+            del KLUSTER_BACKENDS["test"]
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_klusterbackends.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=========================================================")
+    lg.info(" Logger output from cernatschool/test_klusterbackends.py ")
+    lg.info("=========================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary test files.
+import tempfile, shutil
+
+# Import the JSON library.
+import json
+
+#...for the MATH.
+import numpy as np
+
+#...for the cluster properties.
+from klusterhelpers import KlusterProperties, iterKlusterJson, getCachePath
+
+def makeKlusters(n):
+    """ Make a list of (fake) cluster property dictionaries. """
+    ks = []
+    for i in range(n):
+        ks.append({
+            "id"            : "k%05d" % (i),
+            "size"          : 1 + (i % 30),
+            "xmin"          : float(i % 250),
+            "xmax"          : float(i % 250) + 5.0,
+            "ymin"          : 10.0,
+            "ymax"          : 20.0,
+            "width"         : 6.0,
+            "height"        : 11.0,
+            "x_uw"          : float(i % 250) + 2.5,
+            "y_uw"          : 15.0,
+            "radius_uw"     : 0.1 * (i % 40),
+            "density_uw"    : 1.0 / (1.0 + i),
+            "totalcounts"   : 10 * i,
+            "maxcounts"     : float(i % 100),
+            "lin_m"         : 0.5,
+            "lin_c"         : 1.0,
+            "lin_sumofres"  : 2.0,
+            "lin_linearity" : 0.01 * (i % 100),
+            "n_edgepixels"  : i % 7,
+            "edgefrac"      : 0.25,
+            "innerfrac"     : 0.75,
+            "ismc"          : False,
+            "isedgekluster" : (i % 250) == 0
+            })
+    return ks
+
+class KlusterPropertiesTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The temporary directory.
+        self.tmpdir = tempfile.mkdtemp()
+
+        ## The clusters.
+        self.ks = makeKlusters(1000)
+
+        ## The path to the cluster JSON file.
+        self.jsonpath = os.path.join(self.tmpdir, "klusters.json")
+
+        with open(self.jsonpath, "w") as jf:
+            json.dump(self.ks, jf)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_streaming(self):
+
+        # The tests
+        #-----------
+
+        # Small blocks make the clusters straddle the block boundaries.
+        self.assertEqual(list(iterKlusterJson(self.jsonpath, blocksize=100)), self.ks)
+
+        emptypath = os.path.join(self.tmpdir, "empty.json")
+        with open(emptypath, "w") as jf:
+            jf.write("[]")
+        self.assertEqual(list(iterKlusterJson(emptypath)), [])
+
+        with open(emptypath, "w") as jf:
+            jf.write("[{\"size\": 1}, {\"size\"")
+        self.assertRaises(IOError, list, iterKlusterJson(emptypath))
+
+    def test_columns(self):
+
+        kp = KlusterProperties(self.jsonpath)
+
+        ## The non-edge clusters.
+        inner = [k for k in self.ks if not k["isedgekluster"]]
+
+        # The tests
+        #-----------
+        self.assertEqual(kp.get_number_of_klusters(), len(inner))
+        self.assertEqual(list(kp.get_cluster_size_list()), [k["size"] for k in inner])
+        self.assertTrue(np.allclose(kp.get_cluster_radius_u_list(), [k["radius_uw"] for k in inner]))
+        self.assertEqual(kp.get_cluster_counts_list().dtype, np.int64)
+
+        # The energies are missing from the file, so are zero.
+        self.assertEqual(kp.get_column("totalenergy").sum(), 0.0)
+
+        # The accessors return the arrays themselves.
+        self.assertTrue(kp.get_cluster_size_list() is kp.get_column("size"))
+
+        # Selecting with a mask.
+        big = kp.get_subset(kp.get_column("size") > 25)
+        self.assertEqual(big.get_number_of_klusters(), len([k for k in inner if k["size"] > 25]))
+        self.assertTrue((big.get_cluster_size_list() > 25).all())
+
+        self.assertEqual(KlusterProperties(self.jsonpath, includeedges=True).get_number_of_klusters(), 1000)
+
+    def test_cache(self):
+
+        kp = KlusterProperties(self.jsonpath, usecache=True)
+
+        # The tests
+        #-----------
+        self.assertTrue(os.path.exists(getCachePath(self.jsonpath)))
+
+        # The cached columns are the same as those from the JSON.
+        kc = KlusterProperties(self.jsonpath, usecache=True)
+        for name in kp.get_column_names():
+            self.assertTrue(np.array_equal(kp.get_column(name), kc.get_column(name)))
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_klusterhelpers.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("========================================================")
+    lg.info(" Logger output from cernatschool/test_klusterhelpers.py ")
+    lg.info("========================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the processing metrics.
+from metrics import ProcessingMetrics, PROCESSING_STAGES
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_stages_and_counters(self):
+
+        m = ProcessingMetrics("0-00_mm")
+
+        with m.stage("cluster"):
+            sum(range(100000))
+
+        m.increment("frames")
+        m.increment("pixels", 42)
+
+        # The tests
+        #-----------
+        self.assertEqual(m.getName(), "0-00_mm")
+        self.assertTrue(m.getWallTime("cluster") > 0.0)
+        self.assertEqual(m.getWallTime("render"), 0.0)
+        self.assertEqual(m.getCount("frames"), 1)
+        self.assertEqual(m.getCount("pixels"), 42)
+        self.assertEqual(m.getCount("clusters"), 0)
+
+        j = m.getJson()
+        self.assertEqual(sorted(j["stages"].keys()), sorted(PROCESSING_STAGES))
+        self.assertEqual(j["counts"]["pixels"], 42)
+
+        # The summary (with and without the frame rate).
+        self.assertTrue(m.getSummaryLines()[-1].endswith("[frames/s]"))
+        self.assertEqual([l for l in m.getSummaryLines(framerate=False) if "frames/s" in l], [])
+
+        # Moving time between the stages.
+        wall = m.getWallTime("cluster"); cpu = m.getCpuTime("cluster")
+        #
+        m.moveTime("cluster", "properties", wall / 4.0, cpu / 4.0)
+        #
+        self.assertAlmostEqual(m.getWallTime("cluster"), wall * 0.75)
+        self.assertAlmostEqual(m.getWallTime("properties"), wall / 4.0)
+        self.assertAlmostEqual(m.getCpuTime("properties"), cpu / 4.0)
+
+        # Unknown stages and counters are not allowed.
+        self.assertRaises(KeyError, m.increment, "muons")
+        self.assertRaises(KeyError, m.moveTime, "cluster", "muons", 0.0, 0.0)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_metrics.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_metrics.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary data files.
+import tempfile, shutil
+
+#...for the MATH.
+import numpy as np
+
+#...for the occupancy maps.
+from occupancy import OccupancyMap, loadOccupancyMap, readMaskFile, writeMaskFile
+
+#...for reading the data files.
+from helpers import getPixelArrays
+
+def writeFrames(path, nframes):
+    """ Write (random) ASCII [x, y, C] data files with a hot pixel at (10, 20). """
+
+    rs = np.random.RandomState(42)
+
+    ## The paths to the data files.
+    paths = []
+
+    for i in range(nframes):
+        X = rs.choice(256 * 256, 50, replace=False)
+        X = np.union1d(X, [256 * 20 + 10])
+        fn = "%s/data%03d.txt" % (path, i)
+        with open(fn, "w") as df:
+            for x in X:
+                df.write("%d\t%d\t%d\n" % (x % 256, x / 256, 5))
+        paths.append(fn)
+
+    # An empty frame.
+    fn = "%s/data%03d.txt" % (path, nframes)
+    open(fn, "w").close()
+    paths.append(fn)
+
+    return paths
+
+class OccupancyTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The temporary directory for the data files.
+        self.path = tempfile.mkdtemp()
+
+        ## The data files.
+        self.paths = writeFrames(self.path, 40)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_pixel_arrays(self):
+
+        X, C = getPixelArrays(self.paths[0], 4114)
+
+        # The tests
+        #-----------
+        self.assertEqual(len(X), 51)
+        self.assertTrue((256 * 20 + 10) in X)
+        self.assertEqual(list(C), [5] * 51)
+
+        X, C = getPixelArrays(self.paths[-1], 4114)
+
+        self.assertEqual(len(X), 0)
+
+    def test_occupancy(self):
+
+        om = OccupancyMap()
+
+        om.addDataFiles(self.paths, 4114, batchsize=7)
+
+        # The tests
+        #-----------
+        self.assertEqual(om.getNumberOfFrames(), 41)
+        self.assertEqual(om.getHits().sum(), 40 * 51)
+        self.assertEqual(om.getCounts().sum(), 40 * 51 * 5)
+        self.assertEqual(om.getHitMap()[20, 10], 40)
+        self.assertEqual(om.getCountMap()[20, 10], 200)
+
+        # Only the hot pixel is noisy.
+        self.assertEqual(list(om.getNoisyPixels()), [256 * 20 + 10])
+
+    def test_merge_and_save(self):
+
+        om = OccupancyMap()
+        om.addDataFiles(self.paths, 4114)
+
+        om_a = OccupancyMap(); om_a.addDataFiles(self.paths[:15], 4114)
+        om_b = OccupancyMap(); om_b.addDataFiles(self.paths[15:], 4114)
+
+        om_a.merge(om_b)
+
+        om_a.save(self.path + "/occupancy.npz")
+
+        om_c = loadOccupancyMap(self.path + "/occupancy.npz")
+
+        # The tests
+        #-----------
+        self.assertEqual(om_c.getNumberOfFrames(), om.getNumberOfFrames())
+        self.assertTrue(np.array_equal(om_c.getHits(), om.getHits()))
+        self.assertTrue(np.array_equal(om_c.getCounts(), om.getCounts()))
+
+        self.assertRaises(IOError, om.merge, OccupancyMap(128, 128))
+
+    def test_mask_file(self):
+
+        writeMaskFile(self.path + "/masked_pixels.txt", [256 * 20 + 10, 3, 3])
+
+        # The tests
+        #-----------
+        self.assertEqual(open(self.path + "/masked_pixels.txt").read(), "3\t0\n10\t20\n")
+        self.assertEqual(readMaskFile(self.path + "/masked_pixels.txt"), {3 : 1, 256 * 20 + 10 : 1})
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_occupancy.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===================================================")
+    lg.info(" Logger output from cernatschool/test_occupancy.py ")
+    lg.info("===================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary folders.
+import tempfile, shutil
+
+#...for the MATH.
+import numpy as np
+
+#...for the frame payloads.
+from payload import FramePayload, getPayloadFromPixelMap, getPayloadFromDataFile, getPayloadFromString
+
+#...for writing (and reading) the data files.
+from helpers import writeDataFile, getPixelArraysFromString
+
+#...for the synthetic frames.
+from synthetic import SyntheticFrameGenerator
+
+#...for the cluster finder.
+from kluster import KlusterFinder
+
+class PayloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_representations(self):
+
+        ## A sparse frame (unsorted, with an unhit pixel).
+        p = FramePayload(256, 256, [300, 5, 70000 % 65536, 7], [3, 1, 2, 0])
+
+        X, C = p.getArrays()
+
+        # The tests
+        #-----------
+        self.assertFalse(p.isDense())
+        self.assertEqual(p.getNumberOfPixels(), 3)
+        self.assertEqual(X.tolist(), [5, 300, 4464])
+        self.assertEqual(C.tolist(), [1, 3, 2])
+        self.assertEqual(p.getPixelMap(), {5 : 1, 300 : 3, 4464 : 2})
+        self.assertEqual(p.getCounts([300, 5]).tolist(), [3, 1])
+        self.assertEqual(p.getDense()[1, 44], 3)
+
+        # A busy frame is stored as a dense array.
+        dense = np.ones((256, 256), dtype=np.uint16)
+        dense[0, :10] = 0
+        #
+        p = FramePayload(256, 256, dense=dense)
+        #
+        self.assertTrue(p.isDense())
+        self.assertTrue(np.may_share_memory(p.getDense(), dense))
+        self.assertEqual(p.getNumberOfPixels(), 65536 - 10)
+        self.assertEqual(p.getArrays()[0][0], 10)
+
+        # Masking.
+        masked = p.mask({10 : 1, 11 : 1})
+        #
+        self.assertEqual(masked.getNumberOfPixels(), 65536 - 12)
+        self.assertEqual(p.getNumberOfPixels(), 65536 - 10)
+        self.assertTrue(p.mask({}) is p)
+
+        # The sparse arrays are used below the threshold.
+        self.assertFalse(FramePayload(256, 256, dense=dense, threshold=1.1).isDense())
+
+    def test_data_files(self):
+
+        g = SyntheticFrameGenerator(occupancy=0.4, seed=5)
+
+        X, C = g.makeFrame()
+
+        for dataformat in [4114, 8210, 18]:
+
+            fn = os.path.join(self.tmpdir, "data%d.txt" % (dataformat))
+
+            writeDataFile(fn, X, C, dataformat)
+
+            p = getPayloadFromDataFile(fn, dataformat)
+
+            # The tests
+            #-----------
+            self.assertTrue(p.isDense())
+            self.assertEqual(p.getArrays()[0].tolist(), X.tolist())
+            self.assertEqual(p.getArrays()[1].tolist(), C.tolist())
+
+    def test_bad_data_files(self):
+
+        # The tests
+        #-----------
+        # A value that isn't an integer (the rest of the frame would be lost).
+        for text in ["1\t2\t3\n4\t5\t6\nx\t8\t9\n10\t11\t12\n", "1\t2\t3\n4\t5\t6.5\n"]:
+            with self.assertRaises(IOError) as cm:
+                getPayloadFromString(text, 4114)
+            self.assertEqual(str(cm.exception), "FRAME_BAD_FORMAT")
+            #
+            self.assertRaises(IOError, getPixelArraysFromString, text, 4114)
+
+        # A row that's cut short.
+        with self.assertRaises(IOError) as cm:
+            getPayloadFromString("1\t2\t3\n4\t5\n", 4114)
+        self.assertEqual(str(cm.exception), "FRAME_BAD_FORMAT")
+        #
+        self.assertRaises(IOError, getPixelArraysFromString, "1\t2\t3\n4\t5\n", 4114)
+        self.assertRaises(IOError, getPayloadFromString, "1\t3\n4\n", 8210)
+        self.assertRaises(IOError, getPixelArraysFromString, "0 1 2\n", 18)
+
+        # An empty frame is fine.
+        self.assertEqual(getPayloadFromString("", 4114).getNumberOfPixels(), 0)
+
+    def test_duplicate_pixels(self):
+
+        ## A frame with the pixel (1, 2) listed twice.
+        p = getPayloadFromString("1\t2\t3\n7\t0\t5\n1\t2\t9\n", 4114)
+
+        # The tests
+        #-----------
+        # The last count is kept, as in the pixel map.
+        self.assertEqual(p.getNumberOfPixels(), 2)
+        self.assertEqual(p.getPixelMap(), {7 : 5, 513 : 9})
+        self.assertEqual(p.getCounts(np.array([513, 7])).tolist(), [9, 5])
+        #
+        self.assertEqual(FramePayload(256, 256, [5, 5, 5], [1, 2, 0]).getPixelMap(), {})
+        self.assertEqual(FramePayload(256, 256, [9, 5, 9], [1, 2, 4]).getPixelMap(), {5 : 2, 9 : 4})
+
+    def test_clustering(self):
+
+        g = SyntheticFrameGenerator(occupancy=0.02, seed=6)
+
+        X, C = g.makeFrame()
+
+        ## The pixel mask.
+        mask = dict([(x, 1) for x in X[::50].tolist()])
+
+        ## The pixel map.
+        pixelmap = dict(zip(X.tolist(), C.tolist()))
+
+        ## The payload (made dense, whatever the occupancy).
+        payload = getPayloadFromPixelMap(pixelmap, threshold=0.0)
+
+        self.assertTrue(payload.isDense())
+
+        # The reference - the cluster finder run on the pixel map.
+        ref = KlusterFinder(pixelmap, 256, 256, False, mask, backend="ndimage")
+
+        for backend in ["reference", "unionfind", "ndimage"]:
+
+            kf = KlusterFinder(payload, 256, 256, False, mask, backend=backend)
+
+            # The tests
+            #-----------
+            self.assertEqual(kf.getNumberOfKlusters(), ref.getNumberOfKlusters())
+            self.assertEqual(sorted([(kl.getNumberOfPixels(), kl.getTotalCounts()) for kl in kf.getListOfKlusters()]), \
+                sorted([(kl.getNumberOfPixels(), kl.getTotalCounts()) for kl in ref.getListOfKlusters()]))
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_payload.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_payload.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for slowing down the "reading".
+import time
+
+#...for the read-ahead.
+from prefetch import Prefetcher
+
+def slowSquare(i):
+    """ A stand-in for reading a file. """
+    time.sleep(0.001 * (i % 3))
+    return i * i
+
+def failOnFive(i):
+    if i == 5:
+        raise IOError("BAD_ITEM")
+    return i
+
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_order_and_depth(self):
+
+        pf = Prefetcher(slowSquare, range(50), depth=4, threads=3)
+
+        # The tests
+        #-----------
+
+        # The results come back in the order the items were supplied.
+        self.assertEqual(list(pf), [i * i for i in range(50)])
+
+        self.assertEqual(pf.getNumberOfThreads(), 3)
+        self.assertTrue(pf.getMaxItemsInHand() <= 4)
+
+    def test_memory_ceiling(self):
+
+        # Each item is 0.4 MB, so only two fit under the 1 MB ceiling.
+        pf = Prefetcher(slowSquare, range(20), depth=8, threads=4, maxmb=1.0, \
+            sizer=lambda i: 400 * 1024)
+
+        # The tests
+        #-----------
+        self.assertEqual(list(pf), [i * i for i in range(20)])
+        self.assertEqual(pf.getMaxItemsInHand(), 2)
+        self.assertTrue(pf.getMaxBytesInHand() <= 1024 * 1024)
+
+        # A single item bigger than the ceiling is still read.
+        pf = Prefetcher(slowSquare, range(3), depth=8, maxmb=0.1, sizer=lambda i: 400 * 1024)
+        self.assertEqual(list(pf), [0, 1, 4])
+        self.assertEqual(pf.getMaxItemsInHand(), 1)
+
+    def test_errors(self):
+
+        pf = Prefetcher(failOnFive, range(10), depth=3)
+
+        ## The results read before the error.
+        read = []
+
+        # The tests
+        #-----------
+        with self.assertRaises(IOError):
+            for r in pf:
+                read.append(r)
+
+        self.assertEqual(read, range(5))
+
+        self.assertRaises(ValueError, Prefetcher, failOnFive, range(10), 0)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_prefetch.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("==================================================")
+    lg.info(" Logger output from cernatschool/test_prefetch.py ")
+    lg.info("==================================================")
+    lg.info("")
+
+    unittest.main()
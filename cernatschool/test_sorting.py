@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the cluster sorting.
+from sorting import getKlusterType, sortKlusters, getKlusterTypeIndices, KLUSTER_TYPES
+
+#...for the MATH.
+import numpy as np
+
+def makeKluster(kid, size, radius, xmin=100.0, xmax=110.0, ymin=100.0, ymax=110.0):
+    """ Make a (minimal) cluster properties dictionary. """
+    return {"id" : kid, "size" : size, "radius_uw" : radius, \
+            "xmin" : xmin, "xmax" : xmax, "ymin" : ymin, "ymax" : ymax}
+
+class SortingTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_kluster_types(self):
+
+        # The tests
+        #-----------
+        self.assertEqual(getKlusterType(makeKluster("a", 1, 0.0)), "Gamma")
+        self.assertEqual(getKlusterType(makeKluster("b", 2, 0.5)), "Gamma")
+        self.assertEqual(getKlusterType(makeKluster("c", 3, 0.745)), "Gamma")
+        self.assertEqual(getKlusterType(makeKluster("d", 3, 0.75)), "Gamma")
+        self.assertEqual(getKlusterType(makeKluster("e", 3, 0.94)), "Beta")
+        self.assertEqual(getKlusterType(makeKluster("f", 4, 0.71)), "Gamma")
+        self.assertEqual(getKlusterType(makeKluster("g", 4, 1.0)), "Beta")
+        self.assertEqual(getKlusterType(makeKluster("h", 25, 3.0)), "Beta")
+
+        # Clusters on the edge of the frame.
+        self.assertEqual(getKlusterType(makeKluster("i", 1, 0.0, xmin=0.0)), "Edge")
+        self.assertEqual(getKlusterType(makeKluster("j", 25, 3.0, ymax=255.0)), "Edge")
+
+        # Bigger (e.g. quad chip) frames have their edges further out.
+        self.assertEqual(getKlusterType(makeKluster("k", 25, 3.0, ymax=255.0), 512, 512), "Beta")
+        self.assertEqual(getKlusterType(makeKluster("l", 25, 3.0, xmax=511.0), 512, 512), "Edge")
+
+    def test_sort_klusters(self):
+
+        kd = [makeKluster("a", 1, 0.0), makeKluster("b", 25, 3.0), makeKluster("c", 30, 3.5), \
+              makeKluster("d", 5, 1.2, xmax=255.0)]
+
+        ks, counts = sortKlusters(kd)
+
+        # The tests
+        #-----------
+        self.assertEqual(ks, {"a" : "Gamma", "b" : "Beta", "c" : "Beta", "d" : "Edge"})
+        self.assertEqual(sorted(counts.keys()), sorted(KLUSTER_TYPES))
+        self.assertEqual(counts["Beta"], 2)
+        self.assertEqual(counts["Gamma"], 1)
+        self.assertEqual(counts["Edge"], 1)
+        self.assertEqual(counts["Alpha"], 0)
+
+    def test_kluster_type_indices(self):
+
+        kd = [makeKluster("a", 1, 0.0), makeKluster("b", 3, 0.75), makeKluster("c", 3, 0.94), \
+              makeKluster("d", 4, 0.71), makeKluster("e", 4, 1.0), makeKluster("f", 25, 3.0), \
+              makeKluster("g", 1, 0.0, xmin=0.0), makeKluster("h", 25, 3.0, ymax=255.0)]
+
+        ## The cluster property columns.
+        columns = {}
+        for name in ["size", "radius_uw", "xmin", "xmax", "ymin", "ymax"]:
+            columns[name] = np.array([k[name] for k in kd])
+
+        # The tests
+        #-----------
+        self.assertEqual([KLUSTER_TYPES[i] for i in getKlusterTypeIndices(columns)], \
+            [getKlusterType(k) for k in kd])
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_sorting.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from cernatschool/test_sorting.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
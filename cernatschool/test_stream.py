@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary folders.
+import tempfile, shutil
+
+#...for the MATH.
+import numpy as np
+
+#...for the hit streams.
+from stream import StreamKlusterer, iterHitChunks, writeHitFile, getStreamFormat, getStreamKlusterPropertiesJson
+
+#...for the synthetic frames.
+from synthetic import SyntheticFrameGenerator
+
+#...for the cluster finding.
+from klusterbackends import findBlobsUnionFind
+
+#...for the cluster finder.
+from kluster import KlusterFinder
+
+#...for the cluster properties.
+from helpers import getKlusterPropertiesJson
+
+def getKlusterSet(klusters):
+    """ The clusters as a set of (frozen) sets of pixels. """
+    return set([frozenset(k[0].tolist()) for k in klusters])
+
+def runStream(sk, X, toa, tot, chunksize):
+    """ Put the hits through the stream cluster finder a chunk at a time. """
+    klusters = []
+    for first in range(0, len(X), chunksize):
+        klusters += sk.addHits(X[first:first + chunksize], toa[first:first + chunksize], tot[first:first + chunksize])
+    return klusters + sk.flush()
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_formats(self):
+
+        X = np.array([5, 300, 257, 65535]); toa = np.array([10.0, 12.5, 1000.0, 4.0e9]); tot = np.array([1, 20, 300, 4000])
+
+        for streamformat in ["xytt", "t3pa"]:
+
+            fn = os.path.join(self.tmpdir, "hits.%s" % (streamformat))
+
+            writeHitFile(fn, X, toa, tot, streamformat)
+
+            ## The hits read back, three at a time.
+            chunks = list(iterHitChunks(fn, chunksize=3))
+
+            # The tests
+            #-----------
+            self.assertEqual(getStreamFormat(fn), streamformat)
+            self.assertEqual(np.concatenate([c[0] for c in chunks]).tolist(), X.tolist())
+            self.assertEqual(np.concatenate([c[2] for c in chunks]).tolist(), tot.tolist())
+            # (The t3pa ToA values are to the nearest fine ToA tick.)
+            self.assertTrue(np.allclose(np.concatenate([c[1] for c in chunks]), toa, atol=1.0))
+
+        fn = os.path.join(self.tmpdir, "bad.txt")
+        #
+        with open(fn, "w") as f:
+            f.write("1 2 3\n")
+        #
+        self.assertRaises(IOError, getStreamFormat, fn)
+
+    def test_bad_streams(self):
+
+        ## Five hits, one of them (in the middle of the file) not readable.
+        lines = ["1\t2\t10.0\t5\n", "3\t4\t11.0\t6\n", "bad\t5\t12.0\t7\n", "6\t7\t13.0\t8\n", "8\t9\t14.0\t9\n"]
+
+        fn = os.path.join(self.tmpdir, "hits.txt")
+
+        # The tests
+        #-----------
+        for bad in [lines[2], "5\t6\t12.0\n", "5\t6\t12.0\t7x\n"]:
+            with open(fn, "w") as f:
+                f.write("".join(lines[:2] + [bad] + lines[3:]))
+            #
+            with self.assertRaises(IOError) as cm:
+                list(iterHitChunks(fn, "xytt"))
+            self.assertEqual(str(cm.exception), "STREAM_BAD_FORMAT")
+
+        # A bad value at the end of the file.
+        with open(fn, "w") as f:
+            f.write("".join(lines[:2]) + "5\t6\t12.0\t7.5x")
+        #
+        with self.assertRaises(IOError) as cm:
+            list(iterHitChunks(fn, "xytt"))
+        self.assertEqual(str(cm.exception), "STREAM_BAD_FORMAT")
+
+    def test_time_window(self):
+
+        ## Two neighbouring pixels, then the first pixel again much later.
+        X = np.array([1000, 1001, 1000]); tot = np.array([10, 20, 30])
+
+        # The tests
+        #-----------
+        klusters = runStream(StreamKlusterer(window=100.0), X, np.array([0.0, 50.0, 5000.0]), tot, 10)
+        #
+        self.assertEqual([k[0].tolist() for k in klusters], [[1000, 1001], [1000]])
+
+        # Too far apart in time to join.
+        klusters = runStream(StreamKlusterer(window=10.0), X, np.array([0.0, 50.0, 5000.0]), tot, 10)
+        #
+        self.assertEqual(len(klusters), 3)
+
+        # Hits in the same pixel are added together.
+        klusters = runStream(StreamKlusterer(window=100.0), X[[0, 2]], np.array([0.0, 20.0]), tot[[0, 2]], 10)
+        #
+        p = getStreamKlusterPropertiesJson("k", *klusters[0])
+        #
+        self.assertEqual(p["size"], 1)
+        self.assertEqual(p["totalcounts"], 40)
+        self.assertEqual(p["toa"], 0.0)
+        self.assertEqual(p["duration"], 20.0)
+
+        self.assertRaises(IOError, StreamKlusterer, window=-1.0)
+
+    def test_frames(self):
+
+        g = SyntheticFrameGenerator(occupancy=0.01, seed=11)
+
+        rs = np.random.RandomState(12)
+
+        ## The hits and the clusters of each frame.
+        Xs = []; toas = []; tots = []; ref = set()
+
+        # Each frame's hits arrive within 50 ns, a (long) millisecond apart.
+        for i in range(10):
+
+            X, C = g.makeFrame()
+
+            ref |= getKlusterSet([(np.array(b),) for b in findBlobsUnionFind(dict(zip(X.tolist(), C.tolist())), 256, 256)])
+
+            Xs.append(X); tots.append(C); toas.append(i * 1.0e6 + rs.uniform(0.0, 50.0, len(X)))
+
+        X = np.concatenate(Xs); toa = np.concatenate(toas); tot = np.concatenate(tots)
+
+        # Shuffle the hits (within the allowed disorder).
+        order = np.argsort(toa + rs.uniform(0.0, 500.0, len(toa)))
+        #
+        X = X[order]; toa = toa[order]; tot = tot[order]
+
+        for chunksize in [100, 1234, len(X)]:
+
+            sk = StreamKlusterer(window=100.0, disorder=1000.0)
+
+            klusters = runStream(sk, X, toa, tot, chunksize)
+
+            # The tests
+            #-----------
+            self.assertEqual(getKlusterSet(klusters), ref)
+            self.assertEqual(sk.getNumberOfHits(), len(X))
+            self.assertEqual(sk.getNumberOfLateHits(), 0)
+            self.assertEqual(sk.getNumberOfBufferedHits(), 0)
+
+            # Only (about) one frame's hits are kept at a time.
+            if chunksize < len(X):
+                self.assertTrue(sk.getMaxBufferedHits() < 2 * max([len(x) for x in Xs]) + chunksize)
+
+        # Masked pixels are left out.
+        sk = StreamKlusterer(window=100.0, maskdict={int(X[0]) : 1})
+        #
+        self.assertEqual(sum([len(k[0]) for k in runStream(sk, X, toa, tot, 1000)]), len(X) - np.count_nonzero(X == X[0]))
+
+    def test_properties(self):
+
+        X, C = SyntheticFrameGenerator(occupancy=0.01, seed=13).makeFrame()
+
+        ## The cluster finder (for the frame).
+        kf = KlusterFinder(dict(zip(X.tolist(), C.tolist())), 256, 256, False)
+
+        ## The frame's cluster properties {pixels:properties}.
+        ref = {}
+        #
+        for kl in kf.getListOfKlusters():
+            ref[frozenset(kl.get_pixel_xy_list())] = getKlusterPropertiesJson("k", kl)
+
+        # All of the hits at once.
+        klusters = runStream(StreamKlusterer(), X, np.zeros(len(X)), C, len(X))
+
+        self.assertEqual(len(klusters), len(ref))
+
+        for k in klusters:
+
+            p = getStreamKlusterPropertiesJson("k", *k)
+
+            r = ref[frozenset(k[0].tolist())]
+
+            # The tests
+            #-----------
+            self.assertEqual(set(p.keys()), set(r.keys()) | set(["toa", "duration"]))
+            for name in ["size", "xmin", "ymax", "totalcounts", "isedgekluster", "n_edgepixels"]:
+                self.assertEqual(p[name], r[name])
+            for name in ["x_uw", "radius_uw", "lin_linearity"]:
+                self.assertAlmostEqual(p[name], r[name])
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_stream.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("================================================")
+    lg.info(" Logger output from cernatschool/test_stream.py ")
+    lg.info("================================================")
+    lg.info("")
+
+    unittest.main()
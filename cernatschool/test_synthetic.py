@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary folders.
+import tempfile, shutil
+
+#...for the MATH.
+import numpy as np
+
+#...for the synthetic frames.
+from synthetic import SyntheticFrameGenerator, writeSyntheticDataPoint
+
+#...for the Pixelman dataset wrapper.
+from dataset import Dataset
+
+#...for reading the data files.
+from helpers import getPixelArrays
+
+#...for labelling the clusters.
+from counting import getKlusterLabels
+
+class SyntheticTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_occupancy(self):
+
+        for occupancy in [0.01, 0.2, 0.5]:
+
+            g = SyntheticFrameGenerator(occupancy=occupancy, nnoisy=10, seed=1)
+
+            X, C = g.makeFrame()
+
+            # The tests
+            #-----------
+            self.assertAlmostEqual(len(X) / 65536.0, occupancy, delta=0.05 * occupancy + 0.001)
+            self.assertTrue(np.all(np.diff(X) > 0))
+            self.assertTrue(np.all(C > 0))
+
+        # Only gamma candidates - no cluster has more than four pixels.
+        g = SyntheticFrameGenerator(occupancy=0.001, gammafraction=1.0, seed=2)
+        #
+        X, C = g.makeFrame()
+        #
+        labels, n = getKlusterLabels(X, np.zeros(len(X), dtype=np.int64), 1)
+        #
+        self.assertTrue(n > 0)
+        self.assertTrue(np.bincount(labels).max() <= 4)
+
+        self.assertRaises(IOError, SyntheticFrameGenerator, occupancy=1.5)
+
+    def test_write_dataset(self):
+
+        for dataformat in [4114, 8210, 18]:
+
+            path = os.path.join(self.tmpdir, "%d" % (dataformat), "0-00_mm")
+
+            g = SyntheticFrameGenerator(occupancy=0.01, nnoisy=3, seed=3)
+
+            npixels = writeSyntheticDataPoint(path, g, 5, dataformat)
+
+            ds = Dataset(path + "/ASCIIxyC/")
+
+            frames = ds.getFrames((0.0, 0.0, 0.0))
+
+            # The tests
+            #-----------
+            self.assertEqual(ds.dataformat, dataformat)
+            self.assertEqual(len(frames), 5)
+            self.assertEqual(sum([f.getNumberOfUnmaskedPixels() for f in frames]), npixels)
+            self.assertTrue(frames[0].isMC())
+            self.assertTrue(frames[0].getKlusterFinder().getListOfKlusters()[0].isMC())
+            self.assertTrue(frames[1].getStartTime() > frames[0].getStartTime())
+
+        # The same frames are made from the same seed, whatever the format.
+        X0, C0 = getPixelArrays(os.path.join(self.tmpdir, "4114", "0-00_mm", "ASCIIxyC", "data000.txt"), 4114)
+        X1, C1 = getPixelArrays(os.path.join(self.tmpdir, "18", "0-00_mm", "ASCIIxyC", "data000.txt"), 18)
+        #
+        self.assertEqual(sorted(zip(X0, C0)), sorted(zip(X1, C1)))
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_synthetic.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===================================================")
+    lg.info(" Logger output from cernatschool/test_synthetic.py ")
+    lg.info("===================================================")
+    lg.info("")
+
+    unittest.main()
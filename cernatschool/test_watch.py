@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary folders.
+import tempfile, shutil
+
+#...for the acquisition watching.
+from watch import AcquisitionWatcher, LiveCounts
+
+#...for writing the data files.
+from helpers import writeDataFile
+
+#...for writing the DSC files.
+from dsc import writeDscFile
+
+class WatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def writeFrame(self, bn, dsc=True):
+        """ Write a (small) frame's data file and, optionally, its DSC file. """
+        fn = os.path.join(self.tmpdir, bn)
+        writeDataFile(fn, [5, 6, 300], [10, 20, 30], 4114)
+        if dsc:
+            writeDscFile(fn + ".dsc", 1375178115.0)
+
+    def test_watcher(self):
+
+        w = AcquisitionWatcher(self.tmpdir, settle=1.0)
+
+        # A data file without its DSC file isn't ready.
+        self.writeFrame("data000.txt", dsc=False)
+
+        # The tests
+        #-----------
+        self.assertEqual(w.poll(now=100.0), [])
+
+        # Once the DSC file is written, the frame is ready when it has settled.
+        self.writeFrame("data000.txt")
+        #
+        self.assertEqual(w.poll(now=101.0), [])
+        self.assertEqual(w.getNumberWaiting(), 1)
+        self.assertEqual(w.poll(now=101.5), [])
+        self.assertEqual(w.poll(now=102.0), ["data000.txt"])
+
+        # The settling starts again if the files change.
+        self.writeFrame("data001.txt")
+        self.assertEqual(w.poll(now=103.0), ["data000.txt"])
+        #
+        with open(os.path.join(self.tmpdir, "data001.txt"), "a") as f:
+            f.write("7\t0\t40\n")
+        #
+        self.assertEqual(w.poll(now=103.5), ["data000.txt"])
+        self.assertEqual(w.poll(now=104.6), ["data000.txt", "data001.txt"])
+
+        # Processed frames aren't picked up again.
+        w.markDone(["data000.txt", "data001.txt"])
+        #
+        self.assertEqual(w.poll(now=200.0), [])
+        self.assertEqual(w.getDoneFiles(), ["data000.txt", "data001.txt"])
+        self.assertEqual(w.getNumberWaiting(), 0)
+
+        # A half-written DSC file isn't ready.
+        self.writeFrame("data002.txt", dsc=False)
+        #
+        with open(os.path.join(self.tmpdir, "data002.txt.dsc"), "w") as f:
+            f.write("A000000001\n[F0]\n")
+        #
+        self.assertEqual(w.poll(now=300.0), [])
+        self.assertEqual(w.poll(now=302.0), [])
+
+        # Carrying on from an earlier watch.
+        self.assertEqual(AcquisitionWatcher(self.tmpdir, settle=0.0, done=["data000.txt"]).poll(), ["data001.txt"])
+
+        # A folder that doesn't exist (yet).
+        self.assertEqual(AcquisitionWatcher(os.path.join(self.tmpdir, "nothere")).poll(), [])
+
+    def test_live_counts(self):
+
+        live = LiveCounts(window=2)
+
+        live.addFrame(0.5, ["Beta", "Beta", "Gamma"])
+        live.addFrame(0.5, ["Beta", "Edge"])
+        live.addFrame(1.0, [])
+
+        # The tests
+        #-----------
+        self.assertEqual(live.getNumberOfFrames(), 3)
+        self.assertEqual(live.getLiveTime(), 2.0)
+        self.assertEqual(live.getCount("Beta"), 3)
+        self.assertEqual(live.getCounts()["Alpha"], 0)
+        self.assertEqual(live.getRate("Beta"), (1.5, 3**0.5 / 2.0))
+        # (Only the last two frames.)
+        self.assertEqual(live.getRecentRate("Beta"), (1.0 / 1.5, 1.0 / 1.5))
+        self.assertEqual(live.getRecentRate("Alpha"), (0.0, 0.0))
+        self.assertEqual(LiveCounts().getRate("Beta"), (0.0, 0.0))
+
+        # Carrying on from the saved state.
+        carried = LiveCounts(window=2, state=live.getJson())
+        #
+        self.assertEqual(carried.getJson(), live.getJson())
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_watch.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===============================================")
+    lg.info(" Logger output from cernatschool/test_watch.py ")
+    lg.info("===============================================")
+    lg.info("")
+
+    unittest.main()
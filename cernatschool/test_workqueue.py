@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary queue directory.
+import tempfile, shutil
+
+#...for the competing workers.
+import threading
+
+#...for the stale claims.
+import time
+
+# Import the JSON library.
+import json
+
+#...for the work queue.
+from workqueue import WorkQueue, getChunks, writeJsonAtomically, appendJsonList
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The temporary directory.
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_claims(self):
+
+        qpath = os.path.join(self.tmpdir, "queue")
+
+        ## Two workers sharing the queue.
+        q1 = WorkQueue(qpath, "worker1")
+        q2 = WorkQueue(qpath, "worker2")
+
+        # The tests
+        #-----------
+        self.assertTrue(q1.claim("0-00_mm_000000"))
+        self.assertFalse(q2.claim("0-00_mm_000000"))
+        self.assertEqual(q1.getClaimInfo("0-00_mm_000000")["worker"], "worker1")
+
+        # A released task can be claimed by another worker.
+        q1.release("0-00_mm_000000")
+        self.assertTrue(q2.claim("0-00_mm_000000"))
+
+        # A finished task can't be claimed again.
+        q2.markDone("0-00_mm_000000", {"frames" : 100})
+        self.assertTrue(q1.isDone("0-00_mm_000000"))
+        self.assertFalse(q1.claim("0-00_mm_000000"))
+
+        self.assertEqual(q1.getClaimedTasks(), [])
+        self.assertEqual(q2.getClaimedTasks(), ["0-00_mm_000000"])
+
+    def test_stale_claims(self):
+
+        qpath = os.path.join(self.tmpdir, "queue")
+
+        ## Two workers sharing the queue (with a one minute claim timeout).
+        q1 = WorkQueue(qpath, "worker1", timeout=60.0)
+        q2 = WorkQueue(qpath, "worker2", timeout=60.0)
+
+        # The tests
+        #-----------
+        self.assertTrue(q1.claim("task"))
+        self.assertFalse(q2.isStale("task"))
+        self.assertFalse(q2.claim("task"))
+
+        # A claim that's still fresh isn't removed (and is left as it was).
+        self.assertFalse(q2.removeStaleClaim("task"))
+        self.assertEqual(q2.getClaimInfo("task")["worker"], "worker1")
+
+        # The first worker dies - its claim isn't touched for two minutes.
+        t_old = time.time() - 120.0
+        os.utime(q1.getClaimPath("task"), (t_old, t_old))
+        #
+        self.assertTrue(q2.isStale("task"))
+        self.assertTrue(q2.claim("task"))
+        self.assertEqual(q2.getClaimInfo("task")["worker"], "worker2")
+        self.assertEqual(sorted(os.listdir(qpath)), ["task.claim"])
+
+        # The first worker can't keep the claim it has lost alive.
+        os.utime(q2.getClaimPath("task"), (t_old, t_old))
+        q1.touch("task")
+        self.assertTrue(q1.isStale("task"))
+
+        # The first worker gives up - but the task is no longer its to release.
+        q2.touch("task")
+        q1.release("task")
+        self.assertEqual(q2.getClaimInfo("task")["worker"], "worker2")
+        self.assertFalse(WorkQueue(qpath, "worker3", timeout=60.0).claim("task"))
+        self.assertEqual(sorted(os.listdir(qpath)), ["task.claim"])
+
+        # Claims never go stale without a timeout.
+        self.assertFalse(WorkQueue(qpath, "worker3", timeout=0).claim("task"))
+
+    def test_keep_alive(self):
+
+        qpath = os.path.join(self.tmpdir, "queue")
+
+        ## Two workers with a short claim timeout.
+        q1 = WorkQueue(qpath, "worker1", timeout=0.5)
+        q2 = WorkQueue(qpath, "worker2", timeout=0.5)
+
+        # The tests
+        #-----------
+        self.assertTrue(q1.claim("task"))
+        #
+        with q1.keepAlive("task", interval=0.05):
+            time.sleep(1.0)
+            self.assertFalse(q2.claim("task"))
+        #
+        time.sleep(1.0)
+        self.assertTrue(q2.claim("task"))
+
+    def test_competing_workers(self):
+
+        qpath = os.path.join(self.tmpdir, "queue")
+
+        ## The tasks.
+        tasks = ["task%03d" % (i) for i in range(100)]
+
+        ## The workers.
+        queues = [WorkQueue(qpath, "worker%d" % (i)) for i in range(4)]
+
+        def work(q):
+            for task in tasks:
+                q.claim(task)
+
+        threads = [threading.Thread(target=work, args=(q,)) for q in queues]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        ## All of the claimed tasks.
+        claimed = []
+        for q in queues:
+            claimed += q.getClaimedTasks()
+
+        # The tests
+        #-----------
+
+        # Each task is claimed by exactly one worker.
+        self.assertEqual(sorted(claimed), tasks)
+
+    def test_chunks_and_json(self):
+
+        # The tests
+        #-----------
+        self.assertEqual(getChunks(600, 0), [(0, 600)])
+        self.assertEqual(getChunks(5, 2), [(0, 2), (2, 4), (4, 5)])
+        self.assertEqual(getChunks(4, 10), [(0, 4)])
+
+        path = os.path.join(self.tmpdir, "frames.json")
+        writeJsonAtomically(path, [{"id" : 1}])
+        with open(path, "r") as jf:
+            self.assertEqual(json.load(jf), [{"id" : 1}])
+
+        # No temporary files are left behind.
+        self.assertEqual(os.listdir(self.tmpdir), ["frames.json"])
+
+    def test_append_json(self):
+
+        path = os.path.join(self.tmpdir, "klusters.json")
+
+        items = [{"id" : i} for i in range(5)]
+
+        offset = appendJsonList(path, 0, [])
+        offset = appendJsonList(path, offset, items[:2])
+
+        ## Where the file ended after the first items.
+        committed = offset
+
+        offset = appendJsonList(path, offset, [])
+        offset = appendJsonList(path, offset, items[2:])
+
+        # The tests
+        #-----------
+        # The same as writing the list in one go.
+        with open(path, "r") as jf:
+            self.assertEqual(jf.read(), json.dumps(items))
+
+        # Carrying on from the first items writes over the rest.
+        appendJsonList(path, committed, items[3:])
+        #
+        with open(path, "r") as jf:
+            self.assertEqual(json.load(jf), items[:2] + items[3:])
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_workqueue.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===================================================")
+    lg.info(" Logger output from cernatschool/test_workqueue.py ")
+    lg.info("===================================================")
+    lg.info("")
+
+    unittest.main()
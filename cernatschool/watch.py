@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Watching an acquisition directory for new frames (live processing).
+
+Pixelman writes each frame as a data file and a DSC file. A frame is
+picked up once both files exist and neither has changed for a (short)
+settling time, so that half-written files are left alone. The running
+numbers of each cluster type and their rates are kept as the frames
+are processed.
+"""
+
+# The usual suspects.
+import os, time
+
+#...for the logging.
+import logging as lg
+
+#...for the recent frames.
+from collections import deque
+
+#...for the MATH.
+import numpy as np
+
+#...for the DSC file wrapper class.
+from dsc import DscFile
+
+#...for the cluster types.
+from sorting import KLUSTER_TYPES
+
+## The default time between polls of the acquisition directory [s].
+DEFAULT_POLL_INTERVAL = 1.0
+
+## The default time a frame's files must be unchanged before they're read [s].
+DEFAULT_SETTLE_TIME = 0.5
+
+## The default number of recent frames used for the recent rates.
+DEFAULT_RATE_WINDOW = 20
+
+def getFileState(path):
+    """ The size and modification time of a file (None if it can't be found). """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime)
+
+class AcquisitionWatcher:
+    """ Wrapper class for watching an acquisition directory for complete frames. """
+
+    def __init__(self, foldername, settle=DEFAULT_SETTLE_TIME, done=None):
+        """
+        Constructor.
+
+        @param [in] foldername The folder the data and DSC files are written to.
+        @param [in] settle How long a frame's files must be unchanged before they're read [s].
+        @param [in] done The names of the data files already processed.
+        """
+
+        ## The folder name.
+        self.__foldername = foldername
+
+        ## The settling time [s].
+        self.__settle = settle
+
+        ## The names of the data files already processed.
+        self.__done = set(done if done is not None else [])
+
+        ## The frames waiting to settle {name:((data state, DSC state), time first seen)}.
+        self.__waiting = {}
+
+    def getFolderName(self):
+        return self.__foldername
+
+    def getDoneFiles(self):
+        """ The names of the data files processed (sorted). """
+        return sorted(self.__done)
+
+    def markDone(self, names):
+        """ Mark data files as processed. """
+        for bn in names:
+            self.__done.add(bn)
+            self.__waiting.pop(bn, None)
+
+    def getNumberWaiting(self):
+        """ The number of frames seen but not yet settled. """
+        return len(self.__waiting)
+
+    def isDscComplete(self, dscpath):
+        """ Can the DSC file be read (without its data file)? """
+        try:
+            DscFile(dscpath, readpixels=False)
+        except Exception as e:
+            lg.debug(" * '%s' can't be read yet (%s)." % (dscpath, str(e)))
+            return False
+        return True
+
+    def poll(self, now=None):
+        """
+        Look for new complete frames.
+
+        @param [in] now The current time [s] (default: the time now).
+        @returns The names of the data files of the frames that are ready (sorted).
+        """
+
+        if now is None:
+            now = time.time()
+
+        if not os.path.isdir(self.__foldername):
+            return []
+
+        ## The names of the files in the folder.
+        names = set([bn for bn in os.listdir(self.__foldername) if not bn.startswith(".")])
+
+        ## The frames that are ready.
+        ready = []
+
+        for bn in sorted(names):
+
+            if bn.endswith(".dsc") or bn in self.__done or (bn + ".dsc") not in names:
+                continue
+
+            path = os.path.join(self.__foldername, bn)
+
+            ## The data and DSC files' sizes and modification times.
+            state = (getFileState(path), getFileState(path + ".dsc"))
+
+            if None in state:
+                continue
+
+            # Start (or restart) the settling time if the files have changed.
+            if bn not in self.__waiting or self.__waiting[bn][0] != state:
+                self.__waiting[bn] = (state, now)
+
+            if now - self.__waiting[bn][1] < self.__settle:
+                continue
+
+            if self.isDscComplete(path + ".dsc"):
+                ready.append(bn)
+
+        return ready
+
+class LiveCounts:
+    """
+    Wrapper class for the running numbers (and rates) of each cluster type.
+    """
+
+    def __init__(self, window=DEFAULT_RATE_WINDOW, state=None):
+        """
+        Constructor.
+
+        @param [in] window The number of recent frames to find the recent rates from.
+        @param [in] state The state to carry on from (see getJson).
+        """
+
+        ## The number of clusters of each type {type:n}.
+        self.__counts = dict([(typename, 0) for typename in KLUSTER_TYPES])
+
+        ## The number of frames.
+        self.__n_frames = 0
+
+        ## The total acquisition (live) time [s].
+        self.__live_time = 0.0
+
+        ## The recent frames' acquisition times and cluster counts.
+        self.__recent = deque(maxlen=window)
+
+        if state is not None:
+            for typename, n in state["counts"].iteritems():
+                self.__counts[typename] = n
+            self.__n_frames  = state["n_frames"]
+            self.__live_time = state["live_time"]
+            for acqtime, counts in state["recent"]:
+                self.__recent.append((acqtime, counts))
+
+    def addFrame(self, acqtime, types):
+        """
+        Add a frame's clusters.
+
+        @param [in] acqtime The frame's acquisition time [s].
+        @param [in] types The types of the frame's clusters.
+        """
+
+        ## The number of the frame's clusters of each type.
+        counts = {}
+        #
+        for typename in types:
+            counts[typename] = counts.get(typename, 0) + 1
+            self.__counts[typename] += 1
+
+        self.__n_frames += 1
+
+        self.__live_time += acqtime
+
+        self.__recent.append((acqtime, counts))
+
+    def getCounts(self):
+        return dict(self.__counts)
+
+    def getCount(self, typename):
+        return self.__counts[typename]
+
+    def getNumberOfFrames(self):
+        return self.__n_frames
+
+    def getLiveTime(self):
+        return self.__live_time
+
+    def getRate(self, typename):
+        """ The rate of a cluster type and its (Poisson) uncertainty over all of the frames [s^-1]. """
+        if self.__live_time <= 0.0:
+            return 0.0, 0.0
+        n = self.__counts[typename]
+        return n / self.__live_time, np.sqrt(n) / self.__live_time
+
+    def getRecentRate(self, typename):
+        """ The rate of a cluster type and its (Poisson) uncertainty over the recent frames [s^-1]. """
+
+        ## The recent live time [s].
+        t = sum([acqtime for acqtime, counts in self.__recent])
+
+        if t <= 0.0:
+            return 0.0, 0.0
+
+        n = sum([counts.get(typename, 0) for acqtime, counts in self.__recent])
+
+        return n / t, np.sqrt(n) / t
+
+    def getJson(self):
+        """ The counts and rates as a JSON-friendly dictionary (also the state to carry on from). """
+
+        rates = {}
+        #
+        for typename in KLUSTER_TYPES:
+            rate, err = self.getRate(typename)
+            recent, recent_err = self.getRecentRate(typename)
+            rates[typename] = {"rate" : rate, "err" : err, "recent" : recent, "recent_err" : recent_err}
+
+        return {
+            "counts"    : dict(self.__counts),
+            "n_frames"  : self.__n_frames,
+            "live_time" : self.__live_time,
+            "rates"     : rates,
+            "recent"    : list(self.__recent)
+            }
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A file-based work queue for sharing processing between workers.
+
+Workers (processes, possibly on different nodes) that share a filesystem
+claim tasks by atomically creating a claim file for each task - the
+first worker to create the file owns the task. Finished tasks are
+marked with a "done" file. No central service is needed.
+
+A worker keeps its claims alive by touching the claim files while it
+works (see keepAlive). A claim that hasn't been touched for the claim
+timeout - e.g. because its worker was killed - is stale, and another
+worker can take the task over.
+"""
+
+# The usual suspects.
+import os, errno, socket, time
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for keeping the claims alive while working.
+import threading
+
+#...for keeping the claims alive with a "with" statement.
+from contextlib import contextmanager
+
+## The default time after which an untouched claim is stale [s].
+DEFAULT_CLAIM_TIMEOUT = 600.0
+
+def getWorkerId():
+    """ A (hopefully) unique ID for this worker - host name and process ID. """
+    return "%s-%d" % (socket.gethostname(), os.getpid())
+
+def writeJsonAtomically(path, obj):
+    """
+    Write an object to a JSON file so that readers never see a partial file.
+
+    The JSON is written to a temporary file in the same directory which
+    is then renamed (atomically) to the final name.
+
+    @param [in] path The path to the JSON file.
+    @param [in] obj The object to write.
+    """
+
+    ## The temporary file name.
+    tmppath = "%s.tmp.%s" % (path, getWorkerId())
+
+    with open(tmppath, "w") as jf:
+        json.dump(obj, jf)
+
+    os.rename(tmppath, path)
+
+def appendJsonList(path, offset, items):
+    """
+    Add items to the end of a JSON list file without rewriting it.
+
+    The file is always left as a complete JSON list. Its length without
+    the closing "]" is returned, and is where the next items are written,
+    so anything written after that (e.g. by a run that stopped part of the
+    way through) is written over.
+
+    @param [in] path The path to the JSON file.
+    @param [in] offset The length of the file without its closing "]" (0 to start a new file).
+    @param [in] items The items to add.
+    @returns The new length of the file without its closing "]".
+    """
+
+    with open(path, "r+b" if offset > 0 else "wb") as jf:
+
+        jf.seek(offset)
+
+        if offset == 0:
+            jf.write("[")
+
+        for item in items:
+            if jf.tell() > 1:
+                jf.write(", ")
+            jf.write(json.dumps(item))
+
+        offset = jf.tell()
+
+        jf.write("]")
+        jf.truncate()
+
+    return offset
+
+def makeDirectory(path):
+    """ Make a directory (and its parents) if another worker hasn't already. """
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+def getChunks(n, chunksize):
+    """
+    Split n items into consecutive chunks.
+
+    @param [in] n The number of items.
+    @param [in] chunksize The (maximum) number of items in a chunk (<= 0 for one chunk).
+    @returns A list of (first, end) index tuples, with first <= i < end.
+    """
+    if chunksize <= 0 or chunksize >= n:
+        return [(0, n)]
+    return [(first, min(first + chunksize, n)) for first in range(0, n, chunksize)]
+
+class WorkQueue:
+    """ Wrapper class for a file-based work queue. """
+
+    def __init__(self, queuepath, workerid=None, timeout=DEFAULT_CLAIM_TIMEOUT):
+        """
+        Constructor.
+
+        @param [in] queuepath The (shared) directory for the claim and done files.
+        @param [in] workerid The ID of this worker (default: host name and process ID).
+        @param [in] timeout The time after which an untouched claim is stale [s] (<= 0 for never).
+        """
+
+        makeDirectory(queuepath)
+
+        ## The path to the queue directory.
+        self.__path = queuepath
+
+        ## The ID of this worker.
+        self.__workerid = workerid
+        #
+        if self.__workerid is None:
+            self.__workerid = getWorkerId()
+
+        ## The time after which an untouched claim is stale [s].
+        self.__timeout = timeout
+
+        ## The tasks claimed by this worker.
+        self.__claimed = []
+
+    def getPath(self):
+        return self.__path
+
+    def getWorkerId(self):
+        return self.__workerid
+
+    def getTimeout(self):
+        return self.__timeout
+
+    def getClaimedTasks(self):
+        """ The tasks claimed by this worker (in the order they were claimed). """
+        return self.__claimed
+
+    def getClaimPath(self, task):
+        return os.path.join(self.__path, task + ".claim")
+
+    def getDonePath(self, task):
+        return os.path.join(self.__path, task + ".done")
+
+    def claim(self, task):
+        """
+        Try to claim a task.
+
+        A stale claim (see isStale) is taken over.
+
+        @param [in] task The name of the task.
+        @returns True if this worker now owns the task, False otherwise.
+        """
+
+        if self.isDone(task):
+            return False
+
+        try:
+            fd = os.open(self.getClaimPath(task), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0644)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            if not self.isStale(task) or not self.removeStaleClaim(task):
+                return False
+            try:
+                fd = os.open(self.getClaimPath(task), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0644)
+            except OSError as e:
+                # Another worker got there first.
+                if e.errno == errno.EEXIST:
+                    return False
+                raise
+
+        os.write(fd, json.dumps({"worker" : self.__workerid, "claimed" : time.time()}))
+        os.close(fd)
+
+        self.__claimed.append(task)
+
+        lg.info(" * Worker '%s' claimed task '%s'." % (self.__workerid, task))
+
+        return True
+
+    def removeStaleClaim(self, task):
+        """
+        Remove a stale claim so that the task can be claimed again.
+
+        The claim file is renamed (atomically) out of the way first, so
+        only one worker can remove it. If it turns out to be a new claim
+        by another worker - made after this worker found the old one
+        stale - it's put back.
+
+        @param [in] task The name of the task.
+        @returns True if this worker removed the stale claim, False otherwise.
+        """
+
+        ## The claim file's path.
+        claimpath = self.getClaimPath(task)
+
+        ## The path the claim file is moved to.
+        stalepath = "%s.stale.%s" % (claimpath, self.__workerid)
+
+        try:
+            os.rename(claimpath, stalepath)
+        except OSError as e:
+            # Another worker moved it first.
+            if e.errno == errno.ENOENT:
+                return False
+            raise
+
+        if not self.isStalePath(stalepath):
+            self.putBackClaim(stalepath, claimpath)
+            return False
+
+        lg.info(" * Worker '%s' removed the stale claim %s on task '%s'." % \
+            (self.__workerid, self.getClaimInfo(task, stalepath), task))
+
+        os.remove(stalepath)
+
+        return True
+
+    def touch(self, task):
+        """ Keep this worker's claim on a task alive (if another worker hasn't taken it over). """
+        if task in self.__claimed and self.isOwnClaim(task):
+            os.utime(self.getClaimPath(task), None)
+
+    @contextmanager
+    def keepAlive(self, task, interval=None):
+        """
+        Keep the claim on a task alive (touching it in the background) during the enclosed block.
+
+        @param [in] task The name of the task.
+        @param [in] interval The time between touches [s] (default: a quarter of the timeout).
+        """
+
+        if interval is None:
+            interval = self.__timeout / 4.0
+
+        ## Set when the block is finished.
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.touch(task)
+                except OSError as e:
+                    lg.error(" * Worker '%s' couldn't touch the claim on task '%s' (%s)." % (self.__workerid, task, str(e)))
+
+        ## The thread touching the claim.
+        heart = threading.Thread(target=beat)
+        heart.daemon = True
+        #
+        if interval > 0:
+            heart.start()
+
+        try:
+            yield
+        finally:
+            stop.set()
+            if heart.is_alive():
+                heart.join()
+
+    def putBackClaim(self, movedpath, claimpath):
+        """ Put back a claim file that was moved out of the way (unless the task has been claimed again). """
+        try:
+            os.link(movedpath, claimpath)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        os.remove(movedpath)
+
+    def isOwnClaim(self, task, claimpath=None):
+        """ Is the claim on a task (or the claim file) this worker's? """
+        info = self.getClaimInfo(task, claimpath)
+        return info is not None and info.get("worker") == self.__workerid
+
+    def release(self, task):
+        """
+        Give up a claimed (but unfinished) task so that another worker can take it.
+
+        The claim is only removed if it's still this worker's - it may
+        have been taken over (see removeStaleClaim). As there, the claim
+        file is renamed out of the way and checked before it's removed.
+        """
+
+        if task in self.__claimed:
+            self.__claimed.remove(task)
+
+        ## The claim file's path.
+        claimpath = self.getClaimPath(task)
+
+        ## The path the claim file is moved to.
+        movedpath = "%s.release.%s" % (claimpath, self.__workerid)
+
+        if not self.isOwnClaim(task):
+            lg.info(" * Worker '%s' no longer owns task '%s' - not releasing it." % (self.__workerid, task))
+            return
+
+        try:
+            os.rename(claimpath, movedpath)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return
+            raise
+
+        if not self.isOwnClaim(task, movedpath):
+            self.putBackClaim(movedpath, claimpath)
+            lg.info(" * Worker '%s' no longer owns task '%s' - not releasing it." % (self.__workerid, task))
+            return
+
+        os.remove(movedpath)
+
+        lg.info(" * Worker '%s' released task '%s'." % (self.__workerid, task))
+
+    def markDone(self, task, info={}):
+        """
+        Mark a task as done.
+
+        @param [in] task The name of the task.
+        @param [in] info A dictionary of extra information to record.
+        """
+        done = {"worker" : self.__workerid, "done" : time.time()}
+        done.update(info)
+        writeJsonAtomically(self.getDonePath(task), done)
+        lg.info(" * Worker '%s' finished task '%s'." % (self.__workerid, task))
+
+    def isClaimed(self, task):
+        return os.path.exists(self.getClaimPath(task))
+
+    def isStale(self, task):
+        """ Has the claim on a task not been touched for the claim timeout? """
+        return self.isStalePath(self.getClaimPath(task))
+
+    def isStalePath(self, claimpath):
+        """ Has a claim file not been touched for the claim timeout? """
+        if self.__timeout <= 0:
+            return False
+        try:
+            return time.time() - os.path.getmtime(claimpath) > self.__timeout
+        except OSError:
+            return False
+
+    def isDone(self, task):
+        return os.path.exists(self.getDonePath(task))
+
+    def getClaimInfo(self, task, claimpath=None):
+        """ The contents of a task's claim file (or None if it hasn't been claimed). """
+        try:
+            with open(claimpath or self.getClaimPath(task), "r") as cf:
+                return json.load(cf)
+        except (IOError, ValueError):
+            return None
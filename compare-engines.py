@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Comparing the Cluster Finding Engines
+
+ See the README.md file for more information.
+
+"""
+
+# Import the code needed to manage files.
+import os, glob
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for the MATH.
+import numpy as np
+
+#...for the datasets.
+from cernatschool.dataset import Dataset
+
+#...for reading the data files.
+from cernatschool.helpers import getPixelArrays
+
+#...for the pixel masks.
+from cernatschool.occupancy import readMaskFile
+
+#...for the engine comparison.
+from cernatschool.differential import DifferentialComparison, getEngineNames, getRandomPixelMap, \
+    DEFAULT_RTOL, DEFAULT_ATOL
+
+from data.datapoint import DataPoint
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*=============================================*")
+    print("* CERN@school - comparing the cluster finders *")
+    print("*=============================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",          help="Path to the input datasets.")
+    parser.add_argument("outputPath",         help="The base path for the output.")
+    parser.add_argument("-e", "--engines",    help="The engines to compare with the reference", nargs="+", \
+        choices=getEngineNames(), default=getEngineNames())
+    parser.add_argument("-n", "--max-frames", help="Maximum number of frames per data point (0 for all of them)", type=int, default=0)
+    parser.add_argument("-r", "--random",     help="Number of random frames to compare too", type=int, default=0)
+    parser.add_argument("--frame-size",       help="The width and height of the random frames [pixels]", type=int, nargs=2, default=[256, 256])
+    parser.add_argument("--seed",             help="The random number seed for the random frames", type=int, default=42)
+    parser.add_argument("--rtol",             help="Relative tolerance for the cluster properties", type=float, default=DEFAULT_RTOL)
+    parser.add_argument("--atol",             help="Absolute tolerance for the cluster properties", type=float, default=DEFAULT_ATOL)
+    parser.add_argument("--strict-order",     help="Clusters of the same size must be in the same order", action="store_true")
+    parser.add_argument("-v", "--verbose",    help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the data file.
+    datapath = args.inputPath
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/log_compare-engines.log', filemode='w', level=level)
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("* Engines             : %s" % (", ".join(args.engines)))
+    print("*")
+
+    ## The comparison.
+    dc = DifferentialComparison(args.engines, args.rtol, args.atol, args.strict_order)
+
+    # Find the data sub-directories.
+
+    data_points = []
+
+    for entry in sorted(glob.glob((datapath + "/*").replace("//", "/"))):
+        if os.path.isdir(entry):
+            data_points.append(DataPoint(entry, outputpath))
+
+    data_points = sorted(data_points)
+
+    for dp in data_points:
+
+        ds = Dataset(dp.get_input_path() + "/ASCIIxyC/")
+
+        ## The frame width and height [pixels].
+        width, height = ds.getFrameSize()
+
+        ## The pixel mask.
+        pixel_mask = readMaskFile(dp.get_input_path() + "/masked_pixels.txt", width)
+
+        paths = ds.getDataFilePaths()
+        #
+        if args.max_frames > 0:
+            paths = paths[:args.max_frames]
+
+        for path in paths:
+
+            X, C = getPixelArrays(path, ds.dataformat, width, height)
+
+            pixelmap = dict([(x, c) for x, c in zip(X.tolist(), C.tolist()) if x not in pixel_mask])
+
+            dc.compareFrame(os.path.basename(path), pixelmap, width, height)
+
+        print("* '%s': compared %d frames." % (dp.get_name(), len(paths)))
+
+    ## The random numbers for the random frames.
+    rs = np.random.RandomState(args.seed)
+
+    ## The width and height of the random frames [pixels].
+    width, height = args.frame_size
+
+    for i in range(args.random):
+        # (The same density of blobs as in the 256 x 256 frames.)
+        pixelmap = getRandomPixelMap(rs, width, height, nklusters=max(1, 20 * width * height / 65536))
+        #
+        dc.compareFrame("random_%06d" % (i), pixelmap, width, height)
+
+    if args.random > 0:
+        print("* Compared %d random frames (seed %d)." % (args.random, args.seed))
+
+    ## The comparison results.
+    summary = dc.getSummary()
+
+    with open(outputpath + "/engine_comparison.json", "w") as jf:
+        json.dump(summary, jf, sort_keys=True, indent=2)
+
+    print("*")
+    print("* %d frames, %d clusters. Reference time: %.2f [s]." % \
+        (summary["n_frames"], summary["n_klusters"], summary["reference_time"]))
+    print("*")
+    for name in args.engines:
+        result = summary["engines"][name]
+        if result["divergence"] is None:
+            status = "AGREES"
+        else:
+            status = "DIVERGES (%s)" % (result["divergence"])
+        print("* %-12s : %8.2f [s] (x%.1f) %s" % (name, result["time"], result["speedup"], status))
+    print("*")
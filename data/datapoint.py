@@ -8,13 +8,17 @@ import logging as lg
 
 class DataPoint:
 
-    def __init__(self, path_to_subdir, outputpath):
+    def __init__(self, path_to_subdir, outputpath, archive=None):
         """
         Constructor.
         @param [in] path_to_subdir The path to the sub-directory.
         @param [in] outputpath The output path to write to.
+        @param [in] archive The archive holding the sub-directory (or None).
         """
 
+        ## The archive holding the sub-directory (None if it's a directory).
+        self.__archive = archive
+
         ## The full path to the (input) sub-directory.
         self.__full_path = path_to_subdir.replace("//", "/")
 
@@ -44,6 +48,9 @@ class DataPoint:
     def get_input_path(self):
         return self.__full_path
 
+    def get_archive(self):
+        return self.__archive
+
     def get_output_path(self):
         return self.__subdir_path
 
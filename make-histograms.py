@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""
+
+ CERN@school - Making the cluster property histograms.
+
+ See the README.md for more information.
+
+"""
+
+# Import the code needed to manage files.
+import os, glob
+
+#..for the sake of argument(s).
+import argparse
+
+#...for the logging.
+import logging as lg
+
+#...for timing the histogramming.
+import time
+
+#...for histogramming the data points in parallel.
+from multiprocessing import Pool
+
+#...for passing the options to the processes.
+from functools import partial
+
+#...for the cluster properties.
+from cernatschool.klusterhelpers import KlusterProperties
+
+#...for the histograms.
+from plotting.histograms import HISTOGRAM_BINS, HISTOGRAM_PAIRS, HISTOGRAM_SELECTIONS, \
+    fill_histograms, merge_histograms, save_histograms, load_histograms, \
+    plot_histogram_1d, plot_histogram_2d, get_histogram_key
+
+from data.datapoint import DataPoint
+
+## The name of the histogram file for each data point (and the merged file).
+HISTOGRAM_FILE_NAME = "histograms.npz"
+
+def histogramDataPoint(dp, framesize=(256, 256)):
+    """
+    Fill and save the histograms for a data point.
+
+    @param [in] dp The data point.
+    @param [in] framesize The frame width and height [pixels].
+    @returns The data point name, number of clusters and time taken [s].
+    """
+
+    t_0 = time.time()
+
+    ## The cluster properties (all of the clusters, edges included).
+    kp = KlusterProperties((dp.get_input_path() + "/klusters.json").replace("//", "/"), \
+        includeedges=True, usecache=True)
+
+    ## The columns of cluster properties.
+    columns = dict([(name, kp.get_column(name)) for name in kp.get_column_names()])
+
+    hists = fill_histograms(columns, framesize[0], framesize[1])
+
+    if not os.path.isdir(dp.get_output_path()):
+        os.mkdir(dp.get_output_path())
+
+    save_histograms((dp.get_output_path() + "/" + HISTOGRAM_FILE_NAME).replace("//", "/"), hists)
+
+    return dp.get_name(), kp.get_number_of_klusters(), time.time() - t_0
+
+#
+# The main program.
+#
+if __name__=="__main__":
+
+    print("=========================================")
+    print("  CERN@school - Cluster Property Histos  ")
+    print("=========================================")
+
+    # Get the datafile path from the command line
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",  help="Path to the processed datasets (containing klusters.json files).")
+    parser.add_argument("outputPath", help="The path for the output files.")
+    parser.add_argument("-j", "--jobs",        help="Number of data points to histogram in parallel", type=int, default=1)
+    parser.add_argument("-r", "--render-only", help="Merge and plot the existing histogram files only", action="store_true")
+    parser.add_argument("-s", "--selections",  help="The cluster selections to plot (default: all)", nargs="+", default=HISTOGRAM_SELECTIONS)
+    parser.add_argument("--frame-size",        help="The frame width and height [pixels]", type=int, nargs=2, default=[256, 256])
+    parser.add_argument("-v", "--verbose",     help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the data.
+    datapath = args.inputPath
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level to DEBUG.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/log_make-histograms.log', filemode='w', level=level)
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("* Frame size          : %d x %d [pixels]" % tuple(args.frame_size))
+    print("*")
+
+    ## The data points.
+    data_points = []
+
+    for entry in sorted(glob.glob((datapath + "/*").replace("//", "/"))):
+        if os.path.isdir(entry) and os.path.exists(entry + "/klusters.json"):
+            data_points.append(DataPoint(entry, outputpath))
+
+    data_points = sorted(data_points)
+
+    if not args.render_only:
+
+        t_0 = time.time()
+
+        if args.jobs > 1:
+            pool = Pool(processes=args.jobs)
+            results = pool.map(partial(histogramDataPoint, framesize=args.frame_size), data_points, chunksize=1)
+            pool.close()
+            pool.join()
+        else:
+            results = [histogramDataPoint(dp, args.frame_size) for dp in data_points]
+
+        for name, n, t in results:
+            print("* Histogrammed '%s': %d clusters in %.2f [s]." % (name, n, t))
+
+        print("*")
+        print("* Histogrammed %d data points in %.2f [s]." % (len(results), time.time() - t_0))
+        print("*")
+
+    # Merge all of the histogram files found in the output path - including
+    # any written by other workers.
+
+    ## The histogram files to merge.
+    histpaths = sorted(glob.glob((outputpath + "/*/" + HISTOGRAM_FILE_NAME).replace("//", "/")))
+
+    if len(histpaths) == 0:
+        raise IOError("* ERROR: no histogram files found in '%s'!" % (outputpath))
+
+    hists = merge_histograms([load_histograms(p) for p in histpaths])
+
+    save_histograms((outputpath + "/" + HISTOGRAM_FILE_NAME).replace("//", "/"), hists)
+
+    print("* Merged the histograms from %d data points." % (len(histpaths)))
+    print("*")
+
+    # Plot the merged histograms.
+
+    ## The path to the plots.
+    plotpath = (outputpath + "/histograms").replace("//", "/")
+    #
+    if not os.path.isdir(plotpath):
+        os.mkdir(plotpath)
+
+    for selection in args.selections:
+
+        if get_histogram_key(selection, ["size"]) not in hists:
+            raise IOError("* ERROR: unknown selection '%s'!" % (selection))
+
+        for name in sorted(HISTOGRAM_BINS.keys()):
+            plot_histogram_1d(hists, selection, name, "%s/%s_%s.png" % (plotpath, selection, name))
+
+        for xname, yname in HISTOGRAM_PAIRS:
+            plot_histogram_2d(hists, selection, xname, yname, "%s/%s_%s_%s.png" % (plotpath, selection, xname, yname))
+
+    print("* Histogram plots written to '%s'." % (plotpath))
+    print("*")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Making Synthetic Datasets
+
+ See the README.md file for more information.
+
+"""
+
+# Import the code needed to manage files.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+#...for timing the writing.
+import time
+
+#...for the data file formats.
+from cernatschool.datavals import DATA_FILE_TYPES
+
+#...for the synthetic frames.
+from cernatschool.synthetic import SyntheticFrameGenerator, writeSyntheticDataPoint, \
+    DEFAULT_SYNTHETIC_OCCUPANCY, DEFAULT_GAMMA_FRACTION, DEFAULT_TRACK_LENGTH, DEFAULT_TRACK_SCATTER, \
+    DEFAULT_MEAN_COUNTS
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*=====================================*")
+    print("* CERN@school - making synthetic data *")
+    print("*=====================================*")
+
+    # Get the output path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("outputPath",           help="The base path for the synthetic data points.")
+    parser.add_argument("-d", "--datapoints",   help="The data point names", nargs="+", default=["0-00_mm"])
+    parser.add_argument("-n", "--frames",       help="Number of frames per data point", type=int, default=600)
+    parser.add_argument("-o", "--occupancy",    help="Fraction of the pixels hit in each frame", type=float, default=DEFAULT_SYNTHETIC_OCCUPANCY)
+    parser.add_argument("--gamma-fraction",     help="Fraction of the clusters that are gamma candidates", type=float, default=DEFAULT_GAMMA_FRACTION)
+    parser.add_argument("--track-length",       help="Mean beta track length [pixels]", type=float, default=DEFAULT_TRACK_LENGTH)
+    parser.add_argument("--scatter",            help="R.m.s. change of track direction per pixel [rad.]", type=float, default=DEFAULT_TRACK_SCATTER)
+    parser.add_argument("--mean-counts",        help="Mean pixel count (ToT) value", type=float, default=DEFAULT_MEAN_COUNTS)
+    parser.add_argument("--noisy",              help="Number of noisy pixels", type=int, default=0)
+    parser.add_argument("--noise-prob",         help="Probability of a noisy pixel firing in a frame", type=float, default=0.5)
+    parser.add_argument("--width",              help="Frame width [pixels]", type=int, default=256)
+    parser.add_argument("--height",             help="Frame height [pixels]", type=int, default=256)
+    parser.add_argument("-f", "--format",       help="The data file format (4114: ASCII [x, y, C], 8210: ASCII [X, C], 18: ASCII matrix)", \
+        type=int, choices=[4114, 8210, 18], default=4114)
+    parser.add_argument("-s", "--seed",         help="The random number seed", type=int, default=42)
+    parser.add_argument("-v", "--verbose",      help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/log_make-synthetic.log', filemode='w', level=level)
+
+    print("*")
+    print("* Output path         : '%s'" % (outputpath))
+    print("* Frames              : %d x %d [pixels], %s" % (args.width, args.height, DATA_FILE_TYPES[args.format]))
+    print("* Occupancy           : %f" % (args.occupancy))
+    print("*")
+
+    t_0 = time.time()
+
+    for i, name in enumerate(args.datapoints):
+
+        # Each data point gets its own (reproducible) random numbers.
+        generator = SyntheticFrameGenerator(args.width, args.height, \
+            occupancy     = args.occupancy, \
+            gammafraction = args.gamma_fraction, \
+            tracklength   = args.track_length, \
+            scatter       = args.scatter, \
+            meancounts    = args.mean_counts, \
+            nnoisy        = args.noisy, \
+            noiseprob     = args.noise_prob, \
+            seed          = args.seed + i)
+
+        npixels = writeSyntheticDataPoint((outputpath + "/" + name).replace("//", "/"), generator, args.frames, args.format)
+
+        print("* '%s': %d frames, %d pixels (occupancy %f)." % \
+            (name, args.frames, npixels, float(npixels) / (args.frames * args.width * args.height)))
+
+    print("*")
+    print("* Wrote %d data points in %.2f [s]." % (len(args.datapoints), time.time() - t_0))
+    print("*")
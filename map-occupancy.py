@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Mapping the Pixel Occupancy
+
+ See the README.md file for more information.
+
+"""
+
+# Import the code needed to manage files.
+import os, glob
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+#...for timing the mapping.
+import time
+
+#...for mapping the data files in parallel.
+from multiprocessing import Pool
+
+#...for backing up the input pixel masks.
+import shutil
+
+#...for the datasets.
+from cernatschool.dataset import Dataset
+
+#...for the occupancy maps and pixel masks.
+from cernatschool.occupancy import OccupancyMap, readMaskFile, writeMaskFile, \
+    DEFAULT_MAX_HIT_FRACTION, DEFAULT_MAX_HIT_FACTOR
+
+#...for splitting the data files between the processes.
+from cernatschool.workqueue import getChunks
+
+from data.datapoint import DataPoint
+
+## The default number of data files per task.
+DEFAULT_OCCUPANCY_CHUNK_SIZE = 200
+
+def mapDataFiles(task):
+    """
+    Make the occupancy map for some data files of a data point.
+
+    @param [in] task The (data point name, data file paths, data file format, frame size) tuple.
+    @returns The data point name and the raw maps (hits, counts, number of frames).
+    """
+
+    name, paths, dataformat, (width, height) = task
+
+    om = OccupancyMap(width, height)
+
+    om.addDataFiles(paths, dataformat)
+
+    return name, om.getHits(), om.getCounts(), om.getNumberOfFrames()
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*=======================================*")
+    print("* CERN@school - pixel occupancy mapping *")
+    print("*=======================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",          help="Path to the input datasets.")
+    parser.add_argument("outputPath",         help="The base path for the output.")
+    parser.add_argument("-j", "--jobs",       help="Number of processes to map the data files with", type=int, default=1)
+    parser.add_argument("--chunk-size",       help="Number of data files per process task", type=int, default=DEFAULT_OCCUPANCY_CHUNK_SIZE)
+    parser.add_argument("--max-fraction",     help="Mask pixels hit in more than this fraction of the frames", type=float, default=DEFAULT_MAX_HIT_FRACTION)
+    parser.add_argument("--max-factor",       help="Mask pixels hit more than this many times the mean", type=float, default=DEFAULT_MAX_HIT_FACTOR)
+    parser.add_argument("-u", "--update-input", help="Update the masked_pixels.txt files of the input datasets too (keeping a .bak)", action="store_true")
+    parser.add_argument("-v", "--verbose",    help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the data file.
+    datapath = args.inputPath
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/log_map-occupancy.log', filemode='w', level=level)
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("*")
+
+    # Find the data sub-directories.
+
+    data_points = []
+
+    for entry in sorted(glob.glob((datapath + "/*").replace("//", "/"))):
+        if os.path.isdir(entry):
+            data_points.append(DataPoint(entry, outputpath))
+
+    data_points = sorted(data_points)
+
+    t_0 = time.time()
+
+    ## The tasks - chunks of the data files of each data point.
+    tasks = []
+
+    ## The frame size (width, height) of each data point {name:size}.
+    sizes = {}
+
+    for dp in data_points:
+
+        ds = Dataset(dp.get_input_path() + "/ASCIIxyC/")
+
+        paths = ds.getDataFilePaths()
+
+        sizes[dp.get_name()] = ds.getFrameSize()
+
+        for first, end in getChunks(len(paths), args.chunk_size):
+            tasks.append((dp.get_name(), paths[first:end], ds.dataformat, sizes[dp.get_name()]))
+
+    lg.info(" * %d data points split into %d tasks." % (len(data_points), len(tasks)))
+
+    if args.jobs > 1:
+        pool = Pool(processes=args.jobs)
+        results = pool.map(mapDataFiles, tasks, chunksize=1)
+        pool.close()
+        pool.join()
+    else:
+        results = [mapDataFiles(task) for task in tasks]
+
+    ## The occupancy maps for each data point {name:map}.
+    maps = dict([(dp.get_name(), OccupancyMap(*sizes[dp.get_name()])) for dp in data_points])
+
+    # Merge the maps from the tasks.
+    for name, hits, counts, nframes in results:
+        maps[name].merge(OccupancyMap(*sizes[name], hits=hits, counts=counts, nframes=nframes))
+
+    for dp in data_points:
+
+        om = maps[dp.get_name()]
+
+        # The output is written next to (rather than in) the data point's
+        # output directory, which process-datasets.py would then skip.
+
+        ## The start of the output file paths.
+        outputstem = (outputpath + "/" + dp.get_name()).replace("//", "/")
+
+        om.save(outputstem + "_occupancy.npz")
+
+        ## The noisy pixels found from the map.
+        noisy = om.getNoisyPixels(args.max_fraction, args.max_factor)
+
+        ## The path to the input pixel mask.
+        maskpath = dp.get_input_path() + "/masked_pixels.txt"
+
+        ## The pixels masked by hand (kept in the backup once updated).
+        pixel_mask = readMaskFile(maskpath + ".bak" if os.path.exists(maskpath + ".bak") else maskpath, om.getWidth())
+
+        ## The updated mask.
+        masked = set(pixel_mask.keys()) | set(noisy.tolist())
+
+        writeMaskFile(outputstem + "_masked_pixels.txt", masked, om.getWidth())
+
+        if args.update_input:
+            if not os.path.exists(maskpath + ".bak"):
+                shutil.copy2(maskpath, maskpath + ".bak")
+            writeMaskFile(maskpath + ".tmp", masked, om.getWidth())
+            os.rename(maskpath + ".tmp", maskpath)
+
+        print("* '%s': %d frames, %d noisy pixels found (%d pixels masked)." % \
+            (dp.get_name(), om.getNumberOfFrames(), len(noisy), len(masked)))
+
+        lg.info(" * '%s': noisy pixels %s" % (dp.get_name(), noisy.tolist()))
+
+    print("*")
+    print("* Mapped %d data points in %.2f [s]." % (len(data_points), time.time() - t_0))
+    print("*")
@@ -26,7 +26,10 @@ import json
 #...for the MATH.
 import numpy as np
 
-from plotting.attenuation import DataPoint, DataPoints, AttenuationPlot
+from plotting.attenuation import DataPoint, DataPoints, AttenuationPlot, fit_attenuation_batch, run_toys
+
+# Import the plotting libraries.
+import pylab as plt
 
 
 #
@@ -43,6 +46,8 @@ if __name__=="__main__":
     parser.add_argument("inputPath",  help="Path to the input dataset.")
     parser.add_argument("outputPath", help="The path for the output files.")
     parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+    parser.add_argument("-t", "--toys",    help="Estimate the uncertainties with N toy Monte Carlo replicas", type=int, default=0)
+    parser.add_argument("-s", "--seed",    help="The random number seed for the toys", type=int, default=None)
     args = parser.parse_args()
 
     ## The path to the data.
@@ -124,6 +129,64 @@ if __name__=="__main__":
 
     attplot.save_plot(results_path, "att")
 
+    # The toy Monte Carlo study
+    #---------------------------
+    #
+    ## The toy study results summary (if requested).
+    toy_summary = None
+    #
+    if args.toys > 0:
+
+        print("* Fitting %d toy Monte Carlo replicas..." % (args.toys))
+        print("*")
+
+        ## The thicknesses.
+        ds = np.array([dp.get_thickness() for dp in dps])
+
+        ## The counts.
+        Bs = np.array([dp.get_count() for dp in dps])
+
+        ## The (weighted) fit to the data itself.
+        data_fit = fit_attenuation_batch(ds, Bs[np.newaxis, :], B_0)
+
+        ## The fits to the toys.
+        toy_fits = run_toys(ds, Bs, B_0, args.toys, seed=args.seed)
+
+        toy_summary = {"n_toys" : args.toys, "seed" : args.seed, "data" : {}, "toys" : {}}
+
+        for key in ["mu", "mu_err", "mfp", "B_0", "chi2"]:
+            toy_summary["data"][key] = float(data_fit[key][0])
+            toy_summary["toys"][key] = {\
+                "mean" : float(np.mean(toy_fits[key])), \
+                "std"  : float(np.std(toy_fits[key])),  \
+                "p16"  : float(np.percentile(toy_fits[key], 15.87)), \
+                "p84"  : float(np.percentile(toy_fits[key], 84.13))  \
+                }
+
+        with open(results_path + "/toys.json", "w") as tjf:
+            json.dump(toy_summary, tjf, indent=2, sort_keys=True)
+
+        # Save the distributions too.
+        np.savez(results_path + "/toys.npz", **toy_fits)
+
+        # Plot the distribution of mu.
+        plt.close('all')
+        toyfig = plt.figure(102, figsize=(5.0, 5.0), dpi=150, facecolor='w', edgecolor='w')
+        toyfig.subplots_adjust(bottom=0.17, left=0.15)
+        toyax = toyfig.add_subplot(111)
+        toyax.hist(toy_fits["mu"], bins=50, histtype='step', color='black')
+        toyax.axvline(toy_summary["data"]["mu"], color='grey')
+        plt.xlabel('$\hat{\mu}$')
+        plt.ylabel('Number of toys')
+        plt.grid(1)
+        toyfig.savefig(results_path + "/toys_mu.png")
+
+        print("* Data (weighted fit): mu = (%5.3f +/- %5.3f)" % \
+            (toy_summary["data"]["mu"], toy_summary["data"]["mu_err"]))
+        print("* Toys:                mu = (%5.3f +/- %5.3f)" % \
+            (toy_summary["toys"]["mu"]["mean"], toy_summary["toys"]["mu"]["std"]))
+        print("*")
+
     # Create the results page.
 
     ## The results page text.
@@ -153,6 +216,14 @@ if __name__=="__main__":
     ipg += "        <br />\n"
     ipg += "        <br />\n"
     ipg += points.write_html_table()
+    if toy_summary is not None:
+        ipg += "        <br />\n"
+        ipg += "        Toy Monte Carlo (%d replicas, weighted fit):<br />\n" % (toy_summary["n_toys"])
+        ipg += "        &mu; = (%5.3f &pm; %5.3f) <br />\n" % \
+            (toy_summary["toys"]["mu"]["mean"], toy_summary["toys"]["mu"]["std"])
+        ipg += "        &lt; x &gt; = (%5.3f &pm; %5.3f) <br />\n" % \
+            (toy_summary["toys"]["mfp"]["mean"], toy_summary["toys"]["mfp"]["std"])
+        ipg += "        <img src='toys_mu.png' width='300' />\n"
     ipg += "      </td>\n"
     ipg += "      </tr>\n"
     ipg += "    </table>\n"
@@ -42,6 +42,152 @@ from plotting.stats import chi2
 def straight_line(x, m, c):
     return (x * m) + c #np.log(27003)
 
+## The default number of replicas fitted at once by fit_attenuation_batch.
+DEFAULT_FIT_CHUNK_SIZE = 10000
+
+def fit_attenuation_batch(d, B, B_0, chunk_size=DEFAULT_FIT_CHUNK_SIZE):
+    """
+    Fit ln(B_i) = ln(B_0) - mu * d_i for a whole batch of replicas at once.
+
+    Each replica is fitted with weighted least squares, where the weight
+    of each point is the inverse of the (binomial) variance on ln(B_i),
+    w_i = B_i * B_0 / (B_0 - B_i). This is the (Gaussian approximation to
+    the) maximum likelihood estimate. The error on mu is the standard
+    error on the fitted gradient, sqrt(sum(w_i) / Delta), which (unlike
+    the 1/sqrt(sum(d_i^2 w_i)) of DataPoints) accounts for B_0 being
+    fitted too.
+
+    Points with B_i <= 0 (or B_i >= B_0) are given zero weight and are
+    left out of the Chi^2 and its degrees of freedom.
+
+    @param [in] d An array of the N thicknesses, d_i.
+    @param [in] B An (M x N) array of the counts, B_i, for M replicas.
+    @param [in] B_0 The number of particles attempting to penetrate the material.
+    @param [in] chunk_size The number of replicas to fit at once.
+    @returns A dictionary of length M arrays - "mu", "mu_err", "mfp", "B_0", "chi2", "dof".
+    """
+
+    ## The thicknesses.
+    d = np.asarray(d, dtype=float)
+
+    ## The counts (one row per replica).
+    B = np.atleast_2d(np.asarray(B, dtype=float))
+
+    ## The number of replicas.
+    n_replicas = B.shape[0]
+
+    ## The results to return.
+    results = {}
+    #
+    for key in ["mu", "mu_err", "mfp", "B_0", "chi2", "dof"]:
+        results[key] = np.empty(n_replicas)
+
+    # Loop over the chunks of replicas.
+    for first in range(0, n_replicas, chunk_size):
+
+        last = min(first + chunk_size, n_replicas)
+
+        ## The counts for this chunk.
+        Bc = B[first:last]
+
+        ## Which points can be used?
+        ok = (Bc > 0.0) & (Bc < B_0)
+
+        ## The safe counts (for the logarithms).
+        Bs = np.where(ok, Bc, 1.0)
+
+        ## The y values, ln(B_i).
+        y = np.log(Bs)
+
+        ## The weights.
+        w = np.where(ok, Bs * B_0 / (B_0 - Bs), 0.0)
+
+        # The sums for the weighted linear regression.
+        S   = w.sum(axis=1)
+        Sx  = (w * d).sum(axis=1)
+        Sy  = (w * y).sum(axis=1)
+        Sxx = (w * d * d).sum(axis=1)
+        Sxy = (w * d * y).sum(axis=1)
+
+        delta = (S * Sxx) - (Sx * Sx)
+
+        ## The gradients.
+        m = ((S * Sxy) - (Sx * Sy)) / delta
+
+        ## The intercepts.
+        c = ((Sxx * Sy) - (Sx * Sxy)) / delta
+
+        ## The estimated initial counts.
+        B_0_est = np.exp(c)
+
+        ## The predicted ln(B_i) values.
+        y_pred = c[:, np.newaxis] + (m[:, np.newaxis] * d)
+
+        # Pearson's Chi^2 of the ln(B_i) values (as for DataPoints).
+        chi2_vals, dof, chi2_div = chi2(y, y_pred, 2, mask=ok)
+
+        results["mu"][first:last]     = -m
+        results["mu_err"][first:last] = np.sqrt(S / delta)
+        results["mfp"][first:last]    = -1.0 / m
+        results["B_0"][first:last]    = B_0_est
+        results["chi2"][first:last]   = chi2_vals
+        results["dof"][first:last]    = dof
+
+    return results
+
+def generate_toys(B, B_0, n_toys, random_state=None):
+    """
+    Generate toy Monte Carlo replicas of the counts.
+
+    Each B_i is drawn from a binomial distribution with B_0 attempts and
+    a success probability of B_i / B_0.
+
+    @param [in] B An array of the N measured counts.
+    @param [in] B_0 The number of particles attempting to penetrate the material.
+    @param [in] n_toys The number of replicas, M.
+    @param [in] random_state A numpy RandomState (optional).
+    @returns An (M x N) array of the replica counts.
+    """
+
+    if random_state is None:
+        random_state = np.random.RandomState()
+
+    ## The success probabilities.
+    p = np.asarray(B, dtype=float) / float(B_0)
+
+    return random_state.binomial(int(B_0), p, size=(n_toys, len(p))).astype(float)
+
+def run_toys(d, B, B_0, n_toys, seed=None, chunk_size=DEFAULT_FIT_CHUNK_SIZE):
+    """
+    Generate and fit toy replicas of the data, a chunk at a time.
+
+    @param [in] d An array of the N thicknesses.
+    @param [in] B An array of the N measured counts.
+    @param [in] B_0 The number of particles attempting to penetrate the material.
+    @param [in] n_toys The number of replicas to generate.
+    @param [in] seed The random number seed (optional).
+    @param [in] chunk_size The number of replicas to generate and fit at once.
+    @returns The fit_attenuation_batch results for all of the replicas.
+    """
+
+    ## The random number generator.
+    rs = np.random.RandomState(seed)
+
+    ## The results for each chunk.
+    chunks = []
+
+    for first in range(0, n_toys, chunk_size):
+        toys = generate_toys(B, B_0, min(chunk_size, n_toys - first), rs)
+        chunks.append(fit_attenuation_batch(d, toys, B_0, chunk_size))
+
+    ## The combined results.
+    results = {}
+    #
+    for key in ["mu", "mu_err", "mfp", "B_0", "chi2", "dof"]:
+        results[key] = np.concatenate([ch[key] for ch in chunks]) if len(chunks) > 0 else np.empty(0)
+
+    return results
+
 
 class DataPoint:
 
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+CERN@school: Histograms of the cluster property distributions.
+
+The histograms have fixed bins (so that histograms from different data
+points, or made by different workers, can simply be added together) and
+each has an underflow and an overflow bin. They are saved as NumPy
+(.npz) arrays so that they can be merged and plotted without going
+back to the cluster JSON.
+
+See the README.md file for more information.
+
+"""
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+# Import the plotting libraries.
+import pylab as plt
+
+#...for the colours. Oh, the colours!
+from matplotlib.colors import LogNorm
+
+#...for the cluster types.
+from cernatschool.sorting import KLUSTER_TYPES, getKlusterTypeIndices
+
+## The 1-D histogram bins {property:(low, high, number of bins)}.
+HISTOGRAM_BINS = {
+    "size"          : (0.5, 200.5, 200),
+    "radius_uw"     : (0.0,  20.0, 100),
+    "density_uw"    : (0.0,   2.0, 100),
+    "lin_linearity" : (0.0,  10.0, 100),
+    "innerfrac"     : (0.0,   1.0,  50),
+    "totalcounts"   : (0.0, 20000.0, 200),
+    "maxcounts"     : (0.0,  2000.0, 200)
+    }
+
+## The pairs of properties with 2-D histograms.
+HISTOGRAM_PAIRS = [
+    ("size",      "radius_uw"),
+    ("size",      "totalcounts"),
+    ("radius_uw", "density_uw")
+    ]
+
+## The cluster selections the histograms are made for.
+HISTOGRAM_SELECTIONS = ["All"] + KLUSTER_TYPES
+
+## The axis labels for the properties.
+HISTOGRAM_LABELS = {
+    "size"          : "Cluster size $N_h$ [pixels]",
+    "radius_uw"     : "Cluster radius $r$ [pixels]",
+    "density_uw"    : "Cluster density $\\rho$ [pixels$^{-1}$]",
+    "lin_linearity" : "Cluster linearity",
+    "innerfrac"     : "Fraction of inner pixels",
+    "totalcounts"   : "Total counts",
+    "maxcounts"     : "Maximum count value"
+    }
+
+def get_histogram_key(selection, names):
+    """ The key of a histogram, e.g. 'Beta__size' or 'All__size__radius_uw'. """
+    return "__".join([selection] + list(names))
+
+def get_bin_indices(x, name):
+    """
+    Get the bin index of each value, with 0 for underflow and n + 1 for overflow.
+
+    @param [in] x The array of values.
+    @param [in] name The name of the property (for the bins).
+    @returns An array of the bin indices.
+    """
+
+    lo, hi, n = HISTOGRAM_BINS[name]
+
+    ## The bin indices (NaNs go in the underflow bin).
+    i = np.floor((np.asarray(x, dtype=np.float64) - lo) * (n / (hi - lo)))
+    #
+    i = np.where(np.isnan(i), -1, i)
+
+    return (np.clip(i, -1, n) + 1).astype(np.intp)
+
+def get_bin_edges(name):
+    """ The edges of the (in-range) bins of a property. """
+    lo, hi, n = HISTOGRAM_BINS[name]
+    return np.linspace(lo, hi, n + 1)
+
+def fill_histograms(columns, width=256, height=256):
+    """
+    Fill the 1-D and 2-D histograms for all of the selections.
+
+    @param [in] columns The cluster property arrays {name:array} (see klusterhelpers).
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns A dictionary of the histogram counts {key:array}.
+    """
+
+    ## The cluster type indices.
+    types = getKlusterTypeIndices(columns, width, height).astype(np.intp)
+
+    ## The type (selection) offset, so that one bincount fills every type.
+    n_types = len(KLUSTER_TYPES)
+
+    ## The bin indices for each property.
+    indices = {}
+    #
+    for name in HISTOGRAM_BINS.keys():
+        indices[name] = get_bin_indices(columns[name], name)
+
+    ## The histograms {key:counts}.
+    hists = {}
+
+    for name in HISTOGRAM_BINS.keys():
+
+        nb = HISTOGRAM_BINS[name][2] + 2
+
+        ## The counts for each type, side by side.
+        counts = np.bincount(types * nb + indices[name], minlength=n_types * nb).reshape(n_types, nb)
+
+        hists[get_histogram_key("All", [name])] = counts.sum(axis=0)
+
+        for t, typename in enumerate(KLUSTER_TYPES):
+            hists[get_histogram_key(typename, [name])] = counts[t]
+
+    for xname, yname in HISTOGRAM_PAIRS:
+
+        nx = HISTOGRAM_BINS[xname][2] + 2; ny = HISTOGRAM_BINS[yname][2] + 2
+
+        ## The counts for each type, side by side.
+        counts = np.bincount((types * nx + indices[xname]) * ny + indices[yname], \
+            minlength=n_types * nx * ny).reshape(n_types, nx, ny)
+
+        hists[get_histogram_key("All", [xname, yname])] = counts.sum(axis=0)
+
+        for t, typename in enumerate(KLUSTER_TYPES):
+            hists[get_histogram_key(typename, [xname, yname])] = counts[t]
+
+    return hists
+
+def merge_histograms(histlist):
+    """
+    Add together histograms (e.g. from different data points or workers).
+
+    @param [in] histlist A list of histogram dictionaries {key:counts}.
+    @returns The merged histogram dictionary.
+    """
+
+    merged = {}
+
+    for hists in histlist:
+        for key, counts in hists.iteritems():
+            if key in merged:
+                if merged[key].shape != counts.shape:
+                    raise ValueError("HISTOGRAM_MISMATCH")
+                merged[key] = merged[key] + counts
+            else:
+                merged[key] = np.array(counts, dtype=np.int64)
+
+    return merged
+
+def save_histograms(path, hists):
+    """ Save the histograms to a (compressed) .npz file. """
+    np.savez_compressed(path, **hists)
+
+def load_histograms(path):
+    """ Load histograms from a .npz file. """
+    with np.load(path) as npz:
+        return dict([(key, npz[key]) for key in npz.files])
+
+def plot_histogram_1d(hists, selection, name, path):
+    """
+    Plot a 1-D histogram (the in-range bins only).
+
+    @param [in] hists The histogram dictionary.
+    @param [in] selection The cluster selection (e.g. "Beta").
+    @param [in] name The cluster property.
+    @param [in] path The path of the image file to write.
+    """
+
+    counts = hists[get_histogram_key(selection, [name])]
+
+    edges = get_bin_edges(name)
+
+    fig = plt.figure(101, figsize=(5.0, 3.0), dpi=150, facecolor='w', edgecolor='w')
+    plt.clf()
+
+    ax = fig.add_subplot(111)
+
+    ax.bar(edges[:-1], counts[1:-1], width=np.diff(edges), align='edge', color='#82bcff', edgecolor='#82bcff')
+
+    ax.set_xlim([edges[0], edges[-1]])
+    ax.set_xlabel(HISTOGRAM_LABELS[name])
+    ax.set_ylabel("Number of clusters")
+    ax.set_title("%s (%d under, %d over)" % (selection, counts[0], counts[-1]), fontsize=8)
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close(fig)
+
+def plot_histogram_2d(hists, selection, xname, yname, path):
+    """
+    Plot a 2-D histogram (the in-range bins only).
+
+    @param [in] hists The histogram dictionary.
+    @param [in] selection The cluster selection (e.g. "Beta").
+    @param [in] xname The cluster property on the x axis.
+    @param [in] yname The cluster property on the y axis.
+    @param [in] path The path of the image file to write.
+    """
+
+    counts = hists[get_histogram_key(selection, [xname, yname])][1:-1, 1:-1]
+
+    xedges = get_bin_edges(xname); yedges = get_bin_edges(yname)
+
+    fig = plt.figure(102, figsize=(5.0, 4.0), dpi=150, facecolor='w', edgecolor='w')
+    plt.clf()
+
+    ax = fig.add_subplot(111)
+
+    if counts.sum() > 0:
+        im = ax.pcolormesh(xedges, yedges, np.ma.masked_equal(counts.T, 0), norm=LogNorm())
+        plt.colorbar(im)
+
+    ax.set_xlim([xedges[0], xedges[-1]])
+    ax.set_ylim([yedges[0], yedges[-1]])
+    ax.set_xlabel(HISTOGRAM_LABELS[xname])
+    ax.set_ylabel(HISTOGRAM_LABELS[yname])
+    ax.set_title(selection, fontsize=8)
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close(fig)
@@ -9,61 +9,81 @@ Statistics functions for plotting with CERN@school.
 import logging as lg
 
 #...for the MATH.
-import math
+import numpy as np
 
-def chi2(observed, expected, n_fitted_params):
+def chi2(observed, expected, n_fitted_params, mask=None):
     """
     Calculate the Pearson's Chi^2 value for a set of N observed and
     expected values.
-    @param [in] distances List with N distances between the data and f(x_i).
-    @param [in] errors List with N errors for each data point x_i.
-    @param [in] n_fitted_params The number of fitted parameters in the f(x_i).
-    """
 
-    lg.info(" *")
+    The values are only summed up to (and including) the last observed
+    value that isn't NaN; any NaN observed values before that are
+    treated as zero.
 
-    ## The sum of the numerator of Chi^2.
-    total = 0
+    The observed values may also be an (M x N) array of M replicas,
+    in which case the expected values may be either (M x N) or N values,
+    and arrays of M results are returned.
 
-    ## The number of degrees of freedom.
-    n_deg_free = 0
-
-    # Find the last non-zero value in the observed data.
-
-    ## The position of the last non-zero observed value.
-    pos_non_zero = 0
-    #
-    for i in range(len(observed) - 1, -1, -1):
-        if not math.isnan(observed[i]):
-            pos_non_zero = i
-            break
+    If a mask is given, only the values it selects are summed (and
+    counted in the degrees of freedom), wherever they are.
 
-    lg.info(" * The last non-zero observed value is at %d" % (pos_non_zero))
-
-    # Calculate Pearson's test statistic.
-    for i in range(pos_non_zero+1):
+    @param [in] observed The N observed values (or M x N array).
+    @param [in] expected The N expected values (or M x N array).
+    @param [in] n_fitted_params The number of fitted parameters in the f(x_i).
+    @param [in] mask The values to use - N or M x N booleans (optional).
+    @returns The Chi^2 value, the number of degrees of freedom and Chi^2 / dof.
+    """
 
-        obs = observed[i]
+    ## The observed values.
+    obs = np.asarray(observed, dtype=float)
 
-        if math.isnan(obs):
-            obs = 0.0
+    ## Has a single set of values been supplied?
+    is_single = (obs.ndim == 1)
 
-        obs = float(obs)
+    obs, exp = np.broadcast_arrays(np.atleast_2d(obs), np.asarray(expected, dtype=float))
 
-        exp = float(expected[i])
+    ## The number of values per replica.
+    n = obs.shape[1]
 
-        dif = obs - exp
+    ## Which observed values are valid (i.e. not NaN)?
+    valid = ~np.isnan(obs)
 
-        difsq = dif**2
+    # Find the last non-NaN value in each set of observed data (the
+    # first value if they're all NaN).
 
-        val = difsq / exp
+    ## The position of the last non-NaN observed value.
+    pos_non_zero = np.where(valid.any(axis=1), n - 1 - np.argmax(valid[:, ::-1], axis=1), 0)
 
-        total += val
+    ## Which values are included in the sum?
+    included = np.arange(n) <= pos_non_zero[:, np.newaxis]
+    #
+    if mask is not None:
+        included = valid & np.broadcast_to(np.asarray(mask, dtype=bool), obs.shape)
 
-        n_deg_free += 1
+    ## The observed values with NaNs set to zero.
+    obs = np.where(valid, obs, 0.0)
 
-        lg.info(" * | % 3d | % 7.3f | % 7.3f | % 7.3f | % 7.3f | % 7.3f |" % (i, obs, exp, dif, difsq, val))
+    ## The contribution from each value.
+    vals = np.where(included, ((obs - exp)**2) / exp, 0.0)
 
-    lg.info(" *")
+    ## The sum of the numerator of Chi^2.
+    total = vals.sum(axis=1)
 
-    return total, n_deg_free - n_fitted_params, total/(n_deg_free - n_fitted_params)
+    ## The number of degrees of freedom.
+    n_deg_free = included.sum(axis=1) - n_fitted_params
+
+    if not is_single:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return total, n_deg_free, total / n_deg_free
+
+    # Log the individual values, but only if anyone is listening.
+    if lg.getLogger().isEnabledFor(lg.INFO):
+        lg.info(" *")
+        lg.info(" * The last non-zero observed value is at %d" % (pos_non_zero[0]))
+        for i in range(pos_non_zero[0] + 1):
+            dif = obs[0, i] - exp[0, i]
+            lg.info(" * | % 3d | % 7.3f | % 7.3f | % 7.3f | % 7.3f | % 7.3f |" % \
+                (i, obs[0, i], exp[0, i], dif, dif**2, vals[0, i]))
+        lg.info(" *")
+
+    return float(total[0]), int(n_deg_free[0]), float(total[0])/int(n_deg_free[0])
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the attenuation fitting.
+from plotting.attenuation import fit_attenuation_batch, run_toys
+
+class AttenuationFitTest(unittest.TestCase):
+
+    def setUp(self):
+
+        ## The thicknesses [mm].
+        self.ds = np.array([0.23, 0.36, 0.48, 0.60, 0.72, 0.85, 1.01, 1.46, 3.20])
+
+        ## The number of attempts.
+        self.B_0 = 27003.0
+
+    def tearDown(self):
+        pass
+
+    def test_exact_exponential(self):
+
+        ## Counts following the attenuation law exactly.
+        Bs = 20000.0 * np.exp(-1.7 * self.ds)
+
+        r = fit_attenuation_batch(self.ds, Bs, self.B_0)
+
+        # The tests
+        #-----------
+        self.assertAlmostEqual(r["mu"][0], 1.7, places=6)
+        self.assertAlmostEqual(r["mfp"][0], 1.0 / 1.7, places=6)
+        self.assertAlmostEqual(r["B_0"][0], 20000.0, places=3)
+        self.assertAlmostEqual(r["chi2"][0], 0.0, places=9)
+        self.assertEqual(r["dof"][0], 7)
+
+    def test_batch_matches_single_fits(self):
+
+        ## Some replicas.
+        Bs = np.array([20000.0 * np.exp(-mu * self.ds) for mu in [1.5, 1.6, 1.7]])
+        Bs[1, 3] += 100.0
+
+        ## The batch fit (in chunks of two replicas).
+        r = fit_attenuation_batch(self.ds, Bs, self.B_0, chunk_size=2)
+
+        for i in range(3):
+            r_i = fit_attenuation_batch(self.ds, Bs[i], self.B_0)
+            for key in ["mu", "mu_err", "mfp", "B_0", "chi2"]:
+                self.assertAlmostEqual(r[key][i], r_i[key][0], places=9)
+
+    def test_excluded_points(self):
+
+        ## The thicknesses [mm].
+        ds = self.ds[:5]
+
+        ## Counts with a zero in the middle.
+        Bs = np.array([900.0, 800.0, 0.0, 650.0, 590.0])
+
+        ## The fit without the zero count.
+        r_ok = fit_attenuation_batch(np.delete(ds, 2), np.delete(Bs, 2), self.B_0)
+
+        r = fit_attenuation_batch(ds, Bs, self.B_0)
+
+        # The tests
+        #-----------
+        #
+        # The zero count isn't used in the fit or in the Chi^2.
+        self.assertEqual(r["dof"][0], 2)
+        for key in ["mu", "mu_err", "B_0", "chi2", "dof"]:
+            self.assertAlmostEqual(r[key][0], r_ok[key][0], places=9)
+
+    def test_toys(self):
+
+        ## The measured counts.
+        Bs = 20000.0 * np.exp(-1.7 * self.ds)
+
+        r_a = run_toys(self.ds, Bs, self.B_0, 2500, seed=42, chunk_size=1000)
+        r_b = run_toys(self.ds, Bs, self.B_0, 2500, seed=42, chunk_size=1000)
+
+        # The tests
+        #-----------
+        self.assertEqual(len(r_a["mu"]), 2500)
+        #
+        # The toys are reproducible with a seed.
+        self.assertTrue(np.array_equal(r_a["mu"], r_b["mu"]))
+        #
+        # The spread of the toys agrees with the fitted error.
+        r = fit_attenuation_batch(self.ds, Bs, self.B_0)
+        self.assertAlmostEqual(np.mean(r_a["mu"]), 1.7, places=2)
+        self.assertTrue(abs(np.std(r_a["mu"]) / r["mu_err"][0] - 1.0) < 0.1)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_attenuation.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("=================================================")
+    lg.info(" Logger output from plotting/test_attenuation.py ")
+    lg.info("=================================================")
+    lg.info("")
+
+    unittest.main()
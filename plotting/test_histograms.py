@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the temporary histogram file.
+import tempfile, shutil
+
+#...for the MATH.
+import numpy as np
+
+#...for the histograms.
+from plotting.histograms import HISTOGRAM_BINS, fill_histograms, merge_histograms, \
+    save_histograms, load_histograms, get_histogram_key, get_bin_edges
+
+def makeColumns(n, seed):
+    """ Make (random) cluster property columns. """
+    rs = np.random.RandomState(seed)
+    columns = {
+        "size"          : rs.randint(1, 300, n),
+        "radius_uw"     : rs.exponential(3.0, n),
+        "density_uw"    : rs.uniform(0.0, 2.5, n),
+        "lin_linearity" : rs.exponential(1.0, n),
+        "innerfrac"     : rs.uniform(0.0, 1.0, n),
+        "totalcounts"   : rs.randint(0, 30000, n),
+        "maxcounts"     : rs.uniform(0.0, 2500.0, n),
+        "xmin"          : rs.uniform(0.0, 250.0, n),
+        "ymin"          : rs.uniform(0.0, 250.0, n)
+        }
+    columns["xmax"] = columns["xmin"] + 5.0
+    columns["ymax"] = columns["ymin"] + 5.0
+    return columns
+
+class HistogramsTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_fill(self):
+
+        columns = makeColumns(10000, 42)
+
+        hists = fill_histograms(columns)
+
+        # The tests
+        #-----------
+        for name, (lo, hi, n) in HISTOGRAM_BINS.iteritems():
+
+            counts = hists[get_histogram_key("All", [name])]
+
+            ## The reference histogram.
+            ref, edges = np.histogram(columns[name], bins=n, range=(lo, hi))
+
+            self.assertEqual(len(counts), n + 2)
+            self.assertEqual(list(counts[1:-1]), list(ref))
+            self.assertEqual(counts[0], (columns[name] < lo).sum())
+            self.assertEqual(counts[-1], (columns[name] >= hi).sum())
+
+            # The types add up to all of the clusters.
+            self.assertEqual(sum([hists[get_histogram_key(t, [name])].sum() \
+                for t in ["None", "Edge", "Alpha", "Beta", "Gamma"]]), 10000)
+
+        counts = hists[get_histogram_key("All", ["size", "radius_uw"])]
+
+        ref, xedges, yedges = np.histogram2d(columns["size"], columns["radius_uw"], \
+            bins=[get_bin_edges("size"), get_bin_edges("radius_uw")])
+
+        self.assertTrue(np.array_equal(counts[1:-1, 1:-1], ref))
+
+        # Only small clusters can be gamma candidates.
+        self.assertEqual(hists[get_histogram_key("Gamma", ["size"])][6:].sum(), 0)
+
+    def test_frame_size(self):
+
+        ## Clusters touching x = 255 (in the middle of a 512 x 512 frame).
+        columns = makeColumns(1000, 3)
+        columns["xmin"] = columns["xmin"] + 250.0
+        columns["xmax"] = columns["xmin"] + 5.0
+        columns["ymin"] = columns["ymin"] + 100.0
+        columns["ymax"] = columns["ymin"] + 5.0
+
+        h256 = fill_histograms(columns)
+        h512 = fill_histograms(columns, 512, 512)
+
+        # The tests
+        #-----------
+        self.assertTrue(h256[get_histogram_key("Edge", ["size"])].sum() > 0)
+        self.assertEqual(h512[get_histogram_key("Edge", ["size"])].sum(), 0)
+
+    def test_merge_and_save(self):
+
+        h1 = fill_histograms(makeColumns(1000, 1))
+        h2 = fill_histograms(makeColumns(2000, 2))
+
+        merged = merge_histograms([h1, h2])
+
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            path = os.path.join(tmpdir, "histograms.npz")
+            save_histograms(path, merged)
+            loaded = load_histograms(path)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        # The tests
+        #-----------
+        self.assertEqual(sorted(loaded.keys()), sorted(h1.keys()))
+        #
+        for key in h1.keys():
+            self.assertTrue(np.array_equal(loaded[key], h1[key] + h2[key]))
+
+        self.assertEqual(loaded[get_histogram_key("All", ["size"])].sum(), 3000)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_histograms.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("================================================")
+    lg.info(" Logger output from plotting/test_histograms.py ")
+    lg.info("================================================")
+    lg.info("")
+
+    unittest.main()
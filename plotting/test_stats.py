@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#...the usual suspects.
+import os, inspect
+
+#...for the unit testing.
+import unittest
+
+#...for the logging.
+import logging as lg
+
+#...for the MATH.
+import numpy as np
+
+#...for the Chi^2 method.
+from plotting.stats import chi2
+
+class Chi2Test(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_chi2_single(self):
+
+        nan = float('nan')
+
+        # The tests
+        #-----------
+        #
+        # The trailing NaN is dropped; the other NaN counts as zero.
+        c2, ndof, c2_div = chi2([1.0, 2.0, nan, 4.0, nan], [1.1, 2.2, 3.3, 4.4, 5.5], 1)
+        self.assertAlmostEqual(c2, (0.1**2)/1.1 + (0.2**2)/2.2 + 3.3 + (0.4**2)/4.4, places=9)
+        self.assertEqual(ndof, 3)
+        self.assertAlmostEqual(c2_div, c2 / 3.0, places=9)
+
+        # If all of the values are NaN, only the first is used.
+        c2, ndof, c2_div = chi2([nan, nan, nan], [1.1, 2.2, 3.3], 0)
+        self.assertAlmostEqual(c2, 1.1, places=9)
+        self.assertEqual(ndof, 1)
+
+    def test_chi2_batch(self):
+
+        nan = float('nan')
+
+        ## The observed values (three replicas).
+        obs = np.array([\
+            [1.0, 2.0, nan, 4.0, nan], \
+            [1.0, 2.0, 3.0, 4.0, 5.0], \
+            [nan, nan, nan, nan, nan]])
+
+        ## The expected values (the same for each replica).
+        exp = np.array([1.1, 2.2, 3.3, 4.4, 5.5])
+
+        c2s, ndofs, c2_divs = chi2(obs, exp, 1)
+
+        # The tests
+        #-----------
+        #
+        # The replicas agree with the single calculations.
+        for i in range(2):
+            c2, ndof, c2_div = chi2(obs[i], exp, 1)
+            self.assertAlmostEqual(c2s[i], c2, places=9)
+            self.assertEqual(ndofs[i], ndof)
+            self.assertAlmostEqual(c2_divs[i], c2_div, places=9)
+        #
+        # The all-NaN replica only uses the first value.
+        self.assertAlmostEqual(c2s[2], 1.1, places=9)
+        self.assertEqual(ndofs[2], 0)
+
+    def test_chi2_mask(self):
+
+        ## The observed values (two replicas).
+        obs = np.array([\
+            [1.0, 2.0, 3.0, 4.0, 5.0], \
+            [1.0, 2.0, 3.0, 4.0, 5.0]])
+
+        ## The expected values.
+        exp = np.array([1.1, 2.2, 3.3, 4.4, 5.5])
+
+        ## The values to use.
+        mask = np.array([\
+            [True, True, False, True, True], \
+            [True, True, True,  True, False]])
+
+        c2s, ndofs, c2_divs = chi2(obs, exp, 2, mask=mask)
+
+        # The tests
+        #-----------
+        #
+        # The masked out values aren't counted at all.
+        self.assertAlmostEqual(c2s[0], (0.1**2)/1.1 + (0.2**2)/2.2 + (0.4**2)/4.4 + (0.5**2)/5.5, places=9)
+        self.assertEqual(ndofs[0], 2)
+        self.assertAlmostEqual(c2s[1], (0.1**2)/1.1 + (0.2**2)/2.2 + (0.3**2)/3.3 + (0.4**2)/4.4, places=9)
+        self.assertEqual(ndofs[1], 2)
+        #
+        # A single set of values.
+        c2, ndof, c2_div = chi2(obs[0], exp, 2, mask=mask[0])
+        self.assertAlmostEqual(c2, c2s[0], places=9)
+        self.assertEqual(ndof, 2)
+
+
+if __name__ == "__main__":
+
+    lg.basicConfig(filename='log_test_stats.log', filemode='w', level=lg.DEBUG)
+
+    lg.info("")
+    lg.info("===========================================")
+    lg.info(" Logger output from plotting/test_stats.py ")
+    lg.info("===========================================")
+    lg.info("")
+
+    unittest.main()
@@ -21,164 +21,220 @@ import logging as lg
 #...for file manipulation.
 from shutil import rmtree
 
+#...for profiling the processing.
+import cProfile
+
+#...for timing the counting.
+import time
+
 # Import the JSON library.
 import json
 
 #...for processing the datasets.
 from cernatschool.dataset import Dataset
 
+#...for reading the datasets straight from archives.
+from cernatschool.archive import DataArchive, ArchiveDataset, isArchive
+
 #...for making the frame and clusters images.
 from visualisation.visualisation import makeFrameImage, makeKlusterImage
 
 #...for getting the cluster properties JSON.
-from cernatschool.helpers import getKlusterPropertiesJson
+from cernatschool.helpers import getKlusterPropertiesJson, getPixelArrays
+
+#...for counting the cluster types without the full processing.
+from cernatschool.counting import countKlusterTypes
+
+#...for the cluster finding backends.
+from cernatschool.klusterbackends import getKlusterBackendNames, registerKlusterBackend, TiledKlusterBackend, \
+    DEFAULT_KLUSTER_BACKEND, DEFAULT_TILE_SIZE
+
+#...for reading the pixel mask.
+from cernatschool.occupancy import getMaskFromLines
+
+#...for the per-pixel energy calibration.
+from cernatschool.calibration import PixelCalibration
+
+#...for the read-ahead defaults.
+from cernatschool.prefetch import DEFAULT_PREFETCH_DEPTH, DEFAULT_PREFETCH_MB
+
+#...for timing and counting the processing.
+from cernatschool.metrics import ProcessingMetrics
+
+#...for sharing the processing between workers.
+from cernatschool.workqueue import WorkQueue, getWorkerId, getChunks, makeDirectory, writeJsonAtomically, appendJsonList, \
+    DEFAULT_CLAIM_TIMEOUT
+
+#...for watching the acquisition directories.
+from cernatschool.watch import AcquisitionWatcher, LiveCounts, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_TIME
+
+#...for sorting the clusters as they're found.
+from cernatschool.sorting import getKlusterType
 
 from data.datapoint import DataPoint
 
-if __name__ == "__main__":
+## The errors raised by frames that can't be read.
+PARSE_ERRORS = (IOError, ValueError, IndexError)
 
-    print("*")
-    print("*========================================*")
-    print("* CERN@school - local dataset processing *")
-    print("*========================================*")
+def getArchiveDataPoints(path, outputpath):
+    """
+    Get the data points held in a (zip or tar) archive.
 
-    # Get the datafile path from the command line.
-    parser = argparse.ArgumentParser()
-    parser.add_argument("inputPath",       help="Path to the input datasets.")
-    parser.add_argument("outputPath",      help="The base path for the output.")
-    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
-    parser.add_argument("-g", "--gamma",   help="Process gamma candidates too", action="store_true")
-    args = parser.parse_args()
+    @param [in] path The path to the archive.
+    @param [in] outputpath The output path.
+    @returns A list of the data points found in the archive.
+    """
 
-    ## The path to the data file.
-    datapath = args.inputPath
+    ## The archive.
+    archive = DataArchive(path)
 
-    ## The output path.
-    outputpath = args.outputPath
+    ## The data points in the archive.
+    dps = [DataPoint(folder, outputpath, archive) for folder in archive.findDataPoints()]
+
+    lg.info(" * Found %d data points in '%s'." % (len(dps), path))
+
+    return dps
+
+def getDataset(dp, selection=None):
+    """
+    Get the dataset of a data point (from its folder or its archive).
+
+    @param [in] dp The data point.
+    @param [in] selection A list of the data file names to use (optional).
+    """
+    if dp.get_archive() is not None:
+        return ArchiveDataset(dp.get_archive(), dp.get_input_path() + "/ASCIIxyC", selection=selection)
+    return Dataset(dp.get_input_path() + "/ASCIIxyC/", selection=selection)
+
+def readInputFile(dp, bn):
+    """ Read one of a data point's files (from its folder or its archive). """
+    if dp.get_archive() is not None:
+        return dp.get_archive().read(dp.get_input_path() + "/" + bn)
+    with open(dp.get_input_path() + "/" + bn, "r") as f:
+        return f.read()
+
+def readDataPointInfo(dp, width=256):
+    """
+    Read the metadata and pixel mask of a data point.
+
+    @param [in] dp The data point.
+    @param [in] width The frame width [pixels].
+    @returns The (lat, lon, alt) tuple and the pixel mask {X:1}.
+    """
+
+    # Get the metadata from the JSON.
+
+    ## The frame metadata.
+    fmd = json.loads(readInputFile(dp, "metadata.json"))
     #
-    # Check if the output directory exists. If it doesn't, quit.
-    if not os.path.isdir(outputpath):
-        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+    ## Latitude of the dataset [deg.].
+    lat = fmd[0]['lat'] # [deg.]
+    #
+    ## Longitude of the dataset [deg.].
+    lon = fmd[0]['lon'] # [deg.]
+    #
+    ## Altitude of the dataset [m].
+    alt = fmd[0]['alt'] # [m]
 
-    # Set the logging level.
-    if args.verbose:
-        level=lg.DEBUG
-    else:
-        level=lg.INFO
+    ## The pixel mask.
+    pixel_mask = getMaskFromLines(readInputFile(dp, "masked_pixels.txt").splitlines(), width)
 
-    # Configure the logging.
-    lg.basicConfig(filename=outputpath + '/log_process-datasets.log', filemode='w', level=level)
+    return (lat, lon, alt), pixel_mask
 
-    print("*")
-    print("* Input path          : '%s'" % (datapath))
-    print("* Output path         : '%s'" % (outputpath))
-    print("*")
-    if args.gamma:
-        print("* Gamma candidate clusters WILL be processed.")
-    else:
-        print("* Gamma candidate clusters WILL NOT be processed.")
-    print("*")
+def makeOutputDirectories(dp):
+    """
+    Make the output directories for a data point (if they don't already exist).
 
-    # Find the data sub-directories.
+    @param [in] dp The data point.
+    @returns The paths to the frame and cluster image directories.
+    """
 
-    data_points = []
+    ## The path to the frame images.
+    frpath = (dp.get_output_path() + "/frames/").replace("//", "/")
 
-    for entry in sorted(glob.glob((datapath + "/*").replace("//", "/"))):
-        if os.path.isdir(entry):
-            data_points.append(DataPoint(entry, outputpath))
+    ## The path to the cluster images.
+    klpath = (dp.get_output_path() + "/clusters/").replace("//", "/")
 
-    data_points = sorted(data_points)
+    for path in [frpath, klpath]:
+        makeDirectory(path)
+        lg.info(" * Using directory '%s'..." % (path))
 
-    # Set up the directories
-    #------------------------
+    return frpath, klpath
 
-    # Create the subdirectories.
-    for dp in data_points:
+def processDataset(name, ds, geo, pixel_mask, frpath, klpath, args, calibration, metrics):
+    """
+    Cluster the frames of a dataset and make the images and JSON entries.
 
-        print("* Processing '%s'." % (dp.get_name()))
+    @param [in] name The name of the data point (for the progress messages).
+    @param [in] ds The dataset.
+    @param [in] geo The (lat, lon, alt) tuple of the dataset.
+    @param [in] pixel_mask The pixel mask {X:1}.
+    @param [in] frpath The path for the frame images.
+    @param [in] klpath The path for the cluster images.
+    @param [in] args The command line arguments.
+    @param [in] calibration The per-pixel energy calibration (or None).
+    @param [in] metrics The timing and counting for the dataset.
+    @returns The list of frame metadata and the list of cluster properties.
+    """
 
-        # If it exists, delete it.
-        if os.path.isdir(dp.get_output_path()):
-            #rmtree(dp.get_output_path())
-            lg.info(" * Skipping directory '%s'..." % (dp.get_output_path()))
-            print(" * Skipping directory '%s'..." % (dp.get_output_path()))
-            continue
-        os.mkdir(dp.get_output_path())
-        lg.info(" * Creating directory '%s'..." % (dp.get_output_path()))
-        lg.info("")
+    ## The frames from the dataset.
+    frames = []
 
-        ## The path to the frame images.
-        frpath = (dp.get_output_path() + "/frames/").replace("//", "/")
-        #
-        if os.path.isdir(frpath):
-            rmtree(frpath)
-            lg.info(" * Removing directory '%s'..." % (frpath))
-        os.mkdir(frpath)
-        lg.info(" * Creating directory '%s'..." % (frpath))
-        lg.info("")
-
-        ## The path to the cluster images.
-        klpath = (dp.get_output_path() + "/clusters/").replace("//", "/")
-        #
-        if os.path.isdir(klpath):
-            rmtree(klpath)
-            lg.info(" * Removing directory '%s'..." % (klpath))
-        os.mkdir(klpath)
-        lg.info(" * Creating directory '%s'..." % (klpath))
-        lg.info("")
+    ## The frames, read (ahead) from the DSC and data files.
+    frameiter = ds.iterFrames(geo, \
+        prefetch    = args.prefetch, \
+        prefetchmb  = args.prefetch_mb, \
+        pixelmask   = pixel_mask, \
+        calibration = calibration, \
+        keepgammas  = args.gamma, \
+        backend     = args.backend)
 
-        ## The dataset to process.
-        ds = Dataset(dp.get_input_path() + "/ASCIIxyC/")
+    # The frames only find their clusters when asked to, so do it
+    # here while the next files are being read. The parsing time is
+    # the time spent waiting for each frame to be read.
+    while True:
 
-        # Get the metadata from the JSON.
+        with metrics.stage("parse"):
+            f = next(frameiter, None)
 
-        ## The frame metadata.
-        fmd = None
-        #
-        with open(dp.get_input_path() + "/metadata.json", "r") as fmdf:
-            fmd = json.load(fmdf, fmd)
-        #
-        ## Latitude of the dataset [deg.].
-        lat = fmd[0]['lat'] # [deg.]
-        #
-        ## Longitude of the dataset [deg.].
-        lon = fmd[0]['lon'] # [deg.]
-        #
-        ## Altitude of the dataset [m].
-        alt = fmd[0]['alt'] # [m]
+        if f is None:
+            break
+
+        with metrics.stage("cluster"):
+            f.cluster()
+
+        # The cluster properties (radius, linearity, etc.) are worked
+        # out by the cluster finder, but are timed as "properties".
+        metrics.moveTime("cluster", "properties", *f.getKlusterFinder().getPropertiesTime())
 
-        ## The pixel mask.
-        pixel_mask = {}
+        frames.append(f)
 
-        with open(dp.get_input_path() + "/masked_pixels.txt", "r") as mpf:
-            rows = mpf.readlines()
-            for row in rows:
-                vals = [int(val) for val in row.strip().split("\t")]
-                x = vals[0]; y = vals[1]; X = (256*y) + x; C = 1
-                pixel_mask[X] = C
+    # Sort the frames by start time (as Dataset.getFrames does).
+    frames.sort(key=lambda f: f.getStartTime())
 
-        ## The frames from the dataset.
-        frames = ds.getFrames((lat, lon, alt), pixelmask = pixel_mask)
+    lg.info(" * Found %d datafiles." % (len(frames)))
 
-        lg.info(" * Found %d datafiles." % (len(frames)))
+    ## A list of frames.
+    mds = []
 
-        ## A list of frames.
-        mds = []
+    ## A list of clusters.
+    klusters = []
 
-        ## A list of clusters.
-        klusters = []
+    # Loop over the frames.
+    for i, f in enumerate(frames):
 
-        # Loop over the frames.
-        for i, f in enumerate(frames):
+        if i % 50 == 0:
+            print("*--> '%s': processing frame % 10d..." % (name, i))
 
-            if i % 50 == 0:
-                print("*--> '%s': processing frame % 10d..." % (dp.get_name(), i))
+        ## The basename for the data frame, based on frame information.
+        bn = "%s_%d-%06d" % (f.getChipId(), f.getStartTimeSec(), f.getStartTimeSubSec())
 
-            ## The basename for the data frame, based on frame information.
-            bn = "%s_%d-%06d" % (f.getChipId(), f.getStartTimeSec(), f.getStartTimeSubSec())
+        # Create the frame image.
+        if not args.no_images:
+            with metrics.stage("render"):
+                makeFrameImage(bn, f.getPayload(), frpath)
 
-            # Create the frame image.
-            makeFrameImage(bn, f.getPixelMap(), frpath)
+        with metrics.stage("properties"):
 
             # Create the metadata dictionary for the frame.
             metadata = {
@@ -207,28 +263,105 @@ if __name__ == "__main__":
                 "ismc"        : int(f.isMC())
                 }
 
-            # Add the frame metadata to the list of frames.
-            mds.append(metadata)
+        # Add the frame metadata to the list of frames.
+        mds.append(metadata)
 
-            # The cluster analysis
-            #----------------------
+        metrics.increment("frames")
+        metrics.increment("pixels",   metadata["n_pixel"])
+        metrics.increment("clusters", metadata["n_kluster"])
+        metrics.increment("gammas",   metadata["n_gamma"])
 
-            # Loop over the clusters.
-            for i, kl in enumerate(f.getKlusterFinder().getListOfKlusters()):
+        # The cluster analysis
+        #----------------------
 
-                if not args.gamma and kl.isGamma():
-                    continue
+        # Loop over the clusters.
+        # (Without -g the gamma candidates were only counted.)
+        kf = f.getKlusterFinder()
+        #
+        for i, kl in zip(kf.getKlusterIndices(), kf.getListOfKlusters()):
+
+            if not args.gamma and kl.isGamma():
+                continue
 
-                ## The kluster ID.
-                klusterid = bn + "_k%05d" % (i)
+            ## The kluster ID.
+            klusterid = bn + "_k%05d" % (i)
 
-                # Get the cluster properties JSON entry and add it to the list.
+            # Get the cluster properties JSON entry and add it to the list.
+            with metrics.stage("properties"):
                 klusters.append(getKlusterPropertiesJson(klusterid, kl))
 
-                # Make the cluster image.
-                makeKlusterImage(klusterid, kl, klpath)
+            # Make the cluster image.
+            if not args.no_images:
+                with metrics.stage("render"):
+                    makeKlusterImage(klusterid, kl, klpath)
+
+        #break # TMP - uncomment to only process the first frame.
+
+    return mds, klusters
+
+def startProfiler(args):
+    """ Start the profiler (if requested). """
+    if not args.profile:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def finish(path, metrics, profiler):
+    """
+    Write out the profiling and the timing and counting information.
+
+    @param [in] path The path (and file name prefix) for the output.
+    @param [in] metrics The timing and counting information.
+    @param [in] profiler The profiler (or None).
+    """
+
+    # Write out the profiling information.
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats((path + "profile.pstats").replace("//", "/"))
+
+    # Summarise and write out the timing and counting information.
+    for l in metrics.getSummaryLines():
+        print(l)
+    metrics.logSummary()
+    metrics.writeJson((path + "metrics.json").replace("//", "/"))
+
+def processDataPoint(dp, args, calibration):
+    """ Process all of the frames of a data point in this process. """
+
+    print("* Processing '%s'." % (dp.get_name()))
+
+    # If it exists, delete it.
+    if os.path.isdir(dp.get_output_path()):
+        #rmtree(dp.get_output_path())
+        lg.info(" * Skipping directory '%s'..." % (dp.get_output_path()))
+        print(" * Skipping directory '%s'..." % (dp.get_output_path()))
+        return
+    os.mkdir(dp.get_output_path())
+    lg.info(" * Creating directory '%s'..." % (dp.get_output_path()))
+    lg.info("")
+
+    frpath, klpath = makeOutputDirectories(dp)
+
+    ## The timing and counting for the data point.
+    metrics = ProcessingMetrics(dp.get_name())
+
+    ## The profiler (if requested).
+    profiler = startProfiler(args)
+
+    # Finding the data and DSC files and reading the metadata
+    # and the pixel mask.
+    with metrics.stage("parse"):
+
+        ## The dataset to process.
+        ds = getDataset(dp)
+
+        geo, pixel_mask = readDataPointInfo(dp, ds.getFrameSize()[0])
+
+    mds, klusters = processDataset(dp.get_name(), ds, geo, pixel_mask, frpath, klpath, args, calibration, metrics)
 
-            #break # TMP - uncomment to only process the first frame.
+    with metrics.stage("write"):
 
         # Write out the frame information to a JSON file.
         with open((dp.get_output_path() + "/frames.json").replace("//", "/"), "w") as jf:
@@ -238,4 +371,574 @@ if __name__ == "__main__":
         with open((dp.get_output_path() + "/klusters.json").replace("//", "/"), "w") as jf:
             json.dump(klusters, jf)
 
-        lg.info(" *")
+    finish(dp.get_output_path() + "/", metrics, profiler)
+
+    lg.info(" *")
+
+def countDataPoint(dp):
+    """
+    Count the clusters of each type in a data point (without any output files).
+
+    @param [in] dp The data point.
+    @returns A dictionary of the number of clusters of each type {type:n}.
+    """
+
+    ## The dataset to count.
+    ds = getDataset(dp)
+
+    ## The frame width and height [pixels].
+    width, height = ds.getFrameSize()
+
+    geo, pixel_mask = readDataPointInfo(dp, width)
+
+    ## The paths to the data files.
+    paths = ds.getDataFilePaths()
+
+    ## The function reading the pixels of each data file.
+    reader = getPixelArrays
+
+    # Read the archive members in the order they're stored (the counts don't depend on the order).
+    if dp.get_archive() is not None:
+        paths = dp.get_archive().sortByPosition(paths)
+        reader = ds.readPixelArrays
+
+    counts = countKlusterTypes(paths, ds.dataformat, pixel_mask, width, height, reader=reader)
+
+    lg.info(" * '%s': %s" % (dp.get_name(), counts))
+
+    return counts
+
+def getTasks(dp, chunksize):
+    """
+    Get the tasks (frame ranges) for a data point.
+
+    Every worker gets the same list, as the data files are sorted by name.
+
+    @param [in] dp The data point.
+    @param [in] chunksize The number of frames per task (<= 0 for the whole data point).
+    @returns A list of (task name, list of data file names) tuples.
+    """
+
+    ## The data file names (sorted).
+    datfiles = sorted(getDataset(dp).datfilenames.values())
+
+    return [("%s_%06d" % (dp.get_name(), first), datfiles[first:end]) \
+        for first, end in getChunks(len(datfiles), chunksize)]
+
+def getPartPath(dp, task):
+    """ The path (and file name prefix) for a task's partial output. """
+    return (dp.get_output_path() + "/parts/" + task + "_").replace("//", "/")
+
+def processTask(dp, task, selection, args, calibration):
+    """ Process the frames of a task (claimed from the work queue). """
+
+    print("* Processing '%s' (%d frames)." % (task, len(selection)))
+
+    makeDirectory(dp.get_output_path() + "/parts")
+
+    frpath, klpath = makeOutputDirectories(dp)
+
+    ## The timing and counting for the task.
+    metrics = ProcessingMetrics(task)
+
+    ## The profiler (if requested).
+    profiler = startProfiler(args)
+
+    with metrics.stage("parse"):
+
+        ## The dataset to process (only the task's frames).
+        ds = getDataset(dp, selection=selection)
+
+        geo, pixel_mask = readDataPointInfo(dp, ds.getFrameSize()[0])
+
+    mds, klusters = processDataset(task, ds, geo, pixel_mask, frpath, klpath, args, calibration, metrics)
+
+    ## The path for the partial output.
+    partpath = getPartPath(dp, task)
+
+    with metrics.stage("write"):
+        writeJsonAtomically(partpath + "frames.json", mds)
+        writeJsonAtomically(partpath + "klusters.json", klusters)
+
+    finish(partpath, metrics, profiler)
+
+    lg.info(" *")
+
+def mergeDataPoint(dp, tasks, queue):
+    """
+    Assemble the frames.json and klusters.json of a data point from its tasks' partial outputs.
+
+    @returns True if the data point was merged, False otherwise.
+    """
+
+    ## The tasks that aren't finished yet.
+    unfinished = [task for task in tasks if not queue.isDone(task)]
+
+    if len(unfinished) > 0:
+        print("* '%s': %d of %d tasks unfinished - not merging." % (dp.get_name(), len(unfinished), len(tasks)))
+        return False
+
+    # Only one worker should merge each data point.
+    if not queue.claim(dp.get_name() + "_merge"):
+        return False
+
+    ## The frames from all of the tasks.
+    mds = []
+
+    ## The clusters from all of the tasks.
+    klusters = []
+
+    try:
+        with queue.keepAlive(dp.get_name() + "_merge"):
+            for task in tasks:
+                partpath = getPartPath(dp, task)
+                with open(partpath + "frames.json", "r") as jf:
+                    mds += json.load(jf)
+                with open(partpath + "klusters.json", "r") as jf:
+                    klusters += json.load(jf)
+
+            # The frames are sorted by start time (as Dataset.getFrames does),
+            # whatever order the tasks' frames are in, and their clusters with them.
+            mds.sort(key=lambda md: md["start_time"])
+
+            ## The position of each frame {frame ID:index}.
+            order = dict([(md["id"], i) for i, md in enumerate(mds)])
+            #
+            klusters.sort(key=lambda k: order[k["id"].rsplit("_k", 1)[0]])
+
+            writeJsonAtomically((dp.get_output_path() + "/frames.json").replace("//", "/"), mds)
+            writeJsonAtomically((dp.get_output_path() + "/klusters.json").replace("//", "/"), klusters)
+    except:
+        queue.release(dp.get_name() + "_merge")
+        raise
+
+    queue.markDone(dp.get_name() + "_merge", {"frames" : len(mds), "klusters" : len(klusters)})
+
+    print("* '%s': merged %d tasks (%d frames, %d clusters)." % (dp.get_name(), len(tasks), len(mds), len(klusters)))
+
+    return True
+
+def getKlusterTypes(mds, klusters, width, height):
+    """
+    Sort the clusters of some frames (as sort-clusters.py would).
+
+    @param [in] mds The frames' metadata dictionaries.
+    @param [in] klusters The frames' cluster properties dictionaries.
+    @param [in] width The frame width [pixels].
+    @param [in] height The frame height [pixels].
+    @returns A list of the types of each frame's clusters (in frame order).
+    """
+
+    ## The types of each frame's clusters {frame ID:[type]}.
+    types = dict([(md["id"], []) for md in mds])
+
+    for k in klusters:
+        types[k["id"].rsplit("_k", 1)[0]].append(getKlusterType(k, width, height))
+
+    return [types[md["id"]] for md in mds]
+
+def startWatching(dp, args):
+    """
+    Start watching the acquisition directory of a data point.
+
+    If the data point was being watched before, the watching carries
+    on from where it left off (see live.json). Anything written to
+    frames.json and klusters.json after live.json was last written is
+    written over, so frames can't be added twice.
+
+    @param [in] dp The data point.
+    @param [in] args The command line arguments.
+    @returns The data point's watch state (or None if the data point isn't ready yet).
+    """
+
+    ## The path to the data and DSC files.
+    acqpath = dp.get_input_path() + "/ASCIIxyC"
+
+    # Wait for the data point's folder, metadata and pixel mask.
+    for path in [acqpath, dp.get_input_path() + "/metadata.json", dp.get_input_path() + "/masked_pixels.txt"]:
+        if not os.path.exists(path):
+            return None
+
+    ## The watch state.
+    state = {
+        "dp"       : dp,
+        "live"     : LiveCounts(),
+        "metrics"  : ProcessingMetrics(dp.get_name()),
+        "geo"      : None,
+        "mask"     : None,
+        "size"     : None,
+        "offsets"  : {"frames" : 0, "klusters" : 0}
+        }
+
+    ## The data files already processed.
+    done = []
+
+    ## The path to the live results.
+    livepath = (dp.get_output_path() + "/live.json").replace("//", "/")
+
+    if os.path.exists(livepath):
+
+        with open(livepath, "r") as jf:
+            live = json.load(jf)
+
+        done = live["files"]
+
+        state["live"] = LiveCounts(state=live["live"])
+
+        state["offsets"] = live["offsets"]
+
+        print("* Carrying on watching '%s' (%d frames)." % (dp.get_name(), len(done)))
+
+    else:
+        makeDirectory(dp.get_output_path())
+
+        print("* Watching '%s'." % (dp.get_name()))
+
+    state["frpath"], state["klpath"] = makeOutputDirectories(dp)
+
+    # Drop anything written since live.json (or start the lists).
+    for key in ["frames", "klusters"]:
+        appendJsonList((dp.get_output_path() + "/" + key + ".json").replace("//", "/"), state["offsets"][key], [])
+
+    state["watcher"] = AcquisitionWatcher(acqpath, args.settle, done)
+
+    return state
+
+def processWatchedFrames(state, names, args, calibration):
+    """
+    Process new frames from a watched data point and update its output.
+
+    @param [in] state The data point's watch state (see startWatching).
+    @param [in] names The names of the new data files.
+    @param [in] args The command line arguments.
+    @param [in] calibration The per-pixel energy calibration (or None).
+    """
+
+    ## The data point.
+    dp = state["dp"]
+
+    ## The timing and counting for the data point.
+    metrics = state["metrics"]
+
+    with metrics.stage("parse"):
+
+        ## The dataset of the new frames.
+        ds = Dataset(state["watcher"].getFolderName(), selection=names)
+
+        # The frame size and pixel mask are read with the first frames.
+        if state["size"] is None:
+            state["size"] = ds.getFrameSize()
+            state["geo"], state["mask"] = readDataPointInfo(dp, state["size"][0])
+
+    mds, klusters = processDataset(dp.get_name(), ds, state["geo"], state["mask"], \
+        state["frpath"], state["klpath"], args, calibration, metrics)
+
+    for md, types in zip(mds, getKlusterTypes(mds, klusters, state["size"][0], state["size"][1])):
+        state["live"].addFrame(md["acqtime"], types)
+
+    state["watcher"].markDone(names)
+
+    # Only the new frames and clusters are written. live.json, which says
+    # how much of the frames and clusters JSON to keep when carrying on,
+    # is written (atomically) last.
+    with metrics.stage("write"):
+        for key, items in [("frames", mds), ("klusters", klusters)]:
+            state["offsets"][key] = appendJsonList((dp.get_output_path() + "/" + key + ".json").replace("//", "/"), \
+                state["offsets"][key], items)
+        writeJsonAtomically((dp.get_output_path() + "/live.json").replace("//", "/"), \
+            {"files" : state["watcher"].getDoneFiles(), "live" : state["live"].getJson(), \
+             "offsets" : state["offsets"], "updated" : time.time()})
+        metrics.writeJson((dp.get_output_path() + "/metrics.json").replace("//", "/"))
+
+def watchDataPoints(datapath, outputpath, args, calibration):
+    """
+    Process the frames of the data points as they are written.
+
+    New data points (directories) are picked up too. The frames,
+    clusters, live counts and beta_results.json are updated after each
+    new batch of frames.
+
+    @param [in] datapath The path to the (input) data points.
+    @param [in] outputpath The base path for the output.
+    @param [in] args The command line arguments.
+    @param [in] calibration The per-pixel energy calibration (or None).
+    """
+
+    ## The watch states of the data points being watched {name:state}.
+    watched = {}
+
+    ## The data points processed in full already (that are skipped).
+    skipped = set()
+
+    ## The time the last new frames were found [s].
+    t_last = time.time()
+
+    while True:
+
+        # Look for new data points.
+        for entry in sorted(glob.glob((datapath + "/*").replace("//", "/"))):
+
+            if not os.path.isdir(entry):
+                continue
+
+            dp = DataPoint(entry, outputpath)
+
+            if dp.get_name() in watched or dp.get_name() in skipped:
+                continue
+
+            if os.path.isdir(dp.get_output_path()) and not os.path.exists(dp.get_output_path() + "/live.json"):
+                lg.info(" * Skipping directory '%s'..." % (dp.get_output_path()))
+                print(" * Skipping directory '%s'..." % (dp.get_output_path()))
+                skipped.add(dp.get_name())
+                continue
+
+            state = startWatching(dp, args)
+
+            if state is not None:
+                watched[dp.get_name()] = state
+
+        ## The names of the data points with new frames.
+        updated = []
+
+        for name in sorted(watched.keys()):
+
+            names = watched[name]["watcher"].poll()
+
+            if len(names) == 0:
+                continue
+
+            try:
+                processWatchedFrames(watched[name], names, args, calibration)
+            except PARSE_ERRORS:
+                # Process the frames one at a time to find the bad ones.
+                for bn in names:
+                    try:
+                        processWatchedFrames(watched[name], [bn], args, calibration)
+                    except PARSE_ERRORS as e:
+                        # Don't keep trying to read a bad frame.
+                        lg.error(" * Couldn't process '%s' from '%s' (%s)." % (bn, name, str(e)))
+                        print("* ERROR: couldn't process '%s' from '%s' (%s) - skipping it." % (bn, name, str(e)))
+                        watched[name]["watcher"].markDone([bn])
+
+            updated.append(name)
+
+        if len(updated) > 0:
+
+            t_last = time.time()
+
+            ## The path to the results JSON.
+            resultspath = (outputpath + "/beta_results.json").replace("//", "/")
+
+            ## The number of beta candidates for each data point {value:n}.
+            beta_results = {}
+
+            # Keep the results of the data points that aren't being watched.
+            if os.path.exists(resultspath):
+                with open(resultspath, "r") as rjf:
+                    beta_results = dict([(float(value), n) for value, n in json.load(rjf).iteritems()])
+
+            for state in watched.values():
+                beta_results[state["dp"].get_value()] = state["live"].getCount("Beta")
+
+            # Write out the results JSON (as sort-clusters.py would).
+            writeJsonAtomically(resultspath, beta_results)
+
+            for name in updated:
+                live = watched[name]["live"]
+                rate, err = live.getRate("Beta"); recent, recent_err = live.getRecentRate("Beta")
+                print("* '%s': %6d frames, %8d betas - %.3f +/- %.3f [s^-1] (recent %.3f +/- %.3f [s^-1])" % \
+                    (name, live.getNumberOfFrames(), live.getCount("Beta"), rate, err, recent, recent_err))
+
+        elif args.watch_timeout > 0 and time.time() - t_last > args.watch_timeout:
+            print("* No new frames for %.1f [s] - stopping." % (args.watch_timeout))
+            break
+
+        time.sleep(args.poll)
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*========================================*")
+    print("* CERN@school - local dataset processing *")
+    print("*========================================*")
+
+    # Get the datafile path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",       help="Path to the input datasets.")
+    parser.add_argument("outputPath",      help="The base path for the output.")
+    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+    parser.add_argument("-g", "--gamma",   help="Process gamma candidates too", action="store_true")
+    parser.add_argument("-p", "--profile", help="Write a cProfile (pstats) file for each data point", action="store_true")
+    parser.add_argument("-c", "--calibration", help="Path to the per-pixel calibration (a, b, c, t) matrices")
+    parser.add_argument("--prefetch",      help="Number of frame files to read ahead (0 to disable)", type=int, default=DEFAULT_PREFETCH_DEPTH)
+    parser.add_argument("--prefetch-mb",   help="Memory ceiling for the files read ahead [MB]", type=float, default=DEFAULT_PREFETCH_MB)
+    parser.add_argument("-s", "--shard",   help="Share the processing with other workers via a work queue", action="store_true")
+    parser.add_argument("--chunk-size",    help="Number of frames per work queue task (0 for whole data points)", type=int, default=0)
+    parser.add_argument("-m", "--merge",   help="Merge the finished work queue tasks into frames.json and klusters.json", action="store_true")
+    parser.add_argument("--claim-timeout", help="Time after which a work queue claim that isn't kept alive is taken over [s] (0 for never)", type=float, default=DEFAULT_CLAIM_TIMEOUT)
+    parser.add_argument("--count-only",    help="Only count the beta candidates, writing beta_results.json", action="store_true")
+    parser.add_argument("--no-images",     help="Don't make the frame and cluster images", action="store_true")
+    parser.add_argument("-w", "--watch",   help="Process the frames as they are written (until stopped)", action="store_true")
+    parser.add_argument("--poll",          help="Time between looks for new frames when watching [s]", type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument("--settle",        help="Time a frame's files must be unchanged before they're read [s]", type=float, default=DEFAULT_SETTLE_TIME)
+    parser.add_argument("--watch-timeout", help="Stop watching after this long without new frames [s] (0 to keep going)", type=float, default=0.0)
+    parser.add_argument("--backend",       help="The cluster finding backend ('auto' for the fastest available)", \
+        choices=getKlusterBackendNames() + ["auto"], default=DEFAULT_KLUSTER_BACKEND)
+    parser.add_argument("--tile-size",     help="Tile size for the 'tiled' backend [pixels]", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--tile-jobs",     help="Number of processes labelling the tiles for the 'tiled' backend", type=int, default=1)
+    args = parser.parse_args()
+
+    ## The path to the data file.
+    datapath = args.inputPath
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    ## The log file name (one per worker when sharing the processing).
+    logname = 'log_process-datasets.log'
+    #
+    if args.shard or args.merge:
+        logname = 'log_process-datasets_%s.log' % (getWorkerId())
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/' + logname, filemode='w', level=level)
+
+    # Set up the tiled backend with the requested tiles and processes.
+    registerKlusterBackend("tiled", TiledKlusterBackend(args.tile_size, args.tile_jobs))
+
+    print("*")
+    print("* Input path          : '%s'" % (datapath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("*")
+    if args.gamma:
+        print("* Gamma candidate clusters WILL be processed.")
+    else:
+        print("* Gamma candidate clusters WILL NOT be processed.")
+    print("*")
+    print("* Clustering backend  : '%s'" % (args.backend))
+    if args.backend == "tiled":
+        print("* Tiles               : %d x %d [pixels], %d job(s)" % (args.tile_size, args.tile_size, args.tile_jobs))
+    print("*")
+    if args.profile:
+        print("* Profiling information WILL be written for each data point.")
+        print("*")
+
+    if args.prefetch > 0:
+        print("* Up to %d frame files (%.1f MB) WILL be read ahead." % (args.prefetch, args.prefetch_mb))
+        print("*")
+
+    ## The per-pixel energy calibration (loaded once for all data points).
+    calibration = None
+    #
+    if args.calibration is not None:
+        calibration = PixelCalibration(args.calibration)
+        print("* Cluster energies WILL be calculated using '%s'." % (args.calibration))
+        print("*")
+
+    # Find the data sub-directories.
+
+    data_points = []
+
+    ## The data point folders and archives.
+    entries = sorted(glob.glob((datapath + "/*").replace("//", "/")))
+    #
+    # The input path may be an archive of data points itself.
+    if isArchive(datapath):
+        entries = [datapath]
+
+    for entry in entries:
+        if os.path.isdir(entry):
+            data_points.append(DataPoint(entry, outputpath))
+        elif isArchive(entry) and not args.watch:
+            data_points += getArchiveDataPoints(entry, outputpath)
+
+    data_points = sorted(data_points)
+
+    if args.watch:
+
+        print("* Watching '%s' for new frames (every %.1f [s]) - press Ctrl-C to stop." % (datapath, args.poll))
+        print("*")
+
+        try:
+            watchDataPoints(datapath, outputpath, args, calibration)
+        except KeyboardInterrupt:
+            print("* Stopped watching.")
+
+        print("*")
+
+    elif args.count_only:
+
+        ## The number of beta candidates for each data point {value:n}.
+        beta_results = {}
+
+        for dp in data_points:
+
+            t_0 = time.time()
+
+            counts = countDataPoint(dp)
+
+            print("* Counted '%s': %d clusters in %.2f [s]." % (dp.get_name(), sum(counts.values()), time.time() - t_0))
+            print("* %f [%s] has % 10d betas" % (dp.get_value(), dp.get_unit(), counts["Beta"]))
+
+            beta_results[dp.get_value()] = counts["Beta"]
+
+        # Write out the results JSON (as sort-clusters.py would).
+        with open(outputpath + "/beta_results.json", "w") as rjf:
+            json.dump(beta_results, rjf, sort_keys=True)
+
+        print("*")
+
+    elif not args.shard and not args.merge:
+
+        # Process each data point in turn.
+        for dp in data_points:
+            processDataPoint(dp, args, calibration)
+
+    else:
+
+        ## The work queue (shared by all of the workers).
+        queue = WorkQueue((outputpath + "/queue").replace("//", "/"), timeout=args.claim_timeout)
+
+        print("* Worker ID           : '%s'" % (queue.getWorkerId()))
+        print("* Work queue          : '%s'" % (queue.getPath()))
+        print("*")
+
+        ## The tasks for each data point {name:[(task, selection)]}.
+        tasks = {}
+
+        for dp in data_points:
+            tasks[dp.get_name()] = getTasks(dp, args.chunk_size)
+
+        # Claim and process any tasks that are still to be done.
+        if args.shard:
+            for dp in data_points:
+                for task, selection in tasks[dp.get_name()]:
+                    if not queue.claim(task):
+                        continue
+                    try:
+                        with queue.keepAlive(task):
+                            processTask(dp, task, selection, args, calibration)
+                    except:
+                        # Let another worker have a go.
+                        queue.release(task)
+                        raise
+                    queue.markDone(task, {"frames" : len(selection)})
+
+            print("* Worker '%s' processed %d tasks." % (queue.getWorkerId(), len(queue.getClaimedTasks())))
+            print("*")
+
+        # Assemble the outputs of the finished data points.
+        if args.merge:
+            for dp in data_points:
+                mergeDataPoint(dp, [task for task, selection in tasks[dp.get_name()]], queue)
+            print("*")
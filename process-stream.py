@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+
+ CERN@school - Processing Timepix3 Hit Streams
+
+ See the README.md file for more information.
+
+"""
+
+# Import the code needed to manage files.
+import os
+
+#...for parsing the arguments.
+import argparse
+
+#...for the logging.
+import logging as lg
+
+# Import the JSON library.
+import json
+
+#...for the data values.
+from cernatschool.datavals import STREAM_FILE_TYPES
+
+#...for the hit streams.
+from cernatschool.stream import StreamKlusterer, iterHitChunks, getStreamFormat, getStreamKlusterPropertiesJson, \
+    DEFAULT_HIT_CHUNK, DEFAULT_TOA_WINDOW, DEFAULT_TOA_DISORDER
+
+#...for counting the gamma candidates.
+from cernatschool.kluster import isGammaCandidate
+
+#...for the pixel masks.
+from cernatschool.occupancy import readMaskFile
+
+#...for the timing and counting.
+from cernatschool.metrics import ProcessingMetrics
+
+if __name__ == "__main__":
+
+    print("*")
+    print("*==========================================*")
+    print("* CERN@school - processing the hit streams *")
+    print("*==========================================*")
+
+    # Get the stream file path from the command line.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputPath",         help="Path to the hit stream file.")
+    parser.add_argument("outputPath",        help="The path for the output files.")
+    parser.add_argument("-f", "--format",    help="The stream file format (found from the file if not given)", \
+        choices=sorted(STREAM_FILE_TYPES.keys()))
+    parser.add_argument("-w", "--window",    help="Time window for joining neighbouring hits [ns]", type=float, default=DEFAULT_TOA_WINDOW)
+    parser.add_argument("--disorder",        help="How far out of ToA order the hits may be [ns]", type=float, default=DEFAULT_TOA_DISORDER)
+    parser.add_argument("--chunk-size",      help="Number of hits to read at a time", type=int, default=DEFAULT_HIT_CHUNK)
+    parser.add_argument("--width",           help="Frame width [pixels]", type=int, default=256)
+    parser.add_argument("--height",          help="Frame height [pixels]", type=int, default=256)
+    parser.add_argument("-m", "--mask",      help="Path to a pixel mask file (masked_pixels.txt)")
+    parser.add_argument("-v", "--verbose",   help="Increase output verbosity", action="store_true")
+    args = parser.parse_args()
+
+    ## The path to the stream file.
+    streampath = args.inputPath
+    #
+    if not os.path.isfile(streampath):
+        raise IOError("* ERROR: '%s' stream file does not exist!" % (streampath))
+
+    ## The output path.
+    outputpath = args.outputPath
+    #
+    # Check if the output directory exists. If it doesn't, quit.
+    if not os.path.isdir(outputpath):
+        raise IOError("* ERROR: '%s' output directory does not exist!" % (outputpath))
+
+    # Set the logging level.
+    if args.verbose:
+        level=lg.DEBUG
+    else:
+        level=lg.INFO
+
+    # Configure the logging.
+    lg.basicConfig(filename=outputpath + '/log_process-stream.log', filemode='w', level=level)
+
+    ## The stream file format.
+    streamformat = args.format
+    #
+    if streamformat is None:
+        streamformat = getStreamFormat(streampath)
+
+    ## The pixel mask.
+    pixel_mask = {}
+    #
+    if args.mask is not None:
+        pixel_mask = readMaskFile(args.mask, args.width)
+
+    print("*")
+    print("* Input path          : '%s'" % (streampath))
+    print("* Output path         : '%s'" % (outputpath))
+    print("* Stream format       : %s" % (STREAM_FILE_TYPES[streamformat]))
+    print("* ToA window          : %.1f [ns] (disorder %.1f [ns])" % (args.window, args.disorder))
+    print("* Masked pixels       : %d" % (len(pixel_mask)))
+    print("*")
+
+    ## The name of the stream (for the cluster IDs).
+    name = os.path.splitext(os.path.basename(streampath))[0]
+
+    ## The timing and counting information.
+    metrics = ProcessingMetrics(name)
+
+    ## The cluster finder.
+    sk = StreamKlusterer(args.width, args.height, args.window, args.disorder, pixel_mask)
+
+    ## The first and last hit ToA values [ns].
+    t_first = None; t_last = None
+
+    ## The number of clusters written.
+    n_klusters = 0
+
+    # The clusters are written as they are finished, so that only the
+    # unfinished clusters are kept in memory.
+    with open((outputpath + "/klusters.json").replace("//", "/"), "w") as jf:
+
+        jf.write("[")
+
+        ## The hit chunks.
+        chunks = iterHitChunks(streampath, streamformat, args.chunk_size, args.width)
+
+        while True:
+
+            with metrics.stage("parse"):
+                chunk = next(chunks, None)
+
+            if chunk is None:
+                with metrics.stage("cluster"):
+                    klusters = sk.flush()
+            else:
+                X, toa, tot = chunk
+                #
+                if len(toa) > 0:
+                    t_first = toa.min() if t_first is None else min(t_first, toa.min())
+                    t_last  = toa.max() if t_last  is None else max(t_last,  toa.max())
+                #
+                with metrics.stage("cluster"):
+                    klusters = sk.addHits(X, toa, tot)
+
+            for kX, ktoa, ktot in klusters:
+
+                with metrics.stage("properties"):
+                    p = getStreamKlusterPropertiesJson("%s_k%08d" % (name, n_klusters), kX, ktoa, ktot, args.width, args.height)
+
+                if isGammaCandidate(p["size"], p["radius_uw"]):
+                    metrics.increment("gammas")
+
+                with metrics.stage("write"):
+                    if n_klusters > 0:
+                        jf.write(",\n")
+                    jf.write(json.dumps(p))
+
+                n_klusters += 1
+
+            if chunk is None:
+                break
+
+        jf.write("]\n")
+
+    metrics.increment("pixels", sk.getNumberOfHits())
+    metrics.increment("clusters", n_klusters)
+
+    # The hit rates are given below (there are no frames).
+    for l in metrics.getSummaryLines(framerate=False):
+        print(l)
+    metrics.logSummary(framerate=False)
+    metrics.writeJson((outputpath + "/metrics.json").replace("//", "/"))
+
+    ## The time spanned by the hits [s].
+    t_acq = 0.0
+    #
+    if t_first is not None:
+        t_acq = (t_last - t_first) * 1.0e-9
+
+    ## The processing time [s].
+    t_proc = metrics.getTotalWallTime()
+
+    print("*")
+    print("* %d hits (%d late), %d clusters." % (sk.getNumberOfHits(), sk.getNumberOfLateHits(), n_klusters))
+    print("* At most %d hits were kept between chunks." % (sk.getMaxBufferedHits()))
+    if t_acq > 0.0 and t_proc > 0.0:
+        print("* Hit rate            : %.1f [hits/s] acquired, %.1f [hits/s] processed (x%.1f)." % \
+            (sk.getNumberOfHits() / t_acq, sk.getNumberOfHits() / t_proc, t_acq / t_proc))
+    print("*")
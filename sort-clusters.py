@@ -20,6 +20,13 @@ from shutil import rmtree, copyfile
 # Import the JSON library.
 import json
 
+#...for timing the sorting.
+import time
+
+#...for sorting the data points in parallel.
+from multiprocessing import Pool
+from functools import partial
+
 # Import the plotting libraries.
 import pylab as plt
 
@@ -33,10 +40,152 @@ from matplotlib import rc
 # Get the path of the current directory
 path = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 
-from cernatschool.datavals import TRIPIXEL_RADIUS, TETRAPIXEL_RADIUS
+#...for the cluster sorting algorithm.
+from cernatschool.sorting import KLUSTER_TYPES, getKlusterType
+
+#...for reading the cluster JSON.
+from cernatschool.klusterhelpers import iterKlusterJson
+
+#...for the cluster galleries.
+from cernatschool.gallery import KlusterGallery, DEFAULT_GALLERY_PAGE_SIZE
 
 from data.datapoint import DataPoint
 
+def sortDataPoint(dp, pagesize=DEFAULT_GALLERY_PAGE_SIZE, framesize=(256, 256)):
+    """
+    Sort the clusters of a data point and write its sorting and gallery pages.
+
+    @param [in] dp The data point.
+    @param [in] pagesize The number of clusters per gallery page.
+    @param [in] framesize The frame width and height [pixels].
+    @returns A dictionary of the data point's results.
+    """
+
+    ## The time the sorting started [s].
+    t_0 = time.time()
+
+    # If it exists, delete it.
+    if os.path.isdir(dp.get_output_path()):
+        rmtree(dp.get_output_path())
+        #lg.info(" * Skipping directory '%s'..." % (dp.get_output_path()))
+        #print(" * Skipping directory '%s'..." % (dp.get_output_path()))
+        #continue
+    os.mkdir(dp.get_output_path())
+    lg.info(" * Creating directory '%s'..." % (dp.get_output_path()))
+    lg.info("")
+
+    ## The cluster properties JSON file.
+    kluster_json_path = (dp.get_input_path() + "/klusters.json").replace("//", "/")
+    #
+    if not os.path.exists(kluster_json_path):
+        raise IOError("* ERROR! '%s' doesn't exist." % (kluster_json_path))
+
+    ## The path to the cluster images, relative to the sorting pages.
+    imagepath = os.path.relpath(os.path.join(dp.get_input_path(), "clusters"), dp.get_output_path())
+
+    ## The galleries for each cluster type { type:gallery }.
+    galleries = {}
+    #
+    for typename in KLUSTER_TYPES:
+        galleries[typename] = KlusterGallery(dp.get_output_path(), typename, \
+            "CERN@school: %s Clusters for %4.2f [%s]" % (typename, dp.get_value(), dp.get_unit()), \
+            imagepath, pagesize)
+
+    ## The number of clusters of each type { type:n }.
+    counts = dict([(typename, 0) for typename in KLUSTER_TYPES])
+
+    lg.info(" *")
+    lg.info(" * SUMMARY for '%s':" % (dp.get_name()))
+    lg.info(" *")
+
+    # Sort the clusters, adding each one to its type's gallery as we go.
+    # The clusters are read from the JSON one at a time.
+    for k in iterKlusterJson(kluster_json_path):
+        ktype = getKlusterType(k, framesize[0], framesize[1])
+        lg.info(" * %s is '%s'." % (str(k["id"]), str(ktype)))
+        counts[ktype] += 1
+        galleries[ktype].add(k["id"])
+
+    for typename in KLUSTER_TYPES:
+        galleries[typename].close()
+
+    ## The number of clusters.
+    n_klusters = sum(counts.values())
+
+    ## The number of edge clusters.
+    n_edge_klusters = counts["Edge"]
+
+    ## Path to the sorting HTML page.
+    homepage_name = (dp.get_output_path() + "/index.html").replace("//", "/")
+
+    # Write the index page for the sorted clusters.
+    with open(homepage_name, "w") as f:
+
+        f.write("<!DOCTYPE html>\n")
+        f.write("<html>\n")
+        f.write("  <head>\n")
+        f.write("    <title>Cluster sorting: %4.2f [%s]</title>\n" % (dp.get_value(), dp.get_unit()))
+        f.write("  </head>\n")
+        f.write("  <body>\n")
+        f.write("    <h1>CERN@school: Cluster Sorting for %4.2f [%s]</h1>\n" % (dp.get_value(), dp.get_unit()))
+        f.write("    <p>Back to the <a href='../index.html'>datasets home</a>.</p>\n")
+        f.write("    <h2>Dataset summary</h2>\n")
+        f.write("    <p>\n")
+        f.write("      <ul>\n")
+        f.write("        <li>Dataset path = '%s'</li>\n" % (dp.get_input_path()))
+        f.write("        <li>Number of clusters = %d</li>\n" % (n_klusters))
+        f.write("      </ul>\n")
+        f.write("    </p>\n")
+        f.write("    <h2>Cluster types</h2>\n")
+
+        f.write("    <p>\n")
+
+        # Make this into a table.
+        f.write("      <table>\n")
+        f.write("        <tr><th>Type</th><th colspan=\"2\">Clusters</th><th>%</th></tr>\n")
+
+        # Loop over the cluster types.
+        for typename in sorted(KLUSTER_TYPES):
+
+            ## The number of clusters of this type.
+            numtype = counts[typename]
+
+            # Write the entry on the sorting homepage table.
+            f.write("          <tr>")
+            f.write("<td><a href=\"%s.html\">%s</a></td>" % (typename, typename))
+            f.write("<td style=\"text-align:right\">%d</td>" % (numtype))
+            f.write("<td>")
+
+            if typename != "Edge":
+                perc = 100.0 * (numtype) / (n_klusters - n_edge_klusters)
+                f.write("|" * int(perc))
+                f.write("</td>")
+                f.write("<td style=\"text-align:right\">% 4.1f</td>" % (perc))
+            else:
+                f.write("<td></td><td></td>\n")
+            f.write("</tr>\n")
+
+        f.write("      </table>\n")
+        f.write("    </p>\n")
+        f.write("  </body>\n")
+        f.write("</html>")
+
+    return {
+        "name"       : dp.get_name(),
+        "value"      : dp.get_value(),
+        "unit"       : dp.get_unit(),
+        "n_klusters" : n_klusters,
+        "n_beta"     : counts["Beta"],
+        "t_total"    : time.time() - t_0
+        }
+
+def getKlusterJsonSize(dp):
+    """ The size of a data point's cluster JSON file [bytes] (for scheduling). """
+    try:
+        return os.path.getsize((dp.get_input_path() + "/klusters.json").replace("//", "/"))
+    except OSError:
+        return 0
+
 #
 # The main program.
 #
@@ -50,6 +199,9 @@ if __name__=="__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("inputPath",  help="Path to the input dataset.")
     parser.add_argument("outputPath", help="The path for the output files.")
+    parser.add_argument("-j", "--jobs", help="Number of data points to sort in parallel", type=int, default=1)
+    parser.add_argument("--page-size", help="Number of clusters per gallery page", type=int, default=DEFAULT_GALLERY_PAGE_SIZE)
+    parser.add_argument("--frame-size", help="The frame width and height [pixels]", type=int, nargs=2, default=[256, 256])
     parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
     args = parser.parse_args()
 
@@ -75,6 +227,8 @@ if __name__=="__main__":
     print("*")
     print("* Input path          : '%s'" % (datapath))
     print("* Output file         : '%s'" % (outputpath))
+    print("* Parallel jobs       : %d" % (args.jobs))
+    print("* Frame size          : %d x %d [pixels]" % tuple(args.frame_size))
     print("*")
 
     # Loop over the datasets to get the JSONs.
@@ -89,214 +243,67 @@ if __name__=="__main__":
     # Sort the data points.
     data_points = sorted(data_points)
 
-    ## Dictionary for the results JSON.
-    beta_results = {}
+    ## The time the sorting started [s].
+    t_0 = time.time()
 
-    # Create the subdirectories.
-    for dp in data_points:
-
-        print("* Processing '%s'." % (dp.get_name()))
-        print("*--> Input:  '%s'." % (dp.get_input_path()))
-        print("*--> Output: '%s'." % (dp.get_output_path()))
-        print("*")
-
-        # If it exists, delete it.
-        if os.path.isdir(dp.get_output_path()):
-            rmtree(dp.get_output_path())
-            #lg.info(" * Skipping directory '%s'..." % (dp.get_output_path()))
-            #print(" * Skipping directory '%s'..." % (dp.get_output_path()))
-            #continue
-        os.mkdir(dp.get_output_path())
-        lg.info(" * Creating directory '%s'..." % (dp.get_output_path()))
-        lg.info("")
-
-        ## The cluster properties JSON file - FIXME: check it exists...
-        kluster_json_path = (dp.get_input_path() + "/klusters.json").replace("//", "/")
-        #
-        if not os.path.exists(kluster_json_path):
-            raise IOError("* ERROR! '%s' doesn't exist." % (kluster_json_path))
-
-        kf = open(kluster_json_path, "r")
-        #
-        kd = json.load(kf)
-        kf.close()
-
-        ## Dictionary of the clusters { id:type }.
-        ks = {}
-
-        ## Dictionary of the cluster sizes { id:size }.
-        ksizes = {}
-
-        ## Dictionary of the cluster radii { id:radius }.
-        krads = {}
-
-        ## Dictionary of the cluster densities { id:density }.
-        kdens = {}
-
-        ## Dictionary of the cluster linearity { id:linearity }.
-        klins = {}
-
-        ## Dictionary of the clusters' fraction of inner pixels { id:innerfrac }.
-        kinners = {}
-
-        ## Dictionary of the cluster total counts { id:totalcounts }.
-        kttcs = {}
-
-        ## Dictionary of the clusters' max. count value { id:maxcounts }.
-        kmxcs = {}
-
-        ## List of the cluster types.
-        alltypes = ["None", "Edge", "Alpha", "Beta", "Gamma"]
-
-        ## The number of edge clusters.
-        n_edge_klusters = 0
-
-        # Loop over the klusters.
-        for k in kd:
-
-            # Add to the cluster property dictionaries.
-            ksizes[k["id"]] = k["size"]
-            krads[k["id"]]  = k["radius_uw"]
-            kdens[k["id"]]  = k["density_uw"]
-            klins[k["id"]]  = k["lin_linearity"]
-            kinners[k["id"]] = k["innerfrac"]
-            kttcs[k["id"]] = k["totalcounts"]
-            kmxcs[k["id"]] = k["maxcounts"]
-
-            # Check if the cluster is on the edge of the frame.
-            if k["xmin"] <= 0.1 or k["xmax"] >= 254.9 or k["ymin"] <= 0.1 or k["ymax"] >= 254.9:
-                ks[k["id"]] = "Edge"
-                n_edge_klusters += 1
-                continue
-
-            # Everything but gamma (or edge) is a beta (Strontium-90 data only!).
-            if   k['size'] == 1:
-                ks[k['id']] = "Gamma"
-            elif k['size'] == 2:
-                ks[k['id']] = "Gamma"
-            elif k['size'] == 3:
-                if k['radius_uw'] <= TRIPIXEL_RADIUS:
-                    ks[k['id']] = "Gamma"
-                else:
-                    ks[k['id']] = "Beta"
-            elif k['size'] == 4:
-                if k['radius_uw'] <= TETRAPIXEL_RADIUS:
-                    ks[k['id']] = "Gamma"
-                else:
-                    ks[k['id']] = "Beta"
-            else:
-                ks[k['id']] = "Beta"
-
-        lg.info(" *")
-        lg.info(" * SUMMARY:")
-        lg.info(" *")
-        for cid, ctype in ks.iteritems():
-            lg.info(" * %s is '%s'." % (str(cid), str(ctype)))
-        print("*")
-        print("* Sorted %d clusters!" % (len(ks)))
-
-        ## Path to the sorting HTML page.
-        homepage_name = (dp.get_output_path() + "/index.html").replace("//", "/")
-
-        ## The index page for the sorted clusters.
-        pg = ""
-
-        pg += "<!DOCTYPE html>\n"
-        pg += "<html>\n"
-        pg += "  <head>\n"
-        pg += "    <title>Cluster sorting: %4.2f [%s]</title>\n" % (dp.get_value(), dp.get_unit())
-        pg += "  </head>\n"
-        pg += "  <body>\n"
-        pg += "    <h1>CERN@school: Cluster Sorting for %4.2f [%s]</h1>\n" % (dp.get_value(), dp.get_unit())
-        pg += "    <p>Back to the <a href='../index.html'>datasets home</a>.</p>\n"
-        pg += "    <h2>Dataset summary</h2>\n"
-        pg += "    <p>\n"
-        pg += "      <ul>\n"
-        pg += "        <li>Dataset path = '%s'</li>\n" % (dp.get_input_path())
-        pg += "        <li>Number of clusters = %d</li>\n" % (len(kd))
-        pg += "      </ul>\n"
-        pg += "    </p>\n"
-        pg += "    <h2>Cluster types</h2>\n"
-
-        pg += "    <p>\n"
-
-        # Make this into a table.
-        pg += "      <table>\n"
-        pg += "        <tr><th>Type</th><th colspan=\"2\">Clusters</th><th>%</th></tr>\n"
+    ## The results for each data point.
+    results = []
 
-        # Loop over the cluster types.
-        for typename in sorted(alltypes):
+    if args.jobs > 1:
 
-            ## The number of clusters of this type.
-            numtype = 0
+        ## The pool of worker processes.
+        pool = Pool(processes=args.jobs)
 
-            for kl, ktype in ks.iteritems():
-                if ktype == typename:
-                    numtype += 1
+        # Start the biggest data points first so that the total time is
+        # close to that of the biggest one.
+        results = pool.map(partial(sortDataPoint, pagesize=args.page_size, framesize=args.frame_size), \
+            sorted(data_points, key=getKlusterJsonSize, reverse=True), chunksize=1)
 
-            # Write the entry on the sorting homepage table.
-            pg += "          <tr>"
-            pg += "<td><a href=\"%s.html\">%s</a></td>" % (typename, typename)
-            pg += "<td style=\"text-align:right\">%d</td>" % (numtype)
-            pg += "<td>"
+        pool.close()
+        pool.join()
 
-            if typename != "Edge":
-                perc = 100.0 * (numtype) / (len(ks) - n_edge_klusters)
-                for i in range(int(perc)):
-                    pg += "|"
-                pg += "</td>"
-                pg += "<td style=\"text-align:right\">% 4.1f</td>" % (perc)
-            else:
-                pg += "<td></td><td></td>\n"
-            pg += "</tr>\n"
-
-            # Add to the results JSON.
-            if typename == "Beta":
-                print("* %f [%s] has % 10d betas" % (dp.get_value(), dp.get_unit(), numtype))
-                beta_results[dp.get_value()] = numtype
+    else:
+        for dp in data_points:
+            results.append(sortDataPoint(dp, args.page_size, args.frame_size))
 
+    # Put the results back in data point order.
+    results = sorted(results, key=lambda r: r["value"])
 
-        pg += "      </table>\n"
-        pg += "    </p>\n"
-        pg += "  </body>\n"
-        pg += "</html>"
+    ## Dictionary for the results JSON.
+    beta_results = {}
 
+    for r in results:
+        print("* Sorted '%s': %d clusters in %.2f [s] (%.0f clusters/s)." % \
+            (r["name"], r["n_klusters"], r["t_total"], r["n_klusters"] / max(r["t_total"], 1.0e-6)))
+        print("* %f [%s] has % 10d betas" % (r["value"], r["unit"], r["n_beta"]))
+        beta_results[r["value"]] = r["n_beta"]
 
-        ## The text file for the HTML page.
-        f = open(homepage_name, "w")
-        f.write(pg)
-        f.close()
+    print("*")
+    print("* Sorted %d data points in %.2f [s]." % (len(results), time.time() - t_0))
 
     # Write out the results JSON.
     with open(outputpath + "/beta_results.json", "w") as rjf:
-        json.dump(beta_results, rjf)
-
-    # Create the index page.
-
-    ## The index page text.
-    ipg = ""
-    ipg += "<!DOCTYPE html>\n"
-    ipg += "<html>\n"
-    ipg += "  <head>\n"
-    ipg += "    <title>Beta Attenuation: the datasets.</title>\n"
-    ipg += "  </head>\n"
-    ipg += "  <body>\n"
-    ipg += "    <h1>CERN@school: Beta Attenuation Datasets</h1>\n"
-    ipg += "    <ul>\n"
-
-    for dp in data_points:
-        ipg += "<li><a href='%s/index.html'>%s</a></li>\n" % (dp.get_name(), dp.get_name())
-
-    ipg += "    </ul>\n"
-    ipg += "  </body>\n"
-    ipg += "</html>"
+        json.dump(beta_results, rjf, sort_keys=True)
 
     index_page_name = (outputpath + "/index.html").replace("//", "/")
 
-    ## The text file for the HTML page.
-    f = open(index_page_name, "w")
-    f.write(ipg)
-    f.close()
+    # Write the index page.
+    with open(index_page_name, "w") as f:
+        f.write("<!DOCTYPE html>\n")
+        f.write("<html>\n")
+        f.write("  <head>\n")
+        f.write("    <title>Beta Attenuation: the datasets.</title>\n")
+        f.write("  </head>\n")
+        f.write("  <body>\n")
+        f.write("    <h1>CERN@school: Beta Attenuation Datasets</h1>\n")
+        f.write("    <ul>\n")
+
+        for dp in data_points:
+            f.write("<li><a href='%s/index.html'>%s</a></li>\n" % (dp.get_name(), dp.get_name()))
+
+        f.write("    </ul>\n")
+        f.write("  </body>\n")
+        f.write("</html>")
 
     # Now you can view "index.html" to see your results!
     print("*")
@@ -36,11 +36,11 @@ def addRadiusCircle(figax, x, y, r):
     figax.add_patch(plt.Circle((x_c,y_c),r,fc='k',alpha=0.1,lw=3.0))
     figax.add_patch(plt.Circle((x_c,y_c),r,fill=False,lw=1.0,ec='g'))
 
-def addLineOfBestFit(figax, m, c):
+def addLineOfBestFit(figax, m, c, width=256):
     """ Adds a line of best fit to the cluster image. """
 
     ## The x values.
-    xs = np.arange(0.0,256.0,0.1)
+    xs = np.arange(0.0,float(width),0.1)
 
     ## The y values.
     ys = m*(xs - 0.5) + c + 0.5
@@ -79,6 +79,9 @@ def makeKlusterImage(klusterid, kl, outputpath):
 
     m, c, sumR = kl.getLineOfBestFitValues()
 
+    ## The frame width and height [pixels].
+    fw = kl.getFrameCols(); fh = kl.getFrameRows()
+
     # Create the figure.
     plt.close('all')
 
@@ -91,7 +94,7 @@ def makeKlusterImage(klusterid, kl, outputpath):
     blobfigax = blobfig.add_subplot(111, axisbg='#222222')
 
     # Add the frame background (blue).
-    blobfigax.add_patch(plt.Rectangle((0,0),256,256,facecolor='#82bcff'))
+    blobfigax.add_patch(plt.Rectangle((0,0),fw,fh,facecolor='#82bcff'))
 
     # Add a grid.
     plt.grid(1)
@@ -107,14 +110,14 @@ def makeKlusterImage(klusterid, kl, outputpath):
     colorbar.ColorbarBase(colax,cmap=cmap,norm=colors.Normalize(vmin=0,vmax=col_max))
 
     # Add the line of best fit.
-    addLineOfBestFit(blobfigax, m, c)
+    addLineOfBestFit(blobfigax, m, c, fw)
 
     # Add the radius circle.
     addRadiusCircle(blobfigax, x_bar, y_bar, radius)
 
     # Loop over the pixels and plot them.
     for X, C in pixels.iteritems():
-        x = X % 256; y = X / 256
+        x = X % fw; y = X / fw
         scaled_C = float(C)/float(col_max)
         blobfigax.add_patch(plt.Rectangle((x,y),1,1,facecolor=cmap(scaled_C)))
 
@@ -137,28 +140,45 @@ def makeKlusterImage(klusterid, kl, outputpath):
     blobfig.savefig(outputpath + "/%s.png" % (klusterid))
 
 
-def makeFrameImage(basename, pixels, outputpath):
-    """ Create the frame image. """
+def makeFrameImage(basename, pixels, outputpath, width=256, height=256):
+    """
+    Create the frame image.
+
+    @param [in] basename The image file name (without the extension).
+    @param [in] pixels The pixel map {X:C} or the frame payload (see cernatschool.payload).
+    @param [in] outputpath The path to write the image to.
+    @param [in] width The frame width [pixels] (a payload knows its own).
+    @param [in] height The frame height [pixels] (a payload knows its own).
+    """
 
     # FIXME: Make configurable.
 
+    if not isinstance(pixels, dict):
+        width = pixels.getWidth(); height = pixels.getHeight()
+
     x_min = 0
 
-    x_max = 256
+    x_max = width
 
     y_min = 0
 
-    y_max = 256
+    y_max = height
 
-    w = 256
+    w = width
 
-    h = 256
+    h = height
+
+    ## Is the frame a (dense) payload to be drawn as an image?
+    isdense = not isinstance(pixels, dict) and pixels.isDense()
+
+    ## The pixel counts.
+    Cs = pixels.values() if isinstance(pixels, dict) else pixels.getArrays()[1].tolist()
 
     ## The maximum count value.
     C_max = 1
 
-    if len(pixels.values()) > 0:
-        C_max = max(pixels.values())
+    if len(Cs) > 0:
+        C_max = max(Cs)
 
     # Create the figure.
     plt.close('all')
@@ -172,7 +192,7 @@ def makeFrameImage(basename, pixels, outputpath):
     frfigax = frfig.add_subplot(111, axisbg='#222222')
 
     # Add the frame background (blue).
-    frfigax.add_patch(plt.Rectangle((0,0),256,256,facecolor='#82bcff'))
+    frfigax.add_patch(plt.Rectangle((0,0),w,h,facecolor='#82bcff'))
 
     # Add a grid.
     plt.grid(1)
@@ -187,17 +207,29 @@ def makeFrameImage(basename, pixels, outputpath):
 
     colorbar.ColorbarBase(colax,cmap=cmap,norm=colors.Normalize(vmin=0,vmax=col_max))
 
-    # Loop over the pixels and plot them.
-    for X, C in pixels.iteritems():
-        x = X % 256; y = X / 256
-        scaled_C = float(C)/float(col_max)
-        frfigax.add_patch(plt.Rectangle((x,y),1,1,edgecolor=cmap(scaled_C),facecolor=cmap(scaled_C)))
+    if isdense:
+
+        # Busy frames are drawn as one image (the unhit pixels are left transparent).
+        frfigax.imshow(np.ma.masked_equal(pixels.getDense(), 0), cmap=cmap, \
+            norm=colors.Normalize(vmin=0,vmax=col_max), extent=(0, w, 0, h), \
+            origin='lower', interpolation='nearest', aspect='auto', zorder=2)
+
+    else:
+
+        if not isinstance(pixels, dict):
+            pixels = pixels.getPixelMap()
+
+        # Loop over the pixels and plot them.
+        for X, C in pixels.iteritems():
+            x = X % w; y = X / w
+            scaled_C = float(C)/float(col_max)
+            frfigax.add_patch(plt.Rectangle((x,y),1,1,edgecolor=cmap(scaled_C),facecolor=cmap(scaled_C)))
 
     # Set the axis limits based on the cluster radius.
     b = 3 # border
 
-    frfigax.set_xlim([0 - b, 256 + 3])
-    frfigax.set_ylim([0 - b, 256 + 3])
+    frfigax.set_xlim([0 - b, w + 3])
+    frfigax.set_ylim([0 - b, h + 3])
 
     # Save the figure.
     frfig.savefig(outputpath + "/%s.png" % (basename))